@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
-import pandas as pd
 import numpy as np
 import math
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 from mpl_toolkits.basemap import Basemap
+from utils import decoder
 
 # area = "Japan"
 area = "Tokyo"
@@ -45,67 +45,8 @@ class temp2col():
         # ax.set_axis_off()
 
 
-def str_rep(inp):
-    return inp.replace("[", "").replace("]", "").replace(",", "").split()
-
-
 def read_data(input_filename):
-    out_lon = list()
-    out_lat = list()
-    out_temp = list()
-    out_u = list()
-    out_v = list()
-    # データ取得部分
-    df = pd.read_csv(input_filename)
-    lon_in = df.loc[:, "lon"]
-    lat_in = df.loc[:, "lat"]
-    temp_in = df.loc[:, "temp"]
-    wd_in = df.loc[:, "windDirection"]
-    ws_in = df.loc[:, "wind"]
-    for lon, lat, temp, wd, ws in zip(lon_in, lat_in, temp_in, wd_in, ws_in):
-        # 経度・緯度の計算
-        lon = str_rep(lon)
-        lat = str_rep(lat)
-        lon = float(lon[0]) + float(lon[1]) / 60.0
-        lat = float(lat[0]) + float(lat[1]) / 60.0
-        # print(lon.strip(), lat.strip(), temp)
-        try:
-            # 気温の計算
-            temp.isdecimal()
-            new = str_rep(temp)
-            if new[1] == "0":
-                temp = float(new[0])
-            else:
-                temp = np.nan
-        except AttributeError:
-            temp = np.nan
-        try:
-            # 風向・風速の計算
-            wd.isdecimal()
-            ws.isdecimal()
-            new_wd = str_rep(wd)
-            new_ws = str_rep(ws)
-            if new_wd[1] == "0" and new_ws[1] == "0":
-                wd = float(new_wd[0]) * 22.5
-                ws = float(new_ws[0])
-            else:
-                wd = np.nan
-                ws = np.nan
-            # 東西風、南北風への変換
-            u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-            v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-        except AttributeError:
-            u = np.nan
-            v = np.nan
-
-        # データの保存
-        out_lon.append(lon)
-        out_lat.append(lat)
-        out_temp.append(temp)
-        out_u.append(u)
-        out_v.append(v)
-    return np.array(out_lon), np.array(out_lat), np.array(out_temp), np.array(
-        out_u), np.array(out_v)
+    return decoder.read_data(input_filename)
 
 
 def draw(lons, lats, d, u, v, output_filename="test.png", title=None):
@@ -1,137 +1,88 @@
 #!/usr/bin/env python3
 import pandas as pd
 import numpy as np
-import math
 import os
 import sys
 from datetime import timedelta
-import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 from jmaloc import MapRegion
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
-import cartopy.io.shapereader as shapereader
 from utils import collevs
 from utils import os_mkdir
 from utils import parse_command
+from utils.bulk import time_range
+from utils.accum import accumulate
 from utils import common
+from utils.background import map_axes, savefig
+from utils.pref import add_pref
+from utils.frame import frame_figure
+from utils.render import render_frames
+from utils.layers import in_extent, warn_missing
 common
 
+# 地図の背景（経度・緯度線、陸・海、都道府県境）を画像としてキャッシュし、
+# 同じ領域・設定の図で使い回すかどうか（~/.cache/jma_draw/background）
+opt_bgcache = True
 
-def str_rep(inp):
-    """データの文字列を処理し数値リストを返す"""
-    return inp.replace("[", "").replace("]", "").replace(",", "").split()
+# 時刻毎に図を作り直さず、領域・設定が同じ図のデータだけを置き換えるかどうか
+opt_persist = True
 
+# 降水量の累積和のチェックポイント（Noneの場合は保存しない）
+acc_file = "cumrain_acc.npz"
 
-def read_data(input_filename):
-    """AMeDAS csvデータを読み込む
+# 期間内に欠損値の時刻がある地点を欠損値とするかどうか（Trueは以前と同じく
+# 欠損した地点を描かない、Falseは正常な時刻の値のみ積算して描く）
+opt_complete = True
+
+
+def draw_background(ax, region, opt_mapcolor=False, opt_pref=False):
+    """地図の背景（経度・緯度線、陸・海・海岸線、都道府県境）を描く
 
     Parameters:
     ----------
-    input_filename: str
-        入力ファイル名
+    ax: matplotlib Axes
+        cartopyを呼び出した際のaxes
+    region: jmaloc.MapRegion
+        作図範囲
+    opt_mapcolor: bool
+        True: 陸・海・湖を塗り分けて描く
+        False: 海岸線を描く
+    opt_pref: bool
+        都道府県境を描くかどうか
     ----------
     """
-    out_lon = list()
-    out_lat = list()
-    out_temp = list()
-    out_u = list()
-    out_v = list()
-    out_prep = list()
-    # データ取得部分
-    df = pd.read_csv(input_filename)
-    lon_in = df.loc[:, "lon"]
-    lat_in = df.loc[:, "lat"]
-    temp_in = df.loc[:, "temp"]
-    wd_in = df.loc[:, "windDirection"]
-    ws_in = df.loc[:, "wind"]
-    prep_in = df.loc[:, "precipitation1h"]
-    for lon, lat, temp, wd, ws, prep in zip(lon_in, lat_in, temp_in, wd_in,
-                                            ws_in, prep_in):
-        # 経度・緯度の計算
-        lon = str_rep(lon)
-        lat = str_rep(lat)
-        lon = float(lon[0]) + float(lon[1]) / 60.0
-        lat = float(lat[0]) + float(lat[1]) / 60.0
-        # print(lon.strip(), lat.strip(), temp)
-        # データの保存
-        out_lon.append(lon)
-        out_lat.append(lat)
-        try:
-            # 気温の計算
-            temp.isdecimal()
-            new = str_rep(temp)
-            if new[1] == "0":
-                temp = float(new[0])
-            else:
-                temp = np.nan
-            # データの保存
-            out_temp.append(temp)
-        except AttributeError:
-            out_temp.append(np.nan)
-        #
-        try:
-            # 風向・風速の計算
-            wd.isdecimal()
-            ws.isdecimal()
-            new_wd = str_rep(wd)
-            new_ws = str_rep(ws)
-            if new_wd[1] == "0" and new_ws[1] == "0":
-                wd = float(new_wd[0]) * 22.5
-                ws = float(new_ws[0])
-            else:
-                wd = np.nan
-                ws = np.nan
-            # 東西風、南北風への変換
-            u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-            v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-            # データの保存
-            out_u.append(u)
-            out_v.append(v)
-        except AttributeError:
-            out_u.append(np.nan)
-            out_v.append(np.nan)
-        #
-        try:
-            # 降水量の計算
-            prep.isdecimal()
-            new = str_rep(prep)
-            if new[1] == "0":
-                prep = float(new[0])
-            else:
-                prep = np.nan
-            out_prep.append(prep)
-        except AttributeError:
-            out_prep.append(np.nan)
-    return np.array(out_lon), np.array(out_lat), np.array(out_temp), np.array(
-        out_u), np.array(out_v), np.array(out_prep)
-
+    lon_step = region.lon_step  # 経度線を描く間隔
+    lat_step = region.lat_step  # 緯度線を描く間隔
+    # 経度、緯度線を描く
+    xticks = np.arange(-180, 180, lon_step)
+    yticks = np.arange(-90, 90, lat_step)
+    gl = ax.gridlines(crs=ccrs.PlateCarree(),
+                      draw_labels=True,
+                      linewidth=1,
+                      linestyle=':',
+                      color='k',
+                      alpha=0.8)
+    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
+    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
+    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
+    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
 
-# ax: cartopyを呼び出した際のaxes
-def add_pref(ax,
-             linestyle='-',
-             facecolor='none',
-             edgecolor='k',
-             linewidth=0.8):
-    # 10mの解像度のデータ
-    shpfilename = shapereader.natural_earth(resolution='10m',
-                                            category='cultural',
-                                            name='admin_1_states_provinces')
-    #
-    # 都道府県のみ取得
-    provinces = shapereader.Reader(shpfilename).records()
-    provinces_of_japan = filter(
-        lambda province: province.attributes['admin'] == 'Japan', provinces)
+    # 海岸線を描く
+    if opt_mapcolor:
+        # 陸・海・湖を塗り分けて描く
+        ax.add_feature(cfeature.LAND, color='darkseagreen')
+        ax.add_feature(cfeature.OCEAN)
+        # ax.add_feature(cfeature.OCEAN, color='powderblue')
+        ax.add_feature(cfeature.COASTLINE)
+        # ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
+        ax.add_feature(cfeature.LAKES)
+    else:
+        ax.coastlines(resolution='10m', color='k', linewidth=0.8)
     #
-    # 都道府県境の追加
-    for province in provinces_of_japan:
-        geometry = province.geometry
-        ax.add_geometries([geometry],
-                          ccrs.PlateCarree(),
-                          facecolor=facecolor,
-                          edgecolor=edgecolor,
-                          linewidth=linewidth,
-                          linestyle=linestyle)
+    # 都道府県境を描く
+    if opt_pref:
+        add_pref(ax, region, linestyle='-', facecolor='none', linewidth=0.8)
 
 
 def draw(lons,
@@ -169,15 +120,21 @@ def draw(lons,
     ----------
     """
     # プロット領域の作成
-    fig = plt.figure(figsize=(18, 12))
+    # （領域・設定が前の時刻と同じ場合は図を使い回し、データだけを置き換える）
+    frame = frame_figure(dict(name="cumrain",
+                              opt_mapcolor=opt_mapcolor,
+                              opt_pref=opt_pref,
+                              opt_markerlabel=opt_markerlabel,
+                              area=area),
+                         figsize=(18, 12),
+                         persist=opt_persist)
+    fig = frame.fig
     #
     # MapRegion Classの初期化
     region = MapRegion(area)
     # Map.regionの変数を取得
-    lon_step = region.lon_step  # 経度線を描く間隔
     lon_min = region.lon_min  # 経度範囲下限
     lon_max = region.lon_max  # 経度範囲上限
-    lat_step = region.lat_step  # 緯度線を描く間隔
     lat_min = region.lat_min  # 緯度範囲下限
     lat_max = region.lat_max  # 緯度範囲上限
     if area == "Japan":
@@ -186,38 +143,16 @@ def draw(lons,
         ms = 6  # マーカーサイズ
     #
     # cartopy呼び出し
-    ax = fig.add_axes((0.1, 0.3, 0.8, 0.6), projection=ccrs.PlateCarree())
-    ax.set_extent([lon_min, lon_max, lat_min, lat_max])  # 領域の限定
-
-    # 経度、緯度線を描く
-    xticks = np.arange(-180, 180, lon_step)
-    yticks = np.arange(-90, 90, lat_step)
-    gl = ax.gridlines(crs=ccrs.PlateCarree(),
-                      draw_labels=True,
-                      linewidth=1,
-                      linestyle=':',
-                      color='k',
-                      alpha=0.8)
-    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
-    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
-    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
-    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
-
-    # 海岸線を描く
-    if opt_mapcolor:
-        # 陸・海・湖を塗り分けて描く
-        ax.add_feature(cfeature.LAND, color='darkseagreen')
-        ax.add_feature(cfeature.OCEAN)
-        # ax.add_feature(cfeature.OCEAN, color='powderblue')
-        ax.add_feature(cfeature.COASTLINE)
-        # ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
-        ax.add_feature(cfeature.LAKES)
-    else:
-        ax.coastlines(resolution='10m', color='k', linewidth=0.8)
-    #
-    # 都道府県境を描く
-    if opt_pref:
-        add_pref(ax, linestyle='-', facecolor='none', linewidth=0.8)
+    # （背景の経度・緯度線、陸・海、都道府県境は画像として使い回す）
+    if frame.new:
+        frame.ax = map_axes(fig, (0.1, 0.3, 0.8, 0.6),
+                            region,
+                            draw_background,
+                            dict(opt_mapcolor=opt_mapcolor, opt_pref=opt_pref),
+                            projection=ccrs.PlateCarree(),
+                            dpi=300,
+                            cache=None if opt_bgcache else False)
+    ax = frame.ax
 
     #
     clevs = [20., 50., 100., 200., 300., 400., 600., 800., 2000.]
@@ -231,52 +166,34 @@ def draw(lons,
     t2c = collevs(clevs=clevs, ccols=ccols)
     #
     # マーカーとテキストをプロット
-    for xc, yc, dc in zip(lons, lats, d):
-        if math.isnan(dc):
-            print("Warn ", xc, yc, dc)
-        else:
-            c = t2c.conv(dc)
-            ax.plot(xc, yc, marker='o', color=c, markersize=ms)
-            if opt_markerlabel:
-                if xc >= lon_min and xc <= lon_max and yc >= lat_min and yc <= lat_max:
-                    ax.text(xc + 0.03, yc - 0.02, str(dc), color=c, fontsize=8)
+    # （全地点のマーカー、テキストをそれぞれ1つのArtistで描く）
+    valid = warn_missing(lons, lats, d)
+    frame.markers("markers", ax, lons[valid], lats[valid],
+                  t2c.conv_array(d[valid]), ms)
+    if opt_markerlabel:
+        m = valid & in_extent(lons, lats, lon_min, lon_max, lat_min, lat_max)
+        frame.labels("labels",
+                     ax,
+                     lons[m],
+                     lats[m], [str(dc) for dc in d[m]],
+                     t2c.conv_array(d[m]),
+                     fontsize=8)
 
     # タイトル
-    if title is not None:
-        plt.title(title, size=24)
-        # fig.suptitle(title, size=24)
+    frame.title(ax, title, size=24)
 
     # カラーバーを付ける
-    t2c.colorbar(fig, anchor=(0.30, 0.25), size=(0.35, 0.02))
+    if frame.new:
+        t2c.colorbar(fig, anchor=(0.30, 0.25), size=(0.35, 0.02))
 
     # ファイルへの書き出し
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-    plt.close()
-
-
-def main(tinfof=None):
-    """指定された時刻データを取得
-
-    Parameters:
-    ----------
-    tinfof: str
-        ファイル名の一部に用いる時刻
-        (形式：20210312161000)
-    ----------
-    """
-    if tinfof is not None:
-        # 入力ファイル名
-        input_filename = tinfof + ".csv"
-        # データの取得
-        lons, lats, temp, u, v, prep = read_data(input_filename)
-        print(lons.shape, lats.shape, temp.shape, u.shape, v.shape, prep.shape)
-        #
-        return lons, lats, temp, u, v, prep
+    savefig(fig, output_filename, dpi=300)
+    frame.done()
 
 
 if __name__ == '__main__':
     # オプションの読み込み
-    args = parse_command(sys.argv, opt_lab=True)
+    args = parse_command(sys.argv, opt_lab=True, opt_workers=True)
     # 開始・終了時刻
     time_sta = pd.to_datetime(args.time_sta)
     time_end = pd.to_datetime(args.time_end)
@@ -284,6 +201,8 @@ if __name__ == '__main__':
     area = args.sta
     # 出力ディレクトリ名
     output_dir = args.output_dir
+    # 作図を行うプロセス数
+    workers = args.workers
     # 降水量を数字で表示するかどうか
     opt_markerlabel = args.mlabel
     # 出力ディレクトリ作成
@@ -291,32 +210,36 @@ if __name__ == '__main__':
 
     # データの時間間隔
     time_step = timedelta(hours=1)
-    time = time_sta
-    ofirst = True
-    while True:
-        if time <= time_end:
-            tinfo = time.strftime("%Y/%m/%d %H:%M:%SJST")
-            tinfof = time.strftime("%Y%m%d%H%M%S")
-            print(tinfo)
-            # データ読み込み
-            lons, lats, t_i, u_i, v_i, pr_i = main(tinfof)
-            if ofirst:
-                prep = pr_i
-                ofirst = False
-            else:
-                prep = prep + pr_i
-            # 出力ファイル名
-            output_filename = os.path.join(output_dir, area + "_cumrain_" + tinfof + ".png")
-            # 作図
-            draw(lons,
-                 lats,
-                 prep,
-                 output_filename,
-                 title=tinfo,
-                 area=area,
-                 opt_pref=True,
-                 opt_markerlabel=opt_markerlabel,
-                 opt_mapcolor=True)
-        else:
-            break
-        time = time + time_step
+    # 降水量の累積和（チェックポイントがあれば、まだ読み込んでいない時刻のみ読み込む）
+    acc = accumulate(time_sta,
+                     time_end,
+                     name="precipitation1h",
+                     time_step=time_step,
+                     acc_file=acc_file)
+    lons = acc.lon
+    lats = acc.lat
+    frames = []
+    for time in time_range(time_sta, time_end, time_step):
+        # ファイルが無い時刻は作図しない
+        if not acc.valid[acc.index(time) - 1]:
+            continue
+        tinfo = time.strftime("%Y/%m/%d %H:%M:%SJST")
+        tinfof = time.strftime("%Y%m%d%H%M%S")
+        print(tinfo)
+        prep = acc.window(time_sta - time_step, time, complete=opt_complete)
+        # 出力ファイル名
+        output_filename = os.path.join(output_dir, area + "_cumrain_" + tinfof + ".png")
+        # 作図する時刻のデータ
+        kwargs = dict(title=tinfo,
+                      area=area,
+                      opt_pref=True,
+                      opt_markerlabel=opt_markerlabel,
+                      opt_mapcolor=True)
+        frames.append((output_filename, (lons, lats, prep, output_filename),
+                       kwargs))
+
+    # 作図（workersが2以上の場合は複数のプロセスで描く）
+    failed = render_frames(draw, frames, workers=workers)
+    if len(failed) > 0:
+        print("Error: failed to draw", len(failed), "frames")
+        sys.exit(1)
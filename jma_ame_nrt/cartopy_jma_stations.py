@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import pandas as pd
 import numpy as np
-import math
 import os
 import sys
 from datetime import timedelta
@@ -10,16 +9,18 @@ import matplotlib.ticker as mticker
 from jmaloc import MapRegion
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
-import cartopy.io.shapereader as shapereader
 from utils import os_mkdir
 from utils import parse_command
+from utils import decoder
 from utils import common
+from utils.background import map_axes, savefig
+from utils.pref import add_pref
+from utils.layers import add_markers
 common
 
-
-def str_rep(inp):
-    """データの文字列を処理する"""
-    return inp.replace("[", "").replace("]", "").replace(",", "").split()
+# 地図の背景（経度・緯度線、陸・海、都道府県境）を画像としてキャッシュし、
+# 同じ領域・設定の図で使い回すかどうか（~/.cache/jma_draw/background）
+opt_bgcache = True
 
 
 def read_data(input_filename):
@@ -35,103 +36,55 @@ def read_data(input_filename):
         経度、緯度、気温データ
     ----------
     """
-    out_lon = list()
-    out_lat = list()
-    out_temp = list()
-    out_u = list()
-    out_v = list()
-    # データ取得部分
-    df = pd.read_csv(input_filename)
-    lon_in = df.loc[:, "lon"]
-    lat_in = df.loc[:, "lat"]
-    temp_in = df.loc[:, "temp"]
-    wd_in = df.loc[:, "windDirection"]
-    ws_in = df.loc[:, "wind"]
-    for lon, lat, temp, wd, ws in zip(lon_in, lat_in, temp_in, wd_in, ws_in):
-        # 経度・緯度の計算
-        lon = str_rep(lon)
-        lat = str_rep(lat)
-        lon = float(lon[0]) + float(lon[1]) / 60.0
-        lat = float(lat[0]) + float(lat[1]) / 60.0
-        # print(lon.strip(), lat.strip(), temp)
-        # データの保存
-        out_lon.append(lon)
-        out_lat.append(lat)
-        try:
-            # 気温の計算
-            temp.isdecimal()
-            new = str_rep(temp)
-            if new[1] == "0":
-                temp = float(new[0])
-            else:
-                temp = np.nan
-            # データの保存
-            out_temp.append(temp)
-        except AttributeError:
-            out_temp.append(np.nan)
-        #
-        try:
-            # 風向・風速の計算
-            wd.isdecimal()
-            ws.isdecimal()
-            new_wd = str_rep(wd)
-            new_ws = str_rep(ws)
-            if new_wd[1] == "0" and new_ws[1] == "0":
-                wd = float(new_wd[0]) * 22.5
-                ws = float(new_ws[0])
-            else:
-                wd = np.nan
-                ws = np.nan
-            # 東西風、南北風への変換
-            u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-            v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-            # データの保存
-            out_u.append(u)
-            out_v.append(v)
-        except AttributeError:
-            out_u.append(np.nan)
-            out_v.append(np.nan)
-    return np.array(out_lon), np.array(out_lat), np.array(out_temp)
+    amedas = decoder.read(input_filename, names=["temp"])
+    return amedas.lon, amedas.lat, amedas.get("temp")
 
 
-def add_pref(ax,
-             linestyle='-',
-             facecolor='none',
-             edgecolor='k',
-             linewidth=0.8):
-    """都道府県境を描く
+def draw_background(ax, region, opt_mapcolor=False, opt_pref=False):
+    """地図の背景（経度・緯度線、陸・海・海岸線、都道府県境）を描く
 
     Parameters:
     ----------
     ax: matplotlib Axes
         cartopyを呼び出した際のaxes
-    facecolor: str
-        塗り潰す色
-    edgecolor: str
-        線の色
-    linewidth: str
-        線の幅
+    region: jmaloc.MapRegion
+        作図範囲
+    opt_mapcolor: bool
+        True: 陸・海・湖を塗り分けて描く
+        False: 海岸線を描く
+    opt_pref: bool
+        都道府県境を描くかどうか
     ----------
     """
-    # 10mの解像度のデータ
-    shpfilename = shapereader.natural_earth(resolution='10m',
-                                            category='cultural',
-                                            name='admin_1_states_provinces')
-    #
-    # 都道府県のみ取得
-    provinces = shapereader.Reader(shpfilename).records()
-    provinces_of_japan = filter(
-        lambda province: province.attributes['admin'] == 'Japan', provinces)
+    lon_step = region.lon_step  # 経度線を描く間隔
+    lat_step = region.lat_step  # 緯度線を描く間隔
+    # 経度、緯度線を描く
+    xticks = np.arange(-180, 180, lon_step)
+    yticks = np.arange(-90, 90, lat_step)
+    gl = ax.gridlines(crs=ccrs.PlateCarree(),
+                      draw_labels=True,
+                      linewidth=1,
+                      linestyle=':',
+                      color='k',
+                      alpha=0.8)
+    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
+    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
+    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
+    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
+
+    if opt_mapcolor:
+        # 陸・海・湖を塗り分けて描く
+        ax.add_feature(cfeature.LAND)
+        ax.add_feature(cfeature.OCEAN)
+        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
+        ax.add_feature(cfeature.LAKES)
+    else:
+        # 海岸線を描く
+        ax.coastlines(color='k', linewidth=0.8)
     #
-    # 都道府県境の追加
-    for province in provinces_of_japan:
-        geometry = province.geometry
-        ax.add_geometries([geometry],
-                          ccrs.PlateCarree(),
-                          facecolor=facecolor,
-                          edgecolor=edgecolor,
-                          linewidth=linewidth,
-                          linestyle=linestyle)
+    # 都道府県境を描く
+    if opt_pref:
+        add_pref(ax, region, linestyle='-', facecolor='none', linewidth=0.8)
 
 
 def draw(lons,
@@ -169,11 +122,7 @@ def draw(lons,
     # MapRegion Classの初期化
     region = MapRegion(area)
     # Map.regionの変数を取得
-    lon_step = region.lon_step  # 経度線を描く間隔
     lon_min = region.lon_min  # 経度範囲下限
-    lon_max = region.lon_max  # 経度範囲上限
-    lat_step = region.lat_step  # 緯度線を描く間隔
-    lat_min = region.lat_min  # 緯度範囲下限
     lat_max = region.lat_max  # 緯度範囲上限
     if area == "Japan":
         ms = 4  # マーカーサイズ
@@ -183,48 +132,28 @@ def draw(lons,
         ms = 10  # マーカーサイズ
     #
     # cartopy呼び出し
-    ax = fig.add_axes((0.1, 0.3, 0.8, 0.6), projection=ccrs.PlateCarree())
-    ax.set_extent([lon_min, lon_max, lat_min, lat_max])  # 領域の限定
-
-    # 経度、緯度線を描く
-    xticks = np.arange(-180, 180, lon_step)
-    yticks = np.arange(-90, 90, lat_step)
-    gl = ax.gridlines(crs=ccrs.PlateCarree(),
-                      draw_labels=True,
-                      linewidth=1,
-                      linestyle=':',
-                      color='k',
-                      alpha=0.8)
-    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
-    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
-    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
-    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
-
-    if opt_mapcolor:
-        # 陸・海・湖を塗り分けて描く
-        ax.add_feature(cfeature.LAND)
-        ax.add_feature(cfeature.OCEAN)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
-        ax.add_feature(cfeature.LAKES)
-    else:
-        # 海岸線を描く
-        ax.coastlines(color='k', linewidth=0.8)
-    #
-    # 都道府県境を描く
-    if opt_pref:
-        add_pref(ax, linestyle='-', facecolor='none', linewidth=0.8)
+    # （背景の経度・緯度線、陸・海、都道府県境は画像として使い回す）
+    ax = map_axes(fig, (0.1, 0.3, 0.8, 0.6),
+                  region,
+                  draw_background,
+                  dict(opt_mapcolor=opt_mapcolor, opt_pref=opt_pref),
+                  projection=ccrs.PlateCarree(),
+                  dpi=300,
+                  cache=None if opt_bgcache else False)
     #
     # マーカーとテキストをプロット
-    du = 0
-    dn = 0
-    for xc, yc, dc in zip(lons, lats, d):
-        if math.isnan(dc):
-            # print("Warn ", xc, yc, dc)
-            dn += 1
-        else:
-            ax.plot(xc, yc, marker='d', color='r', markeredgecolor='none',
-                    markersize=ms, alpha=0.8)
-            du += 1
+    # （全地点のマーカーを1つのArtistで描く）
+    valid = ~np.isnan(d)
+    du = int(np.count_nonzero(valid))
+    dn = len(d) - du
+    add_markers(ax,
+                lons[valid],
+                lats[valid],
+                'r',
+                ms,
+                marker='d',
+                edgecolors='none',
+                alpha=0.8)
     print("up, down = ", du, dn)
     ax.text(lon_min + 0.4, lat_max - 0.2, str(du), ha='left', va='center',
             fontsize=24, color='r')
@@ -235,7 +164,7 @@ def draw(lons,
         # fig.suptitle(title, size=24)
 
     # ファイルへの書き出し
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
+    savefig(fig, output_filename, dpi=300)
     plt.close()
 
 
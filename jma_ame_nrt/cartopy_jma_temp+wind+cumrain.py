@@ -1,161 +1,96 @@
 #!/usr/bin/env python3
 import pandas as pd
 import numpy as np
-import math
 import os
 import sys
 from datetime import timedelta
-import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 from jmaloc import MapRegion
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
-import cartopy.io.shapereader as shapereader
 from utils import val2col, collevs
 from utils import os_mkdir
 from utils import parse_command
+from utils import decoder
+from utils.bulk import time_range
+from utils.accum import accumulate, align, checkpoint_file
 from utils import common
+from utils.background import map_axes, savefig
+from utils.pref import add_pref
+from utils.frame import frame_figure
+from utils.render import render_frames
+from utils.layers import in_extent, warn_missing
 common
 
+# 地図の背景（経度・緯度線、陸・海、都道府県境）を画像としてキャッシュし、
+# 同じ領域・設定の図で使い回すかどうか（~/.cache/jma_draw/background）
+opt_bgcache = True
+
+# 時刻毎に図を作り直さず、領域・設定が同じ図のデータだけを置き換えるかどうか
+opt_persist = True
+
 # 矢羽を描く値（短矢羽：1m/s、長矢羽：5m/s、旗矢羽：10m/s）
 half = 1.
 full = 2.
 flag = 10.
 barb_increments = dict(half=half, full=full, flag=flag)
 
+# 10分間降水量の累積和のチェックポイント（入力ディレクトリ毎に名前を付ける、
+# Noneの場合は保存しない）
+acc_file = "temp_wind_cumrain_acc.npz"
 
-def str_rep(inp):
-    """データの文字列を処理し数値リストを返す"""
-    return inp.replace("[", "").replace("]", "").replace(",", "").split()
+# 期間内に欠損値の時刻がある地点を欠損値とするかどうか（Trueは以前と同じく
+# 欠損した地点を描かない、Falseは正常な時刻の値のみ積算して描く）
+opt_complete = True
 
 
-def read_data(input_filename):
-    """AMeDAS csvデータを読み込む
-
-    Parameters:
-    ----------
-    input_filename: str
-        入力ファイル名
-    ----------
-    Returns:
-    ----------
-    lon, lat, temp, u, v, prep: ndarray
-        経度、緯度、気温、東西風、南北風、降水量データ
-    ----------
-    """
-    out_lon = list()
-    out_lat = list()
-    out_temp = list()
-    out_u = list()
-    out_v = list()
-    out_prep = list()
-    # データ取得部分
-    df = pd.read_csv(input_filename)
-    lon_in = df.loc[:, "lon"]
-    lat_in = df.loc[:, "lat"]
-    temp_in = df.loc[:, "temp"]
-    wd_in = df.loc[:, "windDirection"]
-    ws_in = df.loc[:, "wind"]
-    prep_in = df.loc[:, "precipitation10m"]
-    for lon, lat, temp, wd, ws, prep in zip(lon_in, lat_in, temp_in, wd_in,
-                                            ws_in, prep_in):
-        # 経度・緯度の計算
-        lon = str_rep(lon)
-        lat = str_rep(lat)
-        lon = float(lon[0]) + float(lon[1]) / 60.0
-        lat = float(lat[0]) + float(lat[1]) / 60.0
-        # print(lon.strip(), lat.strip(), temp)
-        # データの保存
-        out_lon.append(lon)
-        out_lat.append(lat)
-        try:
-            # 気温の計算
-            temp.isdecimal()
-            new = str_rep(temp)
-            if new[1] == "0":
-                temp = float(new[0])
-            else:
-                temp = np.nan
-            # データの保存
-            out_temp.append(temp)
-        except AttributeError:
-            out_temp.append(np.nan)
-        #
-        try:
-            # 風向・風速の計算
-            wd.isdecimal()
-            ws.isdecimal()
-            new_wd = str_rep(wd)
-            new_ws = str_rep(ws)
-            if new_wd[1] == "0" and new_ws[1] == "0":
-                wd = float(new_wd[0]) * 22.5
-                ws = float(new_ws[0])
-            else:
-                wd = np.nan
-                ws = np.nan
-            # 東西風、南北風への変換
-            u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-            v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-            # データの保存
-            out_u.append(u)
-            out_v.append(v)
-        except AttributeError:
-            out_u.append(np.nan)
-            out_v.append(np.nan)
-        #
-        try:
-            # 降水量の計算
-            prep.isdecimal()
-            new = str_rep(prep)
-            if new[1] == "0":
-                prep = float(new[0])
-            else:
-                prep = np.nan
-            out_prep.append(prep)
-        except AttributeError:
-            out_prep.append(np.nan)
-    return np.array(out_lon), np.array(out_lat), np.array(out_temp), np.array(
-        out_u), np.array(out_v), np.array(out_prep)
-
-
-def add_pref(ax,
-             linestyle='-',
-             facecolor='none',
-             edgecolor='k',
-             linewidth=0.8):
-    """都道府県境を描く
+def draw_background(ax, region, opt_mapcolor=False, opt_pref=False):
+    """地図の背景（経度・緯度線、陸・海・海岸線、都道府県境）を描く
 
     Parameters:
     ----------
     ax: matplotlib Axes
         cartopyを呼び出した際のaxes
-    facecolor: str
-        塗り潰す色
-    edgecolor: str
-        線の色
-    linewidth: str
-        線の幅
+    region: jmaloc.MapRegion
+        作図範囲
+    opt_mapcolor: bool
+        True: 陸・海・湖を塗り分けて描く
+        False: 海岸線を描く
+    opt_pref: bool
+        都道府県境を描くかどうか
     ----------
     """
-    # 10mの解像度のデータ
-    shpfilename = shapereader.natural_earth(resolution='10m',
-                                            category='cultural',
-                                            name='admin_1_states_provinces')
-    #
-    # 都道府県のみ取得
-    provinces = shapereader.Reader(shpfilename).records()
-    provinces_of_japan = filter(
-        lambda province: province.attributes['admin'] == 'Japan', provinces)
+    lon_step = region.lon_step  # 経度線を描く間隔
+    lat_step = region.lat_step  # 緯度線を描く間隔
+    # 経度、緯度線を描く
+    xticks = np.arange(-180, 180, lon_step)
+    yticks = np.arange(-90, 90, lat_step)
+    gl = ax.gridlines(crs=ccrs.PlateCarree(),
+                      draw_labels=True,
+                      linewidth=1,
+                      linestyle=':',
+                      color='k',
+                      alpha=0.8)
+    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
+    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
+    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
+    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
+
+    if opt_mapcolor:
+        # 陸・海・湖を塗り分けて描く
+        ax.add_feature(cfeature.LAND, color='darkseagreen')
+        ax.add_feature(cfeature.OCEAN, color='lightcyan')
+        # ax.add_feature(cfeature.LAND)
+        # ax.add_feature(cfeature.OCEAN)
+        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
+        ax.add_feature(cfeature.LAKES, color='lightcyan')
+    else:
+        # 海岸線を描く
+        ax.coastlines(color='k', linewidth=0.8)
     #
-    # 都道府県境の追加
-    for province in provinces_of_japan:
-        geometry = province.geometry
-        ax.add_geometries([geometry],
-                          ccrs.PlateCarree(),
-                          facecolor=facecolor,
-                          edgecolor=edgecolor,
-                          linewidth=linewidth,
-                          linestyle=linestyle)
+    # 都道府県境を描く
+    if opt_pref:
+        add_pref(ax, region, linestyle='-', facecolor='none', linewidth=0.8)
 
 
 def draw(lons,
@@ -223,15 +158,26 @@ def draw(lons,
     ----------
     """
     # プロット領域の作成
-    fig = plt.figure(figsize=(18, 12))
+    # （領域・設定が前の時刻と同じ場合は図を使い回し、データだけを置き換える）
+    frame = frame_figure(dict(name="temp+wind+cumrain",
+                              opt_mapcolor=opt_mapcolor,
+                              opt_pref=opt_pref,
+                              opt_barbs=opt_barbs,
+                              barb_increments=barb_increments,
+                              opt_addrain=opt_addrain,
+                              tmin=tmin,
+                              tmax=tmax,
+                              tstep=tstep,
+                              area=area),
+                         figsize=(18, 12),
+                         persist=opt_persist)
+    fig = frame.fig
     #
     # MapRegion Classの初期化
     region = MapRegion(area)
     # Map.regionの変数を取得
-    lon_step = region.lon_step  # 経度線を描く間隔
     lon_min = region.lon_min  # 経度範囲下限
     lon_max = region.lon_max  # 経度範囲上限
-    lat_step = region.lat_step  # 緯度線を描く間隔
     lat_min = region.lat_min  # 緯度範囲下限
     lat_max = region.lat_max  # 緯度範囲上限
     if area == "Japan":
@@ -255,48 +201,24 @@ def draw(lons,
         yloc = 0.2  # 矢羽の凡例を表示する位置(x)
     #
     # cartopy呼び出し
-    ax = fig.add_axes((0.1, 0.3, 0.8, 0.6), projection=ccrs.PlateCarree())
-    ax.set_extent([lon_min, lon_max, lat_min, lat_max])  # 領域の限定
-
-    # 経度、緯度線を描く
-    xticks = np.arange(-180, 180, lon_step)
-    yticks = np.arange(-90, 90, lat_step)
-    gl = ax.gridlines(crs=ccrs.PlateCarree(),
-                      draw_labels=True,
-                      linewidth=1,
-                      linestyle=':',
-                      color='k',
-                      alpha=0.8)
-    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
-    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
-    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
-    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
-
-    if opt_mapcolor:
-        # 陸・海・湖を塗り分けて描く
-        ax.add_feature(cfeature.LAND, color='darkseagreen')
-        ax.add_feature(cfeature.OCEAN, color='lightcyan')
-        # ax.add_feature(cfeature.LAND)
-        # ax.add_feature(cfeature.OCEAN)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
-        ax.add_feature(cfeature.LAKES, color='lightcyan')
-    else:
-        # 海岸線を描く
-        ax.coastlines(color='k', linewidth=0.8)
-    #
-    # 都道府県境を描く
-    if opt_pref:
-        add_pref(ax, linestyle='-', facecolor='none', linewidth=0.8)
+    # （背景の経度・緯度線、陸・海、都道府県境は画像として使い回す）
+    if frame.new:
+        frame.ax = map_axes(fig, (0.1, 0.3, 0.8, 0.6),
+                            region,
+                            draw_background,
+                            dict(opt_mapcolor=opt_mapcolor, opt_pref=opt_pref),
+                            projection=ccrs.PlateCarree(),
+                            dpi=300,
+                            cache=None if opt_bgcache else False)
+    ax = frame.ax
     #
     # val2colクラスの初期化（気温の範囲はtmin、tmaxで設定、tstepで刻み幅）
     t2c = val2col(cmap='jet', tmin=tmin, tmax=tmax, tstep=tstep)
     # マーカーをプロット
-    for xc, yc, dc in zip(lons, lats, d):
-        if math.isnan(dc):
-            print("Warn ", xc, yc, dc)
-        else:
-            c = t2c.conv(dc)
-            ax.plot(xc, yc, marker='o', color=c, markersize=ms)
+    # （全地点のマーカーを1つのArtistで描く）
+    valid = warn_missing(lons, lats, d)
+    frame.markers("markers", ax, lons[valid], lats[valid],
+                  t2c.conv_array(d[valid]), ms)
 
     # 10分降水量をテキストでプロット
     if opt_addrain:
@@ -313,58 +235,65 @@ def draw(lons,
         r2c = collevs(clevs=clevs, ccols=ccols)
         #
         # テキストをプロット
-        for xc, yc, dc in zip(lons, lats, prep):
-            if math.isnan(dc):
-                print("Warn ", xc, yc, dc)
-            else:
-                c = r2c.conv(dc)
-                if xc >= lon_min and xc <= lon_max and yc >= lat_min and yc <= lat_max:
-                    ax.text(xc + 0.03, yc - 0.02, str(dc), color=c, fontsize=8)
+        valid = warn_missing(lons, lats, prep)
+        m = valid & in_extent(lons, lats, lon_min, lon_max, lat_min, lat_max)
+        frame.labels("labels",
+                     ax,
+                     lons[m],
+                     lats[m], [str(dc) for dc in prep[m]],
+                     r2c.conv_array(prep[m]),
+                     fontsize=8)
 
     # 矢羽を描く
     if opt_barbs:
-        ax.barbs(lons,
-                 lats,
-                 u,
-                 v,
-                 sizes=dict(emptybarb=0.0),
-                 length=length,
-                 linewidth=lw,
-                 barb_increments=barb_increments,
-                 color='k')
-        # 矢羽の値をプロット
-        f1 = barb_increments['half']
-        f2 = barb_increments['full']
-        f3 = barb_increments['flag']
-        name = f'half: {f1:.0f}m/s, full: {f2:.0f}m/s, flag: {f3:.0f}m/s'
-        print(name)
-        ax.text(lon_max + xloc, lat_min + yloc, name, ha='right', va='center')
+        frame.barbs("barbs",
+                    ax,
+                    lons,
+                    lats,
+                    u,
+                    v,
+                    sizes=dict(emptybarb=0.0),
+                    length=length,
+                    linewidth=lw,
+                    barb_increments=barb_increments,
+                    color='k')
+        # 矢羽の値をプロット（図を作った時だけ描く）
+        if frame.new:
+            f1 = barb_increments['half']
+            f2 = barb_increments['full']
+            f3 = barb_increments['flag']
+            name = f'half: {f1:.0f}m/s, full: {f2:.0f}m/s, flag: {f3:.0f}m/s'
+            print(name)
+            ax.text(lon_max + xloc,
+                    lat_min + yloc,
+                    name,
+                    ha='right',
+                    va='center')
 
     # タイトル
-    if title is not None:
-        plt.title(title, size=24)
-        # fig.suptitle(title, size=24)
+    frame.title(ax, title, size=24)
 
     # カラーバーを付ける
-    t2c.colorbar(fig)
+    if frame.new:
+        t2c.colorbar(fig)
 
     # ファイルへの書き出し
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-    plt.close()
+    savefig(fig, output_filename, dpi=300)
+    frame.done()
 
 
-def main(tinfo=None,
-         tinfof=None,
-         area="Japan",
-         opt_barbs=False,
-         barb_increments=dict(half=5., full=10., flag=50.),
-         opt_addrain=False,
-         tmin=None,
-         tmax=None,
-         tstep=None,
-         ofirst=True,
-         output_dir='.'):
-    """指定された時刻のデータの作図
+def read_frame(tinfo=None,
+               tinfof=None,
+               area="Japan",
+               opt_barbs=False,
+               barb_increments=dict(half=5., full=10., flag=50.),
+               opt_addrain=False,
+               tmin=None,
+               tmax=None,
+               tstep=None,
+               rain=None,
+               output_dir='.'):
+    """指定された時刻のデータを読み込み、作図（draw）の引数を返す
 
     Parameters:
     ----------
@@ -394,47 +323,59 @@ def main(tinfo=None,
         カラーマップの上限
     tstep: float
         カラーマップのラベルを描く間隔
-    ofirst: bool
-        最初の実行かどうか（Trueで降水量初期化）
+    rain: tuple(ndarray)
+        地点番号（昇順）と積算降水量（Noneの場合は10分間降水量を描く）
     output_dir: str
         出力ディレクトリ
     ----------
+    Returns:
+    ----------
+    output_filename: str
+        出力ファイル名
+    args: tuple
+        drawの引数（データと出力ファイル名）
+    kwargs: dict
+        drawのキーワード引数
+    ----------
     """
-    if tinfof is not None:
-        # 入力ファイル名
-        input_filename = tinfof + ".csv"
-        # 出力ファイル名
-        varname = "_temp"
-        if opt_barbs:
-            varname = varname + "+wind"
-        if opt_addrain:
-            varname = varname + "+cumrain"
-        output_filename = os.path.join(output_dir,
-                                       area + varname + "_" + tinfof + ".png")
-        # データの取得
-        lons, lats, temp, u, v, pr_i = read_data(input_filename)
-        if ofirst:
-            prep = pr_i
-        else:
-            prep = prep + pr_i
-        print(lons.shape, lats.shape, temp.shape, u.shape, v.shape, prep.shape)
-        draw(lons,
-             lats,
-             temp,
-             prep,
-             u,
-             v,
-             output_filename,
-             opt_mapcolor=True,
-             opt_pref=True,
-             opt_barbs=opt_barbs,
-             barb_increments=barb_increments,
-             opt_addrain=opt_addrain,
-             tmin=tmin,
-             tmax=tmax,
-             tstep=tstep,
-             title=tinfo,
-             area=area)
+    if tinfof is None:
+        raise ValueError("tinfof is required")
+    # 入力ファイル名
+    input_filename = tinfof + ".csv"
+    # 出力ファイル名
+    varname = "_temp"
+    if opt_barbs:
+        varname = varname + "+wind"
+    if opt_addrain:
+        varname = varname + "+cumrain"
+    output_filename = os.path.join(output_dir,
+                                   area + varname + "_" + tinfof + ".png")
+    # データの取得
+    amedas = decoder.read(
+        input_filename,
+        names=["temp", "wind", "windDirection", "precipitation10m"])
+    lons = amedas.lon
+    lats = amedas.lat
+    temp = amedas.get("temp")
+    u, v = amedas.wind()
+    if rain is None:
+        prep = amedas.get("precipitation10m")
+    else:
+        # 積算降水量をこの時刻の地点の順に並べ替える
+        prep = align(rain[0], rain[1], amedas.staid)
+    print(lons.shape, lats.shape, temp.shape, u.shape, v.shape, prep.shape)
+    kwargs = dict(opt_mapcolor=True,
+                  opt_pref=True,
+                  opt_barbs=opt_barbs,
+                  barb_increments=barb_increments,
+                  opt_addrain=opt_addrain,
+                  tmin=tmin,
+                  tmax=tmax,
+                  tstep=tstep,
+                  title=tinfo,
+                  area=area)
+    args = (lons, lats, temp, prep, u, v, output_filename)
+    return output_filename, args, kwargs
 
 
 if __name__ == '__main__':
@@ -442,7 +383,8 @@ if __name__ == '__main__':
     args = parse_command(sys.argv,
                          opt_wind=True,
                          opt_trange=True,
-                         opt_rain=True)
+                         opt_rain=True,
+                         opt_workers=True)
     # 開始・終了時刻
     time_sta = pd.to_datetime(args.time_sta)
     time_end = pd.to_datetime(args.time_end)
@@ -450,6 +392,8 @@ if __name__ == '__main__':
     area = args.sta
     # 出力ディレクトリ名
     output_dir = args.output_dir
+    # 作図を行うプロセス数
+    workers = args.workers
     # 矢羽を描くかどうか
     opt_barbs = args.addwind
     # 降水量をテキストでプロットするかどうか
@@ -468,51 +412,50 @@ if __name__ == '__main__':
     # 出力ディレクトリ作成
     os_mkdir(output_dir)
 
+    # 作図する時刻（データは作図を行うプロセスで読み込む、読み込めなかった時刻は
+    # 作図しない）
+    frames = []
+
     # データの時間間隔
     time_step = timedelta(minutes=10)
-    time = time_sta
-    ofirst = True
-    while True:
-        if time <= time_end:
-            tinfo = time.strftime("%Y/%m/%d %H:%M:%SJST")
-            tinfof = time.strftime("%Y%m%d%H%M%S")
-            print(tinfo)
-            # 入力ファイル名
-            input_filename = tinfof + ".csv"
-            # 出力ファイル名
-            varname = "_temp"
-            if opt_barbs:
-                varname = varname + "+wind"
-            if opt_addrain:
-                varname = varname + "+cumrain"
-            output_filename = os.path.join(output_dir,
-                                           area + varname + "_" + tinfof + ".png")
-            # データの取得
-            lons, lats, temp, u, v, pr_i = read_data(input_filename)
-            if ofirst:
-                prep = pr_i
-                ofirst = False
-            else:
-                prep = prep + pr_i
-            print(lons.shape, lats.shape, temp.shape, u.shape, v.shape, prep.shape)
-            # 作図
-            draw(lons,
-                 lats,
-                 temp,
-                 prep,
-                 u,
-                 v,
-                 output_filename,
-                 opt_mapcolor=True,
-                 opt_pref=True,
-                 opt_barbs=opt_barbs,
-                 barb_increments=barb_increments,
-                 opt_addrain=opt_addrain,
-                 tmin=tmin,
-                 tmax=tmax,
-                 tstep=tstep,
-                 title=tinfo,
-                 area=area)
-        else:
-            break
-        time = time + time_step
+    # 10分間降水量の累積和（チェックポイントがあれば、まだ読み込んでいない時刻のみ読み込む）
+    acc = None
+    if opt_addrain:
+        acc = accumulate(time_sta,
+                         time_end,
+                         name="precipitation10m",
+                         time_step=time_step,
+                         acc_file=checkpoint_file(acc_file))
+    for time in time_range(time_sta, time_end, time_step):
+        tinfo = time.strftime("%Y/%m/%d %H:%M:%SJST")
+        tinfof = time.strftime("%Y%m%d%H%M%S")
+        print(tinfo)
+        if acc is not None and not acc.valid[acc.index(time) - 1]:
+            print("Warn: file not found", tinfof)
+            continue
+        rain = None
+        if acc is not None:
+            # 累積和から積算開始時刻からの降水量を求める（地点番号の順）
+            rain = (acc.staid,
+                    acc.window(time_sta - time_step, time,
+                               complete=opt_complete))
+        # データは作図を行うプロセスで読み込む
+        frames.append((tinfof, (tinfo, tinfof),
+                       dict(area=area,
+                            opt_barbs=opt_barbs,
+                            barb_increments=barb_increments,
+                            opt_addrain=opt_addrain,
+                            tmin=tmin,
+                            tmax=tmax,
+                            tstep=tstep,
+                            rain=rain,
+                            output_dir=output_dir)))
+
+    # 作図（workersが2以上の場合は複数のプロセスで描く）
+    failed = render_frames(draw,
+                           frames,
+                           workers=workers,
+                           read_func=read_frame)
+    if len(failed) > 0:
+        print("Error: failed to draw", len(failed), "frames")
+        sys.exit(1)
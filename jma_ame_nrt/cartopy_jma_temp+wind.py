@@ -1,22 +1,32 @@
 #!/usr/bin/env python3
 import pandas as pd
 import numpy as np
-import math
 import os
 import sys
 from datetime import timedelta
-import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 from jmaloc import MapRegion
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
-import cartopy.io.shapereader as shapereader
 from utils import val2col
 from utils import os_mkdir
 from utils import parse_command
+from utils import decoder
 from utils import common
+from utils.background import map_axes, savefig
+from utils.pref import add_pref
+from utils.frame import frame_figure
+from utils.render import render_frames
+from utils.layers import in_extent, warn_missing
 common
 
+# 地図の背景（経度・緯度線、陸・海、都道府県境）を画像としてキャッシュし、
+# 同じ領域・設定の図で使い回すかどうか（~/.cache/jma_draw/background）
+opt_bgcache = True
+
+# 時刻毎に図を作り直さず、領域・設定が同じ図のデータだけを置き換えるかどうか
+opt_persist = True
+
 # 矢羽を描く値（短矢羽：1m/s、長矢羽：5m/s、旗矢羽：10m/s）
 half = 1.
 full = 2.
@@ -24,11 +34,6 @@ flag = 10.
 barb_increments = dict(half=half, full=full, flag=flag)
 
 
-def str_rep(inp):
-    """データの文字列を処理する"""
-    return inp.replace("[", "").replace("]", "").replace(",", "").split()
-
-
 def read_data(input_filename):
     """AMeDAS csvデータを読み込む
 
@@ -43,104 +48,54 @@ def read_data(input_filename):
         経度、緯度、気温、東西風、南北風データ
     ----------
     """
-    out_lon = list()
-    out_lat = list()
-    out_temp = list()
-    out_u = list()
-    out_v = list()
-    # データ取得部分
-    df = pd.read_csv(input_filename)
-    lon_in = df.loc[:, "lon"]
-    lat_in = df.loc[:, "lat"]
-    temp_in = df.loc[:, "temp"]
-    wd_in = df.loc[:, "windDirection"]
-    ws_in = df.loc[:, "wind"]
-    for lon, lat, temp, wd, ws in zip(lon_in, lat_in, temp_in, wd_in, ws_in):
-        # 経度・緯度の計算
-        lon = str_rep(lon)
-        lat = str_rep(lat)
-        lon = float(lon[0]) + float(lon[1]) / 60.0
-        lat = float(lat[0]) + float(lat[1]) / 60.0
-        # print(lon.strip(), lat.strip(), temp)
-        # データの保存
-        out_lon.append(lon)
-        out_lat.append(lat)
-        try:
-            # 気温の計算
-            temp.isdecimal()
-            new = str_rep(temp)
-            if new[1] == "0":
-                temp = float(new[0])
-            else:
-                temp = np.nan
-            # データの保存
-            out_temp.append(temp)
-        except AttributeError:
-            out_temp.append(np.nan)
-        #
-        try:
-            # 風向・風速の計算
-            wd.isdecimal()
-            ws.isdecimal()
-            new_wd = str_rep(wd)
-            new_ws = str_rep(ws)
-            if new_wd[1] == "0" and new_ws[1] == "0":
-                wd = float(new_wd[0]) * 22.5
-                ws = float(new_ws[0])
-            else:
-                wd = np.nan
-                ws = np.nan
-            # 東西風、南北風への変換
-            u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-            v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-            # データの保存
-            out_u.append(u)
-            out_v.append(v)
-        except AttributeError:
-            out_u.append(np.nan)
-            out_v.append(np.nan)
-    return np.array(out_lon), np.array(out_lat), np.array(out_temp), np.array(
-        out_u), np.array(out_v)
+    return decoder.read_data(input_filename)
 
 
-def add_pref(ax,
-             linestyle='-',
-             facecolor='none',
-             edgecolor='k',
-             linewidth=0.8):
-    """都道府県境を描く
+def draw_background(ax, region, opt_mapcolor=False, opt_pref=False):
+    """地図の背景（経度・緯度線、陸・海・海岸線、都道府県境）を描く
 
     Parameters:
     ----------
     ax: matplotlib Axes
         cartopyを呼び出した際のaxes
-    facecolor: str
-        塗り潰す色
-    edgecolor: str
-        線の色
-    linewidth: str
-        線の幅
+    region: jmaloc.MapRegion
+        作図範囲
+    opt_mapcolor: bool
+        True: 陸・海・湖を塗り分けて描く
+        False: 海岸線を描く
+    opt_pref: bool
+        都道府県境を描くかどうか
     ----------
     """
-    # 10mの解像度のデータ
-    shpfilename = shapereader.natural_earth(resolution='10m',
-                                            category='cultural',
-                                            name='admin_1_states_provinces')
-    #
-    # 都道府県のみ取得
-    provinces = shapereader.Reader(shpfilename).records()
-    provinces_of_japan = filter(
-        lambda province: province.attributes['admin'] == 'Japan', provinces)
+    lon_step = region.lon_step  # 経度線を描く間隔
+    lat_step = region.lat_step  # 緯度線を描く間隔
+    # 経度、緯度線を描く
+    xticks = np.arange(-180, 180, lon_step)
+    yticks = np.arange(-90, 90, lat_step)
+    gl = ax.gridlines(crs=ccrs.PlateCarree(),
+                      draw_labels=True,
+                      linewidth=1,
+                      linestyle=':',
+                      color='k',
+                      alpha=0.8)
+    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
+    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
+    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
+    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
+
+    if opt_mapcolor:
+        # 陸・海・湖を塗り分けて描く
+        ax.add_feature(cfeature.LAND)
+        ax.add_feature(cfeature.OCEAN)
+        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
+        ax.add_feature(cfeature.LAKES)
+    else:
+        # 海岸線を描く
+        ax.coastlines(color='k', linewidth=0.8)
     #
-    # 都道府県境の追加
-    for province in provinces_of_japan:
-        geometry = province.geometry
-        ax.add_geometries([geometry],
-                          ccrs.PlateCarree(),
-                          facecolor=facecolor,
-                          edgecolor=edgecolor,
-                          linewidth=linewidth,
-                          linestyle=linestyle)
+    # 都道府県境を描く
+    if opt_pref:
+        add_pref(ax, region, linestyle='-', facecolor='none', linewidth=0.8)
 
 
 def draw(lons,
@@ -205,15 +160,26 @@ def draw(lons,
     ----------
     """
     # プロット領域の作成
-    fig = plt.figure(figsize=(18, 12))
+    # （領域・設定が前の時刻と同じ場合は図を使い回し、データだけを置き換える）
+    frame = frame_figure(dict(name="temp+wind",
+                              opt_mapcolor=opt_mapcolor,
+                              opt_pref=opt_pref,
+                              opt_markerlabel=opt_markerlabel,
+                              opt_barbs=opt_barbs,
+                              barb_increments=barb_increments,
+                              tmin=tmin,
+                              tmax=tmax,
+                              tstep=tstep,
+                              area=area),
+                         figsize=(18, 12),
+                         persist=opt_persist)
+    fig = frame.fig
     #
     # MapRegion Classの初期化
     region = MapRegion(area)
     # Map.regionの変数を取得
-    lon_step = region.lon_step  # 経度線を描く間隔
     lon_min = region.lon_min  # 経度範囲下限
     lon_max = region.lon_max  # 経度範囲上限
-    lat_step = region.lat_step  # 緯度線を描く間隔
     lat_min = region.lat_min  # 緯度範囲下限
     lat_max = region.lat_max  # 緯度範囲上限
     if area == "Japan":
@@ -237,93 +203,82 @@ def draw(lons,
         yloc = 0.2  # 矢羽の凡例を表示する位置(x)
     #
     # cartopy呼び出し
-    ax = fig.add_axes((0.1, 0.3, 0.8, 0.6), projection=ccrs.PlateCarree())
-    ax.set_extent([lon_min, lon_max, lat_min, lat_max])  # 領域の限定
-
-    # 経度、緯度線を描く
-    xticks = np.arange(-180, 180, lon_step)
-    yticks = np.arange(-90, 90, lat_step)
-    gl = ax.gridlines(crs=ccrs.PlateCarree(),
-                      draw_labels=True,
-                      linewidth=1,
-                      linestyle=':',
-                      color='k',
-                      alpha=0.8)
-    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
-    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
-    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
-    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
-
-    if opt_mapcolor:
-        # 陸・海・湖を塗り分けて描く
-        ax.add_feature(cfeature.LAND)
-        ax.add_feature(cfeature.OCEAN)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
-        ax.add_feature(cfeature.LAKES)
-    else:
-        # 海岸線を描く
-        ax.coastlines(color='k', linewidth=0.8)
-    #
-    # 都道府県境を描く
-    if opt_pref:
-        add_pref(ax, linestyle='-', facecolor='none', linewidth=0.8)
+    # （背景の経度・緯度線、陸・海、都道府県境は画像として使い回す）
+    if frame.new:
+        frame.ax = map_axes(fig, (0.1, 0.3, 0.8, 0.6),
+                            region,
+                            draw_background,
+                            dict(opt_mapcolor=opt_mapcolor, opt_pref=opt_pref),
+                            projection=ccrs.PlateCarree(),
+                            dpi=300,
+                            cache=None if opt_bgcache else False)
+    ax = frame.ax
     #
     # val2colクラスの初期化（気温の範囲はtmin、tmaxで設定、tstepで刻み幅）
     t2c = val2col(cmap='jet', tmin=tmin, tmax=tmax, tstep=tstep)
     # マーカーとテキストをプロット
-    for xc, yc, dc in zip(lons, lats, d):
-        if math.isnan(dc):
-            print("Warn ", xc, yc, dc)
-        else:
-            c = t2c.conv(dc)
-            ax.plot(xc, yc, marker='o', color=c, markersize=ms)
-            if opt_markerlabel:
-                if xc >= lon_min and xc <= lon_max and yc >= lat_min and yc <= lat_max:
-                    ax.text(xc + 0.03, yc - 0.02, str(dc), color=c, fontsize=8)
+    # （全地点のマーカー、テキストをそれぞれ1つのArtistで描く）
+    valid = warn_missing(lons, lats, d)
+    frame.markers("markers", ax, lons[valid], lats[valid],
+                  t2c.conv_array(d[valid]), ms)
+    if opt_markerlabel:
+        m = valid & in_extent(lons, lats, lon_min, lon_max, lat_min, lat_max)
+        frame.labels("labels",
+                     ax,
+                     lons[m],
+                     lats[m], [str(dc) for dc in d[m]],
+                     t2c.conv_array(d[m]),
+                     fontsize=8)
 
     # 矢羽を描く
     if opt_barbs:
-        ax.barbs(lons,
-                 lats,
-                 u,
-                 v,
-                 sizes=dict(emptybarb=0.0),
-                 length=length,
-                 linewidth=lw,
-                 barb_increments=barb_increments,
-                 color='k')
-        # 矢羽の値をプロット
-        f1 = barb_increments['half']
-        f2 = barb_increments['full']
-        f3 = barb_increments['flag']
-        name = f'half: {f1:.0f}m/s, full: {f2:.0f}m/s, flag: {f3:.0f}m/s'
-        print(name)
-        ax.text(lon_max + xloc, lat_min + yloc, name, ha='right', va='center')
+        frame.barbs("barbs",
+                    ax,
+                    lons,
+                    lats,
+                    u,
+                    v,
+                    sizes=dict(emptybarb=0.0),
+                    length=length,
+                    linewidth=lw,
+                    barb_increments=barb_increments,
+                    color='k')
+        # 矢羽の値をプロット（図を作った時だけ描く）
+        if frame.new:
+            f1 = barb_increments['half']
+            f2 = barb_increments['full']
+            f3 = barb_increments['flag']
+            name = f'half: {f1:.0f}m/s, full: {f2:.0f}m/s, flag: {f3:.0f}m/s'
+            print(name)
+            ax.text(lon_max + xloc,
+                    lat_min + yloc,
+                    name,
+                    ha='right',
+                    va='center')
 
     # タイトル
-    if title is not None:
-        plt.title(title, size=24)
-        # fig.suptitle(title, size=24)
+    frame.title(ax, title, size=24)
 
     # カラーバーを付ける
-    t2c.colorbar(fig)
+    if frame.new:
+        t2c.colorbar(fig)
 
     # ファイルへの書き出し
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-    plt.close()
+    savefig(fig, output_filename, dpi=300)
+    frame.done()
 
 
-def main(tinfo=None,
-         tinfof=None,
-         area="Japan",
-         opt_markerlabel=False,
-         opt_barbs=False,
-         barb_increments=dict(half=5., full=10., flag=50.),
-         tmin=None,
-         tmax=None,
-         tstep=None,
-         output_dir='.'):
-    """指定された時刻のデータの作図
+def read_frame(tinfo=None,
+               tinfof=None,
+               area="Japan",
+               opt_markerlabel=False,
+               opt_barbs=False,
+               barb_increments=dict(half=5., full=10., flag=50.),
+               tmin=None,
+               tmax=None,
+               tstep=None,
+               output_dir='.'):
+    """指定された時刻のデータを読み込み、作図（draw）の引数を返す
 
     Parameters:
     ----------
@@ -356,41 +311,51 @@ def main(tinfo=None,
     output_dir: str
         出力ディレクトリ
     ----------
+    Returns:
+    ----------
+    output_filename: str
+        出力ファイル名
+    args: tuple
+        drawの引数（データと出力ファイル名）
+    kwargs: dict
+        drawのキーワード引数
+    ----------
     """
-    if tinfof is not None:
-        # 入力ファイル名
-        input_filename = tinfof + ".csv"
-        # 出力ファイル名
-        if opt_barbs:
-            output_filename = os.path.join(
-                output_dir, area + "_temp+wind_" + tinfof + ".png")
-        else:
-            output_filename = os.path.join(output_dir,
-                                           area + "_temp_" + tinfof + ".png")
-        # データの取得
-        lons, lats, temp, u, v = read_data(input_filename)
-        print(lons.shape, lats.shape, temp.shape, u.shape, v.shape)
-        draw(lons,
-             lats,
-             temp,
-             u,
-             v,
-             output_filename,
-             opt_mapcolor=True,
-             opt_pref=True,
-             opt_markerlabel=opt_markerlabel,
-             opt_barbs=opt_barbs,
-             barb_increments=barb_increments,
-             tmin=tmin,
-             tmax=tmax,
-             tstep=tstep,
-             title=tinfo,
-             area=area)
+    if tinfof is None:
+        raise ValueError("tinfof is required")
+    # 入力ファイル名
+    input_filename = tinfof + ".csv"
+    # 出力ファイル名
+    if opt_barbs:
+        output_filename = os.path.join(
+            output_dir, area + "_temp+wind_" + tinfof + ".png")
+    else:
+        output_filename = os.path.join(output_dir,
+                                       area + "_temp_" + tinfof + ".png")
+    # データの取得
+    lons, lats, temp, u, v = read_data(input_filename)
+    print(lons.shape, lats.shape, temp.shape, u.shape, v.shape)
+    kwargs = dict(opt_mapcolor=True,
+                  opt_pref=True,
+                  opt_markerlabel=opt_markerlabel,
+                  opt_barbs=opt_barbs,
+                  barb_increments=barb_increments,
+                  tmin=tmin,
+                  tmax=tmax,
+                  tstep=tstep,
+                  title=tinfo,
+                  area=area)
+    args = (lons, lats, temp, u, v, output_filename)
+    return output_filename, args, kwargs
 
 
 if __name__ == '__main__':
     # オプションの読み込み
-    args = parse_command(sys.argv, opt_wind=True, opt_trange=True, opt_lab=True)
+    args = parse_command(sys.argv,
+                         opt_wind=True,
+                         opt_trange=True,
+                         opt_lab=True,
+                         opt_workers=True)
     # 開始・終了時刻
     time_sta = pd.to_datetime(args.time_sta)
     time_end = pd.to_datetime(args.time_end)
@@ -398,6 +363,8 @@ if __name__ == '__main__':
     area = args.sta
     # 出力ディレクトリ名
     output_dir = args.output_dir
+    # 作図を行うプロセス数
+    workers = args.workers
     # 矢羽を描くかどうか
     opt_barbs = args.addwind
     # 気温を数字で表示するかどうか
@@ -416,6 +383,10 @@ if __name__ == '__main__':
     # 出力ディレクトリ作成
     os_mkdir(output_dir)
 
+    # 作図する時刻（データは作図を行うプロセスで読み込む、読み込めなかった時刻は
+    # 作図しない）
+    frames = []
+
     # データの時間間隔
     time_step = timedelta(minutes=10)
     time = time_sta
@@ -424,16 +395,24 @@ if __name__ == '__main__':
             tinfo = time.strftime("%Y/%m/%d %H:%M:%SJST")
             tinfof = time.strftime("%Y%m%d%H%M%S")
             print(tinfo)
-            main(tinfo,
-                 tinfof,
-                 area=area,
-                 opt_markerlabel=opt_markerlabel,
-                 opt_barbs=opt_barbs,
-                 barb_increments=barb_increments,
-                 tmin=tmin,
-                 tmax=tmax,
-                 tstep=tstep,
-                 output_dir=output_dir)
+            frames.append((tinfof, (tinfo, tinfof),
+                           dict(area=area,
+                                opt_markerlabel=opt_markerlabel,
+                                opt_barbs=opt_barbs,
+                                barb_increments=barb_increments,
+                                tmin=tmin,
+                                tmax=tmax,
+                                tstep=tstep,
+                                output_dir=output_dir)))
         else:
             break
         time = time + time_step
+
+    # 作図（workersが2以上の場合は複数のプロセスで描く）
+    failed = render_frames(draw,
+                           frames,
+                           workers=workers,
+                           read_func=read_frame)
+    if len(failed) > 0:
+        print("Error: failed to draw", len(failed), "frames")
+        sys.exit(1)
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 from pandas import DataFrame
 import pandas as pd
-import numpy as np
-import os
 import json
-import urllib.request
+from utils import decoder
+from utils.fetch import shared_fetcher, write_atomic
+from utils.meta import metadata_cache
 
 # 取得する時刻（Noneとすれば、最新のものを取得）
 latest = None
 # latest = "2021-05-02T14:30:00+09:00"
 
+# csvファイルも出力するかどうか（作図プログラムはnpzファイルを使用）
+opt_csv = False
+# opt_csv = True
+
 
 # データ取得部分
 class AmedasStation():
@@ -25,7 +29,7 @@ class AmedasStation():
         """
         url = "https://www.jma.go.jp/bosai/amedas/data/latest_time.txt"
         if latest is None:
-            latest = np.loadtxt(urllib.request.urlopen(url), dtype="str")
+            latest = shared_fetcher().get_cached(url)[0].decode().strip()
         print(latest)
         self.latest_time = pd.to_datetime(latest).strftime("%Y%m%d%H%M%S")
         print(self.latest_time)
@@ -42,8 +46,7 @@ class AmedasStation():
         file_name = self.latest_time + ".json"
         # アメダスデータの取得
         url = url_top + file_name
-        print(url)
-        urllib.request.urlretrieve(url, file_name)
+        write_atomic(file_name, shared_fetcher().get(url))
         with open(file_name, 'rt') as fin:
             data = fin.read()
         df = DataFrame(json.loads(data)).T
@@ -54,8 +57,11 @@ class AmedasStation():
         df["kjName"] = df_location.loc[:, "kjName"]
         df["knName"] = df_location.loc[:, "knName"]
         df["enName"] = df_location.loc[:, "enName"]
+        # npzファイルとして保存
+        decoder.from_dataframe(df).to_npz(self.latest_time + ".npz")
         # csvファイルとして保存
-        df.to_csv(self.latest_time + ".csv")
+        if opt_csv:
+            df.to_csv(self.latest_time + ".csv")
         #
         # 取り出したデータを返却
         return df
@@ -66,10 +72,10 @@ class AmedasStation():
         file_name = "amedastable.json"
         # アメダス地点情報の取得
         url = url_top + file_name
-        if not os.path.exists(file_name):
-            print(url)
-            urllib.request.urlretrieve(url, file_name)
-        with open(file_name, 'rt') as fin:
+        # 共有するメタデータのキャッシュから読み込み、作図時に同じ版を
+        # 読み込めるように取得時の版を置く（ハードリンク、できない場合はコピー）
+        table_file = metadata_cache().link(url, ".", shared_fetcher())
+        with open(table_file, 'rt') as fin:
             data = fin.read()
         df = DataFrame(json.loads(data))
         # 取り出したデータを返却
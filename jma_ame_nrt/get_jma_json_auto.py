@@ -10,18 +10,51 @@
 #
 from pandas import DataFrame
 import pandas as pd
-import numpy as np
 import os
-import time
 import json
-import urllib.request
 from datetime import timedelta
+from utils import decoder
+from utils.cube import AmedasCube
+from utils.archive import backfill_queue, list_snapshots
+from utils import bundle
+from jmaloc.geometry import load_table
+from utils.fetch import Fetcher, export_metrics, shared_fetcher, write_atomic
+from utils.meta import metadata_cache
+from utils.manifest import FetchManifest
 
 # 出力するディレクトリ
 output_dir = "/path_to_output"  # 配置するディレクトリに設定
 
 # output_dir = "."
 
+# csvファイルも出力するかどうか（作図プログラムはnpzファイルを使用）
+opt_csv = False
+# opt_csv = True
+
+# 取得したデータを(時刻, 地点, 変数)配列に追加するかどうか
+opt_cube = True
+# 配列を保存するディレクトリ
+cube_dir = os.path.join(output_dir, "cube")
+
+# 取得が終わった日付のファイルを1つの圧縮ファイルにまとめるかどうか
+# （まとめた後は時刻.json、csv、npzを削除する。作図プログラムはそのまま読み込める）
+opt_bundle = False
+# opt_bundle = True
+
+# 取得状態を記録するデータベース（サイズ・チェックサムを確認し、失敗した時刻は
+# 待ち時間を延ばしながら再取得する）
+manifest_file = os.path.join(output_dir, "fetch_manifest.sqlite")
+# 取得済みのファイルのチェックサムも毎回確認するかどうか（Falseの場合はサイズのみ）
+opt_verify = False
+
+# 取得元のURL（テスト用のサーバーを使う場合は変更する）
+url_top = "https://www.jma.go.jp/bosai/amedas/"
+# 同時に取得するファイル数
+max_workers = 4
+# 1秒あたりのリクエスト数の上限と、連続して送れるリクエスト数
+rate = 1.0
+burst = 4
+
 
 # dir_name: 作成するディレクトリ名
 def os_mkdir(dir_name):
@@ -36,7 +69,14 @@ def os_mkdir(dir_name):
 class AmedasStation():
     """AMeDASデータを取得し、ndarrayに変換する"""
 
-    def __init__(self, latest=None, outdir_path="."):
+    # 読み込み済みのアメダス地点情報のDataFrame（版毎、csvの出力に使う）
+    _location_memo = dict()
+
+    def __init__(self,
+                 latest=None,
+                 outdir_path=".",
+                 fetcher=None,
+                 manifest=None):
         """
         Parameters:
         ----------
@@ -44,94 +84,254 @@ class AmedasStation():
             取得する時刻（形式：20210819120000）
         output_dir_path: str
             出力ディレクトリのパス
+        fetcher: utils.fetch.Fetcher
+            取得に使うFetcher（Noneの場合はshared_fetcher()、接続と取得速度の
+            制限を共有する）
+        manifest: utils.manifest.FetchManifest
+            取得状態の記録（Noneの場合はファイルの有無で判断する）
         ----------
         """
-        url = "https://www.jma.go.jp/bosai/amedas/data/latest_time.txt"
+        if fetcher is None:
+            fetcher = shared_fetcher()
+        self.fetcher = fetcher
         if latest is None:
-            latest = np.loadtxt(urllib.request.urlopen(url), dtype="str")
+            latest = fetcher.get_cached(
+                url_top + "data/latest_time.txt")[0].decode().strip()
         print(latest)
         self.latest_time = pd.to_datetime(latest).strftime("%Y%m%d%H%M%S")
         print(self.latest_time)
         self.outdir_path = outdir_path
+        self.manifest = manifest
+
+    def path(self):
+        """取得したJSONファイルのパス"""
+        return os.path.join(self.outdir_path, self.latest_time + ".json")
+
+    def needed(self):
+        """取得する必要があるかどうか
+
+        記録した通りのファイルがあれば不要、失敗して待ち時間が過ぎていない場合も不要。
+        記録が無いファイル（以前のバージョンで取得したもの）はJSONとして
+        読み込めれば記録して使い、読み込めなければ（書き込み途中など）取得し直す
+        """
+        path = self.path()
+        # まとめたファイルに含まれる場合（まとめる時に内容を確認している）
+        if not os.path.exists(path) and bundle.find(path)[0] is not None:
+            return False
+        manifest = self.manifest
+        if manifest is None:
+            return not os.path.exists(path)
+        if manifest.verify(self.latest_time, path, full=opt_verify):
+            return False
+        if manifest.get(self.latest_time) is None and os.path.exists(path):
+            try:
+                with open(path, 'rb') as fin:
+                    data = fin.read()
+                json.loads(data)
+            except (OSError, ValueError):
+                print("Warn: corrupt file", path)
+                return True
+            manifest.record_ok(self.latest_time, path, data)
+            return False
+        return manifest.due(self.latest_time)
+
+    def failed(self, error):
+        """取得できなかったことを記録する"""
+        if self.manifest is not None:
+            self.manifest.record_failure(self.latest_time, self.path(), error)
 
     def retrieve(self, cnt=2):
         """アメダスデータ取得
         Parameters:
         ----------
         cnt: int
-            再取得カウント
+            再取得カウント（通信エラーの場合の再取得はFetcherで行う）
         ----------
         Returns:
         ----------
-        df: ndarray
-            アメダスデータ
+        utils.decoder.AmedasData
+            アメダスデータ（既に取得している場合はNone）
         ----------
         """
-        outdir_path = self.outdir_path
         if cnt <= 0:  # 0の場合は終了
             raise RecursionError('maximum count reached')
-        url_top = "https://www.jma.go.jp/bosai/amedas/data/map/"
-        file_name = self.latest_time + ".json"
         # 既に取得している場合
-        if os.path.exists(os.path.join(outdir_path, file_name)):
+        if not self.needed():
             return None
         # アメダスデータの取得
         try:
-            url = url_top + file_name
-            print(url)
-            urllib.request.urlretrieve(url,
-                                       os.path.join(outdir_path, file_name))
-        except OSError:
-            time.sleep(10.0)  # 10秒間待つ
-            self.retrieve(cnt=cnt - 1)  # cntを減らして再帰
-        #
-        # 取得したファイルを開く
-        try:
-            with open(os.path.join(outdir_path, file_name), 'rt') as fin:
-                data = fin.read()
-        except OSError as e:
-            raise OSError(e)
-        df = DataFrame(json.loads(data)).T
+            data = self.fetcher.get(url_top + "data/map/" +
+                                    self.latest_time + ".json",
+                                    retries=cnt - 1)
+            return self.store(data)
+        except (OSError, ValueError) as e:
+            self.failed(e)
+            raise
+
+    def store(self, data):
+        """取得したアメダスデータを保存し、ndarrayに変換する
+
+        JSONをDataFrameを介さずに変換する（DataFrameはcsvを出力する場合のみ作る）。
+        一時ファイルに書き込んでから置き換え、最後にJSONを取得状態に記録する
+
+        Parameters:
+        ----------
+        data: bytes
+            取得したアメダスデータ（JSON）
+        ----------
+        Returns:
+        ----------
+        utils.decoder.AmedasData
+            アメダスデータ
+        ----------
+        """
+        outdir_path = self.outdir_path
+        obs = json.loads(data)
         # アメダス地点情報の取得
-        df_location = self.location()
-        df["lon"] = df_location.loc[:, "lon"]
-        df["lat"] = df_location.loc[:, "lat"]
-        df["kjName"] = df_location.loc[:, "kjName"]
-        df["knName"] = df_location.loc[:, "knName"]
-        df["enName"] = df_location.loc[:, "enName"]
+        table_file = self.table_file()
+        amedas_data = decoder.from_json(obs, table=load_table(table_file))
+        # npzファイルとして保存
+        amedas_data.to_npz(os.path.join(outdir_path, self.latest_time + ".npz"))
         # csvファイルとして保存
-        df.to_csv(os.path.join(outdir_path, self.latest_time + ".csv"))
+        if opt_csv:
+            df = DataFrame(obs).T
+            df_location = self.location(table_file)
+            df["lon"] = df_location.loc[:, "lon"]
+            df["lat"] = df_location.loc[:, "lat"]
+            df["kjName"] = df_location.loc[:, "kjName"]
+            df["knName"] = df_location.loc[:, "knName"]
+            df["enName"] = df_location.loc[:, "enName"]
+            write_atomic(os.path.join(outdir_path, self.latest_time + ".csv"),
+                         df.to_csv().encode())
+        # JSONファイルとして保存（このファイルの有無で取得済みかどうかを判断する）
+        write_atomic(self.path(), data)
+        if self.manifest is not None:
+            self.manifest.record_ok(self.latest_time, self.path(), data)
         #
         # 取り出したデータを返却
-        return df
+        return amedas_data
 
-    def location(self):
-        """アメダス地点情報の取得"""
-        outdir_path = self.outdir_path
-        url_top = "https://www.jma.go.jp/bosai/amedas/const/"
-        file_name = "amedastable.json"
-        # アメダス地点情報の取得
-        url = url_top + file_name
-        if not os.path.exists(os.path.join(outdir_path, file_name)):
-            print(url)
-            urllib.request.urlretrieve(url,
-                                       os.path.join(outdir_path, file_name))
-        # 取得したファイルを開く
-        try:
-            with open(os.path.join(outdir_path, file_name), 'rt') as fin:
+    def table_file(self):
+        """アメダス地点情報（amedastable.json）のパス"""
+        # 共有するメタデータのキャッシュから読み込み（実行中は同じ版を使う）、
+        # 日付別ディレクトリに取得時の版を置く（ハードリンク、できない場合は
+        # コピー）
+        return metadata_cache().link(url_top + "const/amedastable.json",
+                                     self.outdir_path, self.fetcher)
+
+    def location(self, table_file):
+        """アメダス地点情報のDataFrame（同じ版は1回だけ読み込む）"""
+        memo = AmedasStation._location_memo
+        if table_file not in memo:
+            with open(table_file, 'rt') as fin:
                 data = fin.read()
-        except OSError as e:
-            raise OSError(e)
-        df = DataFrame(json.loads(data))
+            memo[table_file] = DataFrame(json.loads(data)).T
         # 取り出したデータを返却
-        return df.T
+        return memo[table_file]
+
+
+def backfill(output_dir,
+             time_sta,
+             time_end,
+             time_step,
+             fetcher,
+             cube=None,
+             manifest=None,
+             on_store=None):
+    """時刻範囲の未取得のデータを新しい時刻から順に並列に取得する
+
+    未取得の時刻は日付別ディレクトリの一覧から求める（時刻毎にstatしない）
+
+    Parameters:
+    ----------
+    output_dir: str
+        出力ディレクトリ（日付別/aに保存する）
+    time_sta: datetime
+        開始時刻
+    time_end: datetime
+        終了時刻
+    time_step: timedelta
+        取得する間隔
+    fetcher: utils.fetch.Fetcher
+        取得に使うFetcher
+    cube: utils.cube.AmedasCube
+        取得したデータを追加する配列（Noneの場合は追加しない）
+    manifest: utils.manifest.FetchManifest
+        取得状態の記録（Noneの場合はファイルの有無で判断する）
+    on_store: function
+        保存した時刻毎に呼び出す関数on_store(time_now, amedas, amedas_data)
+    ----------
+    Returns:
+    ----------
+    list(str)
+        取得できなかった時刻
+    ----------
+    """
+    # JSONファイルが無い時刻（新しい順）
+    queue = list(
+        backfill_queue(output_dir, time_sta, time_end, time_step,
+                       exts=["json"]))
+    # JSONファイルがある時刻は、記録が無いか確認する設定の場合のみ調べる
+    if manifest is not None:
+        for t, _ in list_snapshots(output_dir, time_sta, time_end,
+                                   exts=["json"]):
+            rec = manifest.get(pd.Timestamp(t).strftime("%Y%m%d%H%M%S"))
+            if opt_verify or rec is None or rec["status"] != "ok":
+                queue.append(t)
+    slots = []
+    for t in sorted(queue, reverse=True):
+        time_now = pd.Timestamp(t)
+        latest = time_now.strftime("%Y-%m-%dT%H:%M:%S+09:00")
+        # 出力ディレクトリ（日付別/a）
+        fdate = time_now.strftime("%y%m%d")
+        outdir_path = os.path.join(output_dir, fdate, "a")
+        os_mkdir(outdir_path)
+        amedas = AmedasStation(latest,
+                               outdir_path=outdir_path,
+                               fetcher=fetcher,
+                               manifest=manifest)
+        if amedas.needed():
+            slots.append((time_now, amedas))
+    print("slots to fetch:", len(slots))
+    # 並列に取得し、時刻順に保存する
+    failed = []
+    urls = [
+        url_top + "data/map/" + amedas.latest_time + ".json"
+        for _, amedas in slots
+    ]
+    for (time_now, amedas), (url, data) in zip(slots, fetcher.fetch_all(urls)):
+        if not isinstance(data, Exception):
+            try:
+                amedas_data = amedas.store(data)
+            except Exception as e:
+                # JSONとして読み込めない、書き込めない、地点情報に無い地点など
+                # （その時刻の失敗として記録し、残りの時刻を保存する）
+                data = e
+        if isinstance(data, Exception):
+            print("Warn: failed to fetch", url, data)
+            amedas.failed(data)
+            failed.append(amedas.latest_time)
+            continue
+        # (時刻, 地点, 変数)配列に追加
+        if cube is not None:
+            added = cube.append(time_now, amedas_data)
+            if added > 0:
+                print("stations added to cube =", added)
+        if on_store is not None:
+            on_store(time_now, amedas, amedas_data)
+    return failed
 
 
 if __name__ == '__main__':
 
+    # 接続を再利用し、取得速度を制限するFetcher
+    fetcher = Fetcher(max_workers=max_workers, rate=rate, burst=burst)
+    # 取得状態の記録
+    os_mkdir(output_dir)
+    manifest = FetchManifest(manifest_file)
     # 最新の時刻を取得
     # AmedasStation Classの初期化
-    amedas = AmedasStation()
+    amedas = AmedasStation(fetcher=fetcher, manifest=manifest)
     #
     # 終了時刻:  日本時間の部分を取り出しdatetimeに変換
     time_end = pd.to_datetime(amedas.latest_time.split("+")[0])
@@ -143,22 +343,23 @@ if __name__ == '__main__':
     #
     # 取得する間隔
     time_step = timedelta(minutes=10)
+    # (時刻, 地点, 変数)配列
+    cube = AmedasCube(cube_dir) if opt_cube else None
     # 指定した時刻範囲でアメダスデータを取得
-    time_now = time_sta
-    while True:
-        if time_now <= time_end:
-            latest = time_now.strftime("%Y-%m-%dT%H:%M:%S+09:00")
-            print(latest)
-            # 出力ディレクトリ（日付別/a）
-            fdate = time_now.strftime("%y%m%d")
-            outdir_path = os.path.join(output_dir, fdate, "a")
-            os_mkdir(outdir_path)
-            # AmedasStation Classの初期化
-            amedas = AmedasStation(latest, outdir_path=outdir_path)
-            # AmedasStation.retrieveメソッドを使い、アメダスデータを取得
-            df = amedas.retrieve()
-            if df is not None:
-                time.sleep(10.0)  # 10秒間待つ
-        else:
-            break
-        time_now = time_now + time_step
+    failed = backfill(output_dir,
+                      time_sta,
+                      time_end,
+                      time_step,
+                      fetcher,
+                      cube=cube,
+                      manifest=manifest)
+    if len(failed) > 0:
+        print("Warn: not fetched", len(failed), "slots")
+    # 取得範囲より前の日付をまとめる
+    if opt_bundle:
+        bundle.compact_archive(output_dir, time_sta)
+    print(manifest.summary())
+    # 取得の集計結果を書き出す（JMA_DRAW_METRICS_DIRを設定した場合）
+    export_metrics("get_jma_json_auto")
+    manifest.close()
+    fetcher.close()
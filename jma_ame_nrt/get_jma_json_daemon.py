@@ -0,0 +1,246 @@
+#!/opt/local/bin/python3
+#
+# 最新のアメダスデータを常駐して取得する（cronで毎時実行する代わりに使う）
+# latest_time.txtを条件付きリクエストで確認し、新しい時刻が出たらすぐに取得する
+# 出力ディレクトリなどの設定はget_jma_json_auto.pyのものを使う
+#
+# 使用方法
+# % nohup python3 get_jma_json_daemon.py > daemon.log 2>& 1 &
+#
+import os
+import sys
+import time
+import signal
+import traceback
+import pandas as pd
+from datetime import timedelta
+from utils import bundle
+from utils.cube import AmedasCube
+from utils.fetch import Fetcher, export_metrics
+from utils.meta import metadata_cache
+from utils.manifest import FetchManifest
+import get_jma_json_auto as auto
+
+# latest_time.txtを確認する間隔（秒）
+poll_interval = 20.0
+# 取得に失敗した時刻を含め、過去catchup_window分を取得し直す間隔（秒）
+catchup_interval = 3600.0
+catchup_window = timedelta(days=1)
+# データの時間間隔
+time_step = timedelta(minutes=10)
+
+# 取得した時刻毎に最新の地図を作図するかどうか（map_latest_cartopy.pyを使用）
+opt_map = False
+# opt_map = True
+# 作図する領域と出力ディレクトリ
+map_area = "Japan"
+map_dir = os.path.join(auto.output_dir, "map")
+# 気温を描く範囲（最小値、最大値、間隔）
+map_temprange = (18., 38., 2.)
+
+# 保存した時刻毎に呼び出す関数
+hooks = []
+
+
+def register_hook(func):
+    """保存した時刻毎に呼び出す関数を登録する
+
+    Parameters:
+    ----------
+    func: function
+        func(time_now, amedas, amedas_data)の形式で呼び出す
+        （time_now: 時刻、amedas: get_jma_json_auto.AmedasStation、
+          amedas_data: 取得したデータ（utils.decoder.AmedasData））
+    ----------
+    """
+    hooks.append(func)
+    return func
+
+
+def run_hooks(time_now, amedas, amedas_data):
+    """登録した関数を1つずつ呼び出す（例外は表示して残りの関数を呼び出す）"""
+    for func in hooks:
+        try:
+            func(time_now, amedas, amedas_data)
+        except Exception as e:
+            print("Warn: hook failed",
+                  getattr(func, "__name__", repr(func)), time_now, repr(e))
+            traceback.print_exc()
+
+
+def map_hook(time_now, amedas, amedas_data):
+    """最新の気温と風の地図を作図する"""
+    # cartopyは作図する場合のみ読み込む（常駐するため1回だけ）
+    import map_latest_cartopy
+    tmin, tmax, tstep = map_temprange
+    barb_increments = map_latest_cartopy.barb_increments
+    # 保存したファイルを読み直さずに、変換したデータを使う
+    lons, lats = amedas_data.lon, amedas_data.lat
+    temp = amedas_data.get("temp")
+    u, v = amedas_data.wind()
+    auto.os_mkdir(map_dir)
+    output_filename = os.path.join(
+        map_dir, map_area + "_temp+wind_" + amedas.latest_time + ".png")
+    map_latest_cartopy.draw(lons,
+                            lats,
+                            temp,
+                            u,
+                            v,
+                            output_filename,
+                            opt_mapcolor=True,
+                            opt_pref=True,
+                            opt_barbs=True,
+                            barb_increments=barb_increments,
+                            tmin=tmin,
+                            tmax=tmax,
+                            tstep=tstep,
+                            title=time_now.strftime("%Y/%m/%d %H:%M:%SJST"),
+                            area=map_area)
+
+
+def latest_time(fetcher, force=False):
+    """latest_time.txtを条件付きリクエストで確認する
+
+    Parameters:
+    ----------
+    fetcher: utils.fetch.Fetcher
+        取得に使うFetcher
+    force: bool
+        変更されていない場合も時刻を返すかどうか
+    ----------
+    Returns:
+    ----------
+    pandas.Timestamp
+        最新の時刻（変更されていない場合はNone）
+    ----------
+    """
+    body, changed = fetcher.get_cached(auto.url_top + "data/latest_time.txt")
+    if not changed and not force:
+        return None
+    # 日本時間の部分を取り出す
+    return pd.to_datetime(body.decode().strip().split("+")[0])
+
+
+def poll(fetcher, manifest, cube, time_last, time_catchup):
+    """latest_time.txtを1回確認し、新しい時刻（一定時間毎に過去の分）を取得する
+
+    Parameters:
+    ----------
+    fetcher: utils.fetch.Fetcher
+        取得に使うFetcher
+    manifest: utils.manifest.FetchManifest
+        取得状態の記録
+    cube: utils.cube.AmedasCube
+        取得したデータを追加する配列（Noneの場合は追加しない）
+    time_last: pandas.Timestamp
+        前回確認した最新の時刻（起動時はNone）
+    time_catchup: float
+        次に過去の分を取得し直す時刻（time.monotonic()の値）
+    ----------
+    Returns:
+    ----------
+    time_last, time_catchup
+        更新した値
+    ----------
+    """
+    time_new = latest_time(fetcher, force=time_last is None)
+    if time.monotonic() >= time_catchup:
+        # 起動時と一定時間毎に過去の分を取得し直す
+        if time_new is None:
+            time_new = time_last
+        if time_new is not None:
+            # 地点情報の版の固定を解除し、更新されていれば新しい版を使う
+            metadata_cache().release()
+            failed = auto.backfill(auto.output_dir,
+                                   time_new - catchup_window,
+                                   time_new,
+                                   time_step,
+                                   fetcher,
+                                   cube=cube,
+                                   manifest=manifest,
+                                   on_store=run_hooks)
+            if len(failed) > 0:
+                print("Warn: not fetched", len(failed), "slots")
+            # 取得範囲より前の日付をまとめる
+            if auto.opt_bundle:
+                bundle.compact_archive(auto.output_dir,
+                                       time_new - catchup_window)
+            time_catchup = time.monotonic() + catchup_interval
+    elif time_new is not None and time_new > time_last:
+        # 新しい時刻（前回から飛んだ時刻を含む）のみ取得する
+        auto.backfill(auto.output_dir,
+                      time_last + time_step,
+                      time_new,
+                      time_step,
+                      fetcher,
+                      cube=cube,
+                      manifest=manifest,
+                      on_store=run_hooks)
+    if time_new is not None:
+        time_last = time_new
+    return time_last, time_catchup
+
+
+def run(fetcher, manifest, cube, max_polls=None):
+    """poll_interval毎に確認を繰り返す
+
+    1回の確認で起きた例外（通信できない、不正なlatest_time.txtなど）は
+    表示して次の確認を続ける（常駐を止めない）
+
+    Parameters:
+    ----------
+    fetcher: utils.fetch.Fetcher
+        取得に使うFetcher
+    manifest: utils.manifest.FetchManifest
+        取得状態の記録
+    cube: utils.cube.AmedasCube
+        取得したデータを追加する配列（Noneの場合は追加しない）
+    max_polls: int
+        確認する回数（Noneの場合は終了しない）
+    ----------
+    """
+    time_last = None
+    time_catchup = 0.
+    npoll = 0
+    while max_polls is None or npoll < max_polls:
+        npoll += 1
+        try:
+            time_last, time_catchup = poll(fetcher, manifest, cube,
+                                           time_last, time_catchup)
+        except OSError as e:
+            # 通信できない場合は次の確認まで待つ
+            print("Warn: poll failed", e)
+        except Exception as e:
+            print("Error: poll failed", repr(e))
+            traceback.print_exc()
+        try:
+            # 取得の集計結果を書き出す（JMA_DRAW_METRICS_DIRを設定した場合）
+            export_metrics("get_jma_json_daemon")
+        except Exception as e:
+            print("Warn: cannot export metrics", repr(e))
+        time.sleep(poll_interval)
+
+
+def _terminate(signum, frame):
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+
+    if opt_map:
+        register_hook(map_hook)
+    # killされた場合も記録を閉じる
+    signal.signal(signal.SIGTERM, _terminate)
+
+    # 接続を再利用し、取得速度を制限するFetcher
+    fetcher = Fetcher(max_workers=auto.max_workers,
+                      rate=auto.rate,
+                      burst=auto.burst)
+    auto.os_mkdir(auto.output_dir)
+    manifest = FetchManifest(auto.manifest_file)
+    cube = AmedasCube(auto.cube_dir) if auto.opt_cube else None
+    try:
+        run(fetcher, manifest, cube)
+    finally:
+        manifest.close()
+        fetcher.close()
@@ -4,21 +4,27 @@
 #
 from pandas import DataFrame
 import pandas as pd
-import numpy as np
 import os
-import json
-import urllib.request
+from .geometry import load_table
+from utils.meta import metadata_cache
 
 
 # アメダス地点情報の取得
 class AmedasStation():
     """アメダス地点情報の取得"""
-    def __init__(self):
-        """アメダス地点データの取得と地点情報への変換"""
+    def __init__(self, fetcher=None):
+        """アメダス地点データの取得と地点情報への変換
+
+        Parameters:
+        ----------
+        fetcher: utils.fetch.Fetcher
+            地点情報の確認に使うFetcher（Noneの場合はshared_fetcher()）
+        ----------
+        """
         # データ読み込み
-        df = self._location()
+        self.table = self._location(fetcher)
         # 数値化された経度、緯度情報に変換
-        self.df = self._convert(df)
+        self.df = self._convert(self.table)
 
     def get_staloc(self, kn_name=None, kj_name=None, en_name=None):
         """アメダス地点の経度、緯度を返す
@@ -50,32 +56,27 @@ class AmedasStation():
         latitude = df_loc.iloc[0, 5]
         return float(longitude), float(latitude)
 
-    def _location(self):
-        """AMeDAS地点の位置情報を取得し、pandas DataFrameで返却"""
+    def _location(self, fetcher=None):
+        """AMeDAS地点の位置情報を取得し、StationTableで返却"""
         url_top = "https://www.jma.go.jp/bosai/amedas/const/"
         file_name = "amedastable.json"
         # アメダス地点情報の取得
         url = url_top + file_name
-        if not os.path.exists(file_name):
-            print(url)
-            urllib.request.urlretrieve(url, file_name)
-        with open(file_name, 'rt') as fin:
-            data = fin.read()
-        df = DataFrame(json.loads(data))
-        # 取り出したデータを返却
-        return df.T
-
-    def _str_rep(self, inp):
-        """データの文字列を処理し数値リストを返す"""
-        inp = str(inp)
-        return inp.replace("[", "").replace("]", "").replace(",", "").split()
+        if fetcher is None:
+            # 取得する場合のみ通信のモジュールを読み込む
+            from utils.fetch import shared_fetcher
+            fetcher = shared_fetcher()
+        # 共有するメタデータのキャッシュから読み込む（実行中は同じ版を使う）
+        self.table_file = metadata_cache().get(url, fetcher)[0]
+        # 内容が変わっていなければ変換済みのキャッシュを使う
+        return load_table(self.table_file)
 
-    # 入力 df: DataFrame
-    def _convert(self, df):
+    def _convert(self, table):
         """アメダス地点データ変換
+
         Parameters:
         ----------
-        df: pandas DataFrame
+        table: jmaloc.geometry.StationTable
             アメダス地点情報
         ----------
         Returns:
@@ -84,40 +85,22 @@ class AmedasStation():
             経度・緯度を数値に変換したアメダス地点情報
         ----------
         """
-        lons = []
-        lats = []
-        alts = []
-        staids = []
-        nkjs = []
-        nkns = []
-        nens = []
-        for lon, lat, alt, staid, nkj, nkn, nen in zip(
-                df.loc[:, "lon"], df.loc[:, "lat"], df.loc[:, "alt"], df.index,
-                df.loc[:, "kjName"], df.loc[:, "knName"], df.loc[:, "enName"]):
-            # 経度・緯度の計算
-            lon = self._str_rep(lon)
-            lat = self._str_rep(lat)
-            lon = float(lon[0]) + float(lon[1]) / 60.0
-            lat = float(lat[0]) + float(lat[1]) / 60.0
-            lons.append(lon)
-            lats.append(lat)
-            alts.append(float(alt))
-            staids.append(staid)
-            nkjs.append(nkj)
-            nkns.append(nkn)
-            nens.append(nen)
         # データ作成
         df = DataFrame(
             {
-                'staid': np.array(staids),
-                'kjname': np.array(nkjs),
-                'knname': np.array(nkns),
-                'enname': np.array(nens),
-                'longitude': np.array(lons),
-                'latitude': np.array(lats),
-                'altitude': np.array(alts)
+                'staid': table.staid,
+                'kjname': table.kjname,
+                'knname': table.knname,
+                'enname': table.enname,
+                'longitude': table.lon,
+                'latitude': table.lat,
+                'altitude': table.alt
             },
             dtype='unicode')
-        #print(df)
-        df.to_csv("amedastable.csv")
+        # amedastable.jsonが更新された場合のみcsvファイルを作成
+        # （キャッシュのファイルは版毎のため、新しい版は保存した時刻が新しい）
+        csv_name = "amedastable.csv"
+        if not os.path.exists(csv_name) or os.path.getmtime(
+                csv_name) < os.path.getmtime(self.table_file):
+            df.to_csv(csv_name)
         return df
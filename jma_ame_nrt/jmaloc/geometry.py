@@ -0,0 +1,229 @@
+#
+#  2026/10/18
+#  アメダス地点情報（amedastable.json）を数値配列に変換し、
+#  内容のハッシュ値毎にnpz形式でキャッシュする
+#
+import io
+import os
+import json
+import hashlib
+import numpy as np
+from utils.atomic import write_atomic
+
+# キャッシュの既定のディレクトリ
+cache_dir_default = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "jma_draw")
+# 最後に作成したキャッシュのハッシュ値を記録するファイル
+_LATEST = "amedastable.latest"
+# 読み込み済みの地点情報（ファイルのパス、更新時刻、サイズ毎）
+_memo = dict()
+
+
+class StationTable():
+    """アメダス地点情報の配列（地点番号順）
+
+    Parameters:
+    ----------
+    staid: ndarray(str)
+        地点番号
+    lon: ndarray(float32)
+        経度（度）
+    lat: ndarray(float32)
+        緯度（度）
+    alt: ndarray(float32)
+        高度（m）
+    kjname: ndarray(str)
+        漢字の地点名
+    knname: ndarray(str)
+        カタカナの地点名
+    enname: ndarray(str)
+        英語の地点名
+    version: str
+        amedastable.jsonのハッシュ値
+    ----------
+    """
+    def __init__(self,
+                 staid,
+                 lon,
+                 lat,
+                 alt,
+                 kjname,
+                 knname,
+                 enname,
+                 version=None):
+        order = np.argsort(np.asarray(staid, dtype=str))
+        self.staid = np.asarray(staid, dtype=str)[order]
+        self.lon = np.asarray(lon, dtype=np.float32)[order]
+        self.lat = np.asarray(lat, dtype=np.float32)[order]
+        self.alt = np.asarray(alt, dtype=np.float32)[order]
+        self.kjname = np.asarray(kjname, dtype=str)[order]
+        self.knname = np.asarray(knname, dtype=str)[order]
+        self.enname = np.asarray(enname, dtype=str)[order]
+        self.version = version
+
+    def __len__(self):
+        return len(self.staid)
+
+    def index(self, staid):
+        """地点番号から配列の位置を返す（無い地点は-1）
+
+        Parameters:
+        ----------
+        staid: ndarray(str)
+            地点番号
+        ----------
+        """
+        staid = np.asarray(staid, dtype=str)
+        if len(self) == 0:
+            return np.full(staid.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self.staid, staid)
+        pos[pos >= len(self)] = 0
+        return np.where(self.staid[pos] == staid, pos, -1)
+
+    def lonlat(self, staid):
+        """地点番号から経度、緯度を返す（無い地点は欠損値）
+
+        Parameters:
+        ----------
+        staid: ndarray(str)
+            地点番号
+        ----------
+        """
+        pos = self.index(staid)
+        lon = np.where(pos >= 0, self.lon[pos], np.float32(np.nan))
+        lat = np.where(pos >= 0, self.lat[pos], np.float32(np.nan))
+        return lon, lat
+
+    def diff(self, other):
+        """他の地点情報と比べて、追加・廃止された地点番号を返す
+
+        Parameters:
+        ----------
+        other: StationTable
+            比較する（古い）地点情報
+        ----------
+        Returns:
+        ----------
+        added, removed: ndarray(str)
+            追加された地点番号、廃止された地点番号
+        ----------
+        """
+        return (np.setdiff1d(self.staid, other.staid),
+                np.setdiff1d(other.staid, self.staid))
+
+    def to_npz(self, output_filename):
+        """npz形式で保存する（書き込み途中のファイルは残さない）"""
+        buf = io.BytesIO()
+        np.savez(buf,
+                 staid=self.staid,
+                 lon=self.lon,
+                 lat=self.lat,
+                 alt=self.alt,
+                 kjname=self.kjname,
+                 knname=self.knname,
+                 enname=self.enname,
+                 version=np.array(self.version or "", dtype=str))
+        write_atomic(output_filename, buf.getvalue())
+
+
+def read_npz(input_filename):
+    """npz形式の地点情報を読み込む"""
+    with np.load(input_filename) as d:
+        return StationTable(d["staid"],
+                            d["lon"],
+                            d["lat"],
+                            d["alt"],
+                            d["kjname"],
+                            d["knname"],
+                            d["enname"],
+                            version=str(d["version"]))
+
+
+def parse_table(data, version=None):
+    """amedastable.jsonの内容を数値配列に変換する
+
+    Parameters:
+    ----------
+    data: dict
+        amedastable.jsonを読み込んだ辞書
+    version: str
+        amedastable.jsonのハッシュ値
+    ----------
+    Returns:
+    ----------
+    StationTable
+    ----------
+    """
+    staid = list(data.keys())
+    values = list(data.values())
+    # 経度・緯度は[度, 分]
+    lon = np.array([v["lon"] for v in values], dtype=np.float64)
+    lat = np.array([v["lat"] for v in values], dtype=np.float64)
+    return StationTable(staid,
+                        lon[:, 0] + lon[:, 1] / 60.0,
+                        lat[:, 0] + lat[:, 1] / 60.0,
+                        [v.get("alt", np.nan) for v in values],
+                        [v.get("kjName", "") for v in values],
+                        [v.get("knName", "") for v in values],
+                        [v.get("enName", "") for v in values],
+                        version=version)
+
+
+def load_table(table_file="amedastable.json", cache_dir=None):
+    """amedastable.jsonを読み込む（内容が同じ場合はキャッシュを使う）
+
+    内容が変わった場合はキャッシュを作り直し、追加・廃止された地点を表示する
+
+    Parameters:
+    ----------
+    table_file: str
+        amedastable.jsonのパス
+    cache_dir: str
+        キャッシュのディレクトリ（Noneの場合はcache_dir_default）
+    ----------
+    Returns:
+    ----------
+    StationTable
+    ----------
+    """
+    if cache_dir is None:
+        cache_dir = cache_dir_default
+    st = os.stat(table_file)
+    key = (os.path.abspath(table_file), st.st_mtime_ns, st.st_size, cache_dir)
+    if key in _memo:
+        return _memo[key]
+    with open(table_file, 'rb') as fin:
+        raw = fin.read()
+    version = hashlib.sha1(raw).hexdigest()[:16]
+    cache_file = os.path.join(cache_dir, "amedastable_" + version + ".npz")
+    if os.path.exists(cache_file):
+        table = read_npz(cache_file)
+    else:
+        table = parse_table(json.loads(raw), version=version)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        _report(table, cache_dir)
+        table.to_npz(cache_file)
+        with open(os.path.join(cache_dir, _LATEST), 'wt') as fout:
+            fout.write(version)
+    _memo[key] = table
+    return table
+
+
+def _report(table, cache_dir):
+    """前回作成したキャッシュと比べて地点の変更を表示する"""
+    latest = os.path.join(cache_dir, _LATEST)
+    if not os.path.exists(latest):
+        print("amedastable: new version", table.version, len(table),
+              "stations")
+        return
+    with open(latest, 'rt') as fin:
+        prev = fin.read().strip()
+    prev_file = os.path.join(cache_dir, "amedastable_" + prev + ".npz")
+    if not os.path.exists(prev_file):
+        return
+    added, removed = table.diff(read_npz(prev_file))
+    print("amedastable: version", prev, "->", table.version)
+    print("  added stations:", ", ".join(added) if len(added) else "none")
+    print("  removed stations:",
+          ", ".join(removed) if len(removed) else "none")
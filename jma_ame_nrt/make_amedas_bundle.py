@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+#
+# get_jma_json_auto.pyで取得したアーカイブ（日付別/a/時刻.json）を
+# 日付毎に1つの圧縮ファイル（日付別/a/snapshots.bundle）にまとめる
+#
+import argparse
+from utils.bundle import compact_archive
+
+
+def parse_command():
+    """オプションの読み込み"""
+    parser = argparse.ArgumentParser(description='AMeDAS daily bundles')
+    parser.add_argument('--input_dir',
+                        type=str,
+                        help=('Top directory of the archive'),
+                        metavar='<input_dir>')
+    parser.add_argument('--before',
+                        type=str,
+                        help=('pack days before this date; yyyymmdd, '
+                              'or ISO date'),
+                        metavar='<before>')
+    parser.add_argument('--codec',
+                        type=str,
+                        help=('zstd or gzip (default: zstd if available)'),
+                        metavar='<codec>')
+    parser.add_argument('--keep',
+                        action='store_true',
+                        help=('keep the original files'))
+    args = parser.parse_args()
+    if args.input_dir is None:
+        raise ValueError("input_dir is needed")
+    if args.before is None:
+        raise ValueError("before is needed")
+    return args
+
+
+if __name__ == '__main__':
+    # オプションの読み込み
+    args = parse_command()
+    # 日付毎にまとめる
+    done = compact_archive(args.input_dir,
+                           args.before,
+                           codec=args.codec,
+                           remove=not args.keep)
+    print(len(done), "days")
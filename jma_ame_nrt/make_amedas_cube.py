@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+#
+# get_jma_json_auto.pyで取得したアーカイブ（日付別/a/時刻.npz）から
+# (時刻, 地点, 変数)配列を作成する（既に配列にある時刻は上書き）
+#
+import os
+import argparse
+from utils.cube import build
+
+
+def parse_command():
+    """オプションの読み込み"""
+    parser = argparse.ArgumentParser(description='AMeDAS data cube')
+    parser.add_argument('--input_dir',
+                        type=str,
+                        help=('Top directory of the archive'),
+                        metavar='<input_dir>')
+    parser.add_argument('--time_sta',
+                        type=str,
+                        help=('start time; yyyymmddhhMMss, or ISO date'),
+                        metavar='<timesta>')
+    parser.add_argument('--time_end',
+                        type=str,
+                        help=('end time; yyyymmddhhMMss, or ISO date'),
+                        metavar='<timeend>')
+    parser.add_argument('--output_dir',
+                        type=str,
+                        help=('Directory of the cube (default: input_dir/cube)'),
+                        metavar='<output_dir>')
+    args = parser.parse_args()
+    if args.input_dir is None:
+        raise ValueError("input_dir is needed")
+    if args.output_dir is None:
+        args.output_dir = os.path.join(args.input_dir, "cube")
+    return args
+
+
+if __name__ == '__main__':
+    # オプションの読み込み
+    args = parse_command()
+    # 配列の作成
+    cube = build(args.input_dir,
+                 args.output_dir,
+                 time_sta=args.time_sta,
+                 time_end=args.time_end)
+    times = cube.times()
+    if len(times) > 0:
+        print(times.min(), times.max(), len(times))
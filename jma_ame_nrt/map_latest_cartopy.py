@@ -2,23 +2,30 @@
 from pandas import DataFrame
 import pandas as pd
 import numpy as np
-import math
 import os
 import sys
 import json
-import urllib.request
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 from jmaloc import MapRegion
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
-import cartopy.io.shapereader as shapereader
 from utils import val2col
 from utils import os_mkdir
 from utils import parse_command
+from utils import decoder
+from utils.fetch import shared_fetcher, write_atomic
+from utils.meta import metadata_cache
 from utils import common
+from utils.background import map_axes, savefig
+from utils.pref import add_pref
+from utils.layers import add_markers, warn_missing
 common
 
+# 地図の背景（経度・緯度線、陸・海、都道府県境）を画像としてキャッシュし、
+# 同じ領域・設定の図で使い回すかどうか（~/.cache/jma_draw/background）
+opt_bgcache = True
+
 # 矢羽を描く値（短矢羽：1m/s、長矢羽：5m/s、旗矢羽：10m/s）
 half = 1.
 full = 2.
@@ -42,31 +49,24 @@ class AmedasStation():
         """
         url = "https://www.jma.go.jp/bosai/amedas/data/latest_time.txt"
         if latest is None:
-            latest = np.loadtxt(urllib.request.urlopen(url), dtype="str")
+            latest = shared_fetcher().get_cached(url)[0].decode().strip()
         print(latest)
         self.latest_time = pd.to_datetime(latest).strftime("%Y%m%d%H%M%S")
         self.datetime = pd.to_datetime(latest)
         print(self.latest_time)
         self.outdir_path = outdir_path
 
-    def retrieve(self, cnt=2):  # cntは再取得カウント
-        """AMeDASデータをダウンロードする"""
+    def retrieve(self):
+        """AMeDASデータをダウンロードする（通信エラーの場合の再取得はFetcherで行う）"""
         outdir_path = self.outdir_path
-        if cnt <= 0:  # 0の場合は終了
-            raise RecursionError('maximum count reached')
         url_top = "https://www.jma.go.jp/bosai/amedas/data/map/"
         file_name = self.latest_time + ".json"
         # 既に取得している場合は取得しない
         if not os.path.exists(os.path.join(outdir_path, file_name)):
             # アメダスデータの取得
-            try:
-                url = url_top + file_name
-                print(url)
-                urllib.request.urlretrieve(
-                    url, os.path.join(outdir_path, file_name))
-            except OSError:
-                time.sleep(10.0)  # 10秒間待つ
-                self.retrieve(cnt=cnt - 1)  # cntを減らして再帰
+            url = url_top + file_name
+            write_atomic(os.path.join(outdir_path, file_name),
+                         shared_fetcher().get(url))
         #
         # 取得したファイルを開く
         try:
@@ -82,8 +82,9 @@ class AmedasStation():
         df["kjName"] = df_location.loc[:, "kjName"]
         df["knName"] = df_location.loc[:, "knName"]
         df["enName"] = df_location.loc[:, "enName"]
-        # csvファイルとして保存
-        df.to_csv(os.path.join(outdir_path, self.latest_time + ".csv"))
+        # npzファイルとして保存
+        decoder.from_dataframe(df).to_npz(
+            os.path.join(outdir_path, self.latest_time + ".npz"))
         # DataFrameとして保持
         self.df = df
 
@@ -94,31 +95,23 @@ class AmedasStation():
         file_name = "amedastable.json"
         # アメダス地点情報の取得
         url = url_top + file_name
-        if not os.path.exists(os.path.join(outdir_path, file_name)):
-            print(url)
-            urllib.request.urlretrieve(url,
-                                       os.path.join(outdir_path, file_name))
-        # 取得したファイルを開く
-        try:
-            with open(os.path.join(outdir_path, file_name), 'rt') as fin:
-                data = fin.read()
-        except OSError as e:
-            raise OSError(e)
+        # 共有するメタデータのキャッシュから読み込み、作図時に同じ版を
+        # 読み込めるように取得時の版を置く（ハードリンク、できない場合はコピー）
+        table_file = metadata_cache().link(url, outdir_path,
+                                            shared_fetcher())
+        with open(table_file, 'rt') as fin:
+            data = fin.read()
         df = DataFrame(json.loads(data))
         # 取り出したデータを返却
         return df.T
 
-    def str_rep(self, inp):
-        """データの文字列を処理し数値リストを返す"""
-        return inp.replace("[", "").replace("]", "").replace(",", "").split()
-
     def read_data(self, input_filename=None, rainstep="1h"):
         """AMeDASデータをndarrayに変換する
 
         Parameters:
         ----------
         input_filename: str
-            入力ファイル名（Noneの場合はretrieveで保存したcsvファイル使用）
+            入力ファイル名（Noneの場合はretrieveで保存したnpzファイル使用）
         rain_step: str
             降水量データの間隔（デフォルトは1時間降水量）
         ----------
@@ -128,123 +121,57 @@ class AmedasStation():
             経度、緯度、気温、東西風、南北風、降水量データ
         ----------
         """
-        out_lon = list()
-        out_lat = list()
-        out_temp = list()
-        out_u = list()
-        out_v = list()
-        out_prep = list()
-        # データ取得部分
-        if input_filename is not None:
-            df = pd.read_csv(input_filename)
-        else:
-            df = pd.read_csv(
-                os.path.join(self.outdir_path, self.latest_time + ".csv"))
-            # df = self.df
-        # 変数に分ける
-        lon_in = df.loc[:, "lon"]
-        lat_in = df.loc[:, "lat"]
-        temp_in = df.loc[:, "temp"]
-        wd_in = df.loc[:, "windDirection"]
-        ws_in = df.loc[:, "wind"]
-        prep_in = df.loc[:, "precipitation" + rainstep]
-        for lon, lat, temp, wd, ws, prep in zip(lon_in, lat_in, temp_in, wd_in,
-                                                ws_in, prep_in):
-            # 経度・緯度の計算
-            lon = self.str_rep(lon)
-            lat = self.str_rep(lat)
-            lon = float(lon[0]) + float(lon[1]) / 60.0
-            lat = float(lat[0]) + float(lat[1]) / 60.0
-            # データの保存
-            out_lon.append(lon)
-            out_lat.append(lat)
-            try:
-                # 気温の計算
-                temp.isdecimal()
-                new = self.str_rep(temp)
-                if new[1] == "0":
-                    temp = float(new[0])
-                else:
-                    temp = np.nan
-                # データの保存
-                out_temp.append(temp)
-            except AttributeError:
-                out_temp.append(np.nan)
-            #
-            try:
-                # 風向・風速の計算
-                wd.isdecimal()
-                ws.isdecimal()
-                new_wd = self.str_rep(wd)
-                new_ws = self.str_rep(ws)
-                if new_wd[1] == "0" and new_ws[1] == "0":
-                    wd = float(new_wd[0]) * 22.5
-                    ws = float(new_ws[0])
-                else:
-                    wd = np.nan
-                    ws = np.nan
-                # 東西風、南北風への変換
-                u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-                v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-                # データの保存
-                out_u.append(u)
-                out_v.append(v)
-            except AttributeError:
-                out_u.append(np.nan)
-                out_v.append(np.nan)
-            try:
-                # 降水量の計算
-                prep.isdecimal()
-                new = self.str_rep(prep)
-                if new[1] == "0":
-                    prep = float(new[0])
-                else:
-                    prep = np.nan
-                out_prep.append(prep)
-            except AttributeError:
-                out_prep.append(np.nan)
-        return np.array(out_lon), np.array(out_lat), np.array(
-            out_temp), np.array(out_u), np.array(out_v), np.array(out_prep)
+        if input_filename is None:
+            input_filename = os.path.join(self.outdir_path,
+                                          self.latest_time + ".npz")
+        return decoder.read_data(input_filename, rainstep=rainstep)
 
 
-def add_pref(ax,
-             linestyle='-',
-             facecolor='none',
-             edgecolor='k',
-             linewidth=0.8):
-    """都道府県境を描く
+def draw_background(ax, region, opt_mapcolor=False, opt_pref=False):
+    """地図の背景（経度・緯度線、陸・海・海岸線、都道府県境）を描く
 
     Parameters:
     ----------
     ax: matplotlib Axes
         cartopyを呼び出した際のaxes
-    facecolor: str
-        塗り潰す色
-    edgecolor: str
-        線の色
-    linewidth: str
-        線の幅
+    region: jmaloc.MapRegion
+        作図範囲
+    opt_mapcolor: bool
+        True: 陸・海・湖を塗り分けて描く
+        False: 海岸線を描く
+    opt_pref: bool
+        都道府県境を描くかどうか
     ----------
     """
-    # 10mの解像度のデータ
-    shpfilename = shapereader.natural_earth(resolution='10m',
-                                            category='cultural',
-                                            name='admin_1_states_provinces')
-    #
-    # 都道府県のみ取得
-    provinces = shapereader.Reader(shpfilename).records()
-    provinces_of_japan = filter(
-        lambda province: province.attributes['admin'] == 'Japan', provinces)
+    lon_step = region.lon_step  # 経度線を描く間隔
+    lat_step = region.lat_step  # 緯度線を描く間隔
+    # 経度、緯度線を描く
+    xticks = np.arange(-180, 180, lon_step)
+    yticks = np.arange(-90, 90, lat_step)
+    gl = ax.gridlines(crs=ccrs.PlateCarree(),
+                      draw_labels=True,
+                      linewidth=1,
+                      linestyle=':',
+                      color='k',
+                      alpha=0.8)
+    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
+    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
+    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
+    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
+
+    if opt_mapcolor:
+        # 陸・海・湖を塗り分けて描く
+        ax.add_feature(cfeature.LAND)
+        ax.add_feature(cfeature.OCEAN)
+        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
+        ax.add_feature(cfeature.LAKES)
+    else:
+        # 海岸線を描く
+        ax.coastlines(color='k', linewidth=0.8)
     #
-    # 都道府県境の追加
-    for province in provinces_of_japan:
-        geometry = province.geometry
-        ax.add_geometries([geometry],
-                          ccrs.PlateCarree(),
-                          facecolor=facecolor,
-                          edgecolor=edgecolor,
-                          linewidth=linewidth,
-                          linestyle=linestyle)
+    # 都道府県境を描く
+    if opt_pref:
+        add_pref(ax, region, linestyle='-', facecolor='none', linewidth=0.8)
 
 
 def draw(lons,
@@ -311,12 +238,8 @@ def draw(lons,
     # MapRegion Classの初期化
     region = MapRegion(area)
     # Map.regionの変数を取得
-    lon_step = region.lon_step  # 経度線を描く間隔
-    lon_min = region.lon_min  # 経度範囲下限
     lon_max = region.lon_max  # 経度範囲上限
-    lat_step = region.lat_step  # 緯度線を描く間隔
     lat_min = region.lat_min  # 緯度範囲下限
-    lat_max = region.lat_max  # 緯度範囲上限
     if area == "Japan":
         ms = 1  # マーカーサイズ
         length = 4  # 矢羽のサイズ
@@ -332,46 +255,21 @@ def draw(lons,
         yloc = 0.2  # 矢羽の凡例を表示する位置(x)
     #
     # cartopy呼び出し
-    ax = fig.add_axes((0.1, 0.3, 0.8, 0.6), projection=ccrs.PlateCarree())
-    ax.set_extent([lon_min, lon_max, lat_min, lat_max])  # 領域の限定
-
-    # 経度、緯度線を描く
-    xticks = np.arange(-180, 180, lon_step)
-    yticks = np.arange(-90, 90, lat_step)
-    gl = ax.gridlines(crs=ccrs.PlateCarree(),
-                      draw_labels=True,
-                      linewidth=1,
-                      linestyle=':',
-                      color='k',
-                      alpha=0.8)
-    gl.xlocator = mticker.FixedLocator(xticks)  # 経度線
-    gl.ylocator = mticker.FixedLocator(yticks)  # 緯度線
-    gl.top_labels = False  # 上側の目盛り線ラベルを描かない
-    gl.right_labels = False  # 下側の目盛り線ラベルを描かない
-
-    if opt_mapcolor:
-        # 陸・海・湖を塗り分けて描く
-        ax.add_feature(cfeature.LAND)
-        ax.add_feature(cfeature.OCEAN)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
-        ax.add_feature(cfeature.LAKES)
-    else:
-        # 海岸線を描く
-        ax.coastlines(color='k', linewidth=0.8)
-    #
-    # 都道府県境を描く
-    if opt_pref:
-        add_pref(ax, linestyle='-', facecolor='none', linewidth=0.8)
+    # （背景の経度・緯度線、陸・海、都道府県境は画像として使い回す）
+    ax = map_axes(fig, (0.1, 0.3, 0.8, 0.6),
+                  region,
+                  draw_background,
+                  dict(opt_mapcolor=opt_mapcolor, opt_pref=opt_pref),
+                  projection=ccrs.PlateCarree(),
+                  dpi=300,
+                  cache=None if opt_bgcache else False)
     #
     # val2colクラスの初期化（気温の範囲はtmin、tmaxで設定、tstepで刻み幅）
     t2c = val2col(cmap='jet', tmin=tmin, tmax=tmax, tstep=tstep)
     # マーカーをプロット
-    for xc, yc, dc in zip(lons, lats, d):
-        if math.isnan(dc):
-            print("Warn ", xc, yc, dc)
-        else:
-            c = t2c.conv(dc)
-            ax.plot(xc, yc, marker='o', color=c, markersize=ms)
+    # （全地点のマーカーを1つのArtistで描く）
+    valid = warn_missing(lons, lats, d)
+    add_markers(ax, lons[valid], lats[valid], t2c.conv_array(d[valid]), ms)
 
     # 矢羽を描く
     if opt_barbs:
@@ -401,7 +299,7 @@ def draw(lons,
     t2c.colorbar(fig)
 
     # ファイルへの書き出し
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
+    savefig(fig, output_filename, dpi=300)
     plt.close()
 
 
@@ -10,118 +10,28 @@ import matplotlib.dates as mdates
 import matplotlib.ticker as mticker
 from utils import os_mkdir
 from utils import parse_command
+from utils import decoder
+from utils.archive import to_minutes
+from utils.cube import AmedasCube
+from utils.bulk import read_files
+from utils.point import read_series
 from utils import common
 common
 
+# (時刻, 地点, 変数)配列のディレクトリ（Noneの場合は時刻毎のファイルを読み込む）
+cube_dir = None
+# cube_dir = "/path_to_output/cube"
+# 地点毎のデータ（3時間毎のブロック）を気象庁から直接取得するかどうか
+# （Trueの場合は時刻毎のファイル、cube_dirを使わない）
+opt_point = False
+# opt_point = True
+
 plt.rcParams['xtick.direction'] = 'in'  # x軸目盛線を内側
 plt.rcParams['xtick.major.width'] = 1.2  # x軸主目盛線の長さ
 plt.rcParams['ytick.direction'] = 'in'  # y軸目盛線を内側
 plt.rcParams['ytick.major.width'] = 1.2  # y軸主目盛線の長さ
 
 
-def str_rep(inp):
-    """データの文字列を処理し数値リストを返す"""
-    return inp.replace("[", "").replace("]", "").replace(",", "").split()
-
-
-def read_data(input_filename, sta=None):
-    """AMeDAS csvデータを読み込む
-
-    Parameters:
-    ----------
-    input_filename: str
-        入力ファイル名
-    sta: str
-        アメダス地点名
-    ----------
-    """
-    out_lon = list()
-    out_lat = list()
-    out_temp = list()
-    out_u = list()
-    out_v = list()
-    out_prep = list()
-    # データ取得部分
-    df = pd.read_csv(input_filename)
-    # 地点データ選択
-    df = df[df.loc[:, 'enName'] == sta]
-    lon_in = df.loc[:, "lon"]
-    lat_in = df.loc[:, "lat"]
-    try:
-        temp_in = df.loc[:, "temp"]
-    except ValueError:
-        temp_in = [np.nan]
-    try:
-        wd_in = df.loc[:, "windDirection"]
-        ws_in = df.loc[:, "wind"]
-    except ValueError:
-        wd_in = [np.nan]
-        ws_in = [np.nan]
-    try:
-        prep_in = df.loc[:, "precipitation1h"]
-    except ValueError:
-        prep_in = [np.nan]
-    for lon, lat, temp, wd, ws, prep in zip(lon_in, lat_in, temp_in, wd_in,
-                                            ws_in, prep_in):
-        # 経度・緯度の計算
-        lon = str_rep(lon)
-        lat = str_rep(lat)
-        lon = float(lon[0]) + float(lon[1]) / 60.0
-        lat = float(lat[0]) + float(lat[1]) / 60.0
-        # print(lon.strip(), lat.strip(), temp)
-        # データの保存
-        out_lon.append(lon)
-        out_lat.append(lat)
-        try:
-            # 気温の計算
-            temp.isdecimal()
-            new = str_rep(temp)
-            if new[1] == "0":
-                temp = float(new[0])
-            else:
-                temp = np.nan
-            # データの保存
-            out_temp.append(temp)
-        except AttributeError:
-            out_temp.append(np.nan)
-        #
-        try:
-            # 風向・風速の計算
-            wd.isdecimal()
-            ws.isdecimal()
-            new_wd = str_rep(wd)
-            new_ws = str_rep(ws)
-            if new_wd[1] == "0" and new_ws[1] == "0":
-                wd = float(new_wd[0]) * 22.5
-                ws = float(new_ws[0])
-            else:
-                wd = np.nan
-                ws = np.nan
-            # 東西風、南北風への変換
-            u = ws * np.cos((270.0 - wd) / 180.0 * np.pi)
-            v = ws * np.sin((270.0 - wd) / 180.0 * np.pi)
-            # データの保存
-            out_u.append(u)
-            out_v.append(v)
-        except AttributeError:
-            out_u.append(np.nan)
-            out_v.append(np.nan)
-        #
-        try:
-            # 降水量の計算
-            prep.isdecimal()
-            new = str_rep(prep)
-            if new[1] == "0":
-                prep = float(new[0])
-            else:
-                prep = np.nan
-            out_prep.append(prep)
-        except AttributeError:
-            out_prep.append(np.nan)
-    return np.array(out_lon), np.array(out_lat), np.array(out_temp), np.array(
-        out_u), np.array(out_v), np.array(out_prep)
-
-
 def draw(index,
          temp,
          prep,
@@ -234,35 +144,54 @@ def draw(index,
     plt.close()
 
 
-def main(tinfo=None, tinfof=None, sta=None, output_dir='.'):
-    """指定された時刻のデータを取得
+def main(time_list, stations, cube_dir=None, opt_point=False):
+    """指定した時刻・地点の時系列データを取得
 
     Parameters:
     ----------
-    tinfo: str
-        図のタイトルに表示する時刻
-        (形式：2021/03/12 16:10:00JST)
-    tinfof: str
-        ファイル名の一部に用いる時刻
-        (形式：20210312161000)
-    area: str
-        図を描く地点
-    output_dir: str
-        出力ディレクトリ
+    time_list: list(datetime)
+        取得する時刻
+    stations: list(str)
+        アメダス地点名（英語）または地点番号
+    cube_dir: str
+        (時刻, 地点, 変数)配列のディレクトリ
+        （Noneの場合は時刻毎のファイルを読み込む）
+    opt_point: bool
+        地点毎のデータを気象庁から直接取得するかどうか
+    ----------
+    Returns:
+    ----------
+    temp, u, v, prep: ndarray
+        (時刻, 地点)の気温、東西風、南北風、降水量データ
     ----------
     """
-    if sta is None:
-        raise ValueError('sta is needed')
-    if tinfof is not None:
-        # 入力ファイル名
-        input_filename = tinfof + ".csv"
-        # データの取得
-        lons, lats, temp, u, v, prep = read_data(input_filename, sta=sta)
-        print(lons.shape, lats.shape, temp.shape, u.shape, v.shape, prep.shape)
-        #
-        return lons, lats, temp, u, v, prep
+    names = ["temp", "wind", "windDirection", "precipitation1h"]
+    if opt_point:
+        # 地点毎のデータをブロック単位で並列に取得する（取得済みのブロックは再利用）
+        d = read_series(stations, names, time_list)
+    elif cube_dir is not None:
+        # (時刻, 地点, 変数)配列から指定地点のみ取り出す
+        tlist = np.array([to_minutes(t) for t in time_list])
+        times, dc = AmedasCube(cube_dir).series(stations, names, tlist[0],
+                                                tlist[-1])
+        d = np.full((len(tlist), len(stations), len(names)),
+                    np.nan,
+                    dtype=np.float32)
+        if len(times) > 0:
+            pos = np.minimum(np.searchsorted(times, tlist), len(times) - 1)
+            hit = times[pos] == tlist
+            d[hit] = dc[pos[hit]]
     else:
-        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+        # 時刻毎のファイルをプロセス並列で読み込み、指定地点のみ変換する
+        input_filenames = [
+            t.strftime("%Y%m%d%H%M%S") + ".csv" for t in time_list
+        ]
+        d = read_files(input_filenames,
+                       names,
+                       times=time_list,
+                       stations=stations).series(stations)
+    u, v = decoder.uv(d[:, :, 1], d[:, :, 2])
+    return d[:, :, 0], u, v, d[:, :, 3]
 
 
 if __name__ == '__main__':
@@ -271,8 +200,8 @@ if __name__ == '__main__':
     # 開始・終了時刻
     time_sta = pd.to_datetime(args.time_sta)
     time_end = pd.to_datetime(args.time_end)
-    # アメダス地点名
-    sta = args.sta
+    # アメダス地点名（カンマ区切りで複数指定可能）
+    stations = args.sta.split(",")
     # 出力ディレクトリ名
     output_dir = args.output_dir
     # 降水量を積算降水量にするかどうか
@@ -286,56 +215,34 @@ if __name__ == '__main__':
     # データの時間間隔
     time_step = timedelta(hours=1)
     # time_step = timedelta(minutes=10)
-    index = []
-    prep = []
-    temp = []
-    uwnd = []
-    vwnd = []
     tinfot = time_sta.strftime("%Y/%m/%d %HJST") + "-" + time_end.strftime(
         "%Y/%m/%d %HJST")
     #
+    time_list = []
     time = time_sta
     while True:
         if time <= time_end:
-            tinfo = time.strftime("%Y/%m/%d %H:%M:%SJST")
-            tinfof = time.strftime("%Y%m%d%H%M%S")
-            print(tinfo)
-            # 指定した時刻の地点データ取得
-            lons, lats, t_in, u_in, v_in, pr_in = main(tinfo,
-                                                       tinfof,
-                                                       sta=sta,
-                                                       output_dir=output_dir)
-            #
-            index.append(time)
-            prep.append(pr_in)
-            temp.append(t_in)
-            uwnd.append(u_in)
-            vwnd.append(v_in)
+            time_list.append(time)
         else:
             break
         time = time + time_step
-    #
-    nt = len(index)
-    index = np.vstack(index).reshape(nt)
-    prep = np.vstack(prep).reshape(nt)
-    temp = np.vstack(temp).reshape(nt)
-    uwnd = np.vstack(uwnd).reshape(nt)
-    vwnd = np.vstack(vwnd).reshape(nt)
-    print(index)
-    print(prep)
-    print(temp)
-    print(uwnd)
-    print(vwnd)
+    # 全地点の時系列データ取得
+    temp, uwnd, vwnd, prep = main(time_list,
+                                  stations,
+                                  cube_dir=cube_dir,
+                                  opt_point=opt_point)
+    index = np.array(time_list)
     print(index.shape, prep.shape, temp.shape, uwnd.shape, vwnd.shape)
-    # 出力ファイル名
-    output_filepath = os.path.join(output_dir, "tvar_" + sta + ".png")
-    # 作図
-    draw(index,
-         temp,
-         prep,
-         uwnd,
-         vwnd,
-         output_filename=output_filepath,
-         opt_cumrain=opt_cumrain,
-         opt_addtemp=opt_addtemp,
-         title=tinfot + " (" + sta + ")")
+    for n, sta in enumerate(stations):
+        # 出力ファイル名
+        output_filepath = os.path.join(output_dir, "tvar_" + sta + ".png")
+        # 作図
+        draw(index,
+             temp[:, n],
+             prep[:, n],
+             uwnd[:, n],
+             vwnd[:, n],
+             output_filename=output_filepath,
+             opt_cumrain=opt_cumrain,
+             opt_addtemp=opt_addtemp,
+             title=tinfot + " (" + sta + ")")
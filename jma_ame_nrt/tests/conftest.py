@@ -0,0 +1,7 @@
+#
+#  テストからutils、jmaloc（作図プログラムと同じディレクトリ）をimportする
+#
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,166 @@
+#
+#  utils/accum.pyのテスト
+#
+import os
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from utils import accum
+from utils.accum import RainAccumulator, accumulate
+from utils.bulk import AmedasStack, time_range
+
+STEP = timedelta(minutes=10)
+T0 = pd.Timestamp("2026-07-01 00:10")
+
+
+def make_stack(nt=12, nsta=5, seed=0):
+    """欠損値を含む10分間降水量"""
+    rng = np.random.default_rng(seed)
+    d = rng.integers(0, 10, size=(nt, nsta)).astype(np.float32) * 0.5
+    d[rng.random((nt, nsta)) < 0.2] = np.nan
+    times = np.array(time_range(T0, T0 + STEP * (nt - 1), STEP),
+                     dtype="datetime64[m]")
+    staid = np.array(["%05d" % n for n in range(nsta)])
+    return AmedasStack(times, staid, np.zeros(nsta, np.float32),
+                       np.zeros(nsta, np.float32), staid,
+                       ["precipitation10m"], d[:, :, np.newaxis], [],
+                       np.ones(nt, dtype=bool))
+
+
+def test_window_matches_nansum():
+    stack = make_stack()
+    d = stack.get("precipitation10m")
+    acc = RainAccumulator()
+    acc.update(stack)
+    for i0 in range(len(d)):
+        for i1 in range(i0 + 1, len(d) + 1):
+            t0 = T0 + STEP * (i0 - 1)
+            t1 = T0 + STEP * (i1 - 1)
+            part = d[i0:i1]
+            expect = np.where(np.isnan(part).all(axis=0), np.nan,
+                              np.nansum(part, axis=0))
+            np.testing.assert_allclose(acc.window(t0, t1), expect)
+            # 欠損値の時刻がある地点は欠損値（np.sumと同じ）
+            np.testing.assert_allclose(acc.window(t0, t1, complete=True),
+                                       np.sum(part, axis=0))
+
+
+def test_rolling_matches_window():
+    acc = RainAccumulator()
+    acc.update(make_stack())
+    width = timedelta(minutes=30)
+    times, d = acc.rolling(width, complete=True)
+    for t, row in zip(times[2:], d[2:]):
+        np.testing.assert_array_equal(
+            row, acc.window(pd.Timestamp(t) - width, t, complete=True))
+    # 期間が累積和の範囲外の時刻は欠損値
+    assert np.isnan(d[:2]).all()
+
+
+def test_missing_file_is_skipped():
+    stack = make_stack()
+    stack.valid[3] = False
+    stack.values[3] = np.nan
+    acc = RainAccumulator()
+    acc.update(stack)
+    d = stack.get("precipitation10m")
+    ok = ~np.isnan(np.delete(d[:6], 3, axis=0)).any(axis=0)
+    w = acc.window(T0 - STEP, T0 + STEP * 5, complete=True)
+    # 読み込めなかった時刻は、complete=Trueでも地点を欠損値にしない
+    np.testing.assert_allclose(w[ok], np.nansum(d[:6], axis=0)[ok])
+    assert np.isnan(w[~ok]).all()
+    assert acc.missing_times(T0, T0 + STEP * 5) == [T0 + STEP * 3]
+
+
+def test_rebase_keeps_windows():
+    acc = RainAccumulator()
+    acc.update(make_stack())
+    t1 = T0 + STEP * 11
+    before = [acc.window(T0 + STEP * n, t1) for n in range(4, 11)]
+    assert acc.rebase(T0 + STEP * 5)
+    assert len(acc) == 7
+    assert acc.times()[0] == np.datetime64(T0 + STEP * 5, "m")
+    after = [acc.window(T0 + STEP * n, t1) for n in range(4, 11)]
+    for a, b in zip(before, after):
+        np.testing.assert_allclose(a, b)
+    assert not acc.rebase(T0)
+
+
+def write_files(input_dir, times, seed=0):
+    rng = np.random.default_rng(seed)
+    for t in times:
+        prep = ["[%.1f, 0]" % v for v in rng.integers(0, 10, 3) * 0.5]
+        pd.DataFrame({
+            "precipitation10m": prep,
+            "enName": ["A", "B", "C"]
+        },
+                     index=["1", "2", "3"]).to_csv(
+                         os.path.join(input_dir,
+                                      t.strftime("%Y%m%d%H%M%S") + ".csv"))
+
+
+def test_checkpoint_is_trimmed(tmp_path, monkeypatch):
+    monkeypatch.setattr(accum, "keep_history", timedelta(minutes=20))
+    times = time_range(T0, T0 + STEP * 11, STEP)
+    write_files(str(tmp_path), times)
+    acc_file = str(tmp_path / "acc.npz")
+    acc = accumulate(times[0], times[5], input_dir=str(tmp_path),
+                     acc_file=acc_file, max_workers=1)
+    assert len(acc) == 6
+    # 開始時刻を進めると、keep_historyより前は捨てる
+    acc = accumulate(times[6], times[11], input_dir=str(tmp_path),
+                     acc_file=acc_file, max_workers=1)
+    assert len(acc) == 8
+    fresh = accumulate(times[4], times[11], input_dir=str(tmp_path),
+                       max_workers=1)
+    np.testing.assert_allclose(acc.window(times[5], times[11]),
+                               fresh.window(times[5], times[11]))
+    # 保存した累積和も同じ
+    saved = accum.read_npz(acc_file)
+    assert len(saved) == 8
+    np.testing.assert_allclose(saved.cum, acc.cum)
+    # 変更が無い場合は保存し直さない
+    mtime = os.stat(acc_file).st_mtime_ns
+    accumulate(times[6], times[11], input_dir=str(tmp_path),
+               acc_file=acc_file, max_workers=1)
+    assert os.stat(acc_file).st_mtime_ns == mtime
+
+
+def test_checkpoint_file_is_keyed_by_window_and_dir(tmp_path):
+    a = str(tmp_path / "a")
+    b = str(tmp_path / "b")
+    names = {
+        accum.checkpoint_file("rain3h_acc.npz", "6h", a),
+        accum.checkpoint_file("rain3h_acc.npz", "12h", a),
+        accum.checkpoint_file("rain3h_acc.npz", "6h", b),
+        accum.checkpoint_file("rain24h_acc.npz", "6h", a),
+        accum.checkpoint_file("rain3h_acc.npz", None, a),
+    }
+    assert len(names) == 5
+    assert all(name.endswith(".npz") for name in names)
+    assert accum.checkpoint_file(None, "6h", a) is None
+    # 同じ期間・ディレクトリは同じ名前（相対パスでも）
+    assert accum.checkpoint_file("x.npz", "6H", ".") == accum.checkpoint_file(
+        "x.npz", "6h", os.getcwd())
+
+
+def test_window_rains_matches_window(tmp_path, monkeypatch):
+    times = time_range(T0, T0 + STEP * 11, STEP)
+    write_files(str(tmp_path), times)
+    monkeypatch.chdir(tmp_path)
+    time_sta, time_end = times[6], times[11]
+    acc, time_list, rains = accum.window_rains(time_sta, time_end, "30min",
+                                               timedelta(minutes=20),
+                                               acc_file="acc.npz")
+    assert time_list == time_range(time_sta, time_end, timedelta(minutes=20))
+    for time, rain in zip(time_list, rains):
+        np.testing.assert_allclose(
+            rain, acc.window(time - timedelta(minutes=30), time))
+    # stormは開始時刻からの積算
+    _, _, storm = accum.window_rains(time_sta, time_end, "storm",
+                                     timedelta(minutes=20))
+    for time, rain in zip(time_list, storm):
+        np.testing.assert_allclose(rain, acc.window(time_sta - STEP, time))
+    # チェックポイントは積算期間毎に別のファイル
+    assert os.path.exists(accum.checkpoint_file("acc.npz", "30min", "."))
+    assert not os.path.exists("acc.npz")
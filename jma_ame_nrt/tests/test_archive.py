@@ -0,0 +1,118 @@
+#
+#  utils/archive.pyのテスト（日付を跨ぐ欠けた時刻、まとめたファイル、取得の順序）
+#
+import os
+from datetime import timedelta
+import numpy as np
+from utils import archive, bundle
+
+STEP = timedelta(minutes=10)
+
+
+def touch(archive_dir, stime, ext="json"):
+    path = os.path.join(archive_dir, stime[2:8], "a")
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, stime + "." + ext), 'wb') as fout:
+        fout.write(b"{}")
+
+
+def minutes(*stimes):
+    return np.array(stimes, dtype="datetime64[m]")
+
+
+def test_missing_times_across_directories(tmp_path):
+    top = str(tmp_path)
+    # 日付を跨ぐ期間（23:40〜00:20）の一部のみ取得済み
+    touch(top, "20260701234000")
+    touch(top, "20260702000000", "npz")
+    touch(top, "20260702002000", "csv")
+    # 期間外・間隔外のファイルは数えない
+    touch(top, "20260701233000")
+    touch(top, "20260702000500")
+    # 日付別ディレクトリ以外は無視する
+    os.makedirs(os.path.join(top, "tmp", "a"))
+    missing = archive.missing_times(top, "2026-07-01 23:40",
+                                    "2026-07-02 00:20", STEP)
+    np.testing.assert_array_equal(
+        missing, minutes("2026-07-01T23:50", "2026-07-02T00:10"))
+    # 拡張子を限定した場合は、その拡張子のファイルのみ数える
+    missing = archive.missing_times(top, "2026-07-01 23:40",
+                                    "2026-07-02 00:20", STEP, exts=["npz"])
+    np.testing.assert_array_equal(
+        missing,
+        minutes("2026-07-01T23:40", "2026-07-01T23:50", "2026-07-02T00:10",
+                "2026-07-02T00:20"))
+    # アーカイブが無い場合は全ての時刻
+    missing = archive.missing_times(str(tmp_path / "none"), "2026-07-01 23:40",
+                                    "2026-07-02 00:20", STEP)
+    assert len(missing) == 5
+
+
+def test_list_snapshots_priority(tmp_path):
+    top = str(tmp_path)
+    for ext in ("json", "csv", "npz"):
+        touch(top, "20260701000000", ext)
+    touch(top, "20260701001000", "json")
+    touch(top, "20260702000000", "csv")
+    snaps = archive.list_snapshots(top)
+    assert [str(t) for t, _ in snaps] == [
+        "2026-07-01T00:00", "2026-07-01T00:10", "2026-07-02T00:00"
+    ]
+    # 同じ時刻はnpz、csv、jsonの順に使う
+    assert [os.path.basename(p) for _, p in snaps] == [
+        "20260701000000.npz", "20260701001000.json", "20260702000000.csv"
+    ]
+    # 期間で絞り込む
+    snaps = archive.list_snapshots(top, "2026-07-01 00:05", "2026-07-01 23:50")
+    assert [os.path.basename(p) for _, p in snaps] == ["20260701001000.json"]
+
+
+def test_bundle_members_count_as_present(tmp_path):
+    top = str(tmp_path)
+    day = os.path.join(top, "260701", "a")
+    os.makedirs(day)
+    bundle.write_bundle(os.path.join(day, bundle.bundle_name), {
+        "20260701000000.json": b"{}",
+        "20260701001000.json": b"{}",
+        "amedastable.json": b"{}",
+    })
+    # まとめていないファイルと同じ時刻はファイルを使う
+    touch(top, "20260701001000", "npz")
+    snaps = archive.list_snapshots(top)
+    assert [os.path.relpath(p, top) for _, p in snaps] == [
+        os.path.join("260701", "a", "20260701000000.json"),
+        os.path.join("260701", "a", "20260701001000.npz"),
+    ]
+    missing = archive.missing_times(top, "2026-07-01 00:00",
+                                    "2026-07-01 00:30", STEP)
+    np.testing.assert_array_equal(
+        missing, minutes("2026-07-01T00:20", "2026-07-01T00:30"))
+    # まとめたファイル中はjsonとして扱う
+    missing = archive.missing_times(top, "2026-07-01 00:00",
+                                    "2026-07-01 00:10", STEP, exts=["csv"])
+    assert len(missing) == 2
+    missing = archive.missing_times(top, "2026-07-01 00:00",
+                                    "2026-07-01 00:10", STEP, exts=["json"])
+    assert len(missing) == 0
+    missing = archive.missing_times(top, "2026-07-01 00:00",
+                                    "2026-07-01 00:10", STEP, exts=["npz"])
+    np.testing.assert_array_equal(missing, minutes("2026-07-01T00:00"))
+
+
+def test_backfill_queue_is_newest_first(tmp_path):
+    top = str(tmp_path)
+    touch(top, "20260701235000")
+    queue = archive.backfill_queue(top, "2026-07-01 23:30",
+                                   "2026-07-02 00:10", STEP)
+    np.testing.assert_array_equal(
+        queue,
+        minutes("2026-07-02T00:10", "2026-07-02T00:00", "2026-07-01T23:40",
+                "2026-07-01T23:30"))
+    # 上限を指定した場合は新しい時刻から
+    queue = archive.backfill_queue(top, "2026-07-01 23:30",
+                                   "2026-07-02 00:10", STEP, limit=2)
+    np.testing.assert_array_equal(
+        queue, minutes("2026-07-02T00:10", "2026-07-02T00:00"))
+    # 欠けた時刻が無い場合は空
+    assert len(archive.backfill_queue(top, "2026-07-01 23:50",
+                                      "2026-07-01 23:50", STEP)) == 0
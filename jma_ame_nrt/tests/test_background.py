@@ -0,0 +1,155 @@
+#
+#  utils/background.pyのテスト（キャッシュした背景の図と、毎回背景を描いた図が
+#  同じ画像か）
+#
+#  cartopyを使わずに、経度・緯度をそのまま座標とするAxes（projection=None）で描く
+#
+import os
+import time
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import pytest
+from matplotlib.patches import Polygon
+from PIL import Image
+from jmaloc import MapRegion
+from utils import background
+from utils.background import BackgroundCache, map_axes, savefig
+from utils.layers import add_markers
+
+# 目盛り線を描かない（地図のAxesと同じく、ラベルは背景に描く）
+RC = {
+    "xtick.bottom": False,
+    "xtick.labelbottom": False,
+    "ytick.left": False,
+    "ytick.labelleft": False,
+}
+
+
+def draw_background(ax, region, color="darkseagreen"):
+    """陸の代わりの多角形、経度・緯度線とそのラベル"""
+    ax.add_patch(
+        Polygon([(138.5, 34.), (140.2, 34.4), (141., 36.5), (139., 36.2)],
+                facecolor=color,
+                edgecolor="k"))
+    for lon in np.arange(region.lon_min, region.lon_max, region.lon_step):
+        ax.axvline(lon, linestyle=":", color="k", linewidth=1)
+        ax.text(lon, region.lat_min - 0.1, "%.1fE" % lon, ha="center",
+                va="top")
+    for lat in np.arange(region.lat_min, region.lat_max, region.lat_step):
+        ax.axhline(lat, linestyle=":", color="k", linewidth=1)
+        ax.text(region.lon_min - 0.05, lat, "%.1fN" % lat, ha="right",
+                va="center")
+
+
+def draw(output_filename,
+         cache,
+         color="darkseagreen",
+         figsize=(6, 5),
+         dpi=100,
+         tight=None):
+    """tightにファイル名を与えた場合は、bbox_inches='tight'でも書き出す"""
+    region = MapRegion("Tokyo_a")
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(region.lon_min, region.lon_max, 100)
+    lats = rng.uniform(region.lat_min, region.lat_max, 100)
+    fig = plt.figure(figsize=figsize)
+    try:
+        ax = map_axes(fig, (0.1, 0.1, 0.8, 0.8),
+                      region,
+                      draw_background,
+                      dict(color=color),
+                      dpi=dpi,
+                      cache=cache)
+        add_markers(ax, lons, lats, "b", 6)
+        ax.set_title("2026/07/01 00:00:00JST")
+        savefig(fig, output_filename, dpi=dpi)
+        if tight is not None:
+            fig.savefig(tight, dpi=dpi, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return np.asarray(Image.open(output_filename))
+
+
+@pytest.fixture
+def rc():
+    with matplotlib.rc_context(RC):
+        yield
+
+
+# 範囲の端がピクセルの境界に近くなる解像度・図の大きさを含める
+@pytest.mark.parametrize("figsize, dpi", [
+    ((6, 5), 100),
+    ((6, 5), 72),
+    ((6.13, 4.77), 97),
+    ((7.3, 5.1), 150),
+    ((5.5, 4.5), 300),
+    ((6.01, 5.03), 133),
+])
+def test_cached_background_matches_direct(tmp_path, rc, figsize, dpi):
+    direct = draw(str(tmp_path / "direct.png"),
+                  cache=False,
+                  figsize=figsize,
+                  dpi=dpi,
+                  tight=str(tmp_path / "tight.png"))
+    # 書き出す大きさはbbox_inches='tight'と同じ
+    assert direct.shape == np.asarray(Image.open(str(tmp_path /
+                                                     "tight.png"))).shape
+    cache = BackgroundCache(str(tmp_path / "bg"))
+    first = draw(str(tmp_path / "first.png"),
+                 cache=cache,
+                 figsize=figsize,
+                 dpi=dpi)
+    assert len(os.listdir(str(tmp_path / "bg"))) == 2
+    # 別のプロセスと同じく、保存した画像から読み込む
+    second = draw(str(tmp_path / "second.png"),
+                  cache=BackgroundCache(str(tmp_path / "bg")),
+                  figsize=figsize,
+                  dpi=dpi)
+    assert direct.shape == first.shape
+    np.testing.assert_array_equal(first, direct)
+    np.testing.assert_array_equal(second, direct)
+
+
+def test_style_change_redraws(tmp_path, rc):
+    cache = BackgroundCache(str(tmp_path / "bg"))
+    a = draw(str(tmp_path / "a.png"), cache=cache)
+    b = draw(str(tmp_path / "b.png"), cache=cache, color="tan")
+    # 背景を描く引数を変えた場合は描き直す
+    assert len(os.listdir(str(tmp_path / "bg"))) == 4
+    assert not np.array_equal(a, b)
+    np.testing.assert_array_equal(
+        b, draw(str(tmp_path / "c.png"), cache=False, color="tan"))
+
+
+def test_key_ignores_unrelated_settings(monkeypatch):
+    region = MapRegion("Tokyo_a")
+    args = (region, draw_background, dict(color="tan"), (6, 5),
+            (0.1, 0.1, 0.8, 0.8), 100)
+    key = background.background_key(*args)
+    # 背景の引数に含まれない設定では変わらない
+    with matplotlib.rc_context({"lines.linewidth": 3.}):
+        assert background.background_key(*args) == key
+    # 引数・描く関数・versionを変えた場合は変わる
+    assert background.background_key(region, draw_background,
+                                      dict(color="k"), *args[3:]) != key
+    assert background.background_key(region, draw, *args[2:]) != key
+    monkeypatch.setattr(background, "version", background.version + 1)
+    assert background.background_key(*args) != key
+
+
+def test_cleanup_removes_old_and_excess_images(tmp_path, rc):
+    cache = BackgroundCache(str(tmp_path / "bg"), max_files=2)
+    for color in ("tan", "darkseagreen", "khaki"):
+        draw(str(tmp_path / "a.png"), cache=cache, color=color)
+        time.sleep(0.01)
+    # 最後に使った時刻が古いものから、max_filesを超えた分を削除する
+    names = sorted(os.listdir(str(tmp_path / "bg")))
+    assert len(names) == 4
+    cache = BackgroundCache(str(tmp_path / "bg"), max_age=3600.)
+    assert cache.cleanup(now=time.time() + 7200.) == 2
+    assert os.listdir(str(tmp_path / "bg")) == []
+    # 削除した画像は描き直す
+    a = draw(str(tmp_path / "a.png"), cache=cache, color="tan")
+    np.testing.assert_array_equal(
+        a, draw(str(tmp_path / "b.png"), cache=False, color="tan"))
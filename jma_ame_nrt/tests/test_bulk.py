@@ -0,0 +1,128 @@
+#
+#  utils/bulk.pyのテスト（プロセス並列の読み込み、読み込めなかったファイル）
+#
+import os
+import json
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from utils import bulk
+from utils.bulk import read_files, read_range, time_range
+
+T0 = pd.Timestamp("2026-07-01 00:00")
+STEP = timedelta(minutes=10)
+TABLE = {
+    "11001": {"lon": [141, 56.0], "lat": [45, 31.2], "enName": "Soya"},
+    "44132": {"lon": [139, 45.0], "lat": [35, 41.4], "enName": "Tokyo"},
+    "62078": {"lon": [135, 31.1], "lat": [34, 40.9], "enName": "Osaka"},
+}
+
+
+def write_csv(input_dir, t, staid, temp, flag=0):
+    """地点毎の気温のcsvを書き出す"""
+    pd.DataFrame({
+        "temp": ["[%.1f, %d]" % (v, flag) for v in temp],
+        "enName": [TABLE[s]["enName"] for s in staid]
+    },
+                 index=staid).to_csv(
+                     os.path.join(input_dir,
+                                  t.strftime("%Y%m%d%H%M%S") + ".csv"))
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    with open(str(tmp_path / "amedastable.json"), 'wt') as fout:
+        json.dump(TABLE, fout)
+    # 時刻によって地点が異なる（2番目の時刻は大阪が無い、3番目は宗谷のみ）
+    times = time_range(T0, T0 + STEP * 5, STEP)
+    for n, t in enumerate(times):
+        if n == 1:
+            write_csv(str(tmp_path), t, ["11001", "44132"], [n, n + 10])
+        elif n == 2:
+            write_csv(str(tmp_path), t, ["11001"], [n], flag=1)
+        elif n != 4:
+            write_csv(str(tmp_path), t, ["11001", "44132", "62078"],
+                      [n, n + 10, n + 20])
+    return str(tmp_path)
+
+
+def test_process_pool_matches_serial(input_dir, monkeypatch):
+    monkeypatch.setattr(bulk, "_CHUNKSIZE", 1)
+    pools = []
+
+    class Executor(bulk.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(bulk, "ProcessPoolExecutor", Executor)
+    serial = read_range(T0, T0 + STEP * 5, STEP, ["temp"],
+                        input_dir=input_dir, max_workers=1)
+    pool = read_range(T0, T0 + STEP * 5, STEP, ["temp"],
+                      input_dir=input_dir, max_workers=3)
+    # max_workers=1の場合のみ並列化しない
+    assert len(pools) == 1
+    for stack in (serial, pool):
+        # 地点は全時刻の和集合（地点番号順）
+        assert list(stack.staid) == ["11001", "44132", "62078"]
+        assert list(stack.enname) == ["Soya", "Tokyo", "Osaka"]
+        assert stack.lon[1] == pytest.approx(139.75)
+        assert stack.times[0] == np.datetime64("2026-07-01T00:00")
+        assert stack.values.shape == (6, 3, 1)
+    np.testing.assert_array_equal(pool.values, serial.values)
+    np.testing.assert_array_equal(pool.valid, serial.valid)
+    temp = pool.get("temp")
+    np.testing.assert_array_equal(temp[0], [0., 10., 20.])
+    # ある時刻に無い地点は欠損値
+    np.testing.assert_array_equal(temp[1, :2], [1., 11.])
+    assert np.isnan(temp[1, 2])
+    # 品質フラグが0以外は欠損値
+    assert np.isnan(temp[2]).all()
+    np.testing.assert_array_equal(temp[5], [5., 15., 25.])
+    # 地点を指定して取り出す
+    d = pool.series(["Osaka", "11001", "99999"])
+    np.testing.assert_array_equal(d[0, :2, 0], [20., 0.])
+    assert np.isnan(d[:, 2]).all()
+
+
+def test_missing_files_are_reported(input_dir, tmp_path, capsys):
+    files = [
+        os.path.join(input_dir,
+                     t.strftime("%Y%m%d%H%M%S") + ".csv")
+        for t in time_range(T0, T0 + STEP * 5, STEP)
+    ]
+    # 壊れたファイル（npzでないもの、途中で切れたnpz）
+    broken = str(tmp_path / "20260701010000.npz")
+    with open(broken, 'wb') as fout:
+        fout.write(b"not a npz")
+    truncated = str(tmp_path / "20260701011000.npz")
+    np.savez(truncated, temp=np.zeros(100))
+    with open(truncated, 'rb') as fin:
+        data = fin.read()
+    with open(truncated, 'wb') as fout:
+        fout.write(data[:len(data) // 2])
+    stack = read_files(files + [broken, truncated], ["temp"], max_workers=2)
+    np.testing.assert_array_equal(
+        stack.valid, [True, True, True, True, False, True, False, False])
+    assert stack.missing == [files[4], broken, truncated]
+    assert np.isnan(stack.values[4]).all()
+    assert np.isnan(stack.values[6:]).all()
+    out = capsys.readouterr().out
+    assert "Warn: cannot read " + files[4] in out
+    assert "Warn: cannot read " + broken in out
+    assert "Warn: cannot read 3 of 8 files" in out
+
+
+def test_missing_report_is_limited(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(bulk, "_NREPORT", 2)
+    files = [str(tmp_path / ("2026070100%02d00.csv" % n)) for n in range(5)]
+    stack = read_files(files, ["temp"], max_workers=2)
+    assert not stack.valid.any()
+    assert len(stack.staid) == 0
+    assert stack.values.shape == (5, 0, 1)
+    assert stack.missing == files
+    lines = capsys.readouterr().out.splitlines()
+    # 個別に表示するのは_NREPORT個まで、件数は最後に表示する
+    assert len(lines) == 3
+    assert lines[-1] == "Warn: cannot read 5 of 5 files"
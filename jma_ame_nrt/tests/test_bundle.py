@@ -0,0 +1,96 @@
+#
+#  utils/bundle.pyのテスト（まとめたファイルの書き出しと読み出し）
+#
+import os
+import json
+import numpy as np
+import pytest
+from utils import bundle, decoder
+
+TABLE = {
+    "11001": {"lon": [141, 56.0], "lat": [45, 31.2], "enName": "Soya"},
+    "44132": {"lon": [139, 45.0], "lat": [35, 41.4], "enName": "Tokyo"},
+}
+NAMES = ["temp", "precipitation10m"]
+
+
+def snapshot(t):
+    return {
+        "11001": {"temp": [t, 0], "precipitation10m": [0.0, 0]},
+        "44132": {"temp": [t + 10., 0], "precipitation10m": [None, 1]},
+    }
+
+
+def write_day(day_dir, times):
+    os.makedirs(day_dir, exist_ok=True)
+    with open(os.path.join(day_dir, "amedastable.json"), 'wt') as fout:
+        json.dump(TABLE, fout)
+    for n, t in enumerate(times):
+        with open(os.path.join(day_dir, t + ".json"), 'wt') as fout:
+            json.dump(snapshot(float(n)), fout)
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / bundle.bundle_name)
+    members = {"a.json": b'{"x": 1}', "b.bin": bytes(range(256)) * 10}
+    bundle.write_bundle(path, members, codec="gzip")
+    b = bundle.DayBundle(path)
+    assert b.codec == "gzip"
+    assert b.names() == ["a.json", "b.bin"]
+    for name, data in members.items():
+        assert b.read(name) == data
+    assert not [f for f in os.listdir(str(tmp_path)) if f.endswith(".tmp")]
+
+
+def test_not_a_bundle(tmp_path):
+    path = str(tmp_path / "x.bundle")
+    with open(path, 'wb') as fout:
+        fout.write(b"0" * 64)
+    with pytest.raises(ValueError):
+        bundle.DayBundle(path)
+
+
+def test_compact_round_trip(tmp_path):
+    day_dir = str(tmp_path / "260701" / "a")
+    times = ["20260701000000", "20260701001000"]
+    write_day(day_dir, times)
+    # まとめる前に読み込んだ値
+    before = [
+        decoder.read(os.path.join(day_dir, t + ".json"), NAMES) for t in times
+    ]
+    assert bundle.compact(day_dir, codec="gzip") == 2
+    assert sorted(os.listdir(day_dir)) == [
+        "amedastable.json", bundle.bundle_name
+    ]
+    b = bundle.open_bundle(day_dir)
+    assert b.times() == times
+    assert list(b.table().staid) == ["11001", "44132"]
+    for t, a in zip(times, before):
+        # 元のファイルが無い場合はまとめたファイルから読み込む
+        c = decoder.read(os.path.join(day_dir, t + ".csv"), NAMES)
+        np.testing.assert_array_equal(c.staid, a.staid)
+        np.testing.assert_array_equal(c.values, a.values)
+        np.testing.assert_array_equal(c.flags, a.flags)
+    c = decoder.read(os.path.join(day_dir, times[1] + ".csv"),
+                     NAMES,
+                     stations=["Tokyo"])
+    np.testing.assert_array_equal(c.staid, ["44132"])
+    assert c.get("temp")[0] == 11.
+
+
+def test_compact_appends(tmp_path):
+    archive_dir = str(tmp_path)
+    day_dir = os.path.join(archive_dir, "260701", "a")
+    write_day(day_dir, ["20260701000000"])
+    assert bundle.compact(day_dir, codec="gzip") == 1
+    # 後から取得した時刻を追加する
+    write_day(day_dir, ["20260701001000"])
+    write_day(os.path.join(archive_dir, "260702", "a"), ["20260702000000"])
+    done = bundle.compact_archive(archive_dir, "2026-07-02", codec="gzip")
+    # 取得中の日付はまとめない
+    assert done == [day_dir]
+    assert bundle.open_bundle(day_dir).times() == [
+        "20260701000000", "20260701001000"
+    ]
+    assert not os.path.exists(
+        os.path.join(archive_dir, "260702", "a", bundle.bundle_name))
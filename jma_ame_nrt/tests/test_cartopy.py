@@ -0,0 +1,237 @@
+#
+#  cartopyを使う作図のテスト（cartopy、shapely、pyshpが無い場合は実行しない）
+#
+#  Natural Earthの代わりに小さいシェープファイルをその場で作り、
+#  cartopy.config["pre_existing_data_dir"]から読ませる（ダウンロードしない）
+#
+import os
+import json
+import importlib
+import numpy as np
+import pytest
+from PIL import Image
+
+ccrs = pytest.importorskip("cartopy.crs")
+shapefile = pytest.importorskip("shapefile")
+pytest.importorskip("shapely")
+
+import cartopy  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+from jmaloc import MapRegion, geometry  # noqa: E402
+from utils import background, pref  # noqa: E402
+from utils.frame import close_frames  # noqa: E402
+from utils.render import render_frames  # noqa: E402
+
+AREA = "Tokyo_a"
+# 陸（3つの県に分ける）と湖
+PREFS = [
+    [(138.0, 35.6), (139.3, 35.6), (139.3, 37.0), (138.0, 37.0)],
+    [(139.3, 35.6), (140.4, 35.9), (140.9, 37.0), (139.3, 37.0)],
+    [(138.0, 35.6), (138.6, 34.6), (139.6, 35.0), (140.4, 35.9),
+     (139.3, 35.6)],
+]
+LAKE = [(139.9, 36.2), (140.2, 36.2), (140.2, 36.4), (139.9, 36.4)]
+LAND = [(138.0, 37.0), (138.0, 35.6), (138.6, 34.6), (139.6, 35.0),
+        (140.4, 35.9), (140.9, 37.0)]
+OCEAN = [(137.0, 33.0), (142.0, 33.0), (142.0, 38.0), (140.9, 37.0),
+         (140.4, 35.9), (139.6, 35.0), (138.6, 34.6), (138.0, 35.6),
+         (137.0, 35.6)]
+STATIONS = {
+    "%05d" % (44000 + n): {
+        "lon": [int(lon), (lon - int(lon)) * 60.],
+        "lat": [int(lat), (lat - int(lat)) * 60.],
+        "enName": "S%d" % n
+    }
+    for n, (lon, lat) in enumerate(
+        zip(np.linspace(138.4, 141.0, 40), np.linspace(34.0, 36.6, 40)[::-1]))
+}
+
+
+def _ring(points):
+    """閉じた時計回りの外周（シェープファイルの向き）"""
+    ring = list(points)
+    area = sum(x0 * y1 - x1 * y0
+               for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))
+    if area > 0:
+        ring = ring[::-1]
+    return ring + ring[:1]
+
+
+def _write_polygons(path, polygons, admin=None):
+    w = shapefile.Writer(path, shapeType=shapefile.POLYGON)
+    w.field("admin", "C", size=20)
+    for n, points in enumerate(polygons):
+        w.poly([_ring(points)])
+        w.record(admin[n] if admin is not None else "")
+    w.close()
+
+
+@pytest.fixture
+def natural_earth(tmp_path, monkeypatch):
+    """Natural Earthの代わりのシェープファイルと、キャッシュの置き場所"""
+    top = tmp_path / "ne"
+    physical = top / "shapefiles" / "natural_earth" / "physical"
+    cultural = top / "shapefiles" / "natural_earth" / "cultural"
+    physical.mkdir(parents=True)
+    cultural.mkdir(parents=True)
+    for res in ("10m", "50m", "110m"):
+        _write_polygons(str(physical / ("ne_%s_land" % res)), [LAND])
+        _write_polygons(str(physical / ("ne_%s_ocean" % res)), [OCEAN])
+        _write_polygons(str(physical / ("ne_%s_lakes" % res)), [LAKE])
+        w = shapefile.Writer(str(physical / ("ne_%s_coastline" % res)),
+                             shapeType=shapefile.POLYLINE)
+        w.field("name", "C")
+        w.line([LAND + LAND[:1]])
+        w.record("coast")
+        w.close()
+    # 日本以外の州は取り出さない
+    _write_polygons(str(cultural / "ne_10m_admin_1_states_provinces"),
+                    PREFS + [[(120., 30.), (121., 30.), (121., 31.)]],
+                    admin=["Japan"] * len(PREFS) + ["China"])
+    monkeypatch.setitem(cartopy.config, "pre_existing_data_dir", str(top))
+    monkeypatch.setitem(cartopy.config, "data_dir", str(tmp_path / "data"))
+    monkeypatch.setattr(background, "_shared",
+                        background.BackgroundCache(str(tmp_path / "bg")))
+    monkeypatch.setattr(pref, "_shared",
+                        pref.PrefStore(str(tmp_path / "pref")))
+    monkeypatch.setattr(geometry, "cache_dir_default",
+                        str(tmp_path / "table"))
+    yield top
+    close_frames()
+
+
+def image(path):
+    return np.asarray(Image.open(path).convert("RGBA")).astype(int)
+
+
+def test_pref_store_matches_add_geometries(natural_earth, tmp_path):
+    import cartopy.io.shapereader as shapereader
+    region = MapRegion(AREA)
+    shp = shapereader.natural_earth(resolution='10m',
+                                    category='cultural',
+                                    name='admin_1_states_provinces')
+
+    def render(func, name):
+        fig = plt.figure(figsize=(6, 6))
+        ax = fig.add_axes((0.1, 0.1, 0.8, 0.8),
+                          projection=ccrs.PlateCarree())
+        ax.set_extent([
+            region.lon_min, region.lon_max, region.lat_min, region.lat_max
+        ])
+        func(ax)
+        path = str(tmp_path / name)
+        fig.savefig(path, dpi=100)
+        plt.close(fig)
+        return image(path)
+
+    def per_province(ax):
+        # 前処理する前の描き方（県毎にadd_geometries）
+        for province in shapereader.Reader(shp).records():
+            if province.attributes['admin'] == 'Japan':
+                ax.add_geometries([province.geometry],
+                                  ccrs.PlateCarree(),
+                                  facecolor='none',
+                                  edgecolor='k',
+                                  linewidth=0.8,
+                                  linestyle='-')
+
+    store = pref.PrefStore(str(tmp_path / "store"))
+    a = render(per_province, "geometries.png")
+    b = render(lambda ax: pref.add_pref(ax, region, store=store), "store.png")
+    assert len(store.paths(region)) == len(PREFS)
+    diff = np.abs(a - b).max(axis=2)
+    # 切り取り・簡略化・float32による差は線の縁の数ピクセルのみ
+    assert diff.max() <= 64
+    assert (diff > 0).mean() < 1e-3
+    # 保存した都道府県境を読み込んでも同じ
+    again = pref.PrefStore(str(tmp_path / "store")).region(region)
+    for x, y in zip(store.region(region), again):
+        np.testing.assert_array_equal(x, y)
+
+
+def write_snapshots(input_dir, times):
+    with open(os.path.join(input_dir, "amedastable.json"), 'wt') as fout:
+        json.dump(STATIONS, fout)
+    for n, t in enumerate(times):
+        rng = np.random.default_rng(n)
+        data = {
+            staid: {
+                "temp": [round(float(rng.uniform(10., 30.)), 1), 0],
+                "wind": [round(float(rng.uniform(0., 12.)), 1), 0],
+                "windDirection": [int(rng.integers(1, 17)), 0],
+                "precipitation3h": [float(rng.integers(0, 200)) * 0.5, 0]
+            }
+            for staid in STATIONS
+        }
+        with open(os.path.join(input_dir, t + ".json"), 'wt') as fout:
+            json.dump(data, fout)
+
+
+TIMES = ["20260701000000", "20260701010000", "20260701020000"]
+
+
+def render_rain3h(module, output_dir, workers=1):
+    os.makedirs(output_dir, exist_ok=True)
+    frames = [(t, ("2026/07/01 %s:00:00JST" % t[8:10], t),
+               dict(area=AREA, opt_markerlabel=True, output_dir=output_dir))
+              for t in TIMES]
+    assert render_frames(module.draw,
+                         frames,
+                         workers=workers,
+                         read_func=module.read_frame) == []
+    return {
+        name: image(os.path.join(output_dir, name))
+        for name in sorted(os.listdir(output_dir))
+    }
+
+
+@pytest.fixture
+def rain3h(natural_earth, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(str(tmp_path), TIMES)
+    return importlib.import_module("cartopy_jma_rain3h")
+
+
+def test_rain3h_cached_and_reused_figures_match(rain3h, tmp_path,
+                                                monkeypatch):
+    # 毎回背景を描き、図を作り直す（前処理・キャッシュ前と同じ手順）
+    monkeypatch.setattr(rain3h, "opt_bgcache", False)
+    monkeypatch.setattr(rain3h, "opt_persist", False)
+    direct = render_rain3h(rain3h, str(tmp_path / "direct"))
+    assert len(direct) == len(TIMES)
+    monkeypatch.setattr(rain3h, "opt_bgcache", True)
+    monkeypatch.setattr(rain3h, "opt_persist", True)
+    cached = render_rain3h(rain3h, str(tmp_path / "cached"))
+    assert sorted(cached) == sorted(direct)
+    for name in direct:
+        diff = np.abs(cached[name] - direct[name]).max(axis=2)
+        # 切り取った図はキャンバスが小さく、図の外に出る海岸線をAggが
+        # 切り取る位置が変わるため、その線の縁が1ずれることがある
+        assert diff.max() <= 1, name
+        assert (diff > 0).mean() < 1e-3, name
+
+
+def test_rain3h_workers_match_serial(rain3h, tmp_path):
+    serial = render_rain3h(rain3h, str(tmp_path / "serial"))
+    parallel = render_rain3h(rain3h, str(tmp_path / "parallel"), workers=2)
+    assert sorted(parallel) == sorted(serial)
+    for name in serial:
+        np.testing.assert_array_equal(parallel[name], serial[name])
+
+
+def test_rain3h_frame_without_data_fails_cleanly(rain3h, tmp_path, capsys):
+    output_dir = str(tmp_path / "out")
+    os.makedirs(output_dir)
+    frames = [("notime", ("2026/07/01 00:00:00JST", ),
+               dict(area=AREA, output_dir=output_dir)),
+              ("20260702000000", ("2026/07/02 00:00:00JST", "20260702000000"),
+               dict(area=AREA, output_dir=output_dir)),
+              (TIMES[0], ("2026/07/01 00:00:00JST", TIMES[0]),
+               dict(area=AREA, output_dir=output_dir))]
+    failed = render_frames(rain3h.draw, frames, read_func=rain3h.read_frame)
+    # 時刻が無い、データが無い時刻はその時刻のみ失敗とし、残りは描く
+    assert failed == ["notime", "20260702000000"]
+    assert os.listdir(output_dir) == [AREA + "_rain3h_" + TIMES[0] + ".png"]
+    out = capsys.readouterr().out
+    assert "tinfof is required" in out
+    assert "Traceback" not in out
@@ -0,0 +1,48 @@
+#
+#  utils/cbar.pyのテスト（まとめて変換した色が1つずつ変換した色と同じか）
+#
+import numpy as np
+import pytest
+from matplotlib.colors import to_rgba
+from utils import val2col, collevs
+
+# cartopy_jma_rain3h.pyと同じ設定
+CLEVS = [0.5, 10., 20., 50., 80., 100., 120., 150., 2000.]
+CCOLS = [
+    "lavender", "paleturquoise", "dodgerblue", "b", "gold", "darkorange", "r",
+    "firebrick"
+]
+
+
+def rain_values(dtype):
+    """境の値とその前後、0.5 mm毎の値（アメダスと同じ刻み）"""
+    d = np.concatenate([
+        np.arange(0., 300., 0.5),
+        np.array(CLEVS[:-1]) - 0.1,
+        np.array(CLEVS[:-1]) + 0.1,
+        [0.1, 1999.5],
+    ])
+    return d.astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_collevs_conv_array_matches_conv(dtype):
+    t2c = collevs(clevs=CLEVS, ccols=CCOLS)
+    vals = rain_values(dtype)
+    expect = np.array([to_rgba(t2c.conv(v)) for v in vals])
+    np.testing.assert_array_equal(t2c.conv_array(vals), expect)
+
+
+def test_collevs_conv_array_above_top():
+    t2c = collevs(clevs=CLEVS, ccols=CCOLS)
+    # 上限以上は最後の色
+    np.testing.assert_array_equal(t2c.conv_array([2000., 3000.]),
+                                  [to_rgba(CCOLS[-1])] * 2)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_val2col_conv_array_matches_conv(dtype):
+    t2c = val2col(cmap='jet', tmin=-10., tmax=35., tstep=5.)
+    vals = np.arange(-20., 45., 0.1).astype(dtype)
+    expect = np.array([t2c.conv(v) for v in vals])
+    np.testing.assert_array_equal(t2c.conv_array(vals), expect)
@@ -0,0 +1,86 @@
+#
+#  utils/cube.pyのテスト
+#
+import os
+import numpy as np
+from utils import decoder
+from utils.cube import AmedasCube
+
+NAMES = ["temp", "precipitation10m"]
+
+
+def snapshot(temps):
+    """地点番号と気温の辞書から1時刻分のデータを作る"""
+    data = {
+        staid: {
+            "temp": [t, 0],
+            "precipitation10m": [0.5, 0]
+        }
+        for staid, t in temps.items()
+    }
+    return decoder.from_json(data, NAMES)
+
+
+def test_append_and_read(tmp_path):
+    cube = AmedasCube(str(tmp_path / "cube"), names=NAMES)
+    # 新しい時刻から順に追加する（backfillと同じ順）
+    assert cube.append("2026-01-01 00:20", snapshot({"2": 3., "1": 1.})) == 0
+    cube.append("2026-01-01 00:10", snapshot({"1": 2., "2": 4.}))
+    cube.append("2026-01-01 00:00", snapshot({"1": 5.}))
+    times, d = cube.get("temp")
+    np.testing.assert_array_equal(
+        times.astype("datetime64[m]").astype(str),
+        ["2026-01-01T00:00", "2026-01-01T00:10", "2026-01-01T00:20"])
+    np.testing.assert_array_equal(cube.staid, ["1", "2"])
+    np.testing.assert_array_equal(d, [[5., np.nan], [2., 4.], [1., 3.]])
+
+
+def test_append_overwrites_existing_time(tmp_path):
+    cube = AmedasCube(str(tmp_path / "cube"), names=NAMES)
+    cube.append("2026-01-01 00:10", snapshot({"1": 1.}))
+    cube.append("2026-01-01 00:00", snapshot({"1": 2.}))
+    cube.append("2026-01-01 00:10", snapshot({"1": 3.}))
+    times, d = cube.get("temp")
+    assert len(times) == 2
+    np.testing.assert_array_equal(d[:, 0], [2., 3.])
+
+
+def test_new_station_grows_axis(tmp_path):
+    cube_dir = str(tmp_path / "cube")
+    cube = AmedasCube(cube_dir, names=NAMES)
+    cube.append("2026-01-01 00:00", snapshot({"1": 1., "3": 3.}))
+    assert cube.append("2026-01-01 00:10",
+                       snapshot({"2": 2., "1": 4., "3": 6.})) == 1
+    np.testing.assert_array_equal(cube.staid, ["1", "2", "3"])
+    # 別に開いても同じ配列を読む
+    times, d = AmedasCube(cube_dir).get("temp")
+    np.testing.assert_array_equal(d, [[1., np.nan, 3.], [4., 2., 6.]])
+    assert sorted(os.listdir(cube_dir)) == [
+        "lock", "meta.json", "stations_3.npz", "times.i8", "values_3.f32"
+    ]
+
+
+def test_other_writer_is_seen(tmp_path):
+    # cronと常駐プログラムが同じ配列に追加する場合
+    cube_dir = str(tmp_path / "cube")
+    a = AmedasCube(cube_dir, names=NAMES)
+    a.append("2026-01-01 00:00", snapshot({"1": 1.}))
+    b = AmedasCube(cube_dir)
+    b.append("2026-01-01 00:10", snapshot({"1": 2., "2": 5.}))
+    # bが追加した地点と時刻を読み込み直し、同じ時刻は上書きする
+    assert a.append("2026-01-01 00:10", snapshot({"1": 3.})) == 0
+    times, d = a.get("temp")
+    assert len(times) == 2
+    np.testing.assert_array_equal(d, [[1., np.nan], [3., np.nan]])
+
+
+def test_series(tmp_path):
+    cube = AmedasCube(str(tmp_path / "cube"), names=NAMES)
+    for n in range(6):
+        cube.append("2026-01-01 00:%02d" % (n * 10),
+                    snapshot({"1": float(n), "2": 10. + n}))
+    times, d = cube.series(["2", "9"], ["temp"],
+                           time_sta="2026-01-01 00:10",
+                           time_step="20min")
+    np.testing.assert_array_equal(d[:, 0, 0], [11., 13., 15.])
+    assert np.isnan(d[:, 1, 0]).all()
@@ -0,0 +1,194 @@
+#
+#  常駐して取得する場合（get_jma_json_daemon.pyと同じくbackfillを繰り返す）に、
+#  接続・ファイルを開いたままにしないことのテスト
+#
+import os
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+from jmaloc import geometry
+from utils import fetch, meta
+from utils.cube import AmedasCube
+from utils.manifest import FetchManifest
+import get_jma_json_auto as auto
+
+TABLE = {
+    "11001": {"lon": [141, 56.0], "lat": [45, 31.2], "enName": "Soya"},
+    "44132": {"lon": [139, 45.0], "lat": [35, 41.4], "enName": "Tokyo"},
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """地点情報と、どの時刻にも同じ値のアメダスデータを返す"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.endswith("/const/amedastable.json"):
+            body = json.dumps(TABLE).encode()
+        elif "/data/map/" in self.path:
+            body = json.dumps({
+                staid: {"temp": [20.5, 0], "precipitation10m": [0.0, 0]}
+                for staid in TABLE
+            }).encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    """テスト用のサーバーから取得する（メタデータと地点情報のキャッシュも
+    一時ディレクトリに置く）"""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(fetch, "standin",
+                        "http://127.0.0.1:%d" % httpd.server_address[1])
+    monkeypatch.setattr(meta, "_shared",
+                        meta.MetadataCache(str(tmp_path / "meta")))
+    monkeypatch.setattr(geometry, "cache_dir_default",
+                        str(tmp_path / "table"))
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_fetcher(tmp_path):
+    return fetch.Fetcher(max_workers=4,
+                         rate=None,
+                         retries=0,
+                         cache_dir=str(tmp_path / "http"),
+                         metrics=fetch.FetchMetrics())
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"),
+                    reason="needs /proc/self/fd")
+def test_repeated_polls_keep_fds_flat(tmp_path, standin):
+    output_dir = str(tmp_path / "out")
+    fetcher = make_fetcher(tmp_path)
+    cube = AmedasCube(os.path.join(output_dir, "cube"))
+    step = timedelta(minutes=10)
+    time_new = pd.Timestamp("2026-07-01 00:00")
+    try:
+        fds = []
+        for n in range(40):
+            # 新しい時刻と、その前の2時刻を取得する
+            time_new = time_new + step
+            failed = auto.backfill(output_dir, time_new - step * 2, time_new,
+                                   step, fetcher, cube=cube)
+            assert failed == []
+            fds.append(open_fds())
+        # 接続とファイルの数は最初の数回から増えない
+        assert max(fds[5:]) <= fds[4]
+        assert fetcher.pool.idle() <= 4
+        assert len(cube.times()) == 42
+    finally:
+        fetcher.close()
+
+
+def test_station_uses_shared_fetcher(monkeypatch):
+    shared = fetch.Fetcher(rate=None, metrics=fetch.FetchMetrics())
+    monkeypatch.setattr(fetch, "_shared", shared)
+    amedas = auto.AmedasStation("2026-07-01T00:00:00+09:00")
+    assert amedas.fetcher is shared
+    assert amedas.latest_time == "20260701000000"
+
+
+def test_backfill_records_store_errors_and_continues(tmp_path, standin,
+                                                     monkeypatch):
+    output_dir = str(tmp_path / "out")
+    fetcher = make_fetcher(tmp_path)
+    manifest = FetchManifest(str(tmp_path / "manifest.sqlite"))
+    store = auto.AmedasStation.store
+    errors = {
+        "20260701001000": OSError("No space left on device"),
+        "20260701002000": KeyError("44132"),
+    }
+
+    def failing_store(self, data):
+        if self.latest_time in errors:
+            raise errors[self.latest_time]
+        return store(self, data)
+
+    monkeypatch.setattr(auto.AmedasStation, "store", failing_store)
+    stored = []
+    try:
+        failed = auto.backfill(output_dir,
+                               pd.Timestamp("2026-07-01 00:00"),
+                               pd.Timestamp("2026-07-01 00:30"),
+                               timedelta(minutes=10),
+                               fetcher,
+                               manifest=manifest,
+                               on_store=lambda t, a, d: stored.append(t))
+    finally:
+        fetcher.close()
+    # 保存できなかった時刻は失敗として記録し、残りの時刻は保存する
+    assert sorted(failed) == sorted(errors)
+    assert [t.strftime("%H%M") for t in stored] == ["0030", "0000"]
+    for slot, error in errors.items():
+        rec = manifest.get(slot)
+        assert rec["status"] == "failed"
+        assert rec["error"] == str(error)
+    assert manifest.summary() == dict(ok=2, failed=2)
+    manifest.close()
+
+
+def test_poll_loop_survives_errors(monkeypatch, capsys):
+    import get_jma_json_daemon as daemon
+    t0 = pd.Timestamp("2026-07-01 00:00")
+    results = [ValueError("malformed latest_time.txt"), t0,
+               RuntimeError("unexpected"), t0 + timedelta(minutes=10)]
+
+    def latest_time(fetcher, force=False):
+        r = results.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    calls = []
+
+    def backfill(output_dir, time_sta, time_end, time_step, fetcher,
+                 **kwargs):
+        calls.append((time_sta, time_end))
+        kwargs["on_store"](time_end, None, None)
+        return []
+
+    hooked = []
+
+    def broken_hook(time_now, amedas, amedas_data):
+        raise KeyError("temp")
+
+    monkeypatch.setattr(daemon, "latest_time", latest_time)
+    monkeypatch.setattr(daemon.auto, "backfill", backfill)
+    monkeypatch.setattr(daemon.auto, "opt_bundle", False)
+    monkeypatch.setattr(daemon, "poll_interval", 0.)
+    monkeypatch.setattr(daemon, "export_metrics", lambda program: None)
+    monkeypatch.setattr(daemon, "hooks", [])
+    daemon.register_hook(broken_hook)
+    daemon.register_hook(lambda t, a, d: hooked.append(t))
+    daemon.run(None, None, None, max_polls=4)
+    # 例外の後も確認を続け、起動時の取得と新しい時刻の取得を行う
+    assert results == []
+    assert calls == [(t0 - daemon.catchup_window, t0),
+                     (t0 + timedelta(minutes=10), t0 + timedelta(minutes=10))]
+    # 失敗する関数があっても、残りの関数を呼び出す
+    assert hooked == [t0, t0 + timedelta(minutes=10)]
+    out = capsys.readouterr().out
+    assert "Error: poll failed ValueError" in out
+    assert "Error: poll failed RuntimeError" in out
+    assert "Warn: hook failed broken_hook" in out
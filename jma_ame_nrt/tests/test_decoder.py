@@ -0,0 +1,96 @@
+#
+#  utils/decoder.pyのテスト
+#
+import numpy as np
+import pandas as pd
+from utils import decoder
+
+# 2地点分のアメダスデータ（JSON）
+DATA = {
+    "44132": {
+        "temp": [21.3, 0],
+        "wind": [3.2, 0],
+        "windDirection": [4, 0],
+        "precipitation10m": [0.5, 0],
+        "gustTime": {"hour": 14, "minute": 20},
+    },
+    "11016": {
+        "temp": [None, 1],
+        "wind": [1.0, 0],
+        "windDirection": [0, 0],
+    },
+}
+
+
+def test_decode_pairs():
+    cells = np.array(["[1.5, 0]", "[None, 1]", None, np.nan, "[-2, 5]"],
+                     dtype=object)
+    d = decoder.decode_pairs(cells)
+    assert d.shape == (5, 2)
+    np.testing.assert_array_equal(d[[0, 4]], [[1.5, 0.], [-2., 5.]])
+    assert np.isnan(d[1, 0]) and d[1, 1] == 1.
+    assert np.isnan(d[2:4, 0]).all()
+    np.testing.assert_array_equal(d[2:4, 1], [-1., -1.])
+
+
+def test_decode_pairs_keeps_shape():
+    cells = np.array([["[1, 0]", "[2, 0]"], ["[3, 0]", "[4, 8]"]],
+                     dtype=object)
+    d = decoder.decode_pairs(cells)
+    assert d.shape == (2, 2, 2)
+    np.testing.assert_array_equal(d[..., 0], [[1, 2], [3, 4]])
+    np.testing.assert_array_equal(d[..., 1], [[0, 0], [0, 8]])
+
+
+def test_decode_pairs_malformed_cells_are_not_shifted():
+    # 1つ少ないセルと1つ多いセル（合計の数は合っている）
+    cells = np.array(["[1.0]", "[2.0, 0, 5]", "[3.5, 0]"], dtype=object)
+    d = decoder.decode_pairs(cells)
+    assert np.isnan(d[0, 0]) and d[0, 1] == -1.
+    np.testing.assert_array_equal(d[1:], [[2., 0.], [3.5, 0.]])
+
+
+def test_from_json_matches_csv(tmp_path):
+    # 取得プログラムと同じく、DataFrameをcsvに書き出して読み込む
+    names = ["temp", "wind", "windDirection", "precipitation10m", "gustTime"]
+    path = str(tmp_path / "20260101000000.csv")
+    pd.DataFrame(DATA).T.to_csv(path)
+    df = pd.read_csv(path, index_col=0, dtype=str)
+    a = decoder.from_json(DATA, names)
+    b = decoder.from_dataframe(df, names)
+    np.testing.assert_array_equal(a.staid, b.staid)
+    np.testing.assert_array_equal(a.values, b.values)
+    np.testing.assert_array_equal(a.flags, b.flags)
+    assert a.get("gustTime")[0] == 14 * 60 + 20
+
+
+def test_get_applies_quality_flags():
+    a = decoder.from_json(DATA, ["temp", "precipitation10m"])
+    t = a.get("temp")
+    assert t[0] == np.float32(21.3)
+    assert np.isnan(t[1])
+    assert np.isnan(a.get("temp", qc=False)[1])
+    assert np.isnan(a.get("precipitation10m")[1])
+    assert np.isnan(a.get("snow")).all()
+
+
+def test_wind():
+    a = decoder.from_json(DATA, ["wind", "windDirection"])
+    u, v = a.wind()
+    # 東（4）から吹く風は西向き
+    np.testing.assert_allclose([u[0], v[0]], [-3.2, 0.], atol=1e-5)
+
+
+def test_npz_round_trip(tmp_path):
+    a = decoder.from_json(DATA)
+    path = str(tmp_path / "20260101000000.npz")
+    a.to_npz(path)
+    b = decoder.read_npz(path)
+    np.testing.assert_array_equal(a.staid, b.staid)
+    assert a.names == b.names
+    np.testing.assert_array_equal(a.values, b.values)
+    np.testing.assert_array_equal(a.flags, b.flags)
+    c = decoder.read_npz(path, ["wind", "snow"])
+    assert c.names == ["wind", "snow"]
+    np.testing.assert_array_equal(c.get("wind"), a.get("wind"))
+    np.testing.assert_array_equal(c.flag("snow"), [-1, -1])
@@ -0,0 +1,85 @@
+#
+#  utils/fetch.pyのテスト（接続の使い回しと後始末）
+#
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.fetch import FetchMetrics, Fetcher
+
+
+class Handler(BaseHTTPRequestHandler):
+    """パスを返すkeep-aliveのサーバー（/closeは応答後に接続を閉じる）"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.clients = set()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_fetcher(max_workers=4):
+    return Fetcher(max_workers=max_workers,
+                   rate=None,
+                   retries=0,
+                   metrics=FetchMetrics())
+
+
+def urls(server, n=8):
+    top = "http://127.0.0.1:%d/" % server.server_address[1]
+    return [top + str(i) for i in range(n)]
+
+
+def test_fetch_all_reuses_connections(server):
+    fetcher = make_fetcher(max_workers=4)
+    for _ in range(10):
+        res = list(fetcher.fetch_all(urls(server)))
+        assert [body for _, body in res] == [
+            ("/" + str(i)).encode() for i in range(8)
+        ]
+    # fetch_all毎にスレッドが変わっても、同時接続数を超えて接続しない
+    assert len(server.clients) <= 4
+    assert 1 <= fetcher.pool.idle() <= 4
+    fetcher.close()
+    assert fetcher.pool.idle() == 0
+
+
+def test_pool_is_bounded(server):
+    fetcher = make_fetcher(max_workers=2)
+    key = ("http", "127.0.0.1:%d" % server.server_address[1])
+    # 保持する数を超えた接続は閉じる
+    conns = [fetcher.pool._checkout(key) for _ in range(5)]
+    for conn in conns:
+        fetcher.pool._checkin(key, conn)
+    assert fetcher.pool.idle() == 2
+    assert all(conn.sock is None for conn in conns[2:])
+    fetcher.close()
+
+
+def test_server_closed_connection_is_not_kept(server):
+    fetcher = make_fetcher(max_workers=1)
+    top = "http://127.0.0.1:%d/" % server.server_address[1]
+    assert fetcher.get(top + "close") == b"/close"
+    assert fetcher.pool.idle() == 0
+    assert fetcher.get(top + "a") == b"/a"
+    assert fetcher.pool.idle() == 1
+    fetcher.close()
@@ -0,0 +1,85 @@
+#
+#  utils/frame.pyのテスト（使い回した図と、時刻毎に作り直した図が同じ画像か）
+#
+import numpy as np
+import matplotlib
+import pytest
+from PIL import Image
+from jmaloc import MapRegion
+from utils import collevs
+from utils.background import BackgroundCache, map_axes, savefig
+from utils.frame import close_frames, frame_figure
+
+CLEVS = [0.5, 10., 20., 50., 80., 100., 120., 150., 2000.]
+CCOLS = [
+    "lavender", "paleturquoise", "dodgerblue", "b", "gold", "darkorange", "r",
+    "firebrick"
+]
+
+
+def draw_background(ax, region):
+    for lat in np.arange(region.lat_min, region.lat_max, region.lat_step):
+        ax.axhline(lat, linestyle=":", color="k", linewidth=1)
+
+
+def snapshot(n):
+    """時刻毎に地点数と値が変わるデータ"""
+    rng = np.random.default_rng(n)
+    nsta = 80 + 10 * n
+    region = MapRegion("Tokyo_a")
+    lons = rng.uniform(region.lon_min, region.lon_max, nsta)
+    lats = rng.uniform(region.lat_min, region.lat_max, nsta)
+    d = (rng.integers(1, 300, nsta) * 0.5).astype(np.float32)
+    u = rng.normal(0., 8., nsta)
+    v = rng.normal(0., 8., nsta)
+    return lons, lats, d, u, v
+
+
+def draw(n, output_filename, cache, persist):
+    """作図プログラムのdrawと同じ手順で描く"""
+    lons, lats, d, u, v = snapshot(n)
+    region = MapRegion("Tokyo_a")
+    frame = frame_figure(dict(name="test", area=region.sta),
+                         figsize=(6, 5),
+                         persist=persist)
+    if frame.new:
+        frame.ax = map_axes(frame.fig, (0.1, 0.2, 0.8, 0.7),
+                            region,
+                            draw_background,
+                            dpi=100,
+                            cache=cache)
+    ax = frame.ax
+    t2c = collevs(clevs=CLEVS, ccols=CCOLS)
+    frame.markers("markers", ax, lons, lats, t2c.conv_array(d), 6)
+    frame.labels("labels", ax, lons, lats, [str(dc) for dc in d],
+                 t2c.conv_array(d), fontsize=8)
+    # 矢羽は2時刻毎に同じ地点（set_UVCで置き換える場合と描き直す場合）
+    m = slice(0, 40 + 10 * (n // 2 * 2))
+    frame.barbs("barbs", ax, lons[m], lats[m], u[m], v[m], length=5)
+    frame.title(ax, "time %d" % n, size=12)
+    if frame.new:
+        t2c.colorbar(frame.fig, anchor=(0.3, 0.1), size=(0.4, 0.02))
+    savefig(frame.fig, output_filename, dpi=100)
+    frame.done()
+    return np.asarray(Image.open(output_filename))
+
+
+@pytest.fixture
+def rc():
+    with matplotlib.rc_context({
+            "xtick.bottom": False,
+            "xtick.labelbottom": False,
+            "ytick.left": False,
+            "ytick.labelleft": False,
+    }):
+        yield
+    close_frames()
+
+
+def test_persistent_frame_matches_fresh(tmp_path, rc):
+    cache = BackgroundCache(str(tmp_path / "bg"))
+    for n in range(4):
+        fresh = draw(n, str(tmp_path / ("fresh%d.png" % n)), cache, False)
+        # 2時刻目以降は前の図のデータだけを置き換える
+        reused = draw(n, str(tmp_path / ("reused%d.png" % n)), cache, True)
+        np.testing.assert_array_equal(reused, fresh)
@@ -0,0 +1,98 @@
+#
+#  jmaloc/geometry.pyのテスト（地点情報のキャッシュの作り直し、地点の変更の表示）
+#
+import os
+import json
+import numpy as np
+import pytest
+from jmaloc import geometry
+
+TABLE = {
+    "44132": {"lon": [139, 45.0], "lat": [35, 41.4], "enName": "Tokyo"},
+    "11001": {"lon": [141, 56.0], "lat": [45, 31.2], "enName": "Soya"},
+    "62078": {"lon": [135, 31.1], "lat": [34, 40.9], "enName": "Osaka"},
+}
+
+
+def write_table(path, table):
+    with open(path, 'wt') as fout:
+        json.dump(table, fout)
+
+
+def cache_files(cache_dir):
+    return sorted(f for f in os.listdir(cache_dir) if f.endswith(".npz"))
+
+
+def test_index_and_lonlat():
+    table = geometry.parse_table(TABLE)
+    # 地点番号順に並べる
+    assert list(table.staid) == ["11001", "44132", "62078"]
+    np.testing.assert_array_equal(table.index(["62078", "99999", "11001"]),
+                                  [2, -1, 0])
+    lon, lat = table.lonlat(["44132", "99999"])
+    assert lon[0] == pytest.approx(139.75)
+    assert lat[0] == pytest.approx(35.69)
+    assert np.isnan(lon[1]) and np.isnan(lat[1])
+
+
+def test_cache_is_rebuilt_when_table_changes(tmp_path, monkeypatch, capsys):
+    cache_dir = str(tmp_path / "cache")
+    table_file = str(tmp_path / "amedastable.json")
+    write_table(table_file, TABLE)
+    first = geometry.load_table(table_file, cache_dir=cache_dir)
+    assert len(cache_files(cache_dir)) == 1
+    assert "new version" in capsys.readouterr().out
+    # 同じファイルは読み込み済みのものを返す
+    assert geometry.load_table(table_file, cache_dir=cache_dir) is first
+    # 内容が変わった場合は別のハッシュ値でキャッシュを作る
+    table = dict(TABLE)
+    table["44136"] = {"lon": [139, 29.0], "lat": [35, 34.5], "enName": "Fuchu"}
+    write_table(table_file, table)
+    second = geometry.load_table(table_file, cache_dir=cache_dir)
+    assert second.version != first.version
+    assert "44136" in second.staid
+    assert len(cache_files(cache_dir)) == 2
+    with open(os.path.join(cache_dir, geometry._LATEST), 'rt') as fin:
+        assert fin.read() == second.version
+    # 同じ内容の別のファイルはキャッシュから読み込む（JSONを変換しない）
+    geometry._memo.clear()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(geometry, "parse_table", fail)
+    other = str(tmp_path / "copy.json")
+    write_table(other, TABLE)
+    third = geometry.load_table(other, cache_dir=cache_dir)
+    assert third.version == first.version
+    np.testing.assert_array_equal(third.staid, first.staid)
+    np.testing.assert_array_equal(third.lon, first.lon)
+
+
+def test_report_added_and_removed(tmp_path, capsys):
+    cache_dir = str(tmp_path / "cache")
+    table_file = str(tmp_path / "amedastable.json")
+    write_table(table_file, TABLE)
+    old = geometry.load_table(table_file, cache_dir=cache_dir)
+    capsys.readouterr()
+    table = dict(TABLE)
+    del table["11001"]
+    table["44136"] = {"lon": [139, 29.0], "lat": [35, 34.5], "enName": "Fuchu"}
+    table["44116"] = {"lon": [139, 35.0], "lat": [35, 35.0], "enName": "X"}
+    write_table(table_file, table)
+    new = geometry.load_table(table_file, cache_dir=cache_dir)
+    out = capsys.readouterr().out.splitlines()
+    assert out == [
+        "amedastable: version " + old.version + " -> " + new.version,
+        "  added stations: 44116, 44136",
+        "  removed stations: 11001",
+    ]
+    added, removed = new.diff(old)
+    assert list(added) == ["44116", "44136"]
+    assert list(removed) == ["11001"]
+    # 変更が無い地点は「none」
+    del table["44116"]
+    write_table(table_file, table)
+    geometry.load_table(table_file, cache_dir=cache_dir)
+    out = capsys.readouterr().out.splitlines()
+    assert out[1:] == ["  added stations: none", "  removed stations: 44116"]
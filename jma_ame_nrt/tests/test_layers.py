@@ -0,0 +1,125 @@
+#
+#  utils/layers.pyのテスト（地点毎にax.plot、ax.textで描いた図と同じ画像か）
+#
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+from utils import collevs
+from utils.layers import add_labels, add_markers
+
+CLEVS = [0.5, 10., 20., 50., 80., 100., 120., 150., 2000.]
+CCOLS = [
+    "lavender", "paleturquoise", "dodgerblue", "b", "gold", "darkorange", "r",
+    "firebrick"
+]
+
+
+def stations(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    lons = rng.uniform(138.2, 141.2, n).astype(np.float32)
+    lats = rng.uniform(33.8, 36.8, n).astype(np.float32)
+    d = (rng.integers(1, 400, n) * 0.5).astype(np.float32)
+    return lons, lats, d
+
+
+def render(func, dpi=100):
+    fig = Figure(figsize=(6, 5), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((0.1, 0.1, 0.8, 0.8))
+    ax.set_xlim(138.2, 141.2)
+    ax.set_ylim(33.8, 36.8)
+    func(ax)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+def assert_same(a, b, atol=0):
+    diff = np.abs(a.astype(int) - b).max(axis=2)
+    assert diff.max() <= atol
+    # 重なったマーカーの縁はAggの丸め方の違いで1ずれることがある
+    assert (diff > 0).sum() <= 10
+
+
+@pytest.mark.parametrize("ms", [1, 6, 10])
+def test_markers_match_plot(ms):
+    lons, lats, d = stations()
+    t2c = collevs(clevs=CLEVS, ccols=CCOLS)
+
+    def per_station(ax):
+        for xc, yc, dc in zip(lons, lats, d):
+            ax.plot(xc, yc, marker='o', color=t2c.conv(dc), markersize=ms)
+
+    def batched(ax):
+        add_markers(ax, lons, lats, t2c.conv_array(d), ms)
+
+    assert_same(render(batched), render(per_station), atol=1)
+
+
+def test_single_color_markers_match_plot():
+    lons, lats, _ = stations(seed=1)
+
+    def per_station(ax):
+        for xc, yc in zip(lons, lats):
+            ax.plot(xc, yc, marker='o', color='k', markersize=4)
+
+    def batched(ax):
+        add_markers(ax, lons, lats, 'k', 4)
+
+    assert_same(render(batched), render(per_station), atol=1)
+
+
+def test_labels_match_text():
+    lons, lats, d = stations(n=50, seed=2)
+    t2c = collevs(clevs=CLEVS, ccols=CCOLS)
+
+    def per_station(ax):
+        # 文字列はマーカーと枠の上に描く
+        for xc, yc, dc in zip(lons, lats, d):
+            ax.text(xc + 0.03, yc - 0.02, str(dc), color=t2c.conv(dc),
+                    fontsize=8)
+            ax.plot(xc, yc, marker='o', color='k', markersize=6)
+
+    def batched(ax):
+        add_labels(ax, lons, lats, [str(dc) for dc in d], t2c.conv_array(d),
+                   fontsize=8)
+        add_markers(ax, lons, lats, 'k', 6)
+
+    np.testing.assert_array_equal(render(batched), render(per_station))
+
+
+def test_label_extent_matches_text():
+    lons, lats, d = stations(n=300, seed=3)
+    fig = Figure(figsize=(6, 5), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((0.1, 0.1, 0.8, 0.8))
+    ax.set_xlim(138.2, 141.2)
+    ax.set_ylim(33.8, 36.8)
+    # 同じ文字列が複数の地点にある（範囲は1回だけ求める）
+    texts = [str(dc) for dc in np.round(d / 10.) * 10.]
+    layer = add_labels(ax, lons, lats, texts, ['k'] * len(texts), fontsize=8)
+    renderer = canvas.get_renderer()
+    per_label = [
+        ax.text(xc + 0.03, yc - 0.02, text,
+                fontsize=8).get_window_extent(renderer)
+        for xc, yc, text in zip(lons, lats, texts)
+    ]
+    np.testing.assert_allclose(
+        layer.get_window_extent(renderer).extents,
+        Bbox.union(per_label).extents)
+
+
+def test_marker_draw_keeps_offsets():
+    lons, lats, d = stations(n=20)
+    t2c = collevs(clevs=CLEVS, ccols=CCOLS)
+    layers = []
+
+    def batched(ax):
+        layers.append(add_markers(ax, lons, lats, t2c.conv_array(d), 6))
+
+    render(batched)
+    # 描く時にピクセルに合わせた位置は、レイヤーの位置を置き換えない
+    np.testing.assert_array_equal(layers[0].get_offsets(),
+                                  np.column_stack([lons, lats]))
+    assert layers[0].get_offset_transform() is layers[0].axes.transData
@@ -0,0 +1,98 @@
+#
+#  utils/manifest.pyのテスト（再取得の待ち時間、ファイルの確認、集計）
+#
+import pytest
+from utils import manifest
+
+NOW = 1.8e9
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest.time, "time", lambda: NOW)
+    # 乱数を掛けない待ち時間で確認する
+    monkeypatch.setattr(manifest.random, "uniform", lambda a, b: 1.0)
+    m = manifest.FetchManifest(str(tmp_path / "manifest.sqlite"))
+    yield m
+    m.close()
+
+
+def test_backoff_doubles_up_to_one_day(db):
+    waits = []
+    for _ in range(12):
+        db.record_failure("20260701000000", "a.json", "timed out")
+        rec = db.get("20260701000000")
+        waits.append(rec["next_attempt"] - rec["last_attempt"])
+    assert waits[:8] == [600. * 2**n for n in range(8)]
+    # 1日で頭打ち
+    assert max(waits) == 86400.
+    assert waits[8:] == [86400.] * 4
+    assert rec["attempts"] == 12
+    assert rec["status"] == "failed"
+    assert rec["error"] == "timed out"
+
+
+def test_backoff_jitter_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest.time, "time", lambda: NOW)
+    m = manifest.FetchManifest(str(tmp_path / "manifest.sqlite"))
+    for n in range(20):
+        m.record_failure("slot%d" % n, "a.json", "error")
+        wait = m.get("slot%d" % n)["next_attempt"] - NOW
+        assert 600. * manifest.jitter[0] <= wait <= 600. * manifest.jitter[1]
+    m.close()
+
+
+def test_due(db):
+    slot = "20260701000000"
+    # 記録が無い時刻は取得する
+    assert db.due(slot)
+    db.record_failure(slot, "a.json", "error")
+    assert not db.due(slot, now=NOW)
+    assert not db.due(slot, now=NOW + 599.)
+    assert db.due(slot, now=NOW + 600.)
+    # nowを省略した場合は現在時刻
+    assert not db.due(slot)
+    # 取得できた時刻は待たない
+    db.record_ok(slot, "a.json", b"{}")
+    assert db.due(slot, now=NOW)
+    assert db.get(slot)["attempts"] == 2
+
+
+def test_verify_size_and_checksum(db, tmp_path):
+    path = tmp_path / "a.json"
+    data = b'{"11001": {"temp": [10.5, 0]}}'
+    path.write_bytes(data)
+    # 記録が無い、失敗した時刻は確認できない
+    assert not db.verify("s", str(path))
+    db.record_failure("s", str(path), "error")
+    assert not db.verify("s", str(path))
+    db.record_ok("s", str(path), data)
+    assert db.get("s")["checksum"] == manifest.checksum(data)
+    assert db.verify("s", str(path))
+    assert db.verify("s", str(path), full=True)
+    # 同じサイズで内容が異なる場合はチェックサムでのみ分かる
+    path.write_bytes(data.replace(b"10.5", b"11.5"))
+    assert db.verify("s", str(path))
+    assert not db.verify("s", str(path), full=True)
+    # サイズが異なる
+    path.write_bytes(data[:-1])
+    assert not db.verify("s", str(path))
+    # ファイルが無い
+    path.unlink()
+    assert not db.verify("s", str(path))
+    assert not db.verify("s", str(path), full=True)
+
+
+def test_summary(db, tmp_path):
+    assert db.summary() == dict()
+    db.record_ok("s1", "a", b"1")
+    db.record_ok("s2", "b", b"2")
+    db.record_failure("s3", "c", "error")
+    assert db.summary() == dict(ok=2, failed=1)
+    # 失敗した時刻を取得できた場合は置き換える
+    db.record_ok("s3", "c", b"3")
+    assert db.summary() == dict(ok=3)
+    # 別に開いても同じ内容
+    other = manifest.FetchManifest(db.db_path)
+    assert other.summary() == dict(ok=3)
+    other.close()
@@ -0,0 +1,162 @@
+#
+#  utils/meta.pyのテスト（日付別ディレクトリに置く地点情報、版の固定、確認の間隔）
+#
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pytest
+from jmaloc import geometry
+from utils import decoder, meta
+
+URL = "https://www.jma.go.jp/bosai/amedas/const/amedastable.json"
+TABLE = {
+    "11001": {"lon": [141, 56.0], "lat": [45, 31.2], "enName": "Soya"},
+    "44132": {"lon": [139, 45.0], "lat": [35, 41.4], "enName": "Tokyo"},
+}
+DATA = {
+    "11001": {"temp": [10.5, 0]},
+    "44132": {"temp": [21.3, 0]},
+}
+
+
+class FakeFetcher():
+    """get_cachedの回数を数え、設定した内容または例外を返す"""
+    def __init__(self, body):
+        self.body = body
+        self.error = None
+        self.calls = 0
+
+    def get_cached(self, url):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.body, True
+
+
+def body(table=TABLE):
+    return json.dumps(table).encode()
+
+
+@pytest.fixture
+def day_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(geometry, "cache_dir_default", str(tmp_path / "table"))
+    path = tmp_path / "20260701" / "a"
+    path.mkdir(parents=True)
+    with open(str(path / "20260701000000.json"), 'wt') as fout:
+        json.dump(DATA, fout)
+    return str(path)
+
+
+def test_link_places_table_in_day_dir(tmp_path, day_dir, monkeypatch):
+    cache = meta.MetadataCache(str(tmp_path / "meta"))
+    path = cache.link(URL, day_dir, FakeFetcher(body()))
+    assert path == os.path.join(day_dir, "amedastable.json")
+    with open(path, 'rb') as fin:
+        assert fin.read() == body()
+    # 同じファイルシステムではハードリンク（容量を増やさない）
+    assert os.stat(path).st_nlink == 2
+    # 別のホストに移した場合と同じく、キャッシュが空でも読み込める
+    shutil.rmtree(str(tmp_path / "meta"))
+    monkeypatch.setattr(meta, "_shared",
+                        meta.MetadataCache(str(tmp_path / "empty")))
+    filename = os.path.join(day_dir, "20260701000000.json")
+    for d in (decoder.read_json(filename, ["temp"]),
+              decoder.read(filename, ["temp"])):
+        assert list(d.staid) == ["11001", "44132"]
+        assert d.lon[1] == pytest.approx(139.75)
+        np.testing.assert_allclose(d.values[:, 0], [10.5, 21.3], rtol=1e-6)
+
+
+def test_link_copies_when_hardlink_fails(tmp_path, day_dir, monkeypatch):
+    def fail(src, dst):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(meta.os, "link", fail)
+    cache = meta.MetadataCache(str(tmp_path / "meta"))
+    path = cache.link(URL, day_dir, FakeFetcher(body()))
+    assert os.stat(path).st_nlink == 1
+    assert meta.file_digest(path) == hashlib.sha256(body()).hexdigest()
+    assert sorted(os.listdir(day_dir)) == [
+        "20260701000000.json", "amedastable.json"
+    ]
+
+
+def test_link_replaces_changed_table_and_old_pointer(tmp_path, day_dir):
+    cache = meta.MetadataCache(str(tmp_path / "meta"), max_age=0)
+    old = cache.link(URL, day_dir, FakeFetcher(body()))
+    # 以前の版で作成したハッシュ値のファイル
+    with open(old + ".sha256", 'wt') as fout:
+        fout.write(hashlib.sha256(body()).hexdigest() + "\n")
+    table = dict(TABLE)
+    del table["11001"]
+    cache.release()
+    path = cache.link(URL, day_dir, FakeFetcher(body(table)))
+    assert not os.path.exists(path + ".sha256")
+    with open(path, 'rb') as fin:
+        assert fin.read() == body(table)
+    # キャッシュの古い版は書き換えない
+    old_object = cache.object_path(hashlib.sha256(body()).hexdigest())
+    with open(old_object, 'rb') as fin:
+        assert fin.read() == body()
+
+
+def test_legacy_pointer_resolves_from_cache(tmp_path, day_dir, monkeypatch):
+    cache = meta.MetadataCache(str(tmp_path / "meta"))
+    object_path, digest = cache.get(URL, FakeFetcher(body()))
+    table_file = os.path.join(day_dir, "amedastable.json")
+    with open(table_file + ".sha256", 'wt') as fout:
+        fout.write(digest + "\n")
+    assert cache.resolve(table_file) == object_path
+    monkeypatch.setattr(meta, "_shared", cache)
+    d = decoder.read_json(os.path.join(day_dir, "20260701000000.json"))
+    assert list(d.staid) == ["11001", "44132"]
+    # キャッシュに無い版はNone（読み込めない）
+    empty = meta.MetadataCache(str(tmp_path / "empty"))
+    assert empty.resolve(table_file) is None
+    monkeypatch.setattr(meta, "_shared", empty)
+    with pytest.raises(ValueError):
+        decoder.read_json(os.path.join(day_dir, "20260701000000.json"))
+
+
+def test_version_is_pinned_until_release(tmp_path):
+    fetcher = FakeFetcher(body())
+    cache = meta.MetadataCache(str(tmp_path / "meta"), max_age=0)
+    _, first = cache.get(URL, fetcher)
+    fetcher.body = body({"44132": TABLE["44132"]})
+    # 実行中はサーバーに確認せず、最初の版を使う
+    assert cache.get(URL, fetcher)[1] == first
+    assert fetcher.calls == 1
+    cache.release()
+    _, second = cache.get(URL, fetcher)
+    assert second != first
+    assert fetcher.calls == 2
+    with open(cache.get(URL, fetcher)[0], 'rb') as fin:
+        assert fin.read() == fetcher.body
+
+
+def test_refresh_policy(tmp_path, capsys):
+    cache_dir = str(tmp_path / "meta")
+    fetcher = FakeFetcher(body())
+    _, digest = meta.MetadataCache(cache_dir).get(URL, fetcher)
+    assert fetcher.calls == 1
+    # 別のプロセス：確認からmax_age以内はサーバーに確認しない
+    assert meta.MetadataCache(cache_dir).get(URL, fetcher)[1] == digest
+    assert fetcher.calls == 1
+    # max_ageを過ぎた場合は確認する
+    meta.MetadataCache(cache_dir, max_age=0).get(URL, fetcher)
+    assert fetcher.calls == 2
+    # 通信できない場合は保存した版を使う
+    fetcher.error = OSError("timed out")
+    assert meta.MetadataCache(cache_dir, max_age=0).get(URL,
+                                                         fetcher)[1] == digest
+    assert "use cached metadata" in capsys.readouterr().out
+    # Fetcherを渡さない場合は確認せずに保存した版を使う
+    assert meta.MetadataCache(cache_dir, max_age=0).get(URL)[1] == digest
+    assert fetcher.calls == 3
+    # 保存した版が無い場合は例外
+    with pytest.raises(OSError):
+        meta.MetadataCache(str(tmp_path / "empty")).get(URL, fetcher)
+    with pytest.raises(FileNotFoundError):
+        meta.MetadataCache(str(tmp_path / "empty")).get(URL)
@@ -0,0 +1,182 @@
+#
+#  utils/point.pyのテスト（ブロックの名前、確定の判定、404、保存する内容）
+#
+import os
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from jmaloc.geometry import parse_table
+from utils import point
+from utils.fetch import FetchError, FetchMetrics, Fetcher
+
+TABLE = parse_table({
+    "44132": {"lon": [139, 45.0], "lat": [35, 41.4], "enName": "Tokyo"},
+    "11001": {"lon": [141, 56.0], "lat": [45, 31.2], "enName": "Soya"},
+})
+
+
+def block_data(name):
+    """ブロック中の10分毎の気温（時刻の分を値とする）"""
+    t0 = point.block_start(name)
+    data = dict()
+    for n in range(18):
+        t = t0 + pd.Timedelta(minutes=10 * n)
+        data[t.strftime("%Y%m%d%H%M%S")] = {"temp": [float(n), 0]}
+    return data
+
+
+class FakeFetcher():
+    """URL毎の内容を返す（無いURLは404）"""
+    max_workers = 2
+
+    def __init__(self, bodies=None):
+        self.bodies = dict() if bodies is None else bodies
+        self.urls = []
+
+    def get_cached(self, url, file_name=None):
+        self.urls.append(url)
+        if url not in self.bodies:
+            raise FetchError(url, 404)
+        body = self.bodies[url]
+        if file_name is not None:
+            with open(file_name, 'wb') as fout:
+                fout.write(body)
+        return body, True
+
+
+def url(staid, name):
+    return point.url_top + staid + "/" + name + ".json"
+
+
+def test_block_name():
+    assert point.block_name("2026-07-01 00:00") == "20260701_00"
+    assert point.block_name("2026-07-01 02:50") == "20260701_00"
+    assert point.block_name("2026-07-01 03:00") == "20260701_03"
+    assert point.block_name("2026-07-01 23:59") == "20260701_21"
+    assert point.block_start("20260701_21") == pd.Timestamp("2026-07-01 21:00")
+
+
+def test_settled_one_hour_after_block_end(tmp_path):
+    def settled(now):
+        return point.PointFetcher(FakeFetcher(), str(tmp_path),
+                                  now=now).settled("20260701_00")
+
+    # ブロックは03:00に終わり、その1時間後に確定する
+    assert not settled(datetime(2026, 7, 1, 2, 50))
+    assert not settled(datetime(2026, 7, 1, 3, 50))
+    assert settled(datetime(2026, 7, 1, 4, 0))
+
+
+def test_block_uses_saved_file_once_settled(tmp_path):
+    name = "20260701_00"
+    fetcher = FakeFetcher(
+        {url("44132", name): json.dumps(block_data(name)).encode()})
+    pf = point.PointFetcher(fetcher,
+                            str(tmp_path),
+                            now=datetime(2026, 7, 1, 3, 30))
+    assert pf.block("44132", name) == block_data(name)
+    assert pf.block("44132", name) == block_data(name)
+    # 確定していないブロックは取得し直す
+    assert len(fetcher.urls) == 2
+    pf.now = pd.Timestamp(datetime(2026, 7, 1, 4, 0))
+    assert pf.block("44132", name) == block_data(name)
+    assert len(fetcher.urls) == 2
+    # 未来のブロックは取得しない
+    assert pf.block("44132", "20260701_06") == dict()
+    assert len(fetcher.urls) == 2
+
+
+def test_missing_block_is_empty(tmp_path):
+    fetcher = FakeFetcher()
+    pf = point.PointFetcher(fetcher, str(tmp_path), now=datetime(2026, 7, 2))
+    assert pf.block("44132", "20260701_00") == dict()
+    assert not os.path.exists(os.path.join(str(tmp_path), "44132",
+                                           "20260701_00.json"))
+
+    class Broken(FakeFetcher):
+        def get_cached(self, url, file_name=None):
+            raise FetchError(url, 500)
+
+    # 404以外は例外
+    pf = point.PointFetcher(Broken(), str(tmp_path), now=datetime(2026, 7, 2))
+    with pytest.raises(FetchError):
+        pf.block("44132", "20260701_00")
+
+
+def test_series(tmp_path):
+    names = ["20260701_00", "20260701_03"]
+    fetcher = FakeFetcher({
+        url("44132", name): json.dumps(block_data(name)).encode()
+        for name in names
+    })
+    pf = point.PointFetcher(fetcher, str(tmp_path), now=datetime(2026, 7, 2))
+    times = [datetime(2026, 7, 1, 2, 50), datetime(2026, 7, 1, 3, 10)]
+    d = pf.series(["Tokyo", "11001", "99999"], ["temp"], times, table=TABLE)
+    assert d.shape == (2, 3, 1)
+    np.testing.assert_array_equal(d[:, 0, 0], [17., 1.])
+    # データが無い地点（404）と地点情報に無い地点は欠損値
+    assert np.isnan(d[:, 1:]).all()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ETagを付けて返し、If-None-Matchが一致すれば304を返すサーバー"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps(block_data("20260701_00")).encode()
+        etag = '"v1"'
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_body_is_stored_once(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(point, "url_top",
+                        "http://127.0.0.1:%d/" % server.server_address[1])
+    validators = str(tmp_path / "validators")
+    fetcher = Fetcher(max_workers=1,
+                      rate=None,
+                      retries=0,
+                      cache_dir=validators,
+                      metrics=FetchMetrics())
+    pf = point.PointFetcher(fetcher,
+                            str(tmp_path / "point"),
+                            now=datetime(2026, 7, 1, 3, 30))
+    first = pf.block("44132", "20260701_00")
+    second = pf.block("44132", "20260701_00")
+    fetcher.close()
+    assert first == second == block_data("20260701_00")
+    # 2回目は条件付きリクエスト（304）で、保存したブロックを使う
+    assert server.requests == [None, '"v1"']
+    # 内容はブロックのファイルのみに保存し、Fetcherのキャッシュにはヘッダのみ
+    assert (tmp_path / "point" / "44132" / "20260701_00.json").exists()
+    assert [os.path.splitext(f)[1]
+            for f in os.listdir(validators)] == [".json"]
@@ -0,0 +1,114 @@
+#
+#  utils/render.pyのテスト（作図の代わりに読み込んだ値をファイルに書き出す）
+#
+import os
+import json
+import numpy as np
+import pytest
+from utils.render import render_frames
+
+
+def read_frame(input_filename, scale=1., rain=None, output_dir='.'):
+    """npzを読み込み、drawの引数を返す（作図プログラムのread_frameと同じ形）"""
+    with np.load(input_filename) as data:
+        d = data["d"] * scale
+    if rain is not None:
+        d = d + rain[1][rain[0]]
+    base = os.path.splitext(os.path.basename(input_filename))[0]
+    output_filename = os.path.join(output_dir, base + ".json")
+    return output_filename, (d, output_filename), dict(pid=os.getpid())
+
+
+def draw(d, output_filename, pid=None):
+    if np.isnan(d).any():
+        raise RuntimeError("nan in " + output_filename)
+    with open(output_filename, 'wt') as fout:
+        json.dump(dict(d=d.tolist(), pid=pid), fout)
+
+
+def make_frames(tmp_path, n=6):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    frames = []
+    for i in range(n):
+        path = str(input_dir / ("%02d.npz" % i))
+        np.savez(path, d=np.arange(4, dtype=np.float32) + i)
+        frames.append((path, (path, ), dict(scale=2.)))
+    return frames
+
+
+def outputs(output_dir):
+    res = dict()
+    for name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, name), 'rt') as fin:
+            res[name] = json.load(fin)
+    return res
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_workers_read_their_own_frames(tmp_path, workers):
+    frames = make_frames(tmp_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    for _, _, kwargs in frames:
+        kwargs["output_dir"] = str(output_dir)
+    assert render_frames(draw, frames, workers=workers,
+                         read_func=read_frame) == []
+    res = outputs(str(output_dir))
+    assert sorted(res) == ["%02d.json" % i for i in range(6)]
+    for i in range(6):
+        assert res["%02d.json" % i]["d"] == [2. * (i + k) for k in range(4)]
+    pids = set(r["pid"] for r in res.values())
+    if workers > 1:
+        # 最初の時刻以外は作図を行うプロセスで読み込む
+        assert res["00.json"]["pid"] == os.getpid()
+        assert os.getpid() not in set(r["pid"] for name, r in res.items()
+                                      if name != "00.json")
+    else:
+        assert pids == {os.getpid()}
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_broken_frames_are_skipped(tmp_path, workers):
+    frames = make_frames(tmp_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    for _, _, kwargs in frames:
+        kwargs["output_dir"] = str(output_dir)
+    # 壊れたnpz（BadZipFile）、無いファイル（OSError）、作図の失敗
+    with open(frames[1][0], 'wb') as fout:
+        fout.write(b"PK\x03\x04broken")
+    os.remove(frames[2][0])
+    np.savez(frames[4][0], d=np.full(4, np.nan, dtype=np.float32))
+    failed = render_frames(draw, frames, workers=workers,
+                           read_func=read_frame)
+    assert failed == [frames[n][0] for n in (1, 2, 4)]
+    assert sorted(outputs(str(output_dir))) == [
+        "00.json", "03.json", "05.json"
+    ]
+
+
+def test_arrays_in_kwargs_are_shared(tmp_path):
+    frames = make_frames(tmp_path, n=4)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    # 呼び出し側で求めた値（地点の位置と値のtuple）
+    for n, (_, _, kwargs) in enumerate(frames):
+        kwargs["output_dir"] = str(output_dir)
+        kwargs["rain"] = (np.array([3, 2, 1, 0]),
+                          np.full(4, 100. * n, dtype=np.float32))
+    assert render_frames(draw, frames, workers=2, read_func=read_frame) == []
+    res = outputs(str(output_dir))
+    for n in range(4):
+        assert res["%02d.json" % n]["d"] == [
+            2. * (n + k) + 100. * n for k in range(4)
+        ]
+
+
+def test_without_read_func(tmp_path):
+    frames = []
+    for n in range(3):
+        path = str(tmp_path / ("%02d.json" % n))
+        frames.append((path, (np.full(2, float(n)), path), dict()))
+    assert render_frames(draw, frames, workers=2) == []
+    assert outputs(str(tmp_path))["02.json"]["d"] == [2., 2.]
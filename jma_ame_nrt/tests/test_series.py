@@ -0,0 +1,109 @@
+#
+#  utils/series.py、地点を指定した読み込みのテスト
+#
+import os
+import numpy as np
+import pandas as pd
+from utils import decoder, series
+from utils.bulk import read_files
+from utils.series import read_series
+
+NAMES = ["temp", "precipitation1h"]
+
+
+def write_snapshot(path, n):
+    """3地点分のcsvを作る（取得プログラムと同じ形式）"""
+    df = pd.DataFrame({
+        "temp": ["[%.1f, 0]" % (n + 0.5), "[%.1f, 0]" % (n + 1.5), None],
+        "humidity": ["[50, 0]", "[60, 0]", "[70, 0]"],
+        "precipitation1h": ["[0.0, 0]", "[1.0, 0]", "[2.0, 1]"],
+        "lon": ["[141, 21.0]", "[139, 45.0]", "[135, 30.0]"],
+        "lat": ["[43, 3.6]", "[35, 41.4]", "[34, 41.0]"],
+        "enName": ["Sapporo", "Tokyo", "Osaka"],
+    }, index=["14163", "44132", "62078"])
+    df.to_csv(path)
+
+
+def test_read_stations_matches_full_read(tmp_path):
+    path = str(tmp_path / "20260101000000.csv")
+    write_snapshot(path, 0)
+    full = decoder.read(path, NAMES)
+    part = decoder.read(path, NAMES, stations=["Osaka", "14163"])
+    np.testing.assert_array_equal(part.staid, ["14163", "62078"])
+    np.testing.assert_array_equal(part.values, full.values[[0, 2]])
+    np.testing.assert_array_equal(part.flags, full.flags[[0, 2]])
+    np.testing.assert_array_equal(part.lon, full.lon[[0, 2]])
+    # npzでも同じ
+    full.to_npz(str(tmp_path / "a.npz"))
+    part = decoder.read(str(tmp_path / "a.npz"), NAMES, stations=["Osaka"])
+    np.testing.assert_array_equal(part.values, full.values[[2]])
+
+
+def test_read_series(tmp_path):
+    paths = [str(tmp_path / ("2026010100%02d00.csv" % (n * 10)))
+             for n in range(3)]
+    for n, path in enumerate(paths):
+        if n != 1:
+            write_snapshot(path, n)
+    d = read_series(paths, ["Tokyo", "62078", "99999"], NAMES)
+    assert d.shape == (3, 3, 2)
+    np.testing.assert_array_equal(d[[0, 2], 0, 0], [1.5, 3.5])
+    assert np.isnan(d[1]).all()
+    # 品質フラグが0以外は欠損値
+    assert np.isnan(d[:, 1, 1]).all()
+    assert np.isnan(d[:, 2]).all()
+    # プロセス並列の読み込みと同じ値
+    s = read_files(paths, NAMES, max_workers=1,
+                   stations=["Tokyo", "62078", "99999"])
+    np.testing.assert_array_equal(
+        s.series(["Tokyo", "62078", "99999"]), d)
+
+
+def test_read_series_npz_rows(tmp_path, monkeypatch):
+    paths = [str(tmp_path / ("2026010100%02d00.csv" % (n * 10)))
+             for n in range(4)]
+    for n, path in enumerate(paths):
+        write_snapshot(path, n)
+    stations = ["Tokyo", "62078", "99999"]
+    expected = read_series(paths, stations, NAMES + ["humidity", "snow"])
+    # csvと同じ時刻のnpzを使う（地点の並びが異なる時刻を含む）
+    for n, path in enumerate(paths):
+        amedas = decoder.read(path)
+        if n == 2:
+            amedas = amedas.select(np.array([2, 0, 1]))
+        amedas.to_npz(path.replace(".csv", ".npz"))
+        os.remove(path)
+    # 地点名は地点番号の並びが変わった場合のみ読み込む
+    calls = []
+    rows = series._station_rows
+
+    def count(staid, enname, stations):
+        calls.append(len(staid))
+        return rows(staid, enname, stations)
+
+    monkeypatch.setattr(series, "_station_rows", count)
+    d = read_series(paths, stations, NAMES + ["humidity", "snow"])
+    np.testing.assert_array_equal(d, expected)
+    assert calls == [3, 3, 3]
+    assert np.isnan(d[:, :, 3]).all()
+
+
+def test_read_series_skips_broken_files(tmp_path, capsys):
+    paths = [str(tmp_path / ("2026010100%02d00.csv" % (n * 10)))
+             for n in range(3)]
+    for path in paths:
+        write_snapshot(path, 0)
+    # 途中で切れたnpzとnpzでないファイル
+    decoder.read(paths[0]).to_npz(paths[0].replace(".csv", ".npz"))
+    with open(paths[0].replace(".csv", ".npz"), 'rb') as fin:
+        data = fin.read()
+    with open(paths[0].replace(".csv", ".npz"), 'wb') as fout:
+        fout.write(data[:len(data) // 2])
+    with open(paths[1].replace(".csv", ".npz"), 'wb') as fout:
+        fout.write(b"not a npz")
+    d = read_series(paths, ["Tokyo"], NAMES)
+    assert np.isnan(d[:2]).all()
+    np.testing.assert_array_equal(d[2, 0], [1.5, 1.0])
+    out = capsys.readouterr().out
+    assert "Warn: cannot read " + paths[0] in out
+    assert "Warn: cannot read " + paths[1] in out
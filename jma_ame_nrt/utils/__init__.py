@@ -34,7 +34,9 @@ def _construct_parser(opt_time=True,
                       opt_rain=False,
                       opt_wind=False,
                       opt_temp=False,
-                      opt_trange=False):
+                      opt_trange=False,
+                      opt_window=False,
+                      opt_workers=False):
     """オプションの読み込み"""
     parser = argparse.ArgumentParser(description='Matplotlib cartopy, ')
 
@@ -84,6 +86,21 @@ def _construct_parser(opt_time=True,
                                   'step: tick interval (optional)'),
                             metavar='<min,max,step>')
 
+    if opt_window:
+        parser.add_argument('--window',
+                            type=str,
+                            help=('accumulation window from 10-minute '
+                                  'precipitation; e.g. 2h, 6h, 48h, '
+                                  'or storm (total from time_sta)'),
+                            metavar='<window>')
+
+    if opt_workers:
+        parser.add_argument('--workers',
+                            type=int,
+                            help=('Number of processes to draw frames '
+                                  '(0: number of CPUs, default: 1)'),
+                            metavar='<workers>')
+
     parser.add_argument('--output_dir',
                         type=str,
                         help=('Directory of output files'),
@@ -108,7 +125,9 @@ def parse_command(args,
                   opt_rain=False,
                   opt_wind=False,
                   opt_temp=False,
-                  opt_trange=False):
+                  opt_trange=False,
+                  opt_window=False,
+                  opt_workers=False):
     """オプションの読み込み"""
     parser = _construct_parser(opt_time=opt_time,
                                opt_cum=opt_cum,
@@ -116,7 +135,9 @@ def parse_command(args,
                                opt_rain=opt_rain,
                                opt_wind=opt_wind,
                                opt_temp=opt_temp,
-                               opt_trange=opt_trange)
+                               opt_trange=opt_trange,
+                               opt_window=opt_window,
+                               opt_workers=opt_workers)
     parsed_args = parser.parse_args(args[1:])
     if parsed_args.output_dir is None:
         parsed_args.output_dir = output_dir_default
@@ -157,4 +178,12 @@ def parse_command(args,
             parsed_args.temprange = "18.,38.,2."
         else:
             parsed_args.temprange = _strdel(parsed_args.temprange)
+    if opt_window:
+        if parsed_args.window is not None:
+            parsed_args.window = _strdel(parsed_args.window)
+    if opt_workers:
+        if parsed_args.workers is None:
+            parsed_args.workers = 1
+        elif parsed_args.workers <= 0:
+            parsed_args.workers = os.cpu_count()
     return parsed_args
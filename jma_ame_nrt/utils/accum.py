@@ -0,0 +1,486 @@
+#
+#  2026/10/18
+#  降水量の地点毎の累積和（prefix sum）を保持し、任意の期間の積算降水量を求める
+#
+import io
+import os
+import hashlib
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from .archive import to_minutes
+from .atomic import write_atomic
+from .bulk import read_files, time_range
+
+# チェックポイントに残す開始時刻より前の期間（より前の累積和は捨てる）
+keep_history = timedelta(days=2)
+
+
+class RainAccumulator():
+    """降水量の地点毎の累積和
+
+    cum[i]は最初の時刻からi番目の時刻までの降水量の和（cum[0]は0）で、
+    期間(t0, t1]の積算降水量はcum[i1] - cum[i0]として地点数の計算で求める
+
+    Parameters:
+    ----------
+    name: str
+        積算する変数名（時間間隔time_stepの降水量）
+    time_step: timedelta
+        データの時間間隔
+    ----------
+    """
+    def __init__(self, name="precipitation10m", time_step=timedelta(minutes=10)):
+        self.name = name
+        self.step = pd.Timedelta(time_step).to_timedelta64().astype(
+            "timedelta64[m]")
+        # cum[0]に対応する時刻（最初のデータの時刻 - time_step）
+        self.time_origin = None
+        self.staid = np.array([], dtype=str)
+        self.lon = np.array([], dtype=np.float32)
+        self.lat = np.array([], dtype=np.float32)
+        self.enname = np.array([], dtype=str)
+        # (時刻 + 1, 地点)の降水量の累積和と、品質が正常なデータ数の累積和
+        self.cum = np.zeros((1, 0), dtype=np.float64)
+        self.nobs = np.zeros((1, 0), dtype=np.int32)
+        # 各時刻のファイルを読み込めたかどうか
+        self.valid = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.valid)
+
+    def times(self):
+        """累積和に含まれる時刻（datetime64[m]）を返す"""
+        if self.time_origin is None:
+            return np.array([], dtype="datetime64[m]")
+        return self.time_origin + self.step * np.arange(1, len(self) + 1)
+
+    def _offset(self, time):
+        """time_originからの時刻の数を返す（time_step毎の時刻でない場合は例外）"""
+        t = to_minutes(time)
+        if self.time_origin is None:
+            raise ValueError("no data in accumulator")
+        n, r = divmod(int((t - self.time_origin) / np.timedelta64(1, "m")),
+                      int(self.step / np.timedelta64(1, "m")))
+        if r != 0:
+            raise ValueError("time is not on the time_step grid: " + str(t))
+        return n
+
+    def index(self, time):
+        """時刻から累積和の位置を返す（time_originが0、範囲外は例外）"""
+        n = self._offset(time)
+        if n < 0 or n > len(self):
+            raise ValueError("time out of range: " + str(to_minutes(time)))
+        return n
+
+    def reset(self, time_sta):
+        """time_staの時刻から累積和を作り直す"""
+        self.__init__(self.name, self.step)
+        self.time_origin = to_minutes(time_sta) - self.step
+
+    def rebase(self, time_sta):
+        """time_staより前の時刻を捨て、time_staから始まる累積和にする
+
+        Parameters:
+        ----------
+        time_sta: str or datetime
+            新しい最初の時刻（time_step毎の時刻）
+        ----------
+        Returns:
+        ----------
+        bool
+            捨てた時刻があるかどうか
+        ----------
+        """
+        n = self._offset(time_sta) - 1
+        if n <= 0:
+            return False
+        if n >= len(self):
+            self.reset(time_sta)
+            return True
+        # 桁が大きくならないように、新しい最初の値を0とする
+        self.cum = self.cum[n:] - self.cum[n]
+        self.nobs = self.nobs[n:] - self.nobs[n]
+        self.valid = self.valid[n:]
+        self.time_origin = self.time_origin + self.step * n
+        return True
+
+    def missing_times(self, time_sta, time_end):
+        """期間[time_sta, time_end]で、まだ読み込んでいない時刻を返す"""
+        tlist = time_range(time_sta, time_end, self.step)
+        return [
+            t for t in tlist
+            if self._offset(t) > len(self) or not self.valid[self._offset(t) - 1]
+        ]
+
+    def _add_stations(self, staid, lon, lat, enname):
+        """新しい地点を加える（加えた地点の過去の値は0、データ数も0）"""
+        new = np.setdiff1d(staid, self.staid)
+        if len(new) == 0:
+            return
+        pos = np.searchsorted(staid, new)
+        allid = np.concatenate([self.staid, new])
+        order = np.argsort(allid)
+        self.staid = allid[order]
+        self.lon = np.concatenate([self.lon, lon[pos]])[order]
+        self.lat = np.concatenate([self.lat, lat[pos]])[order]
+        self.enname = np.concatenate([self.enname, enname[pos]])[order]
+        pad = np.zeros((self.cum.shape[0], len(new)))
+        self.cum = np.concatenate([self.cum, pad], axis=1)[:, order]
+        self.nobs = np.concatenate([self.nobs, pad.astype(np.int32)],
+                                   axis=1)[:, order]
+
+    def update(self, stack):
+        """読み込んだデータで累積和を更新する
+
+        既に読み込んだ時刻の場合は置き換え、その時刻以降の累積和のみ計算し直す
+
+        Parameters:
+        ----------
+        stack: bulk.AmedasStack
+            self.nameを含むデータ（時刻はtime_step毎の格子上）
+        ----------
+        """
+        if len(stack.times) == 0:
+            return
+        if self.time_origin is None:
+            self.time_origin = stack.times.min() - self.step
+        self._add_stations(stack.staid, stack.lon, stack.lat, stack.enname)
+        idx = np.array([self._offset(t) for t in stack.times])
+        if idx.min() < 1:
+            raise ValueError("time before the start of accumulator")
+        # 時刻を延長する
+        nt = max(len(self), int(idx.max()))
+        if nt > len(self):
+            ext = nt - len(self)
+            self.cum = np.concatenate(
+                [self.cum, np.repeat(self.cum[-1:], ext, axis=0)])
+            self.nobs = np.concatenate(
+                [self.nobs, np.repeat(self.nobs[-1:], ext, axis=0)])
+            self.valid = np.concatenate([self.valid, np.zeros(ext, bool)])
+        # 累積和を各時刻の値に戻し、置き換えてから累積し直す
+        k = int(idx.min())
+        inc = np.diff(self.cum[k - 1:], axis=0)
+        cnt = np.diff(self.nobs[k - 1:], axis=0)
+        pos = np.searchsorted(self.staid, stack.staid)
+        d = stack.get(self.name)
+        for n, i in enumerate(idx):
+            if not stack.valid[n]:
+                continue
+            ok = ~np.isnan(d[n])
+            inc[i - k] = 0.
+            cnt[i - k] = 0
+            inc[i - k, pos[ok]] = d[n, ok]
+            cnt[i - k, pos[ok]] = 1
+            self.valid[i - 1] = True
+        self.cum[k:] = self.cum[k - 1] + np.cumsum(inc, axis=0)
+        self.nobs[k:] = self.nobs[k - 1] + np.cumsum(cnt, axis=0)
+
+    def _nvalid(self, i0, i1):
+        """累積和の位置i0からi1までに読み込めた時刻の数"""
+        cv = np.concatenate([[0], np.cumsum(self.valid)])
+        return cv[i1] - cv[i0]
+
+    def _ok(self, nobs, nvalid, complete):
+        """積算降水量を欠損値にしない地点"""
+        if complete:
+            # 読み込めた全ての時刻で正常な値がある地点のみ
+            return (nobs > 0) & (nobs == nvalid)
+        return nobs > 0
+
+    def window(self, t0, t1, staid=None, complete=False):
+        """期間(t0, t1]の積算降水量を返す
+
+        Parameters:
+        ----------
+        t0: str or datetime
+            期間の開始時刻（この時刻の値は含まない）
+        t1: str or datetime
+            期間の終了時刻
+        staid: ndarray(str)
+            地点番号（Noneの場合はself.staidの順）
+        complete: bool
+            True: 期間内に欠損値の時刻がある地点は欠損値とする
+            False: 正常な時刻の値のみ積算する（欠損値の時刻は0として扱う）
+            （どちらもファイルを読み込めなかった時刻は積算に含めない）
+        ----------
+        Returns:
+        ----------
+        ndarray(float32)
+            積算降水量（期間内に正常なデータが無い地点は欠損値）
+        ----------
+        """
+        i0 = self.index(t0)
+        i1 = self.index(t1)
+        d = self.cum[i1] - self.cum[i0]
+        d = np.where(
+            self._ok(self.nobs[i1] - self.nobs[i0], self._nvalid(i0, i1),
+                     complete), d, np.nan)
+        d = d.astype(np.float32)
+        if staid is None:
+            return d
+        return align(self.staid, d, staid)
+
+    def rolling(self, width, times=None, complete=False):
+        """幅widthの移動積算降水量を複数時刻まとめて求める
+
+        Parameters:
+        ----------
+        width: timedelta
+            積算期間（time_stepの整数倍、各時刻tについて期間(t - width, t]）
+        times: list(datetime)
+            求める時刻（Noneの場合は全ての時刻）
+        complete: bool
+            期間内に欠損値の時刻がある地点を欠損値とするかどうか（windowと同じ）
+        ----------
+        Returns:
+        ----------
+        times: ndarray(datetime64[m])
+            時刻
+        d: ndarray(float32)
+            (時刻, 地点)の積算降水量（期間が累積和の範囲外の時刻や、
+            期間内に正常なデータが無い地点は欠損値）
+        ----------
+        """
+        w, r = divmod(
+            pd.Timedelta(width).to_timedelta64().astype("timedelta64[m]"),
+            self.step)
+        if r != np.timedelta64(0, "m") or w < 1:
+            raise ValueError("width must be a multiple of time_step")
+        if times is None:
+            times = self.times()
+        times = np.array([to_minutes(t) for t in times],
+                         dtype="datetime64[m]")
+        i1 = np.array([self.index(t) for t in times], dtype=np.int64)
+        i0 = i1 - int(w)
+        ok = i0 >= 0
+        i0 = np.maximum(i0, 0)
+        d = self.cum[i1] - self.cum[i0]
+        nobs = self.nobs[i1] - self.nobs[i0]
+        nvalid = self._nvalid(i0, i1)[:, np.newaxis]
+        d = np.where(
+            self._ok(nobs, nvalid, complete) & ok[:, np.newaxis], d, np.nan)
+        return times, d.astype(np.float32)
+
+    def to_npz(self, output_filename):
+        """チェックポイントを圧縮したnpz形式で保存する（書き込み途中のファイルは
+        残さない）"""
+        buf = io.BytesIO()
+        np.savez_compressed(buf,
+                            name=np.array(self.name),
+                            step=np.array(self.step.astype("<i8")),
+                            time_origin=np.array(
+                                self.time_origin.astype("<i8")),
+                            staid=self.staid,
+                            lon=self.lon,
+                            lat=self.lat,
+                            enname=self.enname,
+                            cum=self.cum,
+                            nobs=self.nobs,
+                            valid=self.valid)
+        write_atomic(output_filename, buf.getvalue())
+
+
+def align(src_staid, d, staid):
+    """地点番号の順（昇順）に並んだ値を、指定した地点番号の順に並べ替える
+
+    Parameters:
+    ----------
+    src_staid: ndarray(str)
+        dの地点番号（昇順）
+    d: ndarray(float32)
+        地点毎の値
+    staid: ndarray(str)
+        並べ替える地点番号（src_staidに無い地点は欠損値）
+    ----------
+    Returns:
+    ----------
+    ndarray(float32)
+    ----------
+    """
+    pos = np.searchsorted(src_staid, staid)
+    pos[pos >= len(src_staid)] = 0
+    found = src_staid[pos] == np.asarray(staid, dtype=str)
+    return np.where(found, d[pos], np.float32(np.nan))
+
+
+def parse_window(window):
+    """積算期間の文字列（2h、6h、48hなど）をtimedeltaに変換する
+
+    stormの場合は開始時刻からの積算としてNoneを返す
+    """
+    if window.lower() == "storm":
+        return None
+    return pd.Timedelta(window).to_pytimedelta()
+
+
+def checkpoint_file(acc_file, window=None, input_dir="."):
+    """積算期間と入力ディレクトリ毎のチェックポイントのファイル名
+
+    acc_file（プログラム毎の名前）に積算期間と入力ディレクトリのハッシュ値を
+    付ける（同時に実行した別の期間・ディレクトリの作図と共用しないように）
+
+    Parameters:
+    ----------
+    acc_file: str
+        チェックポイントのファイル名（Noneの場合は保存しない）
+    window: str
+        積算期間（2h、6h、stormなど、Noneの場合は付けない）
+    input_dir: str
+        入力ファイルのディレクトリ
+    ----------
+    Returns:
+    ----------
+    str
+        チェックポイントのファイル名（acc_fileがNoneの場合はNone）
+    ----------
+    """
+    if acc_file is None:
+        return None
+    root, ext = os.path.splitext(acc_file)
+    key = hashlib.sha1(
+        os.path.abspath(input_dir).encode()).hexdigest()[:8]
+    if window is not None:
+        root = root + "_" + window.lower()
+    return root + "_" + key + ext
+
+
+def window_rains(time_sta,
+                 time_end,
+                 window,
+                 time_step,
+                 input_dir=".",
+                 acc_file=None):
+    """10分間降水量の累積和から、作図する時刻毎の積算降水量を求める
+
+    Parameters:
+    ----------
+    time_sta: str or datetime
+        作図の開始時刻
+    time_end: str or datetime
+        作図の終了時刻
+    window: str
+        積算期間（2h、6h、48hなど、stormの場合は開始時刻からの積算）
+    time_step: timedelta
+        作図の時間間隔
+    input_dir: str
+        入力ファイルのディレクトリ
+    acc_file: str
+        チェックポイントのファイル名（checkpoint_fileで積算期間と入力
+        ディレクトリ毎の名前にする、Noneの場合は保存しない）
+    ----------
+    Returns:
+    ----------
+    acc: RainAccumulator
+        累積和（地点の経度・緯度）
+    time_list: list(datetime)
+        作図する時刻
+    rains: list(ndarray)
+        時刻毎の積算降水量（地点番号の順）
+    ----------
+    """
+    width = parse_window(window)
+    step10m = timedelta(minutes=10)
+    if width is None:
+        # 開始時刻からの積算（storm total）
+        acc_sta = time_sta
+    else:
+        acc_sta = time_sta - width + step10m
+    acc = accumulate(acc_sta,
+                     time_end,
+                     name="precipitation10m",
+                     time_step=step10m,
+                     input_dir=input_dir,
+                     acc_file=checkpoint_file(acc_file, window, input_dir))
+    time_list = time_range(time_sta, time_end, time_step)
+    if width is None:
+        rains = [acc.window(time_sta - step10m, time) for time in time_list]
+    else:
+        _, rains = acc.rolling(width, time_list)
+    return acc, time_list, rains
+
+
+def read_npz(input_filename):
+    """チェックポイントを読み込む"""
+    with np.load(input_filename) as d:
+        acc = RainAccumulator(str(d["name"]),
+                              timedelta(minutes=int(d["step"])))
+        acc.time_origin = np.datetime64(int(d["time_origin"]), "m")
+        acc.staid = d["staid"]
+        acc.lon = d["lon"]
+        acc.lat = d["lat"]
+        acc.enname = d["enname"]
+        acc.cum = d["cum"]
+        acc.nobs = d["nobs"]
+        acc.valid = d["valid"]
+    return acc
+
+
+def accumulate(time_sta,
+               time_end,
+               name="precipitation10m",
+               time_step=timedelta(minutes=10),
+               input_dir=".",
+               acc_file=None,
+               max_workers=None):
+    """期間[time_sta, time_end]の降水量の累積和を作成する
+
+    acc_fileがある場合はチェックポイントを読み込み、まだ読み込んでいない時刻
+    （前回無かったファイルを含む）のみ読み込んで更新し、保存する。
+    開始時刻のkeep_historyより前の時刻は捨て、チェックポイントが実行の度に
+    大きくならないようにする（変更が無い場合は保存し直さない）
+
+    Parameters:
+    ----------
+    time_sta: str or datetime
+        開始時刻
+    time_end: str or datetime
+        終了時刻
+    name: str
+        積算する変数名
+    time_step: timedelta
+        データの時間間隔
+    input_dir: str
+        入力ファイル（時刻.csv、npzがあればnpz）のディレクトリ
+    acc_file: str
+        チェックポイントのファイル名（Noneの場合は保存しない）
+    max_workers: int
+        読み込みに使うプロセス数
+    ----------
+    Returns:
+    ----------
+    RainAccumulator
+    ----------
+    """
+    acc = None
+    if acc_file is not None and os.path.exists(acc_file):
+        acc = read_npz(acc_file)
+        if (acc.name != name or acc.step != RainAccumulator(
+                name, time_step).step or to_minutes(time_sta) <
+                acc.time_origin + acc.step or
+                (to_minutes(time_sta) - acc.time_origin) % acc.step):
+            # 変数・時間間隔が異なるか、開始時刻が範囲外の場合は作り直す
+            acc = None
+    changed = False
+    if acc is None:
+        acc = RainAccumulator(name, time_step)
+        acc.reset(time_sta)
+        changed = True
+    else:
+        # 保持する期間より前の累積和を捨てる（time_step毎の時刻に合わせる）
+        nkeep = int(pd.Timedelta(keep_history) // pd.Timedelta(acc.step))
+        changed = acc.rebase(to_minutes(time_sta) - acc.step * nkeep)
+    tlist = acc.missing_times(time_sta, time_end)
+    if len(tlist) > 0:
+        changed = True
+        input_filenames = [
+            os.path.join(input_dir,
+                         t.strftime("%Y%m%d%H%M%S") + ".csv") for t in tlist
+        ]
+        acc.update(
+            read_files(input_filenames, [name],
+                       times=tlist,
+                       max_workers=max_workers))
+    if acc_file is not None and changed:
+        acc.to_npz(acc_file)
+    return acc
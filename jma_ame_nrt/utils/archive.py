@@ -0,0 +1,185 @@
+#
+#  2026/10/18
+#  get_jma_json_auto.pyで作成したアーカイブ（日付別/a/時刻.npz）の走査と、
+#  欠けている時刻の取得計画
+#
+import os
+import re
+import numpy as np
+import pandas as pd
+from . import bundle
+
+# 日付別ディレクトリ名（yymmdd）
+_DATE_DIR = re.compile(r"^\d{6}$")
+# データファイル名（yyyymmddhhMMss.拡張子）
+_DATA_FILE = re.compile(r"^(\d{14})\.(npz|csv|json)$")
+# 同じ時刻のファイルが複数ある場合の優先順位（bundleはまとめたファイル中のjson）
+_PRIORITY = {"npz": 0, "csv": 1, "json": 2, "bundle": 3}
+
+
+def to_minutes(t):
+    """時刻をdatetime64[m]に変換する（タイムゾーン付きの場合は日本時間のまま）
+
+    Parameters:
+    ----------
+    t: str or datetime or numpy.datetime64
+        時刻
+    ----------
+    """
+    ts = pd.Timestamp(t)
+    if ts.tz is not None:
+        ts = ts.tz_localize(None)
+    return ts.to_datetime64().astype("datetime64[m]")
+
+
+def date_dir(archive_dir, t):
+    """時刻に対応する日付別ディレクトリ（日付別/a）を返す
+
+    Parameters:
+    ----------
+    archive_dir: str
+        アーカイブのトップディレクトリ
+    t: str or datetime or numpy.datetime64
+        時刻
+    ----------
+    """
+    fdate = pd.Timestamp(to_minutes(t)).strftime("%y%m%d")
+    return os.path.join(archive_dir, fdate, "a")
+
+
+def list_snapshots(archive_dir, time_sta=None, time_end=None, exts=None):
+    """アーカイブ中のデータファイルを時刻順に返す
+
+    日付別ディレクトリ毎に1回だけファイル一覧を取得する
+    （同じ時刻のファイルはnpz、csv、json、まとめたファイルの順に使う）。
+    まとめたファイル中の時刻は、日付別/a/時刻.jsonのパスで返す
+    （ファイルは無いがdecoder.readで読み込める）
+
+    Parameters:
+    ----------
+    archive_dir: str
+        アーカイブのトップディレクトリ
+    time_sta: str or datetime
+        開始時刻（Noneの場合は制限なし）
+    time_end: str or datetime
+        終了時刻（Noneの場合は制限なし）
+    exts: list(str)
+        対象とする拡張子（Noneの場合はnpz、csv、jsonの全て、
+        jsonにはまとめたファイル中のものを含む）
+    ----------
+    Returns:
+    ----------
+    list(tuple(numpy.datetime64, str))
+        時刻とファイルのパス
+    ----------
+    """
+    t0 = None if time_sta is None else to_minutes(time_sta)
+    t1 = None if time_end is None else to_minutes(time_end)
+    d0 = None if t0 is None else pd.Timestamp(t0).strftime("%y%m%d")
+    d1 = None if t1 is None else pd.Timestamp(t1).strftime("%y%m%d")
+    found = dict()
+    try:
+        dates = sorted(d for d in os.listdir(archive_dir) if _DATE_DIR.match(d))
+    except FileNotFoundError:
+        return []
+    for d in dates:
+        if (d0 is not None and d < d0) or (d1 is not None and d > d1):
+            continue
+        path = os.path.join(archive_dir, d, "a")
+        try:
+            entries = os.listdir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        files = []
+        for entry in entries:
+            m = _DATA_FILE.match(entry)
+            if m is not None:
+                files.append((m.group(1), m.group(2), entry))
+        if bundle.bundle_name in entries:
+            files.extend((t, "bundle", t + ".json")
+                         for t in bundle.open_bundle(path).times())
+        for stime, ext, entry in files:
+            if exts is not None and ("json" if ext == "bundle" else
+                                     ext) not in exts:
+                continue
+            t = np.datetime64(pd.Timestamp(stime), "m")
+            if (t0 is not None and t < t0) or (t1 is not None and t > t1):
+                continue
+            prev = found.get(t)
+            if prev is None or _PRIORITY[ext] < _PRIORITY[prev[0]]:
+                found[t] = (ext, os.path.join(path, entry))
+    return [(t, found[t][1]) for t in sorted(found)]
+
+
+def missing_times(archive_dir, time_sta, time_end, time_step, exts=None):
+    """期間[time_sta, time_end]でtime_step毎の時刻のうち、ファイルが無い時刻を返す
+
+    ファイルの有無は日付別ディレクトリの一覧から判断する（時刻毎にstatしない）
+
+    Parameters:
+    ----------
+    archive_dir: str
+        アーカイブのトップディレクトリ
+    time_sta: str or datetime
+        開始時刻
+    time_end: str or datetime
+        終了時刻
+    time_step: timedelta
+        時刻の間隔
+    exts: list(str)
+        対象とする拡張子（Noneの場合はnpz、csv、jsonのいずれか）
+    ----------
+    Returns:
+    ----------
+    ndarray(datetime64[m])
+        ファイルが無い時刻（時刻順）
+    ----------
+    """
+    t0 = to_minutes(time_sta)
+    t1 = to_minutes(time_end)
+    step = pd.Timedelta(time_step).to_timedelta64().astype("timedelta64[m]")
+    slots = np.arange(t0, t1 + step, step)
+    slots = slots[slots <= t1]
+    present = np.array(
+        [t for t, _ in list_snapshots(archive_dir, t0, t1, exts=exts)],
+        dtype="datetime64[m]")
+    return slots[~np.isin(slots, present)]
+
+
+def backfill_queue(archive_dir,
+                   time_sta,
+                   time_end,
+                   time_step,
+                   exts=None,
+                   limit=None):
+    """欠けている時刻を新しい順に並べた取得キューを返す
+
+    気象庁のサーバーには最近のファイルしか置かれていないため、
+    消える前に新しい時刻から取得する
+
+    Parameters:
+    ----------
+    archive_dir: str
+        アーカイブのトップディレクトリ
+    time_sta: str or datetime
+        開始時刻
+    time_end: str or datetime
+        終了時刻
+    time_step: timedelta
+        時刻の間隔
+    exts: list(str)
+        対象とする拡張子（Noneの場合はnpz、csv、jsonのいずれか）
+    limit: int
+        キューの長さの上限（Noneの場合は制限なし）
+    ----------
+    Returns:
+    ----------
+    ndarray(datetime64[m])
+        取得する時刻（新しい順）
+    ----------
+    """
+    queue = missing_times(archive_dir, time_sta, time_end, time_step,
+                          exts=exts)[::-1]
+    if limit is not None:
+        queue = queue[:limit]
+    return queue
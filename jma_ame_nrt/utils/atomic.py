@@ -0,0 +1,31 @@
+#
+#  2026/10/18
+#  ファイルを置き換える（書き込み途中のファイルを他のプロセスに読ませない）
+#
+import os
+import threading
+
+
+def write_atomic(output_filename, data):
+    """一時ファイルに書き込んでから置き換える（書き込み途中のファイルは残さない）
+
+    Parameters:
+    ----------
+    output_filename: str
+        出力ファイル名
+    data: bytes
+        書き込む内容
+    ----------
+    """
+    # 複数のプロセス・スレッドが同じファイルを書く場合に一時ファイルが衝突しない
+    # ように、プロセスIDとスレッドIDを付ける
+    tmp = "{}.{}.{}.tmp".format(output_filename, os.getpid(),
+                                threading.get_ident())
+    try:
+        with open(tmp, 'wb') as fout:
+            fout.write(data)
+        os.replace(tmp, output_filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
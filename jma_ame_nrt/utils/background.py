@@ -0,0 +1,380 @@
+#
+#  2026/10/18
+#  地図の背景（経度・緯度線、陸・海・海岸線、都道府県境）を1回だけ画像に描き、
+#  同じ領域・スタイル・図の大きさ・解像度の図で使い回す
+#
+#  キャッシュのキーは、領域（MapRegion）、背景を描く関数の名前と引数、
+#  投影法、図の大きさ・位置・解像度、matplotlib・cartopyの版とversion。
+#  背景を描く関数（draw_background、add_prefなど）やrcParamsを変えた場合は
+#  versionを増やす（またはキャッシュを消す）
+#
+#  保存した画像は、最後に使ってからmax_age_default秒経ったもの、
+#  max_files_defaultを超えた古いものから削除する
+#
+import os
+import io
+import sys
+import time
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+import matplotlib
+from matplotlib.artist import Artist, allow_rasterization
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import Bbox
+from PIL import Image
+from .atomic import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# 背景の画像を保存する既定のディレクトリ
+cache_dir_default = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "jma_draw", "background")
+# 背景の描き方（このファイル、各プログラムのdraw_background、utils/pref.py
+# などの背景を描く関数）やrcParamsを変えた場合に増やす
+version = 2
+# 保存する背景の画像の数
+max_files_default = 100
+# 使われていない背景の画像を削除するまでの時間（秒）
+max_age_default = 30 * 86400.
+
+
+def background_key(region, draw_func, style, figsize, rect, dpi,
+                   projection=None):
+    """背景の画像のキー（SHA-256）
+
+    Parameters:
+    ----------
+    region: jmaloc.MapRegion
+        作図範囲
+    draw_func: function
+        背景を描く関数（draw_func(ax, region, **style)、キーには名前のみを
+        含める）
+    style: dict
+        draw_funcに渡す引数
+    figsize: tuple(float)
+        図の大きさ（インチ）
+    rect: tuple(float)
+        地図のAxesの位置（図に対する割合）
+    dpi: int
+        解像度
+    projection: cartopy.crs.Projection
+        地図の投影法
+    ----------
+    """
+    cartopy = sys.modules.get("cartopy")
+    desc = dict(version=version,
+                region=vars(region),
+                draw_func=draw_func.__module__ + "." + draw_func.__qualname__,
+                style=style,
+                figsize=list(figsize),
+                rect=list(rect),
+                dpi=dpi,
+                projection=getattr(projection, "proj4_init", str(projection)),
+                matplotlib=matplotlib.__version__,
+                cartopy=getattr(cartopy, "__version__", None))
+    data = json.dumps(desc, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _map_axes(fig, rect, region, projection):
+    """作図範囲を設定した地図のAxes"""
+    ax = fig.add_axes(rect, projection=projection)
+    if projection is None:
+        # 投影法を使わない場合（経度・緯度をそのまま座標とする）
+        ax.set_xlim(region.lon_min, region.lon_max)
+        ax.set_ylim(region.lat_min, region.lat_max)
+    else:
+        ax.set_extent(
+            [region.lon_min, region.lon_max, region.lat_min, region.lat_max])
+    return ax
+
+
+def render_background(region, draw_func, style, figsize, rect, dpi,
+                      projection):
+    """背景だけの図を描き、画像とbbox_inches='tight'の範囲を返す
+
+    Returns:
+    ----------
+    ndarray(uint8)
+        図全体の画像（高さ, 幅, RGBA）
+    tuple(float)
+        経度・緯度線のラベルを含む範囲（x0, y0, 幅, 高さ、インチ）
+    ----------
+    """
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = _map_axes(fig, rect, region, projection)
+    draw_func(ax, region, **style)
+    # 地図の枠はデータの上に描くため、使う側のAxesで描く
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    canvas.draw()
+    img = np.asarray(canvas.buffer_rgba()).copy()
+    bbox = fig.get_tightbbox(canvas.get_renderer())
+    return img, tuple(bbox.bounds)
+
+
+class BackgroundCache():
+    """背景の画像をディスク（PNG）とメモリに保存する
+
+    Parameters:
+    ----------
+    cache_dir: str
+        保存するディレクトリ（Noneの場合はcache_dir_default）
+    max_files: int
+        保存する画像の数（超えた場合は最後に使った時刻が古いものから削除する）
+    max_age: float
+        最後に使ってから削除するまでの時間（秒）
+    ----------
+    """
+    def __init__(self,
+                 cache_dir=None,
+                 max_files=max_files_default,
+                 max_age=max_age_default):
+        if cache_dir is None:
+            cache_dir = cache_dir_default
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.max_age = max_age
+        self._memo = dict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def _load(self, path):
+        """保存した画像と範囲（無い・削除された場合はNone）"""
+        try:
+            with open(path + ".json", 'rt') as fin:
+                bounds = tuple(json.load(fin)["bbox"])
+            img = np.asarray(Image.open(path).convert("RGBA"))
+            # 最後に使った時刻（削除する順序に使う）
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return img, bounds
+
+    def cleanup(self, now=None):
+        """古い画像を削除する（最後に使ってからmax_age秒経ったもの、
+        max_filesを超えた分）
+
+        Returns:
+        ----------
+        int
+            削除した画像の数
+        ----------
+        """
+        if now is None:
+            now = time.time()
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return 0
+        for name in names:
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        # 新しい順
+        entries.sort(reverse=True)
+        removed = 0
+        for n, (mtime, path) in enumerate(entries):
+            if n < self.max_files and now - mtime <= self.max_age:
+                continue
+            for f in (path, path + ".json"):
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+            removed += 1
+        return removed
+
+    def get(self, region, draw_func, style, figsize, rect, dpi, projection):
+        """背景の画像とbbox_inches='tight'の範囲を返す（無ければ描く）"""
+        key = background_key(region, draw_func, style, figsize, rect, dpi,
+                             projection)
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+            path = self._path(key)
+            loaded = self._load(path)
+            if loaded is None:
+                logger.info("render background %s %s", region.sta, key[:12])
+                img, bounds = render_background(region, draw_func, style,
+                                                figsize, rect, dpi,
+                                                projection)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                buf = io.BytesIO()
+                Image.fromarray(img).save(buf, format="PNG")
+                # 範囲を先に書く（画像があれば範囲もある）
+                write_atomic(path + ".json",
+                             json.dumps(dict(bbox=bounds)).encode())
+                write_atomic(path, buf.getvalue())
+                loaded = (img, bounds)
+                self.cleanup()
+            self._memo[key] = loaded
+            return self._memo[key]
+
+
+class BackgroundImage(Artist):
+    """図全体の大きさの画像を、拡大・縮小せずに図の左下に合わせて描く
+
+    （bbox_inchesで切り取る場合も、transFigureに合わせて移動する）
+
+    Parameters:
+    ----------
+    img: ndarray(uint8)
+        図全体の画像（高さ, 幅, RGBA）
+    kwargs: dict
+        Artistのプロパティ（zorderなど）
+    ----------
+    """
+    def __init__(self, img, **kwargs):
+        super().__init__()
+        # draw_imageは下の行から並べた配列を使う
+        self._img = np.ascontiguousarray(img[::-1])
+        self.update(kwargs)
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        trans = self.figure.transFigure
+        x0, y0 = trans.transform((0., 0.))
+        x1, y1 = trans.transform((1., 1.))
+        img = self._img
+        # 図の大きさ（ピクセル）はAggと同じく切り捨てる
+        width = int(x1 - x0)
+        height = int(y1 - y0)
+        if (height, width) != img.shape[:2]:
+            # 背景を描いた時と異なる解像度で描く場合
+            img = np.array(
+                Image.fromarray(img).resize((width, height),
+                                            Image.Resampling.BILINEAR))
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, int(round(x0)), int(round(y0)), img)
+        gc.restore()
+        self.stale = False
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def background_cache():
+    """プロセス内で共有するBackgroundCache"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = BackgroundCache()
+        return _shared
+
+
+def map_axes(fig,
+             rect,
+             region,
+             draw_func,
+             style=None,
+             projection=None,
+             dpi=300,
+             cache=None):
+    """背景を描いた地図のAxesを作る
+
+    背景はキャッシュした画像を図全体に置き、その上に透明な地図のAxesを作る
+    （データはこのAxesに描く）
+
+    Parameters:
+    ----------
+    fig: matplotlib Figure
+        図（figsizeはキャッシュのキーに含める）
+    rect: tuple(float)
+        地図のAxesの位置（図に対する割合）
+    region: jmaloc.MapRegion
+        作図範囲
+    draw_func: function
+        背景を描く関数（draw_func(ax, region, **style)）
+    style: dict
+        draw_funcに渡す引数
+    projection: cartopy.crs.Projection
+        地図の投影法（Noneの場合は経度・緯度をそのまま座標とするAxes）
+    dpi: int
+        書き出す解像度（savefigで同じ値を使う）
+    cache: BackgroundCache or bool
+        使うキャッシュ（Noneの場合はbackground_cache()、Falseの場合は
+        キャッシュを使わずに背景を描く）
+    ----------
+    Returns:
+    ----------
+    matplotlib Axes
+    ----------
+    """
+    if style is None:
+        style = dict()
+    if cache is False:
+        ax = _map_axes(fig, rect, region, projection)
+        draw_func(ax, region, **style)
+        return ax
+    if cache is None:
+        cache = background_cache()
+    figsize = tuple(fig.get_size_inches())
+    img, bounds = cache.get(region, draw_func, style, figsize, rect, dpi,
+                            projection)
+    # 背景の画像（図全体に置き、書き出す範囲には含めない）
+    bg = BackgroundImage(img, zorder=-1)
+    bg.set_in_layout(False)
+    fig.add_artist(bg)
+    # 背景の経度・緯度線のラベルを含む範囲を、書き出す範囲に含める
+    x0, y0, width, height = bounds
+    fig.add_artist(
+        Rectangle((x0 / figsize[0], y0 / figsize[1]),
+                  width / figsize[0],
+                  height / figsize[1],
+                  transform=fig.transFigure,
+                  fill=False,
+                  edgecolor='none',
+                  linewidth=0))
+    ax = _map_axes(fig, rect, region, projection)
+    ax.patch.set_visible(False)
+    return ax
+
+
+def savefig(fig, output_filename, dpi=300, pad_inches=None):
+    """bbox_inches='tight'と同じ範囲で書き出す
+
+    背景の画像とずれないように、範囲の端をピクセルの境界に合わせる
+
+    Parameters:
+    ----------
+    fig: matplotlib Figure
+        図
+    output_filename: str
+        出力ファイル名
+    dpi: int
+        解像度（map_axesと同じ値）
+    pad_inches: float
+        範囲の余白（インチ、Noneの場合はrcParams['savefig.pad_inches']）
+    ----------
+    """
+    if pad_inches is None:
+        pad_inches = matplotlib.rcParams['savefig.pad_inches']
+    fig.set_dpi(dpi)
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(pad_inches)
+    # 左下の端をピクセルの境界に合わせ、幅・高さはbbox_inches='tight'と同じ
+    # ピクセル数にする（Aggは幅・高さを切り捨てるため、右端・上端は
+    # 計算誤差で1ピクセル狭くならないように半ピクセル広げる）
+    eps = 1e-6
+    x0, y0 = np.floor(np.array([bbox.x0, bbox.y0]) * dpi + eps)
+    width, height = np.floor(np.array([bbox.width, bbox.height]) * dpi + eps)
+    x1, y1 = x0 + width + 0.5, y0 + height + 0.5
+    fig.savefig(output_filename,
+                dpi=dpi,
+                bbox_inches=Bbox([[x0 / dpi, y0 / dpi], [x1 / dpi, y1 / dpi]]))
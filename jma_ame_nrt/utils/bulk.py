@@ -0,0 +1,223 @@
+#
+#  2026/10/18
+#  複数時刻のアメダスデータファイルをプロセス並列で読み込み、
+#  (時刻, 地点)配列に積み重ねる
+#
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from . import decoder
+from .archive import to_minutes
+
+# 既定のプロセス数（Noneの場合はCPUのコア数）
+max_workers_default = None
+# 1つのプロセスにまとめて渡すファイル数
+_CHUNKSIZE = 4
+# 読み込めなかったファイルを個別に表示する数
+_NREPORT = 10
+
+
+class AmedasStack():
+    """(時刻, 地点, 変数)に積み重ねたアメダスデータ
+
+    地点は全ての時刻の地点番号の和集合（地点番号順）で、
+    ある時刻に無い地点やファイルが無い時刻は欠損値とする
+
+    Parameters:
+    ----------
+    times: ndarray(datetime64[m])
+        時刻
+    staid: ndarray(str)
+        地点番号
+    lon: ndarray(float32)
+        経度
+    lat: ndarray(float32)
+        緯度
+    enname: ndarray(str)
+        英語の地点名
+    names: list(str)
+        変数名
+    values: ndarray(float32)
+        (時刻, 地点, 変数)の値（品質フラグが0以外は欠損値）
+    missing: list(str)
+        読み込めなかったファイル名
+    valid: ndarray(bool)
+        各時刻のファイルを読み込めたかどうか
+    ----------
+    """
+    def __init__(self, times, staid, lon, lat, enname, names, values,
+                 missing, valid):
+        self.times = times
+        self.staid = staid
+        self.lon = lon
+        self.lat = lat
+        self.enname = enname
+        self.names = list(names)
+        self.values = values
+        self.missing = missing
+        self.valid = valid
+
+    def get(self, name):
+        """1変数の(時刻, 地点)配列を返す"""
+        return self.values[:, :, self.names.index(name)]
+
+    def wind(self):
+        """(時刻, 地点)の東西風、南北風を返す"""
+        return decoder.uv(self.get("wind"), self.get("windDirection"))
+
+    def series(self, stations):
+        """指定した地点の(時刻, 地点, 変数)配列を返す（無い地点は欠損値）
+
+        Parameters:
+        ----------
+        stations: list(str)
+            地点番号または英語の地点名
+        ----------
+        """
+        lookup = {name: n for n, name in enumerate(self.enname)}
+        lookup.update({staid: n for n, staid in enumerate(self.staid)})
+        pos = np.array([lookup.get(str(sta), -1) for sta in stations],
+                       dtype=np.int64)
+        for sta in np.asarray(stations)[pos < 0]:
+            print("Warn: station not found", sta)
+        d = np.full((len(self.times), len(stations), len(self.names)),
+                    np.nan,
+                    dtype=np.float32)
+        found = np.nonzero(pos >= 0)[0]
+        d[:, found] = self.values[:, pos[found]]
+        return d
+
+
+def _decode(args):
+    """1時刻分のファイルを読み込む（ワーカープロセスで実行）"""
+    input_filename, names, stations = args
+    try:
+        amedas = decoder.read(input_filename, names, stations=stations)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        return input_filename, str(e)
+    values = np.stack([amedas.get(name) for name in names], axis=1)
+    enname = amedas.enname
+    if enname is None:
+        enname = np.full(len(amedas), "", dtype=str)
+    return input_filename, (np.asarray(amedas.staid, dtype=str), amedas.lon,
+                            amedas.lat, np.asarray(enname,
+                                                   dtype=str), values)
+
+
+def time_range(time_sta, time_end, time_step):
+    """開始時刻から終了時刻までtime_step毎の時刻を返す"""
+    return list(
+        pd.date_range(pd.Timestamp(time_sta), pd.Timestamp(time_end),
+                      freq=pd.Timedelta(time_step)))
+
+
+def read_files(input_filenames,
+               names,
+               times=None,
+               max_workers=None,
+               stations=None):
+    """複数時刻のファイルをプロセス並列で読み込む
+
+    Parameters:
+    ----------
+    input_filenames: list(str)
+        時刻順の入力ファイル名（csv、npzまたはjson）
+    names: list(str)
+        取り出す変数名
+    times: list(datetime)
+        各ファイルの時刻（Noneの場合はファイル名から求める）
+    max_workers: int
+        プロセス数（Noneの場合はmax_workers_default、1の場合は並列化しない）
+    stations: list(str)
+        読み込む地点の地点番号または英語の地点名（Noneの場合は全ての地点、
+        指定した場合はその地点のみ変換する）
+    ----------
+    Returns:
+    ----------
+    AmedasStack
+    ----------
+    """
+    names = list(names)
+    if times is None:
+        times = [
+            os.path.splitext(os.path.basename(f))[0] for f in input_filenames
+        ]
+    times = np.array([to_minutes(t) for t in times], dtype="datetime64[m]")
+    if max_workers is None:
+        max_workers = max_workers_default
+    tasks = [(f, names, stations) for f in input_filenames]
+    if max_workers == 1 or len(tasks) <= 1:
+        results = list(map(_decode, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_decode, tasks, chunksize=_CHUNKSIZE))
+    # 全時刻の地点番号の和集合
+    missing = []
+    info = dict()
+    for input_filename, r in results:
+        if isinstance(r, str):
+            if len(missing) < _NREPORT:
+                print("Warn: cannot read", input_filename, r)
+            missing.append(input_filename)
+            continue
+        for staid, lon, lat, enname in zip(*r[:4]):
+            if staid not in info:
+                info[staid] = (lon, lat, enname)
+    if len(missing) > 0:
+        print("Warn: cannot read", len(missing), "of", len(results), "files")
+    staid = np.array(sorted(info), dtype=str)
+    lon = np.array([info[s][0] for s in staid], dtype=np.float32)
+    lat = np.array([info[s][1] for s in staid], dtype=np.float32)
+    enname = np.array([info[s][2] for s in staid], dtype=str)
+    values = np.full((len(times), len(staid), len(names)),
+                     np.nan,
+                     dtype=np.float32)
+    valid = np.array([not isinstance(r, str) for _, r in results], dtype=bool)
+    for t in np.nonzero(valid)[0]:
+        r = results[t][1]
+        values[t, np.searchsorted(staid, r[0])] = r[4]
+    return AmedasStack(times, staid, lon, lat, enname, names, values,
+                       missing, valid)
+
+
+def read_range(time_sta,
+               time_end,
+               time_step,
+               names,
+               input_dir=".",
+               max_workers=None):
+    """時刻範囲を指定してファイルをプロセス並列で読み込む
+
+    入力ファイル名はinput_dir/時刻.csv（npzがあればnpzを使う）
+
+    Parameters:
+    ----------
+    time_sta: str or datetime
+        開始時刻
+    time_end: str or datetime
+        終了時刻
+    time_step: timedelta
+        時刻の間隔
+    names: list(str)
+        取り出す変数名
+    input_dir: str
+        入力ファイルのディレクトリ
+    max_workers: int
+        プロセス数（Noneの場合はmax_workers_default）
+    ----------
+    Returns:
+    ----------
+    AmedasStack
+    ----------
+    """
+    time_list = time_range(time_sta, time_end, time_step)
+    input_filenames = [
+        os.path.join(input_dir,
+                     t.strftime("%Y%m%d%H%M%S") + ".csv") for t in time_list
+    ]
+    return read_files(input_filenames,
+                      names,
+                      times=time_list,
+                      max_workers=max_workers)
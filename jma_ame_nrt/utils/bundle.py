@@ -0,0 +1,298 @@
+#
+#  2026/10/18
+#  1日分のアメダスデータ（日付別/a/時刻.json）を1つの圧縮ファイルにまとめる
+#
+#  形式：先頭に_MAGIC、続いてファイル毎に圧縮した内容、最後に索引（JSON）と
+#        フッタ（索引の位置と長さ、_INDEX_MAGIC）。索引からファイル毎に読み出せる
+#
+import io
+import os
+import re
+import gzip
+import json
+import struct
+import hashlib
+import pandas as pd
+from jmaloc.geometry import parse_table
+from .atomic import write_atomic
+from .meta import metadata_cache
+try:
+    # zstandardがあれば使う（無い場合はgzip）
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# まとめたファイルの名前（日付別/aに置く）
+bundle_name = "snapshots.bundle"
+# 日付別ディレクトリ名（yymmdd）
+_DATE_DIR = re.compile(r"^\d{6}$")
+# 既定の圧縮形式
+codec_default = "zstd" if zstandard is not None else "gzip"
+# zstdの圧縮レベル
+zstd_level = 10
+
+_MAGIC = b"AMDBNDL1"
+_INDEX_MAGIC = b"AMDBIDX1"
+# フッタ（索引の位置、索引の長さ、_INDEX_MAGIC）
+_FOOTER = struct.Struct("<QQ8s")
+# まとめるファイル名（時刻.json）
+_DATA_FILE = re.compile(r"^(\d{14})\.json$")
+# まとめた後に削除するファイル名（時刻.json、csv、npz）
+_DERIVED_FILE = re.compile(r"^(\d{14})\.(json|csv|npz)$")
+_TABLE = "amedastable.json"
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, mtime=0)
+    raise ValueError("unknown codec: " + str(codec))
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is needed to read zstd bundles")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    raise ValueError("unknown codec: " + str(codec))
+
+
+class DayBundle():
+    """まとめたファイルから個別のファイルを読み出す
+
+    Parameters:
+    ----------
+    path: str
+        まとめたファイルのパス
+    ----------
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fin:
+            if fin.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("not a bundle: " + path)
+            fin.seek(-_FOOTER.size, os.SEEK_END)
+            offset, length, magic = _FOOTER.unpack(fin.read(_FOOTER.size))
+            if magic != _INDEX_MAGIC:
+                raise ValueError("broken bundle: " + path)
+            fin.seek(offset)
+            index = json.loads(fin.read(length))
+        self.codec = index["codec"]
+        # ファイル名: [位置, 圧縮後の長さ, 元の長さ, チェックサム]
+        self.members = index["members"]
+        self._table = None
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def names(self):
+        """まとめたファイル名を返す"""
+        return sorted(self.members)
+
+    def times(self):
+        """まとめたデータの時刻（yyyymmddhhMMss）を返す"""
+        return [
+            m.group(1) for m in map(_DATA_FILE.match, self.names())
+            if m is not None
+        ]
+
+    def read(self, name):
+        """1つのファイルの内容を返す"""
+        offset, length, size, digest = self.members[name]
+        with open(self.path, 'rb') as fin:
+            fin.seek(offset)
+            data = _decompress(fin.read(length), self.codec)
+        if len(data) != size:
+            raise ValueError("broken member: " + name + " in " + self.path)
+        return data
+
+    def checksum(self, name):
+        """ファイルのチェックサム（SHA-256）を返す"""
+        return self.members[name][3]
+
+    def table(self):
+        """まとめたamedastable.jsonの地点情報を返す（無い場合はNone）"""
+        if self._table is None and _TABLE in self.members:
+            raw = self.read(_TABLE)
+            version = hashlib.sha1(raw).hexdigest()[:16]
+            self._table = parse_table(json.loads(raw), version=version)
+        return self._table
+
+
+def write_bundle(output_filename, members, codec=None):
+    """ファイルをまとめて書き出す（一時ファイルに書き込んでから置き換える）
+
+    Parameters:
+    ----------
+    output_filename: str
+        出力ファイル名
+    members: dict
+        ファイル名と内容（bytes）
+    codec: str
+        圧縮形式（zstdまたはgzip、Noneの場合はcodec_default）
+    ----------
+    """
+    if codec is None:
+        codec = codec_default
+    index = dict(codec=codec, members=dict())
+    fout = io.BytesIO()
+    fout.write(_MAGIC)
+    for name in sorted(members):
+        data = members[name]
+        comp = _compress(data, codec)
+        index["members"][name] = [
+            fout.tell(),
+            len(comp),
+            len(data),
+            hashlib.sha256(data).hexdigest()
+        ]
+        fout.write(comp)
+    offset = fout.tell()
+    raw = json.dumps(index).encode()
+    fout.write(raw)
+    fout.write(_FOOTER.pack(offset, len(raw), _INDEX_MAGIC))
+    write_atomic(output_filename, fout.getvalue())
+
+
+# 開いたまとめたファイル（パス、更新時刻毎）
+_memo = dict()
+
+
+def open_bundle(day_dir):
+    """日付別ディレクトリのまとめたファイルを開く（無い場合はNone）"""
+    path = os.path.join(day_dir, bundle_name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if key not in _memo:
+        _memo[key] = DayBundle(path)
+    return _memo[key]
+
+
+def find(input_filename):
+    """入力ファイル（時刻.csvなど）が無い場合に、同じ時刻のJSONを含む
+    まとめたファイルを探す
+
+    Returns:
+    ----------
+    bundle: DayBundle
+        まとめたファイル（無い場合はNone）
+    name: str
+        まとめたファイル中のファイル名
+    ----------
+    """
+    day_dir, base = os.path.split(input_filename)
+    name = os.path.splitext(base)[0] + ".json"
+    bundle = open_bundle(day_dir)
+    if bundle is None or name not in bundle:
+        return None, name
+    return bundle, name
+
+
+def compact(day_dir, codec=None, remove=True):
+    """日付別ディレクトリの時刻.jsonとamedastable.jsonを1つにまとめる
+
+    既にまとめたファイルがある場合は、その内容に追加する。
+    地点情報がハッシュ値（以前の版で作成したamedastable.json.sha256）のみの
+    場合は、その版をメタデータのキャッシュから入れる（まとめたファイルだけで
+    読み込めるように）。
+    まとめた内容を読み出して確認してから、元のファイル（時刻.json、csv、npz）を
+    削除する（amedastable.jsonとハッシュ値のファイルは残す）
+
+    Parameters:
+    ----------
+    day_dir: str
+        日付別ディレクトリ（日付別/a）
+    codec: str
+        圧縮形式（Noneの場合はcodec_default）
+    remove: bool
+        元のファイルを削除するかどうか
+    ----------
+    Returns:
+    ----------
+    int
+        まとめた時刻の数
+    ----------
+    """
+    members = dict()
+    bundle = open_bundle(day_dir)
+    if bundle is not None:
+        for name in bundle.names():
+            members[name] = bundle.read(name)
+    entries = sorted(os.listdir(day_dir))
+    for entry in entries:
+        if _DATA_FILE.match(entry) or entry == _TABLE:
+            with open(os.path.join(day_dir, entry), 'rb') as fin:
+                members[entry] = fin.read()
+    # 地点情報がハッシュ値のみの場合は、取得時の版をキャッシュから入れる
+    cached = None
+    if _TABLE not in members:
+        cached = metadata_cache().resolve(os.path.join(day_dir, _TABLE))
+    if cached is not None:
+        with open(cached, 'rb') as fin:
+            members[_TABLE] = fin.read()
+    ntimes = sum(1 for name in members if _DATA_FILE.match(name))
+    if ntimes == 0:
+        return 0
+    path = os.path.join(day_dir, bundle_name)
+    write_bundle(path, members, codec=codec)
+    # 読み出して確認する
+    bundle = open_bundle(day_dir)
+    for name, data in members.items():
+        if bundle.read(name) != data:
+            raise ValueError("verification failed: " + name + " in " + path)
+    if remove:
+        for entry in entries:
+            m = _DERIVED_FILE.match(entry)
+            # JSONをまとめた時刻のみ削除する
+            if m is not None and m.group(1) + ".json" in members:
+                os.remove(os.path.join(day_dir, entry))
+    return ntimes
+
+
+def compact_archive(archive_dir, before, codec=None, remove=True):
+    """日付がbeforeより前の日付別ディレクトリを全てまとめる
+
+    Parameters:
+    ----------
+    archive_dir: str
+        アーカイブのトップディレクトリ
+    before: str or datetime
+        この日付より前の（取得が終わった）日付のみまとめる
+    codec: str
+        圧縮形式（Noneの場合はcodec_default）
+    remove: bool
+        元のファイルを削除するかどうか
+    ----------
+    Returns:
+    ----------
+    list(str)
+        まとめた日付別ディレクトリ
+    ----------
+    """
+    d1 = pd.Timestamp(before).strftime("%y%m%d")
+    done = []
+    try:
+        dates = sorted(d for d in os.listdir(archive_dir) if _DATE_DIR.match(d))
+    except FileNotFoundError:
+        return done
+    for d in dates:
+        if d >= d1:
+            continue
+        day_dir = os.path.join(archive_dir, d, "a")
+        try:
+            entries = os.listdir(day_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        # まとめていない時刻がある場合のみ
+        if not any(_DATA_FILE.match(entry) for entry in entries):
+            continue
+        n = compact(day_dir, codec=codec, remove=remove)
+        print("compact", day_dir, n, "times")
+        done.append(day_dir)
+    return done
@@ -4,7 +4,7 @@
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 import numpy as np
-from matplotlib.colors import ListedColormap
+from matplotlib.colors import ListedColormap, to_rgba_array
 from .cutil import ColUtils
 
 
@@ -52,6 +52,24 @@ class val2col():
         n = max(min(n, self.cm.N), 0)
         return self.cm(int(n))
 
+    def conv_array(self, vals):
+        """データの配列をまとめてカラーに変換（convと同じ色）
+
+        Parameters:
+        ----------
+        vals: ndarray
+            データ（欠損値を含まない）
+        ----------
+        Returns:
+        ----------
+        ndarray
+            RGBAの配列（データ数, 4）
+        ----------
+        """
+        n = (np.asarray(vals) - self.tmin) / (self.tmax - self.tmin) * self.cm.N
+        n = np.clip(n, 0, self.cm.N)
+        return self.cm(n.astype(int))
+
     def colorbar(self,
                  fig=None,
                  anchor=(0.35, 0.24),
@@ -176,6 +194,29 @@ class collevs():
                 col = self.ccols[n]
         return col
 
+    def conv_array(self, vals):
+        """データの配列をまとめてカラーに変換（convと同じ色）
+
+        Parameters:
+        ----------
+        vals: ndarray
+            データ（欠損値を含まない）
+        ----------
+        Returns:
+        ----------
+        ndarray
+            RGBAの配列（データ数, 4）、clevsの上限以上は最後の色
+        ----------
+        """
+        vals = np.asarray(vals)
+        dtype = vals.dtype if vals.dtype.kind == "f" else np.float64
+        clevs = np.asarray(self.clevs, dtype=dtype)
+        n = np.searchsorted(clevs, vals, side='right') - 1
+        n = np.minimum(n, len(self.ccols) - 1)
+        # 下限未満は灰色（n = -1の位置に置く）
+        table = to_rgba_array(list(self.ccols) + ['gray'])
+        return table[n]
+
     def colorbar(self,
                  fig=None,
                  anchor=(0.35, 0.24),
@@ -0,0 +1,426 @@
+#
+#  2026/10/18
+#  アメダスデータを(時刻, 地点, 変数)のfloat32配列（memmap）として保持する
+#
+import os
+import json
+import fcntl
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from . import decoder
+from .archive import list_snapshots, to_minutes
+from .atomic import write_atomic
+
+# 既定で格納する変数
+CUBE_NAMES = [
+    "temp", "precipitation10m", "precipitation1h", "precipitation3h",
+    "precipitation24h", "wind", "windDirection", "humidity", "pressure",
+    "sun10m"
+]
+
+# 地点を追加する際に一度に書き換える時刻の数
+grow_chunk = 256
+
+
+class AmedasCube():
+    """アメダスデータの(時刻, 地点, 変数)配列
+
+    cube_dirに次のファイルを作成する
+        meta.json: 変数名と、地点・値のファイル名
+        stations.npz: 地点番号、経度、緯度、英語の地点名
+        times.i8: 時刻（datetime64[m]、int64）
+        values.f32: (時刻, 地点, 変数)の値（品質フラグが0以外は欠損値）
+        lock: 書き込み時のロック（cronと常駐プログラムが同時に書き込まない）
+
+    配列に無い地点が現れた場合は、地点を追加した地点・値のファイル
+    （stations_地点数.npz、values_地点数.f32）を作り、meta.jsonを置き換える
+
+    Parameters:
+    ----------
+    cube_dir: str
+        配列を保存するディレクトリ
+    names: list(str)
+        格納する変数名（新規作成時のみ有効）
+    ----------
+    """
+    def __init__(self, cube_dir, names=None):
+        self.cube_dir = cube_dir
+        self.names = list(CUBE_NAMES if names is None else names)
+        self.staid = None
+        self.lon = None
+        self.lat = None
+        self.enname = None
+        self._files = ("stations.npz", "values.f32")
+        self._meta_stat = None
+        # 時刻から配列の位置を求める索引（times.i8の先頭から_tcount個分）
+        self._tindex = dict()
+        self._tcount = 0
+        self._refresh()
+
+    def _refresh(self):
+        """meta.jsonが変わっていれば地点を読み込み直す（他のプロセスで作成・
+        地点を追加した場合）"""
+        try:
+            st = os.stat(self._path("meta.json"))
+        except FileNotFoundError:
+            return
+        stat = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if stat == self._meta_stat:
+            return
+        with open(self._path("meta.json"), 'rt') as fin:
+            meta = json.loads(fin.read())
+        self.names = meta["names"]
+        self._files = (meta.get("stations", "stations.npz"),
+                       meta.get("values", "values.f32"))
+        with np.load(self._path(self._files[0])) as d:
+            self.staid = d["staid"]
+            self.lon = d["lon"]
+            self.lat = d["lat"]
+            self.enname = d["enname"]
+        self._meta_stat = stat
+        self._tindex = dict()
+        self._tcount = 0
+
+    @property
+    def _row_size(self):
+        """1時刻分のバイト数"""
+        return len(self.staid) * len(self.names) * 4
+
+    def _path(self, name):
+        return os.path.join(self.cube_dir, name)
+
+    @contextmanager
+    def _locked(self):
+        """書き込みの間、他のプロセスの書き込みを待たせる"""
+        if not os.path.isdir(self.cube_dir):
+            os.makedirs(self.cube_dir, exist_ok=True)
+        with open(self._path("lock"), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_meta(self, stations, values):
+        """meta.jsonを置き換える（地点・値のファイルを切り替える）"""
+        write_atomic(
+            self._path("meta.json"),
+            json.dumps({
+                "names": self.names,
+                "stations": stations,
+                "values": values
+            }).encode())
+
+    def _save_stations(self, stations, staid, lon, lat, enname):
+        with open(self._path(stations), 'wb') as fout:
+            np.savez(fout, staid=staid, lon=lon, lat=lat, enname=enname)
+
+    def _create(self, amedas):
+        """最初のデータの地点で配列を作成する"""
+        order = np.argsort(amedas.staid)
+        enname = amedas.enname
+        if enname is None:
+            enname = np.full(len(amedas), "", dtype=str)
+        self._save_stations("stations.npz", amedas.staid[order].astype(str),
+                            amedas.lon[order], amedas.lat[order],
+                            np.asarray(enname, dtype=str)[order])
+        open(self._path("times.i8"), 'wb').close()
+        open(self._path("values.f32"), 'wb').close()
+        self._write_meta("stations.npz", "values.f32")
+        self._refresh()
+
+    def _grow(self, amedas, new):
+        """配列に無い地点を追加する（値を並べ替えたファイルを作り、追加した
+        地点の値は欠損値とする）
+
+        新しいファイルを書き終えてからmeta.jsonを置き換えるため、途中で
+        止まっても元の配列は壊れない
+        """
+        enname = amedas.enname
+        if enname is None:
+            enname = np.full(len(amedas), "", dtype=str)
+        staid = np.concatenate([self.staid, amedas.staid[new].astype(str)])
+        order = np.argsort(staid, kind="stable")
+        nsta = len(staid)
+        stations = "stations_%d.npz" % nsta
+        values = "values_%d.f32" % nsta
+        self._save_stations(
+            stations, staid[order],
+            np.concatenate([self.lon, amedas.lon[new]])[order],
+            np.concatenate([self.lat, amedas.lat[new]])[order],
+            np.concatenate([self.enname,
+                            np.asarray(enname, dtype=str)[new]])[order])
+        # 既存の地点の新しい位置
+        pos = np.argsort(order)[:len(self.staid)]
+        nt = self._ntimes()
+        old = self.memmap()
+        with open(self._path(values), 'wb') as fout:
+            for n in range(0, nt, grow_chunk):
+                d = np.full((min(grow_chunk, nt - n), nsta, len(self.names)),
+                            np.nan,
+                            dtype="<f4")
+                d[:, pos] = old[n:n + grow_chunk]
+                fout.write(d.tobytes())
+        del old
+        old_files = self._files
+        self._write_meta(stations, values)
+        for name in old_files:
+            os.remove(self._path(name))
+        self._refresh()
+
+    def _ntimes(self):
+        """値の書き込みが完了している時刻の数"""
+        self._refresh()
+        if self.staid is None:
+            return 0
+        nt = os.path.getsize(self._path(self._files[1])) // self._row_size
+        return min(nt, os.path.getsize(self._path("times.i8")) // 8)
+
+    def times(self):
+        """格納されている時刻（datetime64[m]）を返す"""
+        nt = self._ntimes()
+        if nt == 0:
+            return np.array([], dtype="datetime64[m]")
+        t = np.fromfile(self._path("times.i8"), dtype="<i8", count=nt)
+        return t.astype("datetime64[m]")
+
+    def _find_time(self, t, nt):
+        """時刻の配列の位置を返す（無い場合はNone）
+
+        索引に無い時刻（他のプロセスが追加した分）だけをtimes.i8から読む
+        """
+        if nt < self._tcount:
+            self._tindex = dict()
+            self._tcount = 0
+        if nt > self._tcount:
+            with open(self._path("times.i8"), 'rb') as f:
+                f.seek(self._tcount * 8)
+                tail = np.frombuffer(f.read((nt - self._tcount) * 8),
+                                     dtype="<i8")
+            for n, ti in enumerate(tail.tolist(), self._tcount):
+                self._tindex.setdefault(ti, n)
+            self._tcount = nt
+        return self._tindex.get(t)
+
+    def append(self, time, amedas):
+        """1時刻分のデータを追加する（既にある時刻は上書き）
+
+        配列に無い地点は配列に追加する（それまでの時刻は欠損値）
+
+        Parameters:
+        ----------
+        time: str or datetime
+            時刻
+        amedas: decoder.AmedasData
+            1時刻分のアメダスデータ
+        ----------
+        Returns:
+        ----------
+        int
+            配列に追加した地点の数
+        ----------
+        """
+        with self._locked():
+            return self._append(time, amedas)
+
+    def _append(self, time, amedas):
+        self._refresh()
+        if self.staid is None:
+            self._create(amedas)
+        # 地点番号から配列の位置を求める
+        pos = np.searchsorted(self.staid, amedas.staid)
+        pos[pos >= len(self.staid)] = 0
+        found = self.staid[pos] == amedas.staid
+        added = 0
+        if not np.all(found):
+            # 同じ地点番号が重複していても1回だけ追加する
+            new = np.zeros(len(amedas), dtype=bool)
+            new[np.unique(amedas.staid, return_index=True)[1]] = True
+            new &= ~found
+            added = int(np.count_nonzero(new))
+            self._grow(amedas, new)
+            pos = np.searchsorted(self.staid, amedas.staid)
+            found = np.ones(len(amedas), dtype=bool)
+        row = np.full((len(self.staid), len(self.names)),
+                      np.nan,
+                      dtype="<f4")
+        for n, name in enumerate(self.names):
+            row[pos[found], n] = amedas.get(name)[found]
+        t = int(to_minutes(time).astype("<i8"))
+        nt = self._ntimes()
+        idx = self._find_time(t, nt)
+        if idx is not None:
+            with open(self._path(self._files[1]), 'r+b') as f:
+                f.seek(idx * self._row_size)
+                f.write(row.tobytes())
+        else:
+            # 書き込みが途中で止まった時刻は切り詰めてから追加する
+            with open(self._path(self._files[1]), 'r+b') as f:
+                f.truncate(nt * self._row_size)
+                f.seek(0, os.SEEK_END)
+                f.write(row.tobytes())
+            with open(self._path("times.i8"), 'r+b') as f:
+                f.truncate(nt * 8)
+                f.seek(0, os.SEEK_END)
+                f.write(np.array([t], dtype="<i8").tobytes())
+            self._tindex[t] = nt
+            self._tcount = nt + 1
+        return added
+
+    def memmap(self):
+        """(時刻, 地点, 変数)のmemmapを返す（時刻はtimes()の順）"""
+        nt = self._ntimes()
+        if nt == 0:
+            nsta = 0 if self.staid is None else len(self.staid)
+            return np.zeros((0, nsta, len(self.names)), dtype=np.float32)
+        return np.memmap(self._path(self._files[1]),
+                         dtype="<f4",
+                         mode='r',
+                         shape=(nt, len(self.staid), len(self.names)))
+
+    def _time_index(self, time_sta=None, time_end=None, time_step=None):
+        """時刻範囲に含まれる配列の位置を時刻順に返す"""
+        times = self.times()
+        sel = np.ones(len(times), dtype=bool)
+        if time_sta is not None:
+            sel &= times >= to_minutes(time_sta)
+        if time_end is not None:
+            sel &= times <= to_minutes(time_end)
+        if time_step is not None and np.any(sel):
+            # 開始時刻からtime_step毎の時刻のみ
+            t0 = times[sel].min() if time_sta is None else to_minutes(time_sta)
+            step = pd.Timedelta(time_step).to_timedelta64().astype(
+                "timedelta64[m]")
+            sel &= (times - t0) % step == np.timedelta64(0, "m")
+        idx = np.nonzero(sel)[0]
+        return idx[np.argsort(times[idx], kind="stable")], times
+
+    def _columns(self, names):
+        """変数名から配列の位置を返す"""
+        if names is None:
+            return list(range(len(self.names)))
+        return [self.names.index(name) for name in names]
+
+    def read(self, time_sta=None, time_end=None, names=None):
+        """時刻範囲を指定してデータを取り出す
+
+        Parameters:
+        ----------
+        time_sta: str or datetime
+            開始時刻（Noneの場合は最初から）
+        time_end: str or datetime
+            終了時刻（Noneの場合は最後まで）
+        names: list(str)
+            取り出す変数名（Noneの場合は全ての変数）
+        ----------
+        Returns:
+        ----------
+        times: ndarray(datetime64[m])
+            時刻（昇順）
+        d: ndarray(float32)
+            (時刻, 地点, 変数)の値
+        ----------
+        """
+        idx, times = self._time_index(time_sta, time_end)
+        cols = self._columns(names)
+        d = self.memmap()
+        if len(idx) > 0 and np.all(np.diff(idx) == 1):
+            # 連続した時刻はスライスで取り出す
+            d = d[idx[0]:idx[-1] + 1]
+        else:
+            d = d[idx]
+        return times[idx], np.asarray(d[:, :, cols])
+
+    def get(self, name, time_sta=None, time_end=None):
+        """1変数の(時刻, 地点)配列を返す"""
+        times, d = self.read(time_sta, time_end, names=[name])
+        return times, d[:, :, 0]
+
+    def station_index(self, stations):
+        """地点番号または英語の地点名から配列の位置を返す（無い地点は-1）
+
+        Parameters:
+        ----------
+        stations: list(str)
+            地点番号または英語の地点名
+        ----------
+        """
+        if self.staid is None:
+            return np.full(len(stations), -1, dtype=np.int64)
+        lookup = {name: n for n, name in enumerate(self.enname)}
+        lookup.update({staid: n for n, staid in enumerate(self.staid)})
+        return np.array([lookup.get(str(sta), -1) for sta in stations],
+                        dtype=np.int64)
+
+    def series(self,
+               stations,
+               names=None,
+               time_sta=None,
+               time_end=None,
+               time_step=None):
+        """指定した地点の時系列を取り出す（指定した地点の値のみ読み込む）
+
+        Parameters:
+        ----------
+        stations: list(str)
+            地点番号または英語の地点名
+        names: list(str)
+            取り出す変数名（Noneの場合は全ての変数）
+        time_sta: str or datetime
+            開始時刻（Noneの場合は最初から）
+        time_end: str or datetime
+            終了時刻（Noneの場合は最後まで）
+        time_step: timedelta
+            時刻の間隔（Noneの場合は全ての時刻）
+        ----------
+        Returns:
+        ----------
+        times: ndarray(datetime64[m])
+            時刻（昇順）
+        d: ndarray(float32)
+            (時刻, 地点, 変数)の値（配列に無い地点は欠損値）
+        ----------
+        """
+        idx, times = self._time_index(time_sta, time_end, time_step)
+        cols = self._columns(names)
+        pos = self.station_index(stations)
+        for sta in np.asarray(stations)[pos < 0]:
+            print("Warn: station not found", sta)
+        d = np.full((len(idx), len(stations), len(cols)),
+                    np.nan,
+                    dtype=np.float32)
+        if len(idx) > 0 and np.any(pos >= 0):
+            found = np.nonzero(pos >= 0)[0]
+            d[:, found] = self.memmap()[np.ix_(idx, pos[found], cols)]
+        return times[idx], d
+
+
+def build(archive_dir, cube_dir, time_sta=None, time_end=None, names=None):
+    """アーカイブのデータファイルから配列を作成する（既にある時刻は上書き）
+
+    Parameters:
+    ----------
+    archive_dir: str
+        アーカイブのトップディレクトリ
+    cube_dir: str
+        配列を保存するディレクトリ
+    time_sta: str or datetime
+        開始時刻（Noneの場合は制限なし）
+    time_end: str or datetime
+        終了時刻（Noneの場合は制限なし）
+    names: list(str)
+        格納する変数名（新規作成時のみ有効）
+    ----------
+    Returns:
+    ----------
+    AmedasCube
+    ----------
+    """
+    cube = AmedasCube(cube_dir, names=names)
+    for t, path in list_snapshots(archive_dir, time_sta, time_end):
+        print(path)
+        added = cube.append(t, decoder.read(path, cube.names))
+        if added > 0:
+            print("stations added to cube =", added)
+    return cube
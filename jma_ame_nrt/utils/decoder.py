@@ -0,0 +1,667 @@
+#
+#  2026/10/18
+#  アメダスデータ（[値, 品質フラグ]形式）を一括でndarrayに変換する
+#
+import io
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from jmaloc.geometry import load_table
+from . import bundle
+from .atomic import write_atomic
+from .meta import metadata_cache
+try:
+    # 高速なJSONライブラリがあれば使う
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# 地点情報の列（[値, 品質フラグ]形式ではない列）
+_INFO = ("lon", "lat", "alt", "type", "elems", "kjName", "knName", "enName")
+# 欠損セルの置き換え文字列（値：nan、品質フラグ：-1）
+_MISSING = "[nan, -1]"
+# JSONに変数が無い場合の[値, 品質フラグ]
+_NA = (None, -1)
+# 括弧と区切り記号を空白に置き換える変換表
+_TABLE = str.maketrans("[],", "   ")
+# 結合した文字列でセルを区切る記号（セル毎の値の数を確かめる）
+_SEP = "|"
+# 時・分を取り出す正規表現（csvの"{'hour': 14, 'minute': 20}"など）
+_HOUR_MINUTE = re.compile(r"'?hour'?\s*:\s*(\d+).*'?minute'?\s*:\s*(\d+)")
+
+# アメダスデータの変数（[値, 品質フラグ]形式、変数名: (単位, 内容)）
+SCHEMA = {
+    "temp": ("degC", "気温"),
+    "maxTemp": ("degC", "最高気温"),
+    "minTemp": ("degC", "最低気温"),
+    "humidity": ("%", "相対湿度"),
+    "pressure": ("hPa", "現地気圧"),
+    "normalPressure": ("hPa", "海面気圧"),
+    "wind": ("m/s", "風速"),
+    "windDirection": ("16方位", "風向（0は静穏）"),
+    "gust": ("m/s", "最大瞬間風速"),
+    "gustDirection": ("16方位", "最大瞬間風速の風向"),
+    "precipitation10m": ("mm", "10分間降水量"),
+    "precipitation1h": ("mm", "1時間降水量"),
+    "precipitation3h": ("mm", "3時間降水量"),
+    "precipitation24h": ("mm", "24時間降水量"),
+    "sun10m": ("min", "10分間日照時間"),
+    "sun1h": ("h", "1時間日照時間"),
+    "snow": ("cm", "積雪深"),
+    "snow1h": ("cm", "1時間降雪量"),
+    "snow6h": ("cm", "6時間降雪量"),
+    "snow12h": ("cm", "12時間降雪量"),
+    "snow24h": ("cm", "24時間降雪量"),
+    "visibility": ("m", "視程"),
+    "weather": ("", "天気"),
+}
+# 起時の変数（{"hour": 時, "minute": 分}形式、0時からの分に変換する）
+TIME_SCHEMA = {
+    "maxTempTime": ("min", "最高気温の起時"),
+    "minTempTime": ("min", "最低気温の起時"),
+    "gustTime": ("min", "最大瞬間風速の起時"),
+}
+
+
+def decode_pairs(cells):
+    """[値, 品質フラグ]形式の文字列をまとめて数値に変換する
+
+    Parameters:
+    ----------
+    cells: ndarray(object)
+        [値, 品質フラグ]形式の文字列（欠損はnan、None）
+    ----------
+    Returns:
+    ----------
+    ndarray(float32)
+        cells.shape + (2,)の配列（[..., 0]：値、[..., 1]：品質フラグ）
+    ----------
+    """
+    cells = np.asarray(cells, dtype=object)
+    flat = cells.ravel().copy()
+    flat[pd.isna(flat)] = _MISSING
+    # 全セルを区切り記号を挟んで1つの文字列に結合し、1回で数値に変換する
+    text = (" " + _SEP + " ").join(map(str, flat)).translate(_TABLE).replace(
+        "None", "nan") + " " + _SEP
+    tokens = text.split()
+    out = None
+    # 各セルがちょうど2つの値になる場合だけ、区切り記号が3つ毎に並ぶ
+    # （セル毎の値の数が揃っていない場合は、合計が合っていても使わない）
+    if len(tokens) == flat.size * 3 and set(tokens[2::3]) == {_SEP}:
+        try:
+            out = np.column_stack([
+                np.array(tokens[0::3], dtype=np.float32),
+                np.array(tokens[1::3], dtype=np.float32)
+            ])
+        except ValueError:
+            out = None
+    if out is None:
+        # 形式が揃っていない場合はセル毎に変換する
+        out = np.array([_decode_cell(c) for c in flat], dtype=np.float32)
+    return out.reshape(cells.shape + (2, ))
+
+
+def _decode_cell(cell):
+    """1セル分の[値, 品質フラグ]を返す（変換できない場合は欠損）"""
+    new = str(cell).translate(_TABLE).split()
+    try:
+        return float(new[0].replace("None", "nan")), float(new[1])
+    except (IndexError, ValueError):
+        return np.nan, -1.
+
+
+def _decode_time(cell):
+    """1セル分の起時を0時からの分と品質フラグで返す（無い場合は欠損）"""
+    if isinstance(cell, dict):
+        try:
+            return int(cell["hour"]) * 60 + int(cell["minute"]), 0
+        except (KeyError, TypeError, ValueError):
+            return np.nan, -1
+    m = _HOUR_MINUTE.search(str(cell))
+    if m is None:
+        return np.nan, -1
+    return int(m.group(1)) * 60 + int(m.group(2)), 0
+
+
+def field_names(keys):
+    """変数名をSCHEMA、TIME_SCHEMAの順に並べ、未知の変数を最後に加える
+
+    Parameters:
+    ----------
+    keys: list(str)
+        データに含まれる変数名
+    ----------
+    """
+    keys = list(dict.fromkeys(keys))
+    known = [k for k in list(SCHEMA) + list(TIME_SCHEMA) if k in keys]
+    return known + [k for k in keys if k not in known]
+
+
+def uv(ws, wd):
+    """風速と16方位の風向から東西風、南北風を求める
+
+    Parameters:
+    ----------
+    ws: ndarray
+        風速
+    wd: ndarray
+        風向（16方位、0は静穏）
+    ----------
+    Returns:
+    ----------
+    u, v: ndarray
+        東西風、南北風
+    ----------
+    """
+    rad = np.deg2rad(270.0 - wd * 22.5)
+    return ws * np.cos(rad), ws * np.sin(rad)
+
+
+class AmedasData():
+    """1時刻分のアメダスデータ（地点×変数）
+
+    Parameters:
+    ----------
+    staid: ndarray(str)
+        地点番号
+    lon: ndarray(float32)
+        経度
+    lat: ndarray(float32)
+        緯度
+    names: list(str)
+        変数名
+    values: ndarray(float32)
+        (地点, 変数)の値
+    flags: ndarray(int8)
+        (地点, 変数)の品質フラグ（0：正常、-1：欠損）
+    enname: ndarray(str)
+        英語の地点名
+    ----------
+    """
+    def __init__(self, staid, lon, lat, names, values, flags, enname=None):
+        self.staid = np.asarray(staid)
+        self.lon = np.asarray(lon, dtype=np.float32)
+        self.lat = np.asarray(lat, dtype=np.float32)
+        self.names = list(names)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.flags = np.asarray(flags, dtype=np.int8)
+        self.enname = enname
+
+    def __len__(self):
+        return len(self.staid)
+
+    def get(self, name, qc=True):
+        """変数を取り出す
+
+        Parameters:
+        ----------
+        name: str
+            変数名
+        qc: bool
+            品質フラグが0以外の値を欠損値にするかどうか
+        ----------
+        Returns:
+        ----------
+        ndarray(float32)
+            変数の値（存在しない変数は全て欠損値）
+        ----------
+        """
+        if name not in self.names:
+            return np.full(len(self), np.nan, dtype=np.float32)
+        n = self.names.index(name)
+        d = self.values[:, n]
+        if qc:
+            d = np.where(self.flags[:, n] == 0, d, np.float32(np.nan))
+        return d
+
+    def fields(self, names=None, qc=True):
+        """変数名をキーとする辞書で返す（存在しない変数は全て欠損値）
+
+        Parameters:
+        ----------
+        names: list(str)
+            取り出す変数名（Noneの場合は全ての変数）
+        qc: bool
+            品質フラグが0以外の値を欠損値にするかどうか
+        ----------
+        """
+        if names is None:
+            names = self.names
+        return {name: self.get(name, qc=qc) for name in names}
+
+    def flag(self, name):
+        """品質フラグを取り出す（存在しない変数は-1）"""
+        if name not in self.names:
+            return np.full(len(self), -1, dtype=np.int8)
+        return self.flags[:, self.names.index(name)]
+
+    def wind(self):
+        """東西風、南北風を返す（風向・風速どちらかの品質が悪い場合は欠損値）"""
+        return uv(self.get("wind"), self.get("windDirection"))
+
+    def select(self, mask):
+        """条件に合う地点のみ取り出す
+
+        Parameters:
+        ----------
+        mask: ndarray(bool) or ndarray(int)
+            取り出す地点
+        ----------
+        """
+        enname = None if self.enname is None else self.enname[mask]
+        return AmedasData(self.staid[mask], self.lon[mask], self.lat[mask],
+                          self.names, self.values[mask], self.flags[mask],
+                          enname=enname)
+
+    def take(self, names):
+        """指定した変数のみ取り出す（存在しない変数は欠損値）
+
+        Parameters:
+        ----------
+        names: list(str)
+            取り出す変数名
+        ----------
+        """
+        names = list(names)
+        values = np.full((len(self), len(names)), np.nan, dtype=np.float32)
+        flags = np.full((len(self), len(names)), -1, dtype=np.int8)
+        for n, name in enumerate(names):
+            if name in self.names:
+                m = self.names.index(name)
+                values[:, n] = self.values[:, m]
+                flags[:, n] = self.flags[:, m]
+        return AmedasData(self.staid, self.lon, self.lat, names, values,
+                          flags, enname=self.enname)
+
+    def to_npz(self, output_filename):
+        """npz形式で保存する（一時ファイルに書き込んでから置き換える）
+
+        Parameters:
+        ----------
+        output_filename: str
+            出力ファイル名
+        ----------
+        """
+        enname = self.enname
+        if enname is None:
+            enname = np.full(len(self), "", dtype=str)
+        buf = io.BytesIO()
+        np.savez_compressed(buf,
+                            staid=self.staid.astype(str),
+                            lon=self.lon,
+                            lat=self.lat,
+                            names=np.array(self.names, dtype=str),
+                            values=self.values,
+                            flags=self.flags,
+                            enname=np.asarray(enname, dtype=str))
+        write_atomic(output_filename, buf.getvalue())
+
+
+def pair_names(columns):
+    """[値, 品質フラグ]形式と起時の変数名のみ返す
+
+    Parameters:
+    ----------
+    columns: list(str)
+        DataFrameの列名
+    ----------
+    """
+    return field_names([
+        c for c in columns if c not in _INFO and not str(c).startswith("Unnamed")
+        and (not str(c).endswith("Time") or c in TIME_SCHEMA)
+    ])
+
+
+def _station_mask(staid, enname, stations):
+    """地点番号または英語の地点名が一致する地点のマスク"""
+    stations = np.asarray([str(sta) for sta in stations], dtype=str)
+    mask = np.isin(np.asarray(staid, dtype=str), stations)
+    if enname is not None:
+        mask |= np.isin(np.asarray(enname, dtype=str), stations)
+    return mask
+
+
+def _json_stations(data, table, stations):
+    """アメダスデータ（JSON）の辞書から指定した地点のみ取り出す"""
+    staid = np.array(list(data.keys()), dtype=str)
+    enname = None
+    if table is not None:
+        pos = table.index(staid)
+        enname = np.where(pos >= 0, table.enname[pos], "")
+    return {sta: data[sta] for sta in staid[_station_mask(staid, enname,
+                                                           stations)]}
+
+
+def _csv_columns(names):
+    """csvから読み込む列（指定した変数と地点情報の列、Noneの場合は全ての列）"""
+    if names is None:
+        return None
+    keep = set(names) | set(_INFO)
+    # 地点番号の列（列名が空）は"Unnamed: 0"になる
+    return lambda col: col in keep or col.startswith("Unnamed")
+
+
+def from_dataframe(df, names=None, table=None):
+    """AmedasStation.retrieveで作成したDataFrameを変換する
+
+    Parameters:
+    ----------
+    df: pandas DataFrame
+        アメダスデータ（indexが地点番号）
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数）
+    table: jmaloc.geometry.StationTable
+        地点情報（経度・緯度はここから取り出し、無い地点のみ変換する）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    if names is None:
+        names = pair_names(df.columns)
+    names = list(names)
+    staid = df.index.to_numpy(dtype=object).astype(str)
+    cells = np.empty((len(df), len(names)), dtype=object)
+    for n, col in enumerate(names):
+        if col in df.columns and col not in TIME_SCHEMA:
+            cells[:, n] = df[col].to_numpy(dtype=object)
+        else:
+            cells[:, n] = _MISSING
+    d = decode_pairs(cells)
+    for n, col in enumerate(names):
+        if col in df.columns and col in TIME_SCHEMA:
+            d[:, n] = [_decode_time(c) for c in df[col].to_numpy(dtype=object)]
+    # 経度・緯度
+    if table is not None:
+        lon, lat = table.lonlat(staid)
+    else:
+        lon = np.full(len(df), np.nan, dtype=np.float32)
+        lat = np.full(len(df), np.nan, dtype=np.float32)
+    miss = np.isnan(lon)
+    if np.any(miss) and "lon" in df.columns and "lat" in df.columns:
+        # 地点情報に無い地点は[度, 分]を変換する
+        ll = decode_pairs(df[["lon", "lat"]].to_numpy(dtype=object)[miss])
+        lon[miss] = ll[:, 0, 0] + ll[:, 0, 1] / 60.0
+        lat[miss] = ll[:, 1, 0] + ll[:, 1, 1] / 60.0
+    flags = np.nan_to_num(d[:, :, 1], nan=-1.).astype(np.int8)
+    enname = None
+    if "enName" in df.columns:
+        enname = df["enName"].to_numpy(dtype=object)
+    elif table is not None:
+        pos = table.index(staid)
+        enname = np.where(pos >= 0, table.enname[pos], "")
+    return AmedasData(staid, lon, lat, names, d[:, :, 0], flags, enname=enname)
+
+
+def read_csv(input_filename, names=None, table=None, stations=None):
+    """AMeDAS csvデータを読み込む
+
+    Parameters:
+    ----------
+    input_filename: str
+        入力ファイル名
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数、指定した場合は
+        その列と地点情報の列のみ読み込む）
+    table: jmaloc.geometry.StationTable
+        地点情報（Noneの場合は同じディレクトリのamedastable.jsonを使う）
+    stations: list(str)
+        変換する地点の地点番号または英語の地点名（Noneの場合は全ての地点）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    table = _table_for(input_filename, table)
+    df = pd.read_csv(input_filename,
+                     index_col=0,
+                     dtype=str,
+                     usecols=_csv_columns(names))
+    if stations is not None:
+        staid = df.index.to_numpy(dtype=object).astype(str)
+        if "enName" in df.columns:
+            enname = df["enName"].to_numpy(dtype=object).astype(str)
+        elif table is not None:
+            pos = table.index(staid)
+            enname = np.where(pos >= 0, table.enname[pos], "")
+        else:
+            enname = None
+        df = df[_station_mask(staid, enname, stations)]
+    return from_dataframe(df, names, table=table)
+
+
+def _table_for(input_filename, table):
+    """入力ファイルと同じディレクトリのamedastable.jsonを読み込む
+
+    amedastable.jsonが無く、ハッシュ値を書いたファイル（以前の版で作成した
+    amedastable.json.sha256）のみがある場合は、取得時の版をメタデータの
+    キャッシュから読み込む
+    """
+    if table is None:
+        table_file = os.path.join(os.path.dirname(input_filename),
+                                  "amedastable.json")
+        if os.path.exists(table_file):
+            table = load_table(table_file)
+        else:
+            cached = metadata_cache().resolve(table_file)
+            if cached is not None:
+                table = load_table(cached)
+    return table
+
+
+def from_json(data, names=None, table=None):
+    """アメダスデータ（JSON）の辞書をDataFrameを介さずに変換する
+
+    Parameters:
+    ----------
+    data: dict
+        地点番号をキーとするアメダスデータ
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数）
+    table: jmaloc.geometry.StationTable
+        地点情報（経度・緯度、英語の地点名）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    staid = np.array(list(data.keys()), dtype=str)
+    recs = list(data.values())
+    if names is None:
+        keys = dict()
+        for rec in recs:
+            keys.update((k, None) for k, v in rec.items()
+                        if isinstance(v, list) or k in TIME_SCHEMA)
+        names = field_names(keys)
+    names = list(names)
+    values = np.full((len(recs), len(names)), np.nan, dtype=np.float32)
+    flags = np.full((len(recs), len(names)), -1, dtype=np.int8)
+    for n, name in enumerate(names):
+        if name in TIME_SCHEMA:
+            d = np.array([_decode_time(rec.get(name)) for rec in recs],
+                         dtype=np.float32).reshape(len(recs), 2)
+            values[:, n] = d[:, 0]
+            flags[:, n] = d[:, 1]
+            continue
+        pairs = [rec.get(name, _NA) for rec in recs]
+        try:
+            # Noneは欠損値に変換される
+            d = np.array(pairs, dtype=np.float32).reshape(len(recs), 2)
+        except (TypeError, ValueError):
+            d = np.array([_decode_cell(p) for p in pairs], dtype=np.float32)
+        values[:, n] = d[:, 0]
+        flags[:, n] = np.nan_to_num(d[:, 1], nan=-1.)
+    if table is not None:
+        lon, lat = table.lonlat(staid)
+        pos = table.index(staid)
+        enname = np.where(pos >= 0, table.enname[pos], "")
+    else:
+        lon = np.full(len(recs), np.nan, dtype=np.float32)
+        lat = np.full(len(recs), np.nan, dtype=np.float32)
+        enname = None
+    return AmedasData(staid, lon, lat, names, values, flags, enname=enname)
+
+
+def read_json(input_filename, names=None, table=None, stations=None):
+    """ダウンロードしたアメダスデータ（JSON）を読み込む
+
+    Parameters:
+    ----------
+    input_filename: str
+        入力ファイル名
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数）
+    table: jmaloc.geometry.StationTable
+        地点情報（Noneの場合は同じディレクトリのamedastable.jsonを使う）
+    stations: list(str)
+        変換する地点の地点番号または英語の地点名（Noneの場合は全ての地点）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    table = _table_for(input_filename, table)
+    if table is None:
+        raise ValueError('amedastable.json is needed for ' + input_filename)
+    with open(input_filename, 'rb') as fin:
+        data = _loads(fin.read())
+    if stations is not None:
+        data = _json_stations(data, table, stations)
+    return from_json(data, names, table=table)
+
+
+def read_npz(input_filename, names=None, stations=None):
+    """npz形式のアメダスデータを読み込む
+
+    Parameters:
+    ----------
+    input_filename: str
+        入力ファイル名
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数）
+    stations: list(str)
+        取り出す地点の地点番号または英語の地点名（Noneの場合は全ての地点）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    with np.load(input_filename) as d:
+        staid = d["staid"]
+        enname = d["enname"]
+        mask = slice(None)
+        if stations is not None:
+            mask = _station_mask(staid, enname, stations)
+        amedas = AmedasData(staid[mask],
+                            d["lon"][mask],
+                            d["lat"][mask],
+                            d["names"].tolist(),
+                            d["values"][mask],
+                            d["flags"][mask],
+                            enname=enname[mask])
+    if names is None:
+        return amedas
+    return amedas.take(names)
+
+
+def read_bundle(day_bundle, name, names=None, table=None, stations=None):
+    """まとめたファイル中のアメダスデータ（JSON）を読み込む
+
+    Parameters:
+    ----------
+    day_bundle: bundle.DayBundle
+        まとめたファイル
+    name: str
+        まとめたファイル中のファイル名（時刻.json）
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数）
+    table: jmaloc.geometry.StationTable
+        地点情報（Noneの場合はまとめたamedastable.jsonを使う）
+    stations: list(str)
+        変換する地点の地点番号または英語の地点名（Noneの場合は全ての地点）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    if table is None:
+        table = day_bundle.table()
+    if table is None:
+        table = _table_for(day_bundle.path, None)
+    if table is None:
+        raise ValueError('amedastable.json is needed for ' + day_bundle.path)
+    data = _loads(day_bundle.read(name))
+    if stations is not None:
+        data = _json_stations(data, table, stations)
+    return from_json(data, names, table=table)
+
+
+def read(input_filename, names=None, stations=None):
+    """拡張子に応じてアメダスデータを読み込む
+
+    同じ名前のファイルはnpz、csv、jsonの順に使う。
+    いずれも無い場合は、同じディレクトリのまとめたファイル（utils/bundle.py）から
+    同じ時刻のJSONを読み出す
+
+    Parameters:
+    ----------
+    input_filename: str
+        入力ファイル名（csv、npzまたはjson）
+    names: list(str)
+        取り出す変数名（Noneの場合は全ての変数）
+    stations: list(str)
+        取り出す地点の地点番号または英語の地点名（Noneの場合は全ての地点、
+        指定した場合はその地点のみ変換する）
+    ----------
+    Returns:
+    ----------
+    AmedasData
+    ----------
+    """
+    root, ext = os.path.splitext(input_filename)
+    if not any(os.path.exists(root + e) for e in (".npz", ".csv", ".json")):
+        day_bundle, name = bundle.find(input_filename)
+        if day_bundle is not None:
+            return read_bundle(day_bundle, name, names, stations=stations)
+    if ext == ".npz" or os.path.exists(root + ".npz"):
+        return read_npz(root + ".npz", names, stations=stations)
+    if ext == ".json" or (not os.path.exists(input_filename)
+                          and os.path.exists(root + ".json")):
+        return read_json(root + ".json", names, stations=stations)
+    return read_csv(input_filename, names, stations=stations)
+
+
+def read_data(input_filename, rainstep=None):
+    """AMeDASデータを読み込み、作図用のndarrayを返す
+
+    Parameters:
+    ----------
+    input_filename: str
+        入力ファイル名（csv、npzまたはjson）
+    rainstep: str
+        降水量データの間隔（10m、1h、3h、24h、Noneの場合は降水量を返さない）
+    ----------
+    Returns:
+    ----------
+    lon, lat, temp, u, v(, prep): ndarray
+        経度、緯度、気温、東西風、南北風(、降水量)データ
+    ----------
+    """
+    names = ["temp", "wind", "windDirection"]
+    if rainstep is not None:
+        names.append("precipitation" + rainstep)
+    amedas = read(input_filename, names=names)
+    u, v = amedas.wind()
+    if rainstep is None:
+        return amedas.lon, amedas.lat, amedas.get("temp"), u, v
+    return amedas.lon, amedas.lat, amedas.get("temp"), u, v, amedas.get(
+        "precipitation" + rainstep)
@@ -0,0 +1,753 @@
+#
+#  2026/10/18
+#  JMAのサーバーからファイルを並列に取得する
+#  （接続の再利用、トークンバケットによる取得間隔の制限、
+#    ETag・Last-Modifiedを使った条件付きリクエスト、
+#    リクエスト毎の応答時間・バイト数・エラーの集計）
+#
+#  jma_wpr/fetch.py、jma_sat/fetch.pyはこのファイルを読み込む
+#  （write_atomic（utils/atomic.py）と、地点情報などのメタデータのキャッシュ
+#    （utils/meta.py）もこのモジュールから使える）
+#
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import http.client
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .atomic import write_atomic
+from .meta import MetadataCache, metadata_cache  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# 既定の同時接続数
+max_workers_default = 4
+# 既定の取得速度（1秒あたりのリクエスト数）と連続して取得できる数
+rate_default = 1.0
+burst_default = 4
+# 既定のタイムアウト（秒）
+timeout_default = 30.0
+# 既定の再取得回数と、再取得までの待ち時間（秒、回数毎に2倍、0.5〜1.5倍の乱数を掛ける）
+retries_default = 2
+backoff_default = 10.0
+# 条件付きリクエストに使うETag・Last-Modifiedを保存する既定のディレクトリ
+cache_dir_default = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "jma_draw", "http")
+# User-Agent
+user_agent = "jma_draw (python http.client)"
+# 代わりのサーバー（jma_standin/standin_server.py）のURL
+# 設定した場合は https://ホスト名/パス を 代わりのサーバー/ホスト名/パス に送る
+standin = os.environ.get("JMA_DRAW_STANDIN")
+# 集計結果（Prometheusのtextfile、JSON）を書き出すディレクトリ
+# 設定しない場合は書き出さない（node_exporterの--collector.textfile.directoryなど）
+metrics_dir = os.environ.get("JMA_DRAW_METRICS_DIR")
+# 応答時間（秒）とバイト数のヒストグラムの区切り
+latency_buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+bytes_buckets = (1e3, 1e4, 1e5, 1e6, 1e7)
+# 保存するリクエスト毎の記録の数
+max_records = 10000
+# 接続が切れていた場合に再接続して送り直す例外
+_STALE = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+          BrokenPipeError, ConnectionResetError)
+
+
+class FetchError(OSError):
+    """HTTPのエラー（statusにステータスコード）"""
+    def __init__(self, url, status):
+        super().__init__(url + ": HTTP " + str(status))
+        self.url = url
+        self.status = status
+
+
+class TokenBucket():
+    """トークンバケットによる取得速度の制限
+
+    Parameters:
+    ----------
+    rate: float
+        1秒あたりに補充するトークン数（Noneの場合は制限しない）
+    burst: int
+        貯めておけるトークンの最大数
+    ----------
+    """
+    def __init__(self, rate=rate_default, burst=burst_default):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取り出す（無い場合は補充されるまで待つ）"""
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ValidatorCache():
+    """URL毎のETag・Last-Modifiedと内容をディスクに保存する
+
+    Parameters:
+    ----------
+    cache_dir: str
+        保存するディレクトリ（Noneの場合はcache_dir_default）
+    ----------
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = cache_dir_default
+        self.cache_dir = cache_dir
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()[:20]
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, url, file_name=None):
+        """保存したヘッダと内容を返す（無い場合はNone, None）
+
+        file_nameを指定した場合は、内容をそのファイルから読み込む
+        """
+        path = self._path(url)
+        try:
+            with open(path + ".json", 'rt') as fin:
+                meta = json.loads(fin.read())
+            if file_name is None:
+                if meta.get("file") is not None:
+                    return None, None
+                file_name = path + ".body"
+            elif meta.get("file") != os.path.abspath(file_name):
+                return None, None
+            with open(file_name, 'rb') as fin:
+                body = fin.read()
+        except (OSError, ValueError):
+            return None, None
+        if meta.get("url") != url or meta.get("size") != len(body):
+            return None, None
+        return meta, body
+
+    def store(self, url, headers, body, file_name=None):
+        """ETagかLast-Modifiedがあるレスポンスのみ保存する
+
+        file_nameを指定した場合は、内容はそのファイル（呼び出し側で書き込む）
+        のみとし、ここにはヘッダのみ保存する（同じ内容を2つ保存しない）
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        path = self._path(url)
+        if file_name is None:
+            write_atomic(path + ".body", body)
+        else:
+            file_name = os.path.abspath(file_name)
+            try:
+                os.remove(path + ".body")
+            except FileNotFoundError:
+                pass
+        meta = dict(url=url,
+                    etag=etag,
+                    last_modified=last_modified,
+                    size=len(body),
+                    file=file_name)
+        write_atomic(path + ".json", json.dumps(meta).encode())
+
+    @staticmethod
+    def conditional_headers(meta):
+        """保存したヘッダから条件付きリクエストのヘッダを作成する"""
+        headers = dict()
+        if meta is None:
+            return headers
+        if meta.get("etag") is not None:
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified") is not None:
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+
+def _standin_url(url):
+    """代わりのサーバーを使う場合は送り先のURLを置き換える"""
+    if not standin:
+        return url
+    u = urllib.parse.urlsplit(url)
+    return urllib.parse.urlunsplit(
+        urllib.parse.urlsplit(standin.rstrip("/") + "/" + u.netloc +
+                              u.path)[:3] + (u.query, ""))
+
+
+class ConnectionPool():
+    """ホスト毎のkeep-alive接続
+
+    使っていない接続をホスト毎に保持し、リクエスト毎に取り出して使い終わったら
+    戻す（スレッドやThreadPoolExecutorが変わっても同じ接続を使い回す）
+
+    Parameters:
+    ----------
+    timeout: float
+        タイムアウト（秒）
+    maxsize: int
+        ホスト毎に保持する使っていない接続の最大数（超えた接続は閉じる）
+    ----------
+    """
+    def __init__(self, timeout=timeout_default, maxsize=max_workers_default):
+        self.timeout = timeout
+        self.maxsize = max(1, maxsize)
+        self._idle = dict()
+        self._lock = threading.Lock()
+
+    def _checkout(self, key, fresh=False):
+        """使っていない接続を取り出す（無い場合とfreshの場合は新しく作る）"""
+        if not fresh:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _checkin(self, key, conn):
+        """使い終わった接続を戻す（maxsizeを超える場合は閉じる）"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def idle(self):
+        """保持している使っていない接続の数"""
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def request(self, url, headers=None, method="GET", timing=None):
+        """リクエストを送り、レスポンスを読み込む
+
+        Parameters:
+        ----------
+        url: str
+            URL
+        headers: dict
+            追加するリクエストヘッダ
+        method: str
+            HTTPメソッド
+        timing: dict
+            最初のバイトまでの時間（ttfb、秒）を書き込む辞書
+        ----------
+        Returns:
+        ----------
+        status: int
+            ステータスコード
+        headers: http.client.HTTPMessage
+            レスポンスヘッダ
+        body: bytes
+            レスポンスの内容
+        ----------
+        """
+        u = urllib.parse.urlsplit(_standin_url(url))
+        path = u.path or "/"
+        if u.query:
+            path = path + "?" + u.query
+        hdrs = {"User-Agent": user_agent, "Connection": "keep-alive"}
+        if headers is not None:
+            hdrs.update(headers)
+        key = (u.scheme, u.netloc)
+        for n in range(2):
+            # 送り直す場合は、保持していた他の接続も切れている可能性があるため
+            # 新しく接続する
+            conn = self._checkout(key, fresh=n > 0)
+            try:
+                t0 = time.perf_counter()
+                conn.request(method, path, headers=hdrs)
+                res = conn.getresponse()
+                if timing is not None:
+                    timing["ttfb"] = time.perf_counter() - t0
+                body = res.read()
+            except _STALE:
+                # サーバーが閉じた接続を再利用した場合は1回だけ送り直す
+                conn.close()
+                if n > 0:
+                    raise
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            if res.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return res.status, res.headers, body
+
+    def close(self):
+        """保持している接続を全て閉じる"""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle = dict()
+
+
+class Fetcher():
+    """同時接続数と取得速度を制限してファイルを取得する
+
+    Parameters:
+    ----------
+    max_workers: int
+        同時接続数
+    rate: float
+        1秒あたりのリクエスト数の上限（Noneの場合は制限しない）
+    burst: int
+        連続して送れるリクエスト数
+    timeout: float
+        タイムアウト（秒）
+    retries: int
+        通信エラーや5xxの場合の再取得回数
+    backoff: float
+        再取得までの待ち時間（秒、回数毎に2倍）
+    cache_dir: str
+        ETag・Last-Modifiedを保存するディレクトリ（Noneの場合は既定）
+    metrics: FetchMetrics
+        リクエスト毎の記録の集計先（Noneの場合はfetch_metrics()）
+    ----------
+    """
+    def __init__(self,
+                 max_workers=max_workers_default,
+                 rate=rate_default,
+                 burst=burst_default,
+                 timeout=timeout_default,
+                 retries=retries_default,
+                 backoff=backoff_default,
+                 cache_dir=None,
+                 metrics=None):
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, burst)
+        # 同時接続数と同じ数の接続をホスト毎に保持する
+        self.pool = ConnectionPool(timeout, maxsize=max_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = ValidatorCache(cache_dir)
+        if metrics is None:
+            metrics = fetch_metrics()
+        self.metrics = metrics
+
+    def get(self, url, headers=None, retries=None):
+        """1つのファイルを取得する（404などはFetchError、再取得しない）
+
+        Parameters:
+        ----------
+        url: str
+            URL
+        headers: dict
+            追加するリクエストヘッダ
+        retries: int
+            再取得回数（Noneの場合はself.retries）
+        ----------
+        Returns:
+        ----------
+        bytes
+            ファイルの内容
+        ----------
+        """
+        status, _, body = self.request(url, headers, retries)
+        if status != 200:
+            raise FetchError(url, status)
+        return body
+
+    def get_cached(self, url, file_name=None):
+        """条件付きリクエストで取得する（変更が無ければ保存した内容を返す）
+
+        Parameters:
+        ----------
+        url: str
+            URL
+        file_name: str
+            内容を保存するファイル名（指定した場合は変更された時にこのファイルに
+            書き込み、キャッシュにはヘッダのみ保存する。Noneの場合は内容も
+            キャッシュに保存する）
+        ----------
+        Returns:
+        ----------
+        body: bytes
+            ファイルの内容
+        changed: bool
+            前回の取得から変更されたかどうか（304の場合はFalse）
+        ----------
+        """
+        meta, cached = self.cache.load(url, file_name)
+        status, hdrs, body = self.request(
+            url, ValidatorCache.conditional_headers(meta))
+        if status == 304 and cached is not None:
+            return cached, False
+        if status != 200:
+            raise FetchError(url, status)
+        if file_name is not None:
+            write_atomic(file_name, body)
+        self.cache.store(url, hdrs, body, file_name)
+        return body, True
+
+    def get_file(self, url, file_name):
+        """条件付きリクエストで取得し、変更された場合のみファイルに書き込む
+
+        通信できない場合でもファイルがあれば、警告を表示してそのまま使う
+
+        Parameters:
+        ----------
+        url: str
+            URL
+        file_name: str
+            保存するファイル名（内容はこのファイルのみに保存する）
+        ----------
+        Returns:
+        ----------
+        bool
+            ファイルを書き込んだかどうか
+        ----------
+        """
+        try:
+            _, changed = self.get_cached(url, file_name)
+        except OSError as e:
+            if not os.path.exists(file_name):
+                raise
+            print("Warn: use local file", file_name, e)
+            return False
+        return changed
+
+    def request(self, url, headers=None, retries=None):
+        """取得速度を制限してリクエストを送る（通信エラーと5xxは再取得する）
+
+        最後の応答（または例外）をself.metricsに記録する（応答時間は最初の
+        送信から、再取得までの待ち時間を含む）
+
+        Returns:
+        ----------
+        status, headers, body
+            ConnectionPool.requestと同じ
+        ----------
+        """
+        if retries is None:
+            retries = self.retries
+        t0 = None
+        for n in range(retries + 1):
+            self.bucket.acquire()
+            if t0 is None:
+                t0 = time.perf_counter()
+            if n == 0:
+                logger.info("get %s", url)
+            else:
+                logger.warning("retry %d: %s", n, url)
+            timing = dict()
+            try:
+                status, hdrs, body = self.pool.request(url,
+                                                       headers,
+                                                       timing=timing)
+            except OSError as e:
+                if n >= retries:
+                    self.metrics.record(url, None, 0, timing.get("ttfb"),
+                                        time.perf_counter() - t0, n, error=e)
+                    raise
+                time.sleep(self.backoff * 2**n * random.uniform(0.5, 1.5))
+                continue
+            if status >= 500 and n < retries:
+                time.sleep(self.backoff * 2**n * random.uniform(0.5, 1.5))
+                continue
+            self.metrics.record(url, status, len(body), timing.get("ttfb"),
+                                time.perf_counter() - t0, n)
+            if status >= 400:
+                raise FetchError(url, status)
+            return status, hdrs, body
+
+    def fetch_all(self, urls, headers=None):
+        """複数のファイルを並列に取得する
+
+        Parameters:
+        ----------
+        urls: list(str)
+            URL
+        headers: dict
+            追加するリクエストヘッダ
+        ----------
+        Returns:
+        ----------
+        iterator(tuple(str, bytes or Exception))
+            URLと内容（取得できなかった場合は例外）をurlsの順に返す
+        ----------
+        """
+        def _get(url):
+            try:
+                return url, self.get(url, headers)
+            except OSError as e:
+                return url, e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(_get, urls)
+
+    def close(self):
+        """接続を閉じる"""
+        self.pool.close()
+
+
+# 英字に続かない数字（B13などのバンド名は残す）
+_NUMBER = re.compile(r"(?<![A-Za-z0-9])\d+")
+
+
+def endpoint(url):
+    """URLの数字の部分（時刻、地点番号、タイル番号）をNにまとめた集計単位"""
+    u = urllib.parse.urlsplit(url)
+    return u.netloc + _NUMBER.sub("N", u.path)
+
+
+class Histogram():
+    """区切り毎の数、合計、最大値と、分位点を求めるための最近の値
+
+    Parameters:
+    ----------
+    buckets: tuple(float)
+        区切り（昇順、最後に+Infを加える）
+    ----------
+    """
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.
+        self.count = 0
+        self.max = 0.
+        self._recent = deque(maxlen=max_records)
+
+    def observe(self, value):
+        n = 0
+        while n < len(self.buckets) and value > self.buckets[n]:
+            n += 1
+        self.counts[n] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+        self._recent.append(value)
+
+    def quantile(self, q):
+        """最近の値のq分位点（値が無い場合はNone）"""
+        if len(self._recent) == 0:
+            return None
+        values = sorted(self._recent)
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    def summary(self):
+        mean = self.sum / self.count if self.count > 0 else None
+        return dict(count=self.count,
+                    mean=mean,
+                    p50=self.quantile(0.5),
+                    p90=self.quantile(0.9),
+                    p99=self.quantile(0.99),
+                    max=self.max)
+
+    def prometheus(self, metric, labels):
+        """Prometheusのヒストグラム形式の行を返す"""
+        lines = []
+        cum = 0
+        for le, count in zip(self.buckets + ("+Inf", ), self.counts):
+            cum += count
+            lines.append(metric + "_bucket{" + labels + ',le="' + str(le) +
+                         '"} ' + str(cum))
+        lines.append(metric + "_sum{" + labels + "} " + repr(self.sum))
+        lines.append(metric + "_count{" + labels + "} " + str(self.count))
+        return lines
+
+
+class FetchMetrics():
+    """リクエスト毎の記録（集計単位、ステータス、バイト数、最初のバイトまでの
+    時間、応答時間、再取得回数）を集計する
+
+    集計単位毎のヒストグラムをPrometheusのtextfile形式とJSONで書き出す
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """集計を消去する"""
+        with self._lock:
+            self.records = deque(maxlen=max_records)
+            self._endpoints = dict()
+            self.started = time.time()
+
+    def _stats(self, ep):
+        stats = self._endpoints.get(ep)
+        if stats is None:
+            stats = self._endpoints[ep] = dict(
+                status=dict(),
+                bytes=0,
+                retries=0,
+                latency=Histogram(latency_buckets),
+                ttfb=Histogram(latency_buckets),
+                size=Histogram(bytes_buckets))
+        return stats
+
+    def record(self, url, status, nbytes, ttfb, latency, retries, error=None):
+        """1つのリクエストの結果を記録する
+
+        Parameters:
+        ----------
+        url: str
+            URL
+        status: int
+            ステータスコード（通信エラーの場合はNone）
+        nbytes: int
+            受け取った内容のバイト数
+        ttfb: float
+            最後の送信から最初のバイトまでの時間（秒、受け取れなかった場合はNone）
+        latency: float
+            最初の送信から内容を受け取るまでの時間（秒、再取得を含む）
+        retries: int
+            再取得した回数
+        error: Exception
+            通信エラー
+        ----------
+        """
+        ep = endpoint(url)
+        key = str(status) if status is not None else type(error).__name__
+        rec = dict(time=time.time(),
+                   url=url,
+                   endpoint=ep,
+                   status=key,
+                   bytes=nbytes,
+                   ttfb=ttfb,
+                   latency=latency,
+                   retries=retries)
+        with self._lock:
+            self.records.append(rec)
+            stats = self._stats(ep)
+            stats["status"][key] = stats["status"].get(key, 0) + 1
+            stats["bytes"] += nbytes
+            stats["retries"] += retries
+            stats["latency"].observe(latency)
+            if ttfb is not None:
+                stats["ttfb"].observe(ttfb)
+            if status is not None:
+                stats["size"].observe(nbytes)
+
+    def summary(self):
+        """集計単位毎の要求数、ステータス毎の数、バイト数、再取得回数、
+        応答時間・最初のバイトまでの時間の統計を辞書で返す"""
+        with self._lock:
+            endpoints = dict()
+            for ep, stats in sorted(self._endpoints.items()):
+                nreq = sum(stats["status"].values())
+                nerr = sum(v for k, v in stats["status"].items()
+                           if not k.isdigit() or int(k) >= 400)
+                endpoints[ep] = dict(requests=nreq,
+                                     errors=nerr,
+                                     status=dict(sorted(
+                                         stats["status"].items())),
+                                     bytes=stats["bytes"],
+                                     retries=stats["retries"],
+                                     latency=stats["latency"].summary(),
+                                     ttfb=stats["ttfb"].summary())
+            return dict(started=self.started,
+                        updated=time.time(),
+                        endpoints=endpoints)
+
+    def prometheus(self, program=None):
+        """Prometheusのtextfile形式の文字列を返す"""
+        prefix = ""
+        if program is not None:
+            prefix = 'program="' + program + '",'
+        lines = [
+            "# HELP jma_fetch_requests_total Requests by endpoint and status",
+            "# TYPE jma_fetch_requests_total counter"
+        ]
+        with self._lock:
+            items = sorted(self._endpoints.items())
+            for ep, stats in items:
+                for key, count in sorted(stats["status"].items()):
+                    lines.append("jma_fetch_requests_total{" + prefix +
+                                 'endpoint="' + ep + '",status="' + key +
+                                 '"} ' + str(count))
+            for metric, field, kind, text in (
+                ("jma_fetch_bytes_total", "bytes", "counter",
+                 "Bytes received"),
+                ("jma_fetch_retries_total", "retries", "counter",
+                 "Retries after errors and 5xx"),
+                ("jma_fetch_latency_seconds", "latency", "histogram",
+                 "Time from the first send to the full body"),
+                ("jma_fetch_ttfb_seconds", "ttfb", "histogram",
+                 "Time to the first byte of the last attempt"),
+                ("jma_fetch_response_bytes", "size", "histogram",
+                 "Response body size"),
+            ):
+                lines.append("# HELP " + metric + " " + text)
+                lines.append("# TYPE " + metric + " " + kind)
+                for ep, stats in items:
+                    labels = prefix + 'endpoint="' + ep + '"'
+                    if kind == "counter":
+                        lines.append(metric + "{" + labels + "} " +
+                                     str(stats[field]))
+                    else:
+                        lines.extend(stats[field].prometheus(metric, labels))
+        return "\n".join(lines) + "\n"
+
+    def export(self, program, out_dir=None):
+        """out_dir/program.prom（Prometheus）とprogram.json（JSON）に書き出す
+
+        Parameters:
+        ----------
+        program: str
+            プログラム名（ファイル名とPrometheusのprogramラベルに使う）
+        out_dir: str
+            出力ディレクトリ（Noneの場合はmetrics_dir、それも無い場合は
+            書き出さない）
+        ----------
+        """
+        if out_dir is None:
+            out_dir = metrics_dir
+        if out_dir is None:
+            return
+        os.makedirs(out_dir, exist_ok=True)
+        write_atomic(os.path.join(out_dir, program + ".prom"),
+                     self.prometheus(program).encode())
+        summary = self.summary()
+        summary["program"] = program
+        write_atomic(os.path.join(out_dir, program + ".json"),
+                     json.dumps(summary, indent=1).encode())
+
+
+# プロセス内で共有するFetcher
+_shared = None
+_shared_lock = threading.Lock()
+# プロセス内で共有するFetchMetrics
+_metrics = FetchMetrics()
+
+
+def shared_fetcher():
+    """プロセス内で共有するFetcherを返す（接続とETagのキャッシュを共有する）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Fetcher()
+        return _shared
+
+
+def fetch_metrics():
+    """プロセス内で共有するFetchMetricsを返す（Fetcherの既定の集計先）"""
+    return _metrics
+
+
+def export_metrics(program, out_dir=None):
+    """共有するFetchMetricsの集計結果を書き出す（FetchMetrics.exportと同じ）"""
+    _metrics.export(program, out_dir)
@@ -0,0 +1,167 @@
+#
+#  2026/10/18
+#  時刻毎の作図で図を使い回す
+#
+#  図（背景、地図のAxes、カラーバー、凡例）は領域・設定毎に1回だけ作り、
+#  時刻毎にはマーカーの位置・色（set_offsets、set_facecolor）、矢羽（set_UVC）、
+#  テキスト（set_data）、タイトル（set_text）だけを置き換えて書き出す
+#
+import json
+from collections import OrderedDict
+import numpy as np
+import matplotlib.pyplot as plt
+from .layers import add_labels, add_markers
+
+# 同時に保持する図の数（超えた場合は古い図から閉じる）
+max_frames = 2
+
+
+class Frame():
+    """時刻毎に使い回す図
+
+    Parameters:
+    ----------
+    key: str
+        図のキー（領域・設定が同じ場合に同じ値）
+    figsize: tuple(float)
+        図の大きさ（インチ）
+    persist: bool
+        書き出した後も図を残して使い回すかどうか
+    ----------
+    """
+    def __init__(self, key, figsize, persist=True):
+        self.key = key
+        self.fig = plt.figure(figsize=figsize)
+        # 新しく作った図かどうか（Trueの場合は地図・カラーバーなどを描く）
+        self.new = True
+        self.persist = persist
+        # 作図時に呼び出し側で保持する値（地図のAxesなど）
+        self.ax = None
+        self._artists = dict()
+
+    def markers(self, name, ax, lons, lats, colors, ms, **kwargs):
+        """地点のマーカー（2回目以降は位置と色だけを置き換える）
+
+        Parameters:
+        ----------
+        name: str
+            図の中でのマーカーの名前
+        ax, lons, lats, colors, ms, kwargs:
+            add_markersの引数
+        ----------
+        """
+        layer = self._artists.get(name)
+        if layer is None:
+            layer = add_markers(ax, lons, lats, colors, ms, **kwargs)
+            self._artists[name] = layer
+        else:
+            layer.set_data(lons, lats, colors, alpha=kwargs.get("alpha"))
+        return layer
+
+    def labels(self, name, ax, x, y, texts, colors, dx=0.03, dy=-0.02,
+               **kwargs):
+        """地点の文字列（2回目以降は位置・文字列・色だけを置き換える）
+
+        Parameters:
+        ----------
+        name: str
+            図の中での文字列の名前
+        ax, x, y, texts, colors, dx, dy, kwargs:
+            add_labelsの引数
+        ----------
+        """
+        layer = self._artists.get(name)
+        if layer is None:
+            layer = add_labels(ax, x, y, texts, colors, dx=dx, dy=dy,
+                               **kwargs)
+            self._artists[name] = layer
+        else:
+            layer.set_data(
+                np.asarray(x) + dx,
+                np.asarray(y) + dy, texts, colors)
+        return layer
+
+    def barbs(self, name, ax, lons, lats, u, v, **kwargs):
+        """矢羽（地点が前の時刻と同じ場合は、風速だけをset_UVCで置き換える）
+
+        Parameters:
+        ----------
+        name: str
+            図の中での矢羽の名前
+        ax: matplotlib Axes
+            描くAxes
+        lons, lats, u, v: ndarray
+            経度、緯度、東西風、南北風
+        kwargs: dict
+            ax.barbsに渡す引数
+        ----------
+        """
+        b = self._artists.get(name)
+        if b is not None:
+            if (np.array_equal(b.x, np.ravel(lons))
+                    and np.array_equal(b.y, np.ravel(lats))):
+                b.set_UVC(u, v)
+                return b
+            # 地点が変わった場合は描き直す
+            b.remove()
+        b = ax.barbs(lons, lats, u, v, **kwargs)
+        self._artists[name] = b
+        return b
+
+    def title(self, ax, title, **kwargs):
+        """タイトル（ax.titleのTextを置き換える）"""
+        if title is not None:
+            ax.set_title(title, **kwargs)
+
+    def done(self):
+        """書き出した後に呼ぶ（使い回さない図は閉じる）"""
+        self.new = False
+        if not self.persist:
+            self.close()
+
+    def close(self):
+        plt.close(self.fig)
+
+
+_frames = OrderedDict()
+
+
+def frame_figure(key, figsize, persist=True):
+    """領域・設定毎に使い回す図を返す（無い場合は作る）
+
+    Parameters:
+    ----------
+    key: tuple or dict
+        領域・設定（作図する要素を変える引数を全て含める）
+    figsize: tuple(float)
+        図の大きさ（インチ）
+    persist: bool
+        Falseの場合は毎回新しい図を作り、書き出した後に閉じる
+    ----------
+    Returns:
+    ----------
+    Frame
+    ----------
+    """
+    key = json.dumps(key, sort_keys=True, default=str)
+    if not persist:
+        return Frame(key, figsize, persist=False)
+    frame = _frames.get(key)
+    if frame is not None:
+        if not frame.new:
+            _frames.move_to_end(key)
+            return frame
+        # 前回の作図が途中で失敗した場合は作り直す
+        del _frames[key]
+        frame.close()
+    frame = Frame(key, figsize)
+    _frames[key] = frame
+    while len(_frames) > max_frames:
+        _frames.popitem(last=False)[1].close()
+    return frame
+
+
+def close_frames():
+    """保持している図を全て閉じる"""
+    while len(_frames) > 0:
+        _frames.popitem(last=False)[1].close()
@@ -0,0 +1,271 @@
+#
+#  2026/10/18
+#  地点毎のマーカーとテキストを、地点数に関わらず1つのArtistで描く
+#  （ax.plot、ax.textを地点毎に呼ぶと、1フレームで1000個以上のArtistを作る）
+#
+#  マーカーは全地点を1回でまとめて描く。テキストは1つのTextを地点毎に
+#  置き直して描くため、文字列の配置と描画は地点毎に行う（減るのはArtistを
+#  作る・破棄する分のみ）。bbox_inches='tight'の範囲を求める場合は、
+#  同じ文字列の大きさを1回だけ求めて地点の位置に移す
+#
+import copy
+from numbers import Real
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.artist import Artist, allow_rasterization
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.markers import MarkerStyle
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox, IdentityTransform
+
+
+def in_extent(lons, lats, lon_min, lon_max, lat_min, lat_max):
+    """図の範囲内の地点かどうか"""
+    return (lons >= lon_min) & (lons <= lon_max) & (lats >= lat_min) & (
+        lats <= lat_max)
+
+
+def warn_missing(lons, lats, d):
+    """欠損値の地点を表示し、欠損値でない地点のマスクを返す"""
+    valid = ~np.isnan(d)
+    for xc, yc, dc in zip(lons[~valid], lats[~valid], d[~valid]):
+        print("Warn ", xc, yc, dc)
+    return valid
+
+
+class MarkerLayer(PathCollection):
+    """地点のマーカーを1つのPathCollectionで描く
+
+    Aggで描く場合は、Line2Dのマーカーと同じく位置と形をピクセルに合わせる
+    （PathCollectionはそのままでは合わせないため、1ピクセル未満ずれる）
+
+    Parameters:
+    ----------
+    marker: str
+        マーカーの種類
+    ms: float
+        マーカーサイズ（ポイント）
+    offsets: ndarray
+        マーカーの位置（地点数, 2）
+    kwargs: dict
+        PathCollectionに渡す引数（offset_transform、facecolorsなど）
+    ----------
+    """
+    def __init__(self, marker, ms, offsets, **kwargs):
+        style = MarkerStyle(marker)
+        kwargs.setdefault("joinstyle", style.get_joinstyle())
+        kwargs.setdefault("capstyle", style.get_capstyle())
+        path = style.get_path().transformed(style.get_transform())
+        super().__init__((path, ), sizes=[ms**2], offsets=offsets, **kwargs)
+        # マーカーの形は表示座標（ポイント）で与える
+        self.set_transform(IdentityTransform())
+        self._markersize = ms
+        self._snap_threshold = style.get_snap_threshold()
+
+    def set_data(self, lons, lats, colors, alpha=None):
+        """位置と色を置き換える（地点数が変わってもよい）"""
+        self.set_offsets(np.column_stack([lons, lats]))
+        self.set_facecolor(to_rgba_array(colors, alpha))
+
+    def _single_color(self):
+        """全地点が同じ色の場合（PathCollectionがAggのdraw_markersで描き、
+        位置を合わせる）"""
+        return (len(self.get_facecolor()) == 1
+                and len(self.get_edgecolor()) == 1
+                and len(self.get_linewidth()) == 1)
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        layer = self
+        snap = self.get_snap()
+        agg = (isinstance(renderer, RendererAgg) and not self._single_color())
+        if agg or (snap is None and isinstance(self._snap_threshold, Real)):
+            # 位置・形を合わせたコピーを描く（このレイヤーの設定は変えない）
+            layer = copy.copy(self)
+            layer.stale_callback = None
+            if snap is None and isinstance(self._snap_threshold, Real):
+                # Line2Dと同じく、大きいマーカーは形もピクセルに合わせる
+                snap = (renderer.points_to_pixels(self._markersize) >=
+                        self._snap_threshold)
+                layer.set_snap(snap)
+            if agg:
+                layer.set_offsets(self._snapped_offsets(renderer, snap))
+                layer.set_offset_transform(IdentityTransform())
+        PathCollection.draw(layer, renderer)
+        self.stale = False
+
+    def _snapped_offsets(self, renderer, snap):
+        """Aggの座標（上下が逆）でピクセルの中心に合わせた位置（表示座標）
+
+        形をピクセルに合わせる場合は、ピクセルの境界に合わせる
+        """
+        disp = self.get_offset_transform().transform(self.get_offsets())
+        height = renderer.height
+        center = 0. if snap else 0.5
+        return np.column_stack([
+            np.floor(disp[:, 0] + 0.5) + center,
+            height - (np.floor(height - disp[:, 1] + 0.5) + center)
+        ])
+
+
+def add_markers(ax, lons, lats, colors, ms, marker='o', **kwargs):
+    """地点のマーカーを1つのMarkerLayerで描く
+
+    ax.plot(xc, yc, marker=marker, color=c, markersize=ms)を地点毎に
+    呼んだ場合と同じ見た目にする（縁の幅、重なりの順序も同じ）
+
+    Parameters:
+    ----------
+    ax: matplotlib Axes
+        描くAxes
+    lons, lats: ndarray
+        経度、緯度
+    colors: ndarray or str
+        地点毎の色（RGBAの配列）または全地点で同じ色
+    ms: float
+        マーカーサイズ（ポイント）
+    marker: str
+        マーカーの種類
+    kwargs: dict
+        MarkerLayerに渡す引数（edgecolors、alphaなど）
+    ----------
+    Returns:
+    ----------
+    MarkerLayer
+    ----------
+    """
+    kwargs.setdefault("edgecolors", "face")
+    kwargs.setdefault("linewidths", plt.rcParams['lines.markeredgewidth'])
+    # Line2Dと同じ重なり順（PathCollectionの既定は1）
+    kwargs.setdefault("zorder", 2)
+    # Line2Dと同じく透明度は色に含め、縁が無い場合は透明な縁として描く
+    alpha = kwargs.pop("alpha", None)
+    edgecolors = kwargs.pop("edgecolors")
+    if isinstance(edgecolors, str) and edgecolors == "none":
+        edgecolors = (0., 0., 0., 0.)
+    elif not (isinstance(edgecolors, str) and edgecolors == "face"):
+        edgecolors = to_rgba_array(edgecolors, alpha)
+    layer = MarkerLayer(marker,
+                        ms,
+                        np.column_stack([lons, lats]),
+                        offset_transform=ax.transData,
+                        facecolors=to_rgba_array(colors, alpha),
+                        edgecolors=edgecolors,
+                        **kwargs)
+    ax.add_collection(layer, autolim=False)
+    return layer
+
+
+class TextLayer(Artist):
+    """複数の文字列を1つのArtistで描く
+
+    描く時に1つのTextを位置・文字列・色を変えながら使い回す
+    （ax.textを地点毎に呼んだ場合と同じ見た目）
+
+    Parameters:
+    ----------
+    x, y: ndarray
+        文字列の位置（データ座標）
+    texts: list(str)
+        文字列
+    colors: ndarray or list
+        文字列毎の色
+    kwargs: dict
+        Textに渡す引数（fontsize、ha、vaなど）
+    ----------
+    """
+    def __init__(self, x, y, texts, colors, **kwargs):
+        super().__init__()
+        self._text = Text(0., 0., "", **kwargs)
+        # ax.textと同じ重なり順（Artistの既定は0、Textは3）
+        self.set_zorder(self._text.get_zorder())
+        self.set_data(x, y, texts, colors)
+
+    def set_data(self, x, y, texts, colors):
+        """位置・文字列・色を置き換える"""
+        self._x = np.asarray(x)
+        self._y = np.asarray(y)
+        self._texts = list(texts)
+        self._colors = colors
+        self.stale = True
+
+    def set_figure(self, fig):
+        super().set_figure(fig)
+        self._text.set_figure(fig)
+
+    def set_transform(self, t):
+        super().set_transform(t)
+        self._text.set_transform(t)
+
+    def _each(self):
+        for n, text in enumerate(self._texts):
+            self._text.set_position((self._x[n], self._y[n]))
+            self._text.set_text(text)
+            self._text.set_color(self._colors[n])
+            yield self._text
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        for text in self._each():
+            text.draw(renderer)
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        """全ての文字列を含む範囲（bbox_inches='tight'で使う）
+
+        文字列の範囲は位置によらず同じ形のため、同じ文字列は1回だけ配置を
+        求め、地点の位置（表示座標）に移す
+        """
+        if len(self._texts) == 0:
+            return Bbox.null()
+        xy = self.get_transform().transform(
+            np.column_stack([self._x, self._y]))
+        anchors = np.tile(xy, 2)
+        relative = dict()
+        extents = np.empty((len(self._texts), 4))
+        for n, text in enumerate(self._texts):
+            if text not in relative:
+                self._text.set_position((self._x[n], self._y[n]))
+                self._text.set_text(text)
+                bbox = self._text.get_window_extent(renderer)
+                relative[text] = bbox.extents - anchors[n]
+            extents[n] = relative[text] + anchors[n]
+        return Bbox([extents[:, :2].min(axis=0), extents[:, 2:].max(axis=0)])
+
+
+def add_labels(ax, x, y, texts, colors, dx=0.03, dy=-0.02, **kwargs):
+    """地点の右下に文字列を描く（TextLayerを1つ追加する）
+
+    Parameters:
+    ----------
+    ax: matplotlib Axes
+        描くAxes
+    x, y: ndarray
+        地点の経度、緯度
+    texts: list(str)
+        文字列
+    colors: ndarray or list
+        文字列毎の色
+    dx, dy: float
+        地点からずらす量（度）
+    kwargs: dict
+        Textに渡す引数（fontsizeなど）
+    ----------
+    Returns:
+    ----------
+    TextLayer
+    ----------
+    """
+    layer = TextLayer(np.asarray(x) + dx, np.asarray(y) + dy, texts, colors,
+                      **kwargs)
+    layer.set_transform(ax.transData)
+    # ax.textと同じく図の範囲外でも切り取らない
+    layer.set_clip_on(False)
+    ax.add_artist(layer)
+    return layer
@@ -0,0 +1,133 @@
+#
+#  2026/10/18
+#  取得したファイルの状態（成否、サイズ、チェックサム、試行回数）をSQLiteに記録する
+#
+import os
+import time
+import random
+import hashlib
+import sqlite3
+
+# 再取得までの最初の待ち時間（秒、失敗する毎に2倍）と最大の待ち時間（秒）
+backoff_base = 600.0
+backoff_max = 86400.0
+# 待ち時間に掛ける乱数の範囲（同じ時刻に再取得が集中しないようにする）
+jitter = (0.5, 1.5)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    slot TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    size INTEGER,
+    checksum TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_attempt REAL,
+    next_attempt REAL,
+    error TEXT
+)
+"""
+
+
+def checksum(data):
+    """内容のチェックサム（SHA-256）を返す"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FetchManifest():
+    """時刻（slot）毎の取得状態を記録するSQLiteのデータベース
+
+    statusは取得できた場合に"ok"、失敗した場合に"failed"とし、
+    失敗した時刻は試行回数に応じた待ち時間が過ぎるまで再取得しない
+
+    Parameters:
+    ----------
+    db_path: str
+        データベースのファイル名
+    ----------
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+
+    def get(self, slot):
+        """記録を辞書で返す（無い場合はNone）"""
+        cur = self.conn.execute(
+            "SELECT slot, path, status, size, checksum, attempts, "
+            "last_attempt, next_attempt, error FROM slots WHERE slot = ?",
+            (slot, ))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        keys = ("slot", "path", "status", "size", "checksum", "attempts",
+                "last_attempt", "next_attempt", "error")
+        return dict(zip(keys, row))
+
+    def record_ok(self, slot, path, data):
+        """取得できた内容を記録する"""
+        rec = self.get(slot)
+        attempts = 1 if rec is None else rec["attempts"] + 1
+        self.conn.execute(
+            "INSERT OR REPLACE INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (slot, path, "ok", len(data), checksum(data), attempts,
+             time.time(), None, None))
+        self.conn.commit()
+
+    def record_failure(self, slot, path, error):
+        """失敗を記録し、次に取得する時刻を決める（指数的な待ち時間と乱数）"""
+        rec = self.get(slot)
+        attempts = 1 if rec is None else rec["attempts"] + 1
+        now = time.time()
+        wait = min(backoff_max, backoff_base * 2**(attempts - 1))
+        wait = wait * random.uniform(*jitter)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (slot, path, "failed", None, None, attempts, now, now + wait,
+             str(error)))
+        self.conn.commit()
+
+    def verify(self, slot, path, full=False):
+        """ファイルが記録した通りにあるかどうか
+
+        Parameters:
+        ----------
+        slot: str
+            時刻
+        path: str
+            ファイルのパス
+        full: bool
+            サイズに加えてチェックサムも確認するかどうか
+        ----------
+        """
+        rec = self.get(slot)
+        if rec is None or rec["status"] != "ok":
+            return False
+        try:
+            if os.path.getsize(path) != rec["size"]:
+                return False
+            if full:
+                with open(path, 'rb') as fin:
+                    return checksum(fin.read()) == rec["checksum"]
+        except OSError:
+            return False
+        return True
+
+    def due(self, slot, now=None):
+        """失敗した時刻の待ち時間が過ぎたかどうか（記録が無い場合はTrue）"""
+        rec = self.get(slot)
+        if rec is None or rec["status"] != "failed":
+            return True
+        if now is None:
+            now = time.time()
+        return rec["next_attempt"] is None or rec["next_attempt"] <= now
+
+    def summary(self):
+        """statusごとの件数を返す"""
+        cur = self.conn.execute(
+            "SELECT status, COUNT(*) FROM slots GROUP BY status")
+        return dict(cur.fetchall())
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,215 @@
+#
+#  2026/10/18
+#  地点情報などのメタデータを内容のハッシュ値（SHA-256）毎に保存するキャッシュ
+#
+#  通信はしない（サーバーに確認する場合は、呼び出し側がutils/fetch.pyの
+#  Fetcherを渡す）
+#
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import urllib.parse
+from .atomic import write_atomic
+
+# メタデータを保存する既定のディレクトリ（内容のハッシュ値毎）
+meta_dir_default = os.path.join(os.path.expanduser("~"), ".cache", "jma_draw",
+                                "meta")
+# メタデータをサーバーに確認せずに使う時間（秒）
+meta_max_age_default = 86400.
+
+
+def file_digest(file_name):
+    """ファイルの内容のハッシュ値（SHA-256、無い場合はNone）"""
+    try:
+        with open(file_name, 'rb') as fin:
+            return hashlib.sha256(fin.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _place(src, output_filename):
+    """srcをoutput_filenameにハードリンクする（できない場合はコピーする）
+
+    どちらも一時ファイルを作ってから置き換える
+    """
+    tmp = "{}.{}.{}.tmp".format(output_filename, os.getpid(),
+                                threading.get_ident())
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            # 別のファイルシステム、ハードリンクできないファイルシステム
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, output_filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class MetadataCache():
+    """地点情報などのメタデータを内容のハッシュ値（SHA-256）毎に保存し、
+    全ての取得・読み込みで共有する
+
+    objects/ハッシュ値 に内容、refs/URLのハッシュ値.json にURL毎の最新の
+    ハッシュ値と確認した時刻を保存する。確認からmax_age秒以内はサーバーに
+    問い合わせず、それ以降は条件付きリクエストで確認する。
+    1つのURLはプロセス内で最初に決まった版に固定する（release()で解除）
+
+    Parameters:
+    ----------
+    cache_dir: str
+        保存するディレクトリ（Noneの場合はmeta_dir_default）
+    max_age: float
+        サーバーに確認せずに使う時間（秒、0の場合は毎回確認する）
+    ----------
+    """
+    def __init__(self, cache_dir=None, max_age=meta_max_age_default):
+        if cache_dir is None:
+            cache_dir = meta_dir_default
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self._pinned = dict()
+        self._lock = threading.Lock()
+
+    def object_path(self, digest):
+        """ハッシュ値に対応するファイルのパス"""
+        return os.path.join(self.cache_dir, "objects", digest)
+
+    def _ref_path(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()[:20]
+        return os.path.join(self.cache_dir, "refs", key + ".json")
+
+    def _load_ref(self, url):
+        try:
+            with open(self._ref_path(url), 'rt') as fin:
+                ref = json.loads(fin.read())
+        except (OSError, ValueError):
+            return None
+        if ref.get("url") != url or not os.path.exists(
+                self.object_path(ref.get("sha256", ""))):
+            return None
+        return ref
+
+    def _store(self, url, body):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, body)
+        ref_path = self._ref_path(url)
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        ref = dict(url=url, sha256=digest, checked=time.time())
+        write_atomic(ref_path, json.dumps(ref).encode())
+        return digest
+
+    def get(self, url, fetcher=None, max_age=None):
+        """URLのメタデータを保存したファイルのパスとハッシュ値を返す
+
+        通信できない場合でも保存した版があれば、警告を表示してそのまま使う
+
+        Parameters:
+        ----------
+        url: str
+            URL
+        fetcher: utils.fetch.Fetcher
+            確認に使うFetcher（Noneの場合はサーバーに確認せず、保存した版を
+            使う）
+        max_age: float
+            サーバーに確認せずに使う時間（秒、Noneの場合はself.max_age）
+        ----------
+        Returns:
+        ----------
+        path: str
+            内容を保存したファイルのパス
+        digest: str
+            内容のハッシュ値（SHA-256）
+        ----------
+        """
+        if max_age is None:
+            max_age = self.max_age
+        with self._lock:
+            if url in self._pinned:
+                return self._pinned[url]
+            ref = self._load_ref(url)
+            if fetcher is None:
+                if ref is None:
+                    raise FileNotFoundError("no cached metadata: " + url)
+                digest = ref["sha256"]
+            elif ref is not None and time.time() - ref["checked"] < max_age:
+                digest = ref["sha256"]
+            else:
+                try:
+                    body, _ = fetcher.get_cached(url)
+                    digest = self._store(url, body)
+                except OSError as e:
+                    if ref is None:
+                        raise
+                    print("Warn: use cached metadata", url, e)
+                    digest = ref["sha256"]
+            self._pinned[url] = (self.object_path(digest), digest)
+            return self._pinned[url]
+
+    def read(self, url, fetcher=None):
+        """URLのメタデータの内容を返す"""
+        path, _ = self.get(url, fetcher)
+        with open(path, 'rb') as fin:
+            return fin.read()
+
+    def link(self, url, dir_name, fetcher=None):
+        """取得時の版をディレクトリに置く（ハードリンク、できない場合はコピー）
+
+        データと同じディレクトリに置くため、キャッシュが無いホストでも
+        そのディレクトリだけで読み込める。キャッシュの内容は置き換えるのみで
+        書き換えないため、ハードリンクでも共有して問題ない
+
+        Returns:
+        ----------
+        str
+            置いたファイルのパス
+        ----------
+        """
+        path, digest = self.get(url, fetcher)
+        file_name = os.path.join(
+            dir_name, os.path.basename(urllib.parse.urlsplit(url).path))
+        if file_digest(file_name) != digest:
+            _place(path, file_name)
+        # 以前のハッシュ値だけを書いたファイルは使わない
+        if os.path.exists(file_name + ".sha256"):
+            os.remove(file_name + ".sha256")
+        return file_name
+
+    def resolve(self, file_name):
+        """ハッシュ値だけを書いたファイル（ファイル名.sha256、以前の版で作成）
+        から、内容を保存したファイルのパスを返す（無い場合はNone）"""
+        try:
+            with open(file_name + ".sha256", 'rt') as fin:
+                digest = fin.read().strip()
+        except OSError:
+            return None
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            return None
+        return path
+
+    def release(self):
+        """固定した版を解除する（次のget()で確認し直す）"""
+        with self._lock:
+            self._pinned.clear()
+
+
+# プロセス内で共有するMetadataCache
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def metadata_cache():
+    """プロセス内で共有するMetadataCacheを返す（1回の実行で同じ版を使う）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = MetadataCache()
+        return _shared
@@ -0,0 +1,202 @@
+#
+#  2026/10/18
+#  アメダスの地点毎のデータ（amedas/data/point/地点番号/yyyymmdd_hh.json、
+#  3時間毎のブロック）を並列に取得し、(時刻, 地点, 変数)配列に変換する
+#
+#  全国のデータ（map/時刻.json）を時刻毎に取得せずに、1地点の時系列を作成できる
+#  （1地点1週間の場合、10分毎の全国データ約1000個の代わりに56個のブロック）
+#
+import os
+import json
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from jmaloc.geometry import load_table
+from . import decoder
+from .fetch import FetchError, shared_fetcher
+from .meta import metadata_cache
+
+url_top = "https://www.jma.go.jp/bosai/amedas/data/point/"
+table_url = "https://www.jma.go.jp/bosai/amedas/const/amedastable.json"
+# 取得したブロックを保存する既定のディレクトリ（地点番号/yyyymmdd_hh.json）
+cache_dir_default = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "jma_draw", "point")
+# 1つのブロックの時間（時間）
+block_hours = 3
+# ブロックの終了後、この時間が経つまでは確定していないとして取得し直す
+settle = timedelta(hours=1)
+# 日本標準時
+_JST = timezone(timedelta(hours=9))
+
+
+def block_name(t):
+    """時刻を含むブロックの名前（yyyymmdd_hh、hhは3時間毎）を返す"""
+    t = pd.Timestamp(t)
+    return t.strftime("%Y%m%d") + "_%02d" % (t.hour // block_hours *
+                                             block_hours)
+
+
+def block_start(name):
+    """ブロックの開始時刻を返す"""
+    return pd.to_datetime(name, format="%Y%m%d_%H")
+
+
+def station_ids(stations, table=None, fetcher=None):
+    """地点番号または英語の地点名を地点番号に変換する（無い地点はNone）
+
+    Parameters:
+    ----------
+    stations: list(str)
+        地点番号または英語の地点名
+    table: jmaloc.geometry.StationTable
+        地点情報（Noneの場合はメタデータのキャッシュから読み込む）
+    fetcher: utils.fetch.Fetcher
+        地点情報の確認に使うFetcher（Noneの場合はshared_fetcher()）
+    ----------
+    """
+    if table is None:
+        if fetcher is None:
+            fetcher = shared_fetcher()
+        table = load_table(metadata_cache().get(table_url, fetcher)[0])
+    lookup = {name: staid for staid, name in zip(table.staid, table.enname)}
+    lookup.update({staid: staid for staid in table.staid})
+    ids = []
+    for sta in stations:
+        staid = lookup.get(str(sta))
+        if staid is None:
+            print("Warn: station not found", sta)
+        ids.append(staid)
+    return ids
+
+
+class PointFetcher():
+    """地点毎のデータをブロック単位で取得し、ディスクに保存する
+
+    確定したブロック（終了からsettle以上経過）は保存したものを使い、
+    確定していないブロックは条件付きリクエストで取得し直す
+
+    Parameters:
+    ----------
+    fetcher: utils.fetch.Fetcher
+        取得に使うFetcher（Noneの場合はshared_fetcher()）
+    cache_dir: str
+        保存するディレクトリ（Noneの場合はcache_dir_default）
+    now: datetime
+        現在時刻（日本時間、Noneの場合は実行時の時刻）
+    ----------
+    """
+    def __init__(self, fetcher=None, cache_dir=None, now=None):
+        if fetcher is None:
+            fetcher = shared_fetcher()
+        if cache_dir is None:
+            cache_dir = cache_dir_default
+        if now is None:
+            now = datetime.now(_JST).replace(tzinfo=None)
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.now = pd.Timestamp(now)
+
+    def _path(self, staid, name):
+        return os.path.join(self.cache_dir, staid, name + ".json")
+
+    def settled(self, name):
+        """ブロックが確定しているかどうか"""
+        return (block_start(name) + timedelta(hours=block_hours) + settle <=
+                self.now)
+
+    def block(self, staid, name):
+        """1地点1ブロックのデータ（時刻をキーとする辞書）を返す
+
+        データが無いブロック（404）は空の辞書を返す
+        """
+        path = self._path(staid, name)
+        if self.settled(name) and os.path.exists(path):
+            with open(path, 'rb') as fin:
+                return json.loads(fin.read())
+        if block_start(name) > self.now:
+            return dict()
+        url = url_top + staid + "/" + name + ".json"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # 内容はpathのみに保存する（Fetcherのキャッシュにはヘッダのみ）
+            body, _ = self.fetcher.get_cached(url, path)
+        except FetchError as e:
+            if e.status == 404:
+                return dict()
+            raise
+        return json.loads(body)
+
+    def series(self, stations, names, time_list, table=None):
+        """指定した地点・時刻の(時刻, 地点, 変数)配列を返す
+
+        Parameters:
+        ----------
+        stations: list(str)
+            地点番号または英語の地点名
+        names: list(str)
+            取り出す変数名
+        time_list: list(datetime)
+            取り出す時刻（日本時間、10分毎の任意の時刻）
+        table: jmaloc.geometry.StationTable
+            地点情報（Noneの場合はメタデータのキャッシュから読み込む）
+        ----------
+        Returns:
+        ----------
+        ndarray(float32)
+            (時刻, 地点, 変数)の値（品質フラグが0以外、無い地点・時刻は欠損値）
+        ----------
+        """
+        names = list(names)
+        tpos = {
+            pd.Timestamp(t).strftime("%Y%m%d%H%M%S"): n
+            for n, t in enumerate(time_list)
+        }
+        ids = station_ids(stations, table, self.fetcher)
+        blocks = sorted(set(block_name(t) for t in time_list))
+        jobs = [(n, staid, name) for n, staid in enumerate(ids)
+                if staid is not None for name in blocks]
+        d = np.full((len(time_list), len(stations), len(names)),
+                    np.nan,
+                    dtype=np.float32)
+
+        def _get(job):
+            _, staid, name = job
+            try:
+                return job, self.block(staid, name)
+            except OSError as e:
+                print("Warn:", e)
+                return job, dict()
+
+        with ThreadPoolExecutor(
+                max_workers=self.fetcher.max_workers) as executor:
+            for (n, staid, name), data in executor.map(_get, jobs):
+                # 地点番号の代わりに時刻をキーとする辞書として変換する
+                data = {k: v for k, v in data.items() if k in tpos}
+                if len(data) == 0:
+                    continue
+                amedas = decoder.from_json(data, names)
+                pos = np.array([tpos[t] for t in amedas.staid], dtype=np.int64)
+                d[pos, n] = np.stack([amedas.get(name) for name in names],
+                                     axis=1)
+        return d
+
+
+def read_series(stations, names, time_list, fetcher=None, cache_dir=None):
+    """地点毎のデータを取得し、(時刻, 地点, 変数)配列を返す
+
+    Parameters:
+    ----------
+    stations: list(str)
+        地点番号または英語の地点名
+    names: list(str)
+        取り出す変数名
+    time_list: list(datetime)
+        取り出す時刻（日本時間）
+    fetcher: utils.fetch.Fetcher
+        取得に使うFetcher（Noneの場合はshared_fetcher()）
+    cache_dir: str
+        ブロックを保存するディレクトリ（Noneの場合はcache_dir_default）
+    ----------
+    """
+    return PointFetcher(fetcher, cache_dir).series(stations, names, time_list)
@@ -0,0 +1,270 @@
+#
+#  2026/10/18
+#  都道府県境（Natural Earth 10mのadmin_1_states_provinces）を前処理して保存し、
+#  1つのPathCollectionで描く
+#
+#  1. 全世界のシェープファイルから日本の都道府県だけを取り出し、WKBで保存する
+#     （~/.cache/jma_draw/pref/japan_ハッシュ値.npz、シェープファイルは1回だけ読む）
+#  2. MapRegionの範囲（と周囲のmargin）で切り取り、範囲の幅に応じて簡略化した
+#     頂点とPathのコードの配列を、領域毎に保存する（領域名_ハッシュ値.npz）
+#
+#  キャッシュのキーには、シェープファイルの大きさ・更新時刻、範囲と簡略化の設定を
+#  含めるため、どれかを変えると自動的に作り直す
+#
+import os
+import hashlib
+import threading
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+from .atomic import write_atomic
+
+# 前処理した都道府県境を保存する既定のディレクトリ
+cache_dir_default = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "jma_draw", "pref")
+# 作図範囲の周囲に残す幅（範囲の幅に対する割合、切り取った辺を図の外に置く）
+margin = 0.05
+# 簡略化の許容誤差（範囲の幅に対する割合、1e-4は18インチ・300dpiの図で
+# 約0.4ピクセル）
+simplify_frac = 1e-4
+# 前処理の方法を変えた場合に増やす
+version = 1
+
+
+def _shapefile():
+    """Natural Earth 10mの州・県境界のシェープファイル（無い場合は取得する）"""
+    import cartopy.io.shapereader as shapereader
+    return shapereader.natural_earth(resolution='10m',
+                                     category='cultural',
+                                     name='admin_1_states_provinces')
+
+
+def _digest(*items):
+    """キャッシュのキー（SHA-256の先頭16文字）"""
+    return hashlib.sha256(repr(items).encode()).hexdigest()[:16]
+
+
+def _save_npz(output_filename, **arrays):
+    """npzを書き出す（書き込み途中のファイルは残さない）"""
+    import io
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    write_atomic(output_filename, buf.getvalue())
+
+
+def _polygons(geometry):
+    """ジオメトリに含まれるPolygonを返す（切り取りで生じた線・点は除く）"""
+    if geometry.is_empty:
+        return []
+    if geometry.geom_type == "Polygon":
+        return [geometry]
+    if geometry.geom_type in ("MultiPolygon", "GeometryCollection"):
+        res = []
+        for g in geometry.geoms:
+            res += _polygons(g)
+        return res
+    return []
+
+
+def _polygon_path(polygon):
+    """Polygon（外周と穴）を1つのPathの頂点とコードに変換する"""
+    verts = []
+    codes = []
+    for ring in [polygon.exterior] + list(polygon.interiors):
+        xy = np.asarray(ring.coords, dtype=np.float64)[:, :2]
+        if len(xy) < 3:
+            continue
+        c = np.full(len(xy), Path.LINETO, dtype=np.uint8)
+        c[0] = Path.MOVETO
+        c[-1] = Path.CLOSEPOLY
+        verts.append(xy)
+        codes.append(c)
+    if len(verts) == 0:
+        return None
+    return np.concatenate(verts), np.concatenate(codes)
+
+
+class PrefStore():
+    """前処理した都道府県境をディスク（npz）とメモリに保存する
+
+    Parameters:
+    ----------
+    cache_dir: str
+        保存するディレクトリ（Noneの場合はcache_dir_default）
+    ----------
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = cache_dir_default
+        self.cache_dir = cache_dir
+        self._memo = dict()
+        self._lock = threading.RLock()
+
+    def japan(self):
+        """日本の都道府県のジオメトリ（shapely）のリスト"""
+        from shapely import wkb
+        with self._lock:
+            if "japan" in self._memo:
+                return self._memo["japan"]
+            shp = _shapefile()
+            st = os.stat(shp)
+            key = _digest(version, os.path.abspath(shp), st.st_size,
+                          st.st_mtime_ns)
+            path = os.path.join(self.cache_dir, "japan_" + key + ".npz")
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    buf = data["wkb"].tobytes()
+                    offsets = data["offsets"]
+                geoms = [
+                    wkb.loads(buf[offsets[n]:offsets[n + 1]])
+                    for n in range(len(offsets) - 1)
+                ]
+            else:
+                import cartopy.io.shapereader as shapereader
+                print("extract prefectures", shp)
+                geoms = [
+                    province.geometry
+                    for province in shapereader.Reader(shp).records()
+                    if province.attributes['admin'] == 'Japan'
+                ]
+                blobs = [g.wkb for g in geoms]
+                offsets = np.cumsum([0] + [len(b) for b in blobs])
+                os.makedirs(self.cache_dir, exist_ok=True)
+                _save_npz(path,
+                          wkb=np.frombuffer(b"".join(blobs), dtype=np.uint8),
+                          offsets=offsets.astype(np.int64))
+            self._memo["japan"] = geoms
+            return geoms
+
+    def region(self, region):
+        """作図範囲で切り取り、簡略化した都道府県境
+
+        Parameters:
+        ----------
+        region: jmaloc.MapRegion
+            作図範囲
+        ----------
+        Returns:
+        ----------
+        verts: ndarray(float32)
+            全てのPathの頂点（経度, 緯度）
+        codes: ndarray(uint8)
+            頂点毎のPathのコード
+        offsets: ndarray(int64)
+            Path毎の先頭の頂点の位置（最後は頂点数）
+        ----------
+        """
+        extent = (region.lon_min, region.lon_max, region.lat_min,
+                  region.lat_max)
+        with self._lock:
+            if extent in self._memo:
+                return self._memo[extent]
+            shp = _shapefile()
+            st = os.stat(shp)
+            key = _digest(version, os.path.abspath(shp), st.st_size,
+                          st.st_mtime_ns, extent, margin, simplify_frac)
+            path = os.path.join(self.cache_dir,
+                                str(region.sta) + "_" + key + ".npz")
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    res = (data["verts"], data["codes"], data["offsets"])
+            else:
+                res = self._build(extent)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                _save_npz(path, verts=res[0], codes=res[1], offsets=res[2])
+            self._memo[extent] = res
+            return res
+
+    def _build(self, extent):
+        from shapely.geometry import box
+        lon_min, lon_max, lat_min, lat_max = extent
+        width = max(lon_max - lon_min, lat_max - lat_min)
+        clip = box(lon_min - width * margin, lat_min - width * margin,
+                   lon_max + width * margin, lat_max + width * margin)
+        tolerance = width * simplify_frac
+        verts = []
+        codes = []
+        for geom in self.japan():
+            if not geom.intersects(clip):
+                continue
+            geom = geom.intersection(clip).simplify(tolerance,
+                                                    preserve_topology=True)
+            for polygon in _polygons(geom):
+                p = _polygon_path(polygon)
+                if p is not None:
+                    verts.append(p[0])
+                    codes.append(p[1])
+        offsets = np.cumsum([0] + [len(v) for v in verts]).astype(np.int64)
+        if len(verts) == 0:
+            return (np.zeros((0, 2), dtype=np.float32),
+                    np.zeros(0, dtype=np.uint8), offsets)
+        return (np.concatenate(verts).astype(np.float32),
+                np.concatenate(codes), offsets)
+
+    def paths(self, region):
+        """作図範囲の都道府県境のPathのリスト"""
+        verts, codes, offsets = self.region(region)
+        return [
+            Path(verts[offsets[n]:offsets[n + 1]],
+                 codes[offsets[n]:offsets[n + 1]])
+            for n in range(len(offsets) - 1)
+        ]
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def pref_store():
+    """プロセス内で共有するPrefStore"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PrefStore()
+        return _shared
+
+
+def add_pref(ax,
+             region,
+             linestyle='-',
+             facecolor='none',
+             edgecolor='k',
+             linewidth=0.8,
+             store=None):
+    """都道府県境を描く（全ての都道府県を1つのPathCollectionで描く）
+
+    Parameters:
+    ----------
+    ax: matplotlib Axes
+        cartopyを呼び出した際のaxes
+    region: jmaloc.MapRegion
+        作図範囲
+    linestyle: str
+        線の種類
+    facecolor: str
+        塗り潰す色
+    edgecolor: str
+        線の色
+    linewidth: float
+        線の幅
+    store: PrefStore
+        前処理した都道府県境（Noneの場合はpref_store()）
+    ----------
+    Returns:
+    ----------
+    matplotlib.collections.PathCollection
+    ----------
+    """
+    import cartopy.crs as ccrs
+    if store is None:
+        store = pref_store()
+    # cartopyのadd_geometriesと同じ重なり順（陸・海の上、マーカーの下）
+    coll = PathCollection(store.paths(region),
+                          facecolors=facecolor,
+                          edgecolors=edgecolor,
+                          linewidths=linewidth,
+                          linestyles=linestyle,
+                          transform=ccrs.PlateCarree(),
+                          zorder=1.5)
+    ax.add_collection(coll, autolim=False)
+    return coll
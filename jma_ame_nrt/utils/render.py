@@ -0,0 +1,275 @@
+#
+#  2026/10/18
+#  時刻毎の作図を複数のプロセスで行う
+#
+#  - 各プロセスは作図プログラムのimport（cartopyなど）、背景の画像と使い回す図
+#    （utils/frame.py）を1回だけ用意し、割り当てられた時刻を続けて描く
+#  - データの読み込み（read_func）も各プロセスで行う（呼び出し側で全ての時刻を
+#    先に読み込まない）
+#  - 呼び出し側で求めたデータ（ndarray）は全ての時刻の分を1つの共有メモリに置き、
+#    各プロセスには位置と形だけを渡す（pickleでデータを送らない）
+#  - 出力ファイル名は呼び出し側で決めるため、プロセス数によらず同じ
+#  - 1つの時刻の読み込み・作図に失敗しても、残りの時刻は描く
+#
+import sys
+import zipfile
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+
+# 読み込めなかった時刻として扱う例外（ファイルが無い、壊れたnpz・csvなど）
+read_errors = (OSError, ValueError, zipfile.BadZipFile)
+
+# 作図を行うプロセスで開いている共有メモリ
+_shm = None
+
+
+def _is_shared(a):
+    """共有メモリに置く引数かどうか（マスク付き配列、objectの配列は除く）"""
+    return type(a) is np.ndarray and not a.dtype.hasobject
+
+
+def _item(a, size):
+    """引数を共有メモリに置く位置（8バイト境界に合わせる）または値に変換する
+
+    Returns:
+    ----------
+    tuple
+        ("array", 位置, 形, 型)、("tuple", 要素毎の変換結果)または("value", 値)
+    int
+        共有メモリの大きさ（バイト）
+    ----------
+    """
+    if _is_shared(a):
+        item = ("array", size, a.shape, a.dtype.str)
+        return item, size + (a.nbytes + 7) // 8 * 8
+    if type(a) is tuple:
+        items = []
+        for b in a:
+            item, size = _item(b, size)
+            items.append(item)
+        return ("tuple", items), size
+    return ("value", a), size
+
+
+def _layout(frames):
+    """全ての時刻の引数を共有メモリに置く位置
+
+    Returns:
+    ----------
+    list(tuple)
+        時刻毎のargsとkwargsの変換結果（_item）
+    int
+        共有メモリの大きさ（バイト）
+    ----------
+    """
+    layout = []
+    size = 0
+    for _, args, kwargs in frames:
+        items, size = _item(tuple(args), size)
+        kwitems = dict()
+        for key, a in kwargs.items():
+            kwitems[key], size = _item(a, size)
+        layout.append((items, kwitems))
+    return layout, size
+
+
+def _pack_item(a, item, buf):
+    if item[0] == "array":
+        _, offset, shape, dtype = item
+        view = np.ndarray(shape, dtype, buffer=buf, offset=offset)
+        view[...] = a
+        del view
+    elif item[0] == "tuple":
+        for b, sub in zip(a, item[1]):
+            _pack_item(b, sub, buf)
+
+
+def _pack(frames, layout, shm):
+    """引数の配列を共有メモリに書き込む"""
+    for (_, args, kwargs), (items, kwitems) in zip(frames, layout):
+        _pack_item(tuple(args), items, shm.buf)
+        for key, a in kwargs.items():
+            _pack_item(a, kwitems[key], shm.buf)
+
+
+def _unpack_item(item, buf):
+    if item[0] == "array":
+        _, offset, shape, dtype = item
+        a = np.ndarray(shape, dtype, buffer=buf, offset=offset)
+        a.flags.writeable = False
+        return a
+    if item[0] == "tuple":
+        return tuple(_unpack_item(sub, buf) for sub in item[1])
+    return item[1]
+
+
+def _unpack(layout, buf):
+    """共有メモリの配列（書き換え不可）と値から引数を作る"""
+    items, kwitems = layout
+    kwargs = {key: _unpack_item(item, buf) for key, item in kwitems.items()}
+    return _unpack_item(items, buf), kwargs
+
+
+def _attach(name):
+    """作図を行うプロセスの初期化（共有メモリを開く）"""
+    global _shm
+    try:
+        # 作ったプロセスが削除するため、このプロセスでは管理しない
+        _shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12以前
+        _shm = shared_memory.SharedMemory(name=name)
+
+
+def _render(read_func, draw_func, args, kwargs):
+    """1つの時刻のデータを読み込み（read_funcがある場合）、描く
+
+    Returns:
+    ----------
+    str
+        失敗した場合はエラーの内容（成功した場合はNone）
+    ----------
+    """
+    try:
+        if read_func is not None:
+            try:
+                _, args, kwargs = read_func(*args, **kwargs)
+            except read_errors as e:
+                return "Error: " + str(e)
+        draw_func(*args, **kwargs)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def _draw(read_func, draw_func, n, layout):
+    """作図を行うプロセスで1つの時刻を描く"""
+    args, kwargs = _unpack(layout, _shm.buf)
+    return n, _render(read_func, draw_func, args, kwargs)
+
+
+def _draw_alone(name, read_func, draw_func, layout):
+    """1つの時刻だけを描くプロセス（失敗した場合は終了コード1）"""
+    _attach(name)
+    args, kwargs = _unpack(layout, _shm.buf)
+    error = _render(read_func, draw_func, args, kwargs)
+    if error is not None:
+        print(error)
+        sys.exit(1)
+
+
+def _render_isolated(read_func, draw_func, todo, layout, name, workers,
+                     report):
+    """時刻毎に別のプロセスで描く（異常終了した時刻だけを失敗とする）"""
+    ctx = multiprocessing.get_context()
+    todo = list(todo)
+    running = dict()
+    while len(todo) > 0 or len(running) > 0:
+        while len(todo) > 0 and len(running) < workers:
+            n = todo.pop(0)
+            p = ctx.Process(target=_draw_alone,
+                            args=(name, read_func, draw_func, layout[n]))
+            p.start()
+            running[n] = p
+        n, p = next(iter(running.items()))
+        p.join()
+        del running[n]
+        if p.exitcode == 1:
+            # エラーの内容は描いたプロセスで表示する
+            report(n, None)
+        elif p.exitcode != 0:
+            report(
+                n, "the drawing process terminated abruptly "
+                "(exit code {})".format(p.exitcode))
+
+
+def render_frames(draw_func, frames, workers=1, read_func=None):
+    """時刻毎の作図を行う
+
+    Parameters:
+    ----------
+    draw_func: function
+        作図を行う関数（モジュールの関数、draw_func(*args, **kwargs)）
+    frames: list(tuple)
+        時刻毎の(名前, args, kwargs)（名前は時刻、出力ファイル名などエラーの
+        表示に用いる、args、kwargsのndarrayとndarrayのtupleは共有メモリで
+        渡す）。read_funcがある場合はread_funcの引数、無い場合はdraw_funcの引数
+    workers: int
+        作図を行うプロセス数（1の場合はこのプロセスで順に描く）
+    read_func: function
+        データを読み込む関数（モジュールの関数、read_func(*args, **kwargs)が
+        (出力ファイル名, drawのargs, drawのkwargs)を返す）。作図を行う
+        プロセスで時刻毎に呼び、read_errorsの例外はその時刻の失敗とする
+    ----------
+    Returns:
+    ----------
+    list(str)
+        作図に失敗した時刻の名前
+    ----------
+    """
+    failed = []
+
+    def report(n, error):
+        print("Error: failed to draw", frames[n][0])
+        if error:
+            print(error)
+        failed.append(n)
+
+    if len(frames) == 0:
+        return []
+    if workers <= 1 or len(frames) == 1:
+        for n, (_, args, kwargs) in enumerate(frames):
+            error = _render(read_func, draw_func, args, kwargs)
+            if error is not None:
+                report(n, error)
+        return [frames[n][0] for n in failed]
+    #
+    # 最初の時刻はこのプロセスで描き、背景の画像などのキャッシュを作っておく
+    # （各プロセスが同時に同じ背景を描かないように）
+    _, args, kwargs = frames[0]
+    error = _render(read_func, draw_func, args, kwargs)
+    if error is not None:
+        report(0, error)
+    #
+    # 残りの時刻の引数の配列を共有メモリに置き、複数のプロセスで描く
+    layout, size = _layout(frames)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        _pack(frames, layout, shm)
+        todo = list(range(1, len(frames)))
+        pending = set(todo)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_attach,
+                                 initargs=(shm.name, )) as executor:
+            futures = [
+                executor.submit(_draw, read_func, draw_func, n, layout[n])
+                for n in todo
+            ]
+            try:
+                for future in as_completed(futures):
+                    n, error = future.result()
+                    pending.discard(n)
+                    if error is not None:
+                        report(n, error)
+            except BrokenProcessPool:
+                print("Warn: a drawing process terminated abruptly")
+                for future in futures:
+                    if future.done() and future.exception() is None:
+                        n, error = future.result()
+                        if n in pending:
+                            pending.discard(n)
+                            if error is not None:
+                                report(n, error)
+        if len(pending) > 0:
+            # プロセスが異常終了した場合は、描けなかった時刻を1つずつ別の
+            # プロセスで描き直す（異常終了する時刻が他の時刻を巻き込まない）
+            _render_isolated(read_func, draw_func, sorted(pending), layout,
+                             shm.name, workers, report)
+    finally:
+        shm.close()
+        shm.unlink()
+    return [frames[n][0] for n in sorted(failed)]
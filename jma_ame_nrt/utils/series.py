@@ -0,0 +1,125 @@
+#
+#  2026/10/18
+#  アメダスデータファイルから指定した地点の時系列を取り出す
+#
+import os
+import numpy as np
+from . import decoder
+from .render import read_errors
+
+
+def _station_rows(staid, enname, stations):
+    """地点番号または英語の地点名からデータの行番号を返す（無い地点は-1）"""
+    lookup = dict()
+    if enname is not None:
+        lookup.update({name: n for n, name in enumerate(enname)})
+    lookup.update({sid: n for n, sid in enumerate(staid)})
+    return np.array([lookup.get(str(sta), -1) for sta in stations],
+                    dtype=np.int64)
+
+
+def _npz_rows(npz_filename, names, stations, index):
+    """npzから指定した地点の行・変数の列のみ取り出す
+
+    地点番号と値・品質フラグの配列のみ読み込み、全ての地点のAmedasDataは
+    作らない。地点番号の並びが前回と同じ場合は行番号を使い回す
+    （英語の地点名を読み込まない）
+
+    Parameters:
+    ----------
+    npz_filename: str
+        入力ファイル名（npz）
+    names: list(str)
+        取り出す変数名
+    stations: list(str)
+        地点番号または英語の地点名
+    index: tuple(ndarray, ndarray)
+        前回の地点番号と行番号（Noneの場合は求める）
+    ----------
+    Returns:
+    ----------
+    values: ndarray(float32)
+        (地点, 変数)の値（品質フラグが0以外、無い地点・変数は欠損値）
+    index: tuple(ndarray, ndarray)
+        地点番号と行番号（無い地点は-1）
+    ----------
+    """
+    with np.load(npz_filename) as d:
+        staid = d["staid"]
+        if index is None or not np.array_equal(index[0], staid):
+            index = (staid, _station_rows(staid, d["enname"], stations))
+        rows = index[1]
+        found = np.nonzero(rows >= 0)[0]
+        r = rows[found]
+        file_names = d["names"].tolist()
+        cols = [file_names.index(name) if name in file_names else -1
+                for name in names]
+        values = np.full((len(stations), len(names)), np.nan,
+                         dtype=np.float32)
+        if len(found) > 0 and any(c >= 0 for c in cols):
+            dv = d["values"][r]
+            df = d["flags"][r]
+            for n, c in enumerate(cols):
+                if c >= 0:
+                    values[found, n] = np.where(df[:, c] == 0, dv[:, c],
+                                                np.float32(np.nan))
+    return values, index
+
+
+def read_series(input_filenames, stations, names):
+    """複数時刻のファイルから、複数地点の時系列を1回の読み込みで取り出す
+
+    各ファイルでは指定した地点の行・変数の列のみ変換する（npzは地点番号から
+    求めた行のみ取り出す）。地点の行番号は地点番号の並びが変わった場合のみ
+    求め直す。読み込めないファイル（無い、壊れたnpz・csvなど）の時刻は
+    欠損値とし、残りの時刻を読み込む
+
+    Parameters:
+    ----------
+    input_filenames: list(str)
+        時刻順の入力ファイル名（csv、npzまたはjson）
+    stations: list(str)
+        地点番号または英語の地点名
+    names: list(str)
+        取り出す変数名
+    ----------
+    Returns:
+    ----------
+    ndarray(float32)
+        (時刻, 地点, 変数)の値（ファイルや地点が無い場合は欠損値）
+    ----------
+    """
+    names = list(names)
+    d = np.full((len(input_filenames), len(stations), len(names)),
+                np.nan,
+                dtype=np.float32)
+    staid = None
+    rows = None
+    for t, input_filename in enumerate(input_filenames):
+        # 同じ名前のnpzがあればnpzを使う（decoder.readと同じ）
+        npz_filename = os.path.splitext(input_filename)[0] + ".npz"
+        try:
+            if os.path.exists(npz_filename):
+                d[t], index = _npz_rows(npz_filename, names, stations,
+                                        None if rows is None else
+                                        (staid, rows))
+                staid, rows = index
+                continue
+            amedas = decoder.read(input_filename, names, stations=stations)
+        except FileNotFoundError:
+            print("Warn: file not found", input_filename)
+            continue
+        except read_errors as e:
+            print("Warn: cannot read", input_filename, e)
+            continue
+        if staid is None or not np.array_equal(staid, amedas.staid):
+            staid = amedas.staid
+            rows = _station_rows(staid, amedas.enname, stations)
+        found = np.nonzero(rows >= 0)[0]
+        r = rows[found]
+        d[t, found] = np.where(amedas.flags[r] == 0, amedas.values[r],
+                               np.float32(np.nan))
+    if rows is not None:
+        for sta in np.asarray(stations)[rows < 0]:
+            print("Warn: station not found", sta)
+    return d
@@ -0,0 +1,17 @@
+#
+#  2026/10/18
+#  jma_ame_nrt/utils/fetch.pyを読み込み、このモジュールとして使う
+#  （import fetchで同じFetcher、FetchMetricsなどを使う）
+#
+import os
+import sys
+
+_top = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                 "jma_ame_nrt"))
+if _top not in sys.path:
+    sys.path.append(_top)
+from utils import fetch as _module  # noqa: E402
+
+# fetch._sharedなどの設定が読み込んだモジュールに反映されるように置き換える
+sys.modules[__name__] = _module
@@ -8,16 +8,17 @@
 # Google Colaboratoryで動作するバージョンは、次のリンクから取得可能
 # https://colab.research.google.com/drive/1NtZSQR-JREDH1PnL7T-eInR-CW046iKK
 #
+import io
 import os
 import time
 import cv2
 import json
 import numpy as np
 import pandas as pd
-import urllib.request
 from PIL import Image
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
+from fetch import export_metrics, shared_fetcher, write_atomic
 
 # 最新の画像だけを取得するかどうか
 opt_latest = False  # 取得開始する時刻以降の全時刻の画像を使用する場合（注意）
@@ -92,11 +93,11 @@ def get_fileinfo(opt_jp=False):
         url = "https://www.jma.go.jp/bosai/himawari/data/satimg/targetTimes_jp.json"
     else:  # 全球画像データ
         url = "https://www.jma.go.jp/bosai/himawari/data/satimg/targetTimes_fd.json"
-    urllib.request.urlretrieve(url, "targetTimes.json")
+    # 変更されていなければ前回取得した内容を使う（304）
+    data, changed = shared_fetcher().get_cached(url)
+    write_atomic("targetTimes.json", data)
     #
     # JSON形式読み込み
-    with open("targetTimes.json", 'rt') as fin:
-        data = fin.read()
     df = pd.DataFrame(json.loads(data))
     print(df)
     basetimes = df.loc[:, 'basetime']
@@ -158,17 +159,8 @@ def get_jpg(basetime=None,
         url = urlbase + basetime + "/jp/" + validtime + "/" + band_prod + "/" + tile + ".jpg"
     else:  # 全球画像データ
         url = urlbase + basetime + "/fd/" + validtime + "/" + band_prod + "/" + tile + ".jpg"
-    print(url)
-    try:
-        im = Image.open(urllib.request.urlopen(url))
-    except Exception:
-        time.sleep(10.0)  # 10秒間待つ
-        get_jpg(basetime=basetime,
-                validtime=validtime,
-                mtype=mtype,
-                tile=tile,
-                opt_jp=opt_jp,
-                cnt=cnt - 1)  # cntを減らして再帰
+    # 通信エラーの場合はcnt - 1回まで再取得する
+    im = Image.open(io.BytesIO(shared_fetcher().get(url, retries=cnt - 1)))
     return im
 
 
@@ -197,8 +189,7 @@ def get_tile(tile="3/7/3", mtype="std"):
         raise ValueError("Invalid tile/mtype")
     # URL
     url = urlbase + mtype + "/" + tile + ".png"
-    print(url)
-    im = Image.open(urllib.request.urlopen(url))
+    im = Image.open(io.BytesIO(shared_fetcher().get(url)))
     return im
 
 
@@ -632,3 +623,5 @@ if __name__ == '__main__':
                 time.sleep(10.0)  # 10秒間待つ
         else:
             print("skip")
+    # 取得の集計結果を書き出す（JMA_DRAW_METRICS_DIRを設定した場合）
+    export_metrics("get_jma_jp")
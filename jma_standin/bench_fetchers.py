@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+#
+# 代わりのサーバー（standin_server.py）を起動し、取得プログラム
+# （get_jma_json_auto.py、get_wpr_json.py、get_jma_jp.py）の取得速度と
+# 遅延・エラーがある場合の動作を確認する（ネットワーク不要）
+#
+# 使用方法
+# % python3 make_fixtures.py --fixture_dir fixtures
+# % python3 bench_fetchers.py --fixture_dir fixtures --p5xx 0.1 --latency 0.05
+#
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import pandas as pd
+from datetime import timedelta
+from standin_server import Faults, StandinServer
+
+_TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _endpoints(metrics):
+    """集計単位毎の要求数、エラー数、再取得回数と応答時間（秒）"""
+    res = dict()
+    for ep, stats in metrics.summary()["endpoints"].items():
+        latency = stats["latency"]
+        res[ep] = dict(requests=stats["requests"],
+                       errors=stats["errors"],
+                       retries=stats["retries"],
+                       p50=round(latency["p50"], 4),
+                       p90=round(latency["p90"], 4),
+                       max=round(latency["max"], 4))
+    return res
+
+
+def bench_amedas(fixture_dir, work_dir, args):
+    """get_jma_json_auto.backfillで最近のアメダスデータを取得する"""
+    sys.path.insert(0, os.path.join(_TOP, "jma_ame_nrt"))
+    import get_jma_json_auto as auto
+    from utils import fetch
+    from utils.manifest import FetchManifest
+    from utils.archive import missing_times
+    with open(
+            os.path.join(fixture_dir, "www.jma.go.jp", "bosai", "amedas",
+                         "data", "latest_time.txt"), 'rt') as fin:
+        time_end = pd.to_datetime(fin.read().strip().split("+")[0])
+    time_sta = time_end - timedelta(hours=args.hours)
+    auto.output_dir = os.path.join(work_dir, "amedas")
+    auto.os_mkdir(auto.output_dir)
+    fetch.fetch_metrics().reset()
+    fetcher = fetch.Fetcher(max_workers=args.max_workers,
+                            rate=args.rate,
+                            burst=args.max_workers,
+                            retries=args.retries,
+                            backoff=args.backoff,
+                            cache_dir=os.path.join(work_dir, "http"))
+    manifest = FetchManifest(os.path.join(auto.output_dir, "manifest.sqlite"))
+    failed = auto.backfill(auto.output_dir,
+                           time_sta,
+                           time_end,
+                           timedelta(minutes=10),
+                           fetcher,
+                           manifest=manifest)
+    nslots = len(pd.date_range(time_sta, time_end, freq="10min"))
+    # 2回目は取得済みの時刻と、失敗して待ち時間中の時刻は要求しない
+    auto.backfill(auto.output_dir,
+                  time_sta,
+                  time_end,
+                  timedelta(minutes=10),
+                  fetcher,
+                  manifest=manifest)
+    missing = missing_times(auto.output_dir,
+                            time_sta,
+                            time_end,
+                            timedelta(minutes=10),
+                            exts=["json"])
+    manifest.close()
+    fetcher.close()
+    return dict(slots=nslots,
+                failed=len(failed),
+                missing=len(missing),
+                endpoints=_endpoints(fetch.fetch_metrics()))
+
+
+def _shared_fetcher(work_dir, args):
+    """jma_wpr、jma_satのfetch.pyで共有するFetcherを計測用の設定にする"""
+    import fetch
+    fetch._shared = fetch.Fetcher(max_workers=args.max_workers,
+                                  rate=args.rate,
+                                  burst=args.max_workers,
+                                  retries=args.retries,
+                                  backoff=args.backoff,
+                                  cache_dir=os.path.join(work_dir, "http"))
+    fetch.fetch_metrics().reset()
+    return fetch
+
+
+def bench_wpr(fixture_dir, work_dir, args):
+    """get_wpr_json.pyで時刻、地点情報と全地点のデータを取得する"""
+    sys.path.insert(0, os.path.join(_TOP, "jma_wpr"))
+    fetch = _shared_fetcher(work_dir, args)
+    import get_wpr_json as wpr
+    out = os.path.join(work_dir, "wpr")
+    os.makedirs(out, exist_ok=True)
+    os.chdir(out)
+    t = wpr.wpr_time(opt_retrieve=True)
+    time_list = [tl[0] for tl in t.values.tolist()]
+    stations = list(wpr.wpr_location().index)
+    failed = 0
+    for sid in stations:
+        try:
+            wpr.WprStation(station_no=sid).retrieve(time_list)
+        except OSError as e:
+            print("Warn:", e)
+            failed += 1
+    # 2回目は変更が無いため304
+    wpr.wpr_time(opt_retrieve=True)
+    return dict(times=len(time_list),
+                stations=len(stations),
+                failed=failed,
+                endpoints=_endpoints(fetch.fetch_metrics()))
+
+
+def bench_himawari(fixture_dir, work_dir, args):
+    """get_jma_jp.pyで時刻データと最新時刻のタイル画像を取得する"""
+    sys.path.insert(0, os.path.join(_TOP, "jma_sat"))
+    fetch = _shared_fetcher(work_dir, args)
+    import get_jma_jp as sat
+    out = os.path.join(work_dir, "himawari")
+    os.makedirs(out, exist_ok=True)
+    os.chdir(out)
+    basetimes, validtimes = sat.get_fileinfo(opt_jp=True)
+    tiles = ["6/55/26", "6/56/26", "6/55/27", "6/56/27"]
+    failed = 0
+    for tile in tiles:
+        try:
+            sat.get_jpg(basetimes.iloc[-1],
+                        validtimes.iloc[-1],
+                        mtype="l",
+                        tile=tile,
+                        opt_jp=True,
+                        cnt=args.retries + 1)
+            sat.get_tile(tile, mtype="std")
+        except OSError as e:
+            print("Warn:", e)
+            failed += 1
+    return dict(tiles=len(tiles),
+                failed=failed,
+                endpoints=_endpoints(fetch.fetch_metrics()))
+
+
+def parse_command():
+    """オプションの読み込み"""
+    parser = argparse.ArgumentParser(description='Benchmark JMA fetchers')
+    parser.add_argument('--fixture_dir',
+                        type=str,
+                        default="fixtures",
+                        help=('Top directory of the recorded files'),
+                        metavar='<fixture_dir>')
+    parser.add_argument('--hours',
+                        type=int,
+                        default=24,
+                        help=('Hours of AMeDAS data to fetch (default: 24)'),
+                        metavar='<hours>')
+    parser.add_argument('--only',
+                        type=str,
+                        default="amedas,wpr,himawari",
+                        help=('Fetchers to run (default: all)'),
+                        metavar='<amedas,wpr,himawari>')
+    parser.add_argument('--max_workers', type=int, default=4)
+    parser.add_argument('--rate',
+                        type=float,
+                        help=('Requests per second (default: no limit)'))
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--backoff', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--jitter', type=float, default=0.)
+    parser.add_argument('--bandwidth', type=float)
+    parser.add_argument('--p404', type=float, default=0.)
+    parser.add_argument('--p5xx', type=float, default=0.)
+    parser.add_argument('--max_concurrent', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # オプションの読み込み
+    args = parse_command()
+    fixture_dir = os.path.abspath(args.fixture_dir)
+    faults = Faults(latency=args.latency,
+                    jitter=args.jitter,
+                    bandwidth=args.bandwidth,
+                    p404=args.p404,
+                    p5xx=args.p5xx,
+                    max_concurrent=args.max_concurrent,
+                    seed=args.seed)
+    # 空いているポートで起動し、取得プログラムの送り先にする
+    server = StandinServer(fixture_dir, port=0, faults=faults,
+                           synth_tiles=True).start()
+    os.environ["JMA_DRAW_STANDIN"] = server.url
+    benches = dict(amedas=bench_amedas, wpr=bench_wpr, himawari=bench_himawari)
+    results = dict()
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        for name in args.only.split(","):
+            before = server.stats.summary()
+            t0 = time.perf_counter()
+            try:
+                res = benches[name](fixture_dir, work_dir, args)
+            except ImportError as e:
+                # cv2など作図用のパッケージが無い場合
+                res = dict(skipped=str(e))
+            finally:
+                os.chdir(cwd)
+            res["elapsed"] = round(time.perf_counter() - t0, 3)
+            after = server.stats.summary()
+            res["requests"] = {
+                k: v - before["requests"].get(k, 0)
+                for k, v in after["requests"].items()
+                if v - before["requests"].get(k, 0) > 0
+            }
+            res["bytes"] = after["bytes"] - before["bytes"]
+            results[name] = res
+    server.shutdown()
+    json.dump(results, sys.stdout, indent=1)
+    print()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+#
+# 代わりのサーバー（standin_server.py）で返すファイルを、乱数で作成する
+# （記録したファイルが無い環境で、取得プログラムの試験・計測に使う）
+#
+# 作成するファイル（fixture_dir/ホスト名/パス）
+#   www.jma.go.jp/bosai/amedas/data/latest_time.txt
+#   www.jma.go.jp/bosai/amedas/const/amedastable.json
+#   www.jma.go.jp/bosai/amedas/data/map/時刻.json（10分毎）
+#   www.jma.go.jp/bosai/amedas/data/point/地点番号/yyyymmdd_hh.json（3時間毎）
+#   www.jma.go.jp/bosai/windprofiler/const/station.json
+#   www.jma.go.jp/bosai/windprofiler/data/times.json、地点番号.json
+#   www.jma.go.jp/bosai/himawari/data/satimg/targetTimes_fd.json、_jp.json
+# タイル画像は作成しない（standin_server.pyの--synth_tilesで無地の画像を返す）
+#
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+_JMA = "www.jma.go.jp"
+# 16方位の風向
+_NDIR = 16
+# WPRの地点番号
+_WPR_STATIONS = ("47626", "47636", "47656", "47836")
+
+
+def _write(fixture_dir, path, data):
+    """fixture_dir/pathにJSON（またはテキスト）を書き出す"""
+    output_filename = os.path.join(fixture_dir, *path.split("/"))
+    os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+    with open(output_filename, 'wt') as fout:
+        fout.write(data)
+
+
+def _deg_min(x):
+    """10進の度を[度, 分]に変換する"""
+    deg = int(np.floor(x))
+    return [deg, round((x - deg) * 60., 1)]
+
+
+def make_amedas(fixture_dir, times, nsta, rng):
+    """アメダスの地点情報と10分毎のデータを作成する"""
+    staid = [str(11001 + n * 37) for n in range(nsta)]
+    lon = rng.uniform(128., 146., nsta)
+    lat = rng.uniform(26., 45., nsta)
+    table = dict()
+    for n, sid in enumerate(staid):
+        table[sid] = dict(type="A",
+                          elems="11111111",
+                          lat=_deg_min(lat[n]),
+                          lon=_deg_min(lon[n]),
+                          alt=int(rng.integers(0, 1500)),
+                          kjName="地点" + str(n),
+                          knName="チテン" + str(n),
+                          enName="Station" + str(n))
+    _write(fixture_dir, _JMA + "/bosai/amedas/const/amedastable.json", table)
+    # 気温は緯度と時刻で変え、降水は一部の地点のみ
+    base = 30. - (lat - 26.) * 0.5
+    rain1h = np.zeros(nsta)
+    # 地点毎のデータ（地点番号、yyyymmdd_hh毎）
+    point = dict()
+    for t in times:
+        hour = t.hour + t.minute / 60.
+        temp = base + 4. * np.sin((hour - 9.) / 24. * 2. * np.pi)
+        temp = temp + rng.normal(0., 0.5, nsta)
+        rain10m = np.where(rng.random(nsta) < 0.1, rng.gamma(1., 2., nsta),
+                           0.)
+        rain1h = rain1h * 5. / 6. + rain10m
+        data = dict()
+        for n, sid in enumerate(staid):
+            data[sid] = {
+                "temp": [round(float(temp[n]), 1), 0],
+                "humidity": [int(rng.integers(40, 100)), 0],
+                "pressure": [round(float(rng.normal(1010., 3.)), 1), 0],
+                "precipitation10m": [round(float(rain10m[n]), 1), 0],
+                "precipitation1h": [round(float(rain1h[n]), 1), 0],
+                "precipitation3h": [round(float(rain1h[n] * 2.), 1), 0],
+                "precipitation24h": [round(float(rain1h[n] * 8.), 1), 0],
+                "wind": [round(float(rng.gamma(2., 1.5)), 1), 0],
+                "windDirection": [int(rng.integers(1, _NDIR + 1)), 0],
+                "maxTempTime": dict(hour=13, minute=int(rng.integers(0, 60))),
+            }
+        _write(fixture_dir,
+               _JMA + "/bosai/amedas/data/map/" + t.strftime("%Y%m%d%H%M%S")
+               + ".json", data)
+        block = t.strftime("%Y%m%d") + "_%02d" % (t.hour // 3 * 3)
+        for sid, rec in data.items():
+            point.setdefault((sid, block), dict())[t.strftime(
+                "%Y%m%d%H%M%S")] = rec
+    for (sid, block), data in point.items():
+        _write(fixture_dir, _JMA + "/bosai/amedas/data/point/" + sid + "/" +
+               block + ".json", data)
+    _write(fixture_dir, _JMA + "/bosai/amedas/data/latest_time.txt",
+           times[-1].strftime("%Y-%m-%dT%H:%M:%S+09:00"))
+
+
+def make_wpr(fixture_dir, times, rng):
+    """ウィンドプロファイラの地点情報と10分毎のデータを作成する"""
+    station = dict()
+    for n, sid in enumerate(_WPR_STATIONS):
+        station[sid] = dict(name="WPR" + str(n),
+                            lat=_deg_min(30. + n * 2.),
+                            lon=_deg_min(130. + n * 2.))
+    _write(fixture_dir, _JMA + "/bosai/windprofiler/const/station.json",
+           station)
+    tlist = [t.strftime("%Y%m%d%H%M%S") for t in times]
+    _write(fixture_dir, _JMA + "/bosai/windprofiler/data/times.json", tlist)
+    height = np.arange(300., 6300., 300.)
+    for sid in _WPR_STATIONS:
+        data = dict()
+        for tinfo in tlist:
+            nz = int(rng.integers(len(height) // 2, len(height) + 1))
+            data[tinfo] = [
+                dict(height=float(height[k]),
+                     u=round(float(rng.normal(5., 3.)), 1),
+                     v=round(float(rng.normal(0., 3.)), 1),
+                     w=round(float(rng.normal(0., 0.3)), 2)) for k in range(nz)
+            ]
+        _write(fixture_dir, _JMA + "/bosai/windprofiler/data/" + sid + ".json",
+               data)
+
+
+def make_himawari(fixture_dir, times):
+    """ひまわり画像の時刻データを作成する（時刻はUTC）"""
+    recs = []
+    for t in times:
+        tutc = (t - pd.Timedelta(hours=9)).strftime("%Y%m%d%H%M%S")
+        recs.append(dict(basetime=tutc, validtime=tutc, elements=["B13/TBB"]))
+    for area in ("fd", "jp"):
+        _write(fixture_dir, _JMA + "/bosai/himawari/data/satimg/targetTimes_" +
+               area + ".json", recs)
+
+
+def parse_command():
+    """オプションの読み込み"""
+    parser = argparse.ArgumentParser(description='Synthetic JMA fixtures')
+    parser.add_argument('--fixture_dir',
+                        type=str,
+                        default="fixtures",
+                        help=('Output directory (default: fixtures)'),
+                        metavar='<fixture_dir>')
+    parser.add_argument('--time_end',
+                        type=str,
+                        default="2021-07-01 12:00",
+                        help=('Latest time in JST'),
+                        metavar='<timeend>')
+    parser.add_argument('--hours',
+                        type=int,
+                        default=24,
+                        help=('Hours of data before time_end (default: 24)'),
+                        metavar='<hours>')
+    parser.add_argument('--nsta',
+                        type=int,
+                        default=100,
+                        help=('Number of AMeDAS stations (default: 100)'),
+                        metavar='<nsta>')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help=('Random seed'),
+                        metavar='<seed>')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # オプションの読み込み
+    args = parse_command()
+    rng = np.random.default_rng(args.seed)
+    time_end = pd.Timestamp(args.time_end)
+    times = list(
+        pd.date_range(time_end - pd.Timedelta(hours=args.hours),
+                      time_end,
+                      freq="10min"))
+    make_amedas(args.fixture_dir, times, args.nsta, rng)
+    make_wpr(args.fixture_dir, times, rng)
+    make_himawari(args.fixture_dir, times)
+    print(args.fixture_dir, len(times), "times")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#
+# 気象庁・国土地理院のサーバーから取得したファイルを、代わりのサーバー
+# （standin_server.py）で返せるように記録する（ネットワークがある環境で実行）
+#
+# 記録するファイル（fixture_dir/ホスト名/パス）
+#   amedas：latest_time.txt、amedastable.json、最近hours時間分のmap/時刻.json
+#           （--pointで指定した地点は最近hours時間分のpoint/地点番号/yyyymmdd_hh.json）
+#   wpr：station.json、times.json、全地点の地点番号.json
+#   himawari：targetTimes_fd.json、_jp.json、最新時刻の赤外画像のタイル
+#   --urlで指定したURL（data.jma.go.jpの表、地理院タイルなど）
+#
+import os
+import time
+import json
+import argparse
+import urllib.parse
+import urllib.request
+import pandas as pd
+
+_JMA = "https://www.jma.go.jp/bosai/"
+# 取得する間隔（秒）
+_INTERVAL = 1.0
+# タイムアウト（秒）
+_TIMEOUT = 30.0
+
+
+def record(fixture_dir, url):
+    """URLの内容を取得し、fixture_dir/ホスト名/パスに保存する"""
+    u = urllib.parse.urlsplit(url)
+    path = urllib.parse.unquote(u.path)
+    if u.query:
+        path = path + "?" + u.query
+    parts = [p for p in path.split("/") if p not in ("", ".", "..")]
+    output_filename = os.path.join(fixture_dir, u.netloc, *parts)
+    print(url)
+    with urllib.request.urlopen(url, timeout=_TIMEOUT) as res:
+        data = res.read()
+    os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+    with open(output_filename, 'wb') as fout:
+        fout.write(data)
+    time.sleep(_INTERVAL)
+    return data
+
+
+def record_amedas(fixture_dir, hours, points=()):
+    """アメダスの最新時刻、地点情報と最近のデータを記録する"""
+    latest = record(fixture_dir, _JMA + "amedas/data/latest_time.txt")
+    record(fixture_dir, _JMA + "amedas/const/amedastable.json")
+    time_end = pd.to_datetime(latest.decode().strip().split("+")[0])
+    for t in pd.date_range(time_end - pd.Timedelta(hours=hours),
+                           time_end,
+                           freq="10min"):
+        record(fixture_dir,
+               _JMA + "amedas/data/map/" + t.strftime("%Y%m%d%H%M%S") + ".json")
+    # 地点毎のデータ（3時間毎のブロック）
+    for t in pd.date_range((time_end - pd.Timedelta(hours=hours)).floor("3h"),
+                           time_end,
+                           freq="3h"):
+        for sid in points:
+            record(
+                fixture_dir, _JMA + "amedas/data/point/" + sid + "/" +
+                t.strftime("%Y%m%d_%H") + ".json")
+
+
+def record_wpr(fixture_dir):
+    """ウィンドプロファイラの地点情報、時刻と全地点のデータを記録する"""
+    station = json.loads(
+        record(fixture_dir, _JMA + "windprofiler/const/station.json"))
+    record(fixture_dir, _JMA + "windprofiler/data/times.json")
+    for sid in station:
+        record(fixture_dir, _JMA + "windprofiler/data/" + sid + ".json")
+
+
+def record_himawari(fixture_dir, tiles):
+    """ひまわり画像の時刻データと、最新時刻の赤外画像のタイルを記録する"""
+    for area in ("fd", "jp"):
+        recs = json.loads(
+            record(fixture_dir,
+                   _JMA + "himawari/data/satimg/targetTimes_" + area + ".json"))
+        rec = recs[-1]
+        for tile in tiles:
+            z = int(tile.split("/")[0])
+            # ズームレベル6は日本付近のみ
+            if (area == "jp") != (z == 6):
+                continue
+            record(
+                fixture_dir, _JMA + "himawari/data/satimg/" + rec["basetime"] +
+                "/" + area + "/" + rec["validtime"] + "/B13/TBB/" + tile +
+                ".jpg")
+
+
+def parse_command():
+    """オプションの読み込み"""
+    parser = argparse.ArgumentParser(description='Record JMA fixtures')
+    parser.add_argument('--fixture_dir',
+                        type=str,
+                        default="fixtures",
+                        help=('Output directory (default: fixtures)'),
+                        metavar='<fixture_dir>')
+    parser.add_argument('--hours',
+                        type=int,
+                        default=3,
+                        help=('Hours of AMeDAS maps to record (default: 3)'),
+                        metavar='<hours>')
+    parser.add_argument('--tiles',
+                        type=str,
+                        default="6/55/26,6/56/26,6/55/27,6/56/27",
+                        help=('Himawari tiles z/x/y separated by comma'),
+                        metavar='<tiles>')
+    parser.add_argument('--url',
+                        type=str,
+                        action='append',
+                        default=[],
+                        help=('Additional URL to record (repeatable)'),
+                        metavar='<url>')
+    parser.add_argument('--point',
+                        type=str,
+                        default="",
+                        help=('AMeDAS station numbers separated by comma '
+                              'to record point data'),
+                        metavar='<point>')
+    parser.add_argument('--skip',
+                        type=str,
+                        default="",
+                        help=('Skip amedas, wpr and/or himawari'),
+                        metavar='<amedas,wpr,himawari>')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # オプションの読み込み
+    args = parse_command()
+    skip = args.skip.split(",")
+    if "amedas" not in skip:
+        record_amedas(args.fixture_dir, args.hours,
+                      [sid for sid in args.point.split(",") if sid != ""])
+    if "wpr" not in skip:
+        record_wpr(args.fixture_dir)
+    if "himawari" not in skip:
+        record_himawari(args.fixture_dir, args.tiles.split(","))
+    for url in args.url:
+        record(args.fixture_dir, url)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+#
+# 気象庁・国土地理院のサーバーの代わりに、記録したファイル（fixture）を返す
+# ローカルのサーバー（ネットワークが無い環境での取得プログラムの試験・計測用）
+#
+# fixture_dir/ホスト名/パス のファイルを返す
+#   例：https://www.jma.go.jp/bosai/amedas/data/latest_time.txt
+#       -> fixture_dir/www.jma.go.jp/bosai/amedas/data/latest_time.txt
+#
+# 取得プログラム側では、環境変数JMA_DRAW_STANDINにこのサーバーのURLを設定する
+#   % export JMA_DRAW_STANDIN=http://127.0.0.1:8000
+#
+import os
+import sys
+import time
+import json
+import random
+import argparse
+import threading
+import mimetypes
+import email.utils
+import http.server
+import urllib.parse
+
+# 既定のポート番号
+port_default = 8000
+# 帯域を制限する場合に1回で送る大きさ（バイト）
+_CHUNK = 16384
+
+
+class Faults():
+    """応答の遅延・帯域制限・エラーの設定
+
+    Parameters:
+    ----------
+    latency: float
+        応答までの遅延（秒）
+    jitter: float
+        遅延に加える一様乱数の幅（秒）
+    bandwidth: float
+        1つの応答の送信速度の上限（バイト/秒、Noneの場合は制限しない）
+    p404: float
+        存在するファイルでも404を返す確率
+    p5xx: float
+        500、502、503のいずれかを返す確率
+    max_concurrent: int
+        同時に処理する要求数の上限（超えた場合は503、Noneの場合は制限しない）
+    seed: int
+        乱数の種
+    ----------
+    """
+    def __init__(self,
+                 latency=0.,
+                 jitter=0.,
+                 bandwidth=None,
+                 p404=0.,
+                 p5xx=0.,
+                 max_concurrent=None,
+                 seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.p404 = p404
+        self.p5xx = p5xx
+        self.max_concurrent = max_concurrent
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def delay(self):
+        """応答までの遅延（秒）"""
+        with self._lock:
+            return self.latency + self._random.uniform(0., self.jitter)
+
+    def error(self):
+        """返すエラーのステータスコード（エラーにしない場合はNone）"""
+        with self._lock:
+            r = self._random.random()
+            if r < self.p5xx:
+                return self._random.choice((500, 502, 503))
+            if r < self.p5xx + self.p404:
+                return 404
+        return None
+
+    def enter(self):
+        """処理中の要求数を増やす（上限を超えた場合はFalse）"""
+        with self._lock:
+            if (self.max_concurrent is not None
+                    and self._active >= self.max_concurrent):
+                return False
+            self._active += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
+
+
+class Stats():
+    """ステータスコード毎の要求数と送信したバイト数"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = dict()
+        self.bytes = 0
+
+    def add(self, status, nbytes):
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+            self.bytes += nbytes
+
+    def summary(self):
+        with self._lock:
+            requests = {str(k): v for k, v in sorted(self.requests.items())}
+            return dict(requests=requests, bytes=self.bytes)
+
+
+class StandinHandler(http.server.BaseHTTPRequestHandler):
+    """fixture_dir/ホスト名/パス のファイルを返す（keep-alive、条件付き要求に対応）"""
+    protocol_version = "HTTP/1.1"
+    server_version = "jma_standin/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _path(self):
+        """要求されたパスからfixtureのファイル名を求める"""
+        u = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(u.path)
+        if u.query:
+            # クエリ付きのURLは「パス?クエリ」をファイル名とする
+            path = path + "?" + u.query
+        parts = [p for p in path.split("/") if p not in ("", ".", "..")]
+        return os.path.join(self.server.fixture_dir, *parts)
+
+    def _send(self, status, body=b"", headers=None):
+        faults = self.server.faults
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or dict()).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD" and len(body) > 0:
+            if faults.bandwidth is None:
+                self.wfile.write(body)
+            else:
+                for n in range(0, len(body), _CHUNK):
+                    chunk = body[n:n + _CHUNK]
+                    self.wfile.write(chunk)
+                    time.sleep(len(chunk) / faults.bandwidth)
+        self.server.stats.add(status, len(body))
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        faults = self.server.faults
+        if not faults.enter():
+            self._send(503, headers={"Retry-After": "1"})
+            return
+        try:
+            time.sleep(faults.delay())
+            status = faults.error()
+            if status is not None:
+                self._send(status)
+                return
+            path = self._path()
+            if not os.path.isfile(path):
+                body = self.server.synthesize(path)
+                if body is None:
+                    self._send(404)
+                    return
+                self._send(200, body, {"Content-Type": "image/png"})
+                return
+            st = os.stat(path)
+            etag = '"%x-%x"' % (st.st_mtime_ns, st.st_size)
+            last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+            headers = {"ETag": etag, "Last-Modified": last_modified}
+            if self._not_modified(etag, st.st_mtime):
+                self._send(304, headers=headers)
+                return
+            with open(path, 'rb') as fin:
+                body = fin.read()
+            headers["Content-Type"] = (mimetypes.guess_type(path)[0]
+                                       or "application/octet-stream")
+            self._send(200, body, headers)
+        finally:
+            faults.leave()
+
+    def _not_modified(self, etag, mtime):
+        """If-None-Match、If-Modified-Sinceから変更が無いかどうかを判断する"""
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            return etag in [t.strip() for t in inm.split(",")]
+        ims = self.headers.get("If-Modified-Since")
+        if ims is not None:
+            try:
+                t = email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= int(t)
+        return False
+
+
+class StandinServer(http.server.ThreadingHTTPServer):
+    """記録したファイルを返すサーバー
+
+    Parameters:
+    ----------
+    fixture_dir: str
+        記録したファイルのトップディレクトリ（ホスト名毎のディレクトリを置く）
+    host: str
+        待ち受けるアドレス
+    port: int
+        ポート番号（0の場合は空いている番号）
+    faults: Faults
+        遅延・エラーの設定（Noneの場合は遅延・エラー無し）
+    synth_tiles: bool
+        記録が無いタイル画像（.png、.jpg）を無地の画像で返すかどうか
+    verbose: bool
+        要求毎にログを表示するかどうか
+    ----------
+    """
+    daemon_threads = True
+
+    def __init__(self,
+                 fixture_dir,
+                 host="127.0.0.1",
+                 port=port_default,
+                 faults=None,
+                 synth_tiles=False,
+                 verbose=False):
+        super().__init__((host, port), StandinHandler)
+        self.fixture_dir = fixture_dir
+        self.faults = faults if faults is not None else Faults()
+        self.synth_tiles = synth_tiles
+        self.verbose = verbose
+        self.stats = Stats()
+        self._tile = None
+
+    @property
+    def url(self):
+        """取得プログラムのJMA_DRAW_STANDINに設定するURL"""
+        host, port = self.server_address[:2]
+        return "http://" + host + ":" + str(port)
+
+    def synthesize(self, path):
+        """記録が無いタイル画像の代わりの画像を返す（返さない場合はNone）"""
+        if not self.synth_tiles or not path.endswith((".png", ".jpg")):
+            return None
+        if self._tile is None:
+            import io
+            from PIL import Image
+            buf = io.BytesIO()
+            Image.new("RGB", (256, 256), (128, 128, 128)).save(buf,
+                                                               format="PNG")
+            self._tile = buf.getvalue()
+        return self._tile
+
+    def start(self):
+        """別のスレッドで待ち受けを開始する（試験・計測用）"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def parse_command():
+    """オプションの読み込み"""
+    parser = argparse.ArgumentParser(description='JMA stand-in server')
+    parser.add_argument('--fixture_dir',
+                        type=str,
+                        default="fixtures",
+                        help=('Top directory of the recorded files '
+                              '(default: fixtures)'),
+                        metavar='<fixture_dir>')
+    parser.add_argument('--port',
+                        type=int,
+                        default=port_default,
+                        help=('Port number (default: 8000)'),
+                        metavar='<port>')
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.,
+                        help=('Response latency in seconds'),
+                        metavar='<latency>')
+    parser.add_argument('--jitter',
+                        type=float,
+                        default=0.,
+                        help=('Random latency added in seconds'),
+                        metavar='<jitter>')
+    parser.add_argument('--bandwidth',
+                        type=float,
+                        help=('Bytes per second for each response'),
+                        metavar='<bandwidth>')
+    parser.add_argument('--p404',
+                        type=float,
+                        default=0.,
+                        help=('Probability of 404 for existing files'),
+                        metavar='<p404>')
+    parser.add_argument('--p5xx',
+                        type=float,
+                        default=0.,
+                        help=('Probability of 500/502/503'),
+                        metavar='<p5xx>')
+    parser.add_argument('--max_concurrent',
+                        type=int,
+                        help=('Requests served at once (503 beyond this)'),
+                        metavar='<max_concurrent>')
+    parser.add_argument('--seed',
+                        type=int,
+                        help=('Random seed'),
+                        metavar='<seed>')
+    parser.add_argument('--synth_tiles',
+                        action='store_true',
+                        help=('Serve a blank image for missing tiles'))
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help=('Log every request'))
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # オプションの読み込み
+    args = parse_command()
+    faults = Faults(latency=args.latency,
+                    jitter=args.jitter,
+                    bandwidth=args.bandwidth,
+                    p404=args.p404,
+                    p5xx=args.p5xx,
+                    max_concurrent=args.max_concurrent,
+                    seed=args.seed)
+    server = StandinServer(args.fixture_dir,
+                           port=args.port,
+                           faults=faults,
+                           synth_tiles=args.synth_tiles,
+                           verbose=args.verbose)
+    print("serving", os.path.abspath(args.fixture_dir), "at", server.url)
+    print("export JMA_DRAW_STANDIN=" + server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # 要求数と送信したバイト数を表示する
+        json.dump(server.stats.summary(), sys.stdout, indent=1)
+        print()
@@ -4,7 +4,7 @@ import pandas as pd
 import numpy as np
 import os
 import json
-import urllib.request
+from fetch import export_metrics, shared_fetcher, metadata_cache
 
 
 # データ取得部分
@@ -42,9 +42,9 @@ class WprStation():
         file_name = self.station_no + ".json"
         # WPRデータの取得
         url = url_top + file_name
-        print(url)
         if opt_retrieve:
-            urllib.request.urlretrieve(url, file_name)
+            # 前回から変更された場合のみ取得する
+            shared_fetcher().get_file(url, file_name)
         # 配列の初期化（z方向はデータ長よりも長く)
         size = (50, )
         z = np.ones(size) * np.nan
@@ -89,24 +89,21 @@ class WprStation():
         return u, v, w, z
 
 
-def wpr_time(opt_retrive=True):
+def wpr_time(opt_retrieve=True):
     """WPR時刻情報を取得し保存する
 
     Parameters:
     ----------
-    opt_retrive: bool
-        データが存在する場合にも取得する
+    opt_retrieve: bool
+        データが存在する場合にも取得する（変更されていなければ304で済ませる）
     ----------
     """
     url_top = "https://www.jma.go.jp/bosai/windprofiler/data/"
     file_name = "times.json"
-    if opt_retrieve and os.path.exists(file_name):
-        os.remove(file_name)
     # WPR時刻情報の取得
     url = url_top + file_name
-    if not os.path.exists(file_name):
-        print(url)
-        urllib.request.urlretrieve(url, file_name)
+    if opt_retrieve or not os.path.exists(file_name):
+        shared_fetcher().get_file(url, file_name)
     with open(file_name, 'rt') as fin:
         data = fin.read()
     df = DataFrame(json.loads(data))
@@ -127,11 +124,8 @@ def wpr_location():
     file_name = "station.json"
     # WPR地点情報の取得
     url = url_top + file_name
-    if not os.path.exists(file_name):
-        print(url)
-        urllib.request.urlretrieve(url, file_name)
-    with open(file_name, 'rt') as fin:
-        data = fin.read()
+    # 共有するメタデータのキャッシュから読み込む（実行中は同じ版を使う）
+    data = metadata_cache().read(url, shared_fetcher()).decode()
     df = DataFrame(json.loads(data))
     # 取り出したデータを返却
     return df.T
@@ -143,7 +137,7 @@ if __name__ == '__main__':
     opt_retrieve = True
     # opt_retrieve = False
     # WPRデータの時刻を取得
-    t = wpr_time(opt_retrive=True)
+    t = wpr_time(opt_retrieve=True)
     time_list = [tl[0] for tl in np.array(t).tolist()]
     print(time_list, len(time_list))
     # WPRの位置を取得
@@ -180,3 +174,5 @@ if __name__ == '__main__':
     u.to_csv('u_' + str(station_no) + ".csv")
     v.to_csv('v_' + str(station_no) + ".csv")
     w.to_csv('w_' + str(station_no) + ".csv")
+    # 取得の集計結果を書き出す（JMA_DRAW_METRICS_DIRを設定した場合）
+    export_metrics("get_wpr_json")